@@ -29,7 +29,11 @@ from api.v1.serializers.django_celery_beat_serializers import (
     IntervalScheduleSerializer,
     PeriodicTaskSerializer,
 )
+from api.v1.serializers.mailbox_serializers.MailboxFetchProgressSerializer import (
+    MailboxFetchProgressSerializer,
+)
 from core.models import Daemon, Mailbox
+from core.utils.fetchers import FetchingFilter
 
 
 if TYPE_CHECKING:
@@ -53,6 +57,10 @@ class BaseDaemonSerializer(serializers.ModelSerializer[Daemon]):
     """The celery_task is serialized
     by :class:`api.v1.serializers.django_celery_beat_serializers.PeriodicTaskSerializer`.
     """
+    fetch_progress = MailboxFetchProgressSerializer(source="mailbox", read_only=True)
+    """The progress of the latest fetching run of the mailbox is serialized
+    by :class:`api.v1.serializers.mailbox_serializers.MailboxFetchProgressSerializer`.
+    """
 
     class Meta:
         """Metadata class for the base serializer.
@@ -73,11 +81,13 @@ class BaseDaemonSerializer(serializers.ModelSerializer[Daemon]):
             "is_healthy",
             "last_error",
             "last_error_occurred_at",
+            "is_fetch_pending",
             "created",
             "updated",
         ]
         """The :attr:`core.models.Daemon.Daemon.uuid`,
         :attr:`core.models.Daemon.Daemon.is_healthy`,
+        :attr:`core.models.Daemon.Daemon.is_fetch_pending`,
         :attr:`core.models.Daemon.Daemon.created` and
         :attr:`core.models.Daemon.Daemon.updated` fields are read-only.
         """
@@ -91,6 +101,15 @@ class BaseDaemonSerializer(serializers.ModelSerializer[Daemon]):
             raise serializers.ValidationError("No mailbox with that id found.")
         return value
 
+    def validate_fetching_filter(self, value: dict | None) -> dict | None:
+        """Validate that the given fetching_filter is wellformed."""
+        if value:
+            try:
+                FetchingFilter.validate(value)
+            except ValueError as error:
+                raise serializers.ValidationError(str(error)) from error
+        return value
+
     @override
     def validate(self, attrs: Any) -> Any:
         """Validate that the given fetching_criterion is available for the mailbox."""
@@ -20,7 +20,7 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Final
+from typing import TYPE_CHECKING, ClassVar, Final
 
 from rest_framework import serializers
 
@@ -44,14 +44,18 @@ class BaseMailboxSerializer(serializers.ModelSerializer[Mailbox]):
 
         Contains constraints that must be implemented by all serializers.
         Other serializer metaclasses should inherit from this.
-        :attr:`read_only_fields` must not be shortened in subclasses.
+        :attr:`read_only_fields` and :attr:`exclude` must not be shortened in subclasses.
         """
 
         model: Final[type[Model]] = Mailbox
         """The model to serialize."""
 
-        fields = "__all__"
-        """Includes all fields."""
+        exclude: ClassVar[list[str]] = [
+            "fetched_uidls",
+            "sync_state",
+            "interrupted_fetch_runs",
+        ]
+        """Exclude the internal sync state fields, :attr:`core.models.Mailbox.Mailbox.fetched_uidls` can be very long."""
 
         read_only_fields: Final[list[str]] = [
             "name",
@@ -59,12 +63,23 @@ class BaseMailboxSerializer(serializers.ModelSerializer[Mailbox]):
             "is_healthy",
             "last_error",
             "last_error_occurred_at",
+            "uid_validity",
+            "highest_uid",
+            "fetch_run_id",
+            "fetch_run_key",
+            "fetch_checkpoint",
+            "fetch_progress",
+            "fetch_checkpoint_at",
+            "is_fetch_complete",
             "created",
             "updated",
         ]
         """The :attr:`core.models.Mailbox.Mailbox.name`,
         :attr:`core.models.Mailbox.Mailbox.account`,
         :attr:`core.models.Mailbox.Mailbox.is_healthy`,
+        :attr:`core.models.Mailbox.Mailbox.uid_validity`,
+        :attr:`core.models.Mailbox.Mailbox.highest_uid`,
+        the fetching progress fields,
         :attr:`core.models.Mailbox.Mailbox.created` and
         :attr:`core.models.Mailbox.Mailbox.updated` fields are read-only.
         """
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`MailboxFetchProgressSerializer` serializer class."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, ClassVar, Final
+
+from rest_framework import serializers
+
+from core.models import Mailbox
+
+
+if TYPE_CHECKING:
+    from django.db.models import Model
+
+
+class MailboxFetchProgressSerializer(serializers.ModelSerializer[Mailbox]):
+    """The serializer for the fetching progress of a :class:`core.models.Mailbox`.
+
+    Only includes the fields of the latest fetching run, all of them read-only.
+    Used to nest the progress into other serializers.
+    """
+
+    class Meta:
+        """Metadata class for the serializer."""
+
+        model: Final[type[Model]] = Mailbox
+        """The model to serialize."""
+
+        fields: ClassVar[list[str]] = [
+            "fetch_run_id",
+            "fetch_run_key",
+            "fetch_checkpoint",
+            "fetch_progress",
+            "fetch_checkpoint_at",
+            "is_fetch_complete",
+        ]
+        """Include only the fetching progress fields."""
+
+        read_only_fields: Final[list[str]] = fields
+        """All fields are read-only."""
@@ -19,7 +19,12 @@
 """api.v1.serializers.mailbox_serializers package containing serializers for the :mod:`core.models.Mailbox` data."""
 
 from .BaseMailboxSerializer import BaseMailboxSerializer
+from .MailboxFetchProgressSerializer import MailboxFetchProgressSerializer
 from .MailboxWithDaemonSerializer import MailboxWithDaemonSerializer
 
 
-__all__ = ["BaseMailboxSerializer", "MailboxWithDaemonSerializer"]
+__all__ = [
+    "BaseMailboxSerializer",
+    "MailboxFetchProgressSerializer",
+    "MailboxWithDaemonSerializer",
+]
@@ -25,18 +25,27 @@ from typing import TYPE_CHECKING, Final, override
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.openapi import OpenApiTypes
-from drf_spectacular.utils import extend_schema, extend_schema_view, inline_serializer
+from drf_spectacular.utils import (
+    OpenApiResponse,
+    extend_schema,
+    extend_schema_view,
+    inline_serializer,
+)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import ChoiceField
 
 from api.v1.filters import AccountFilterSet
 from api.v1.mixins.ToggleFavoriteMixin import ToggleFavoriteMixin
 from api.v1.serializers import AccountSerializer
+from core.constants import EmailFetchingCriterionChoices
 from core.models import Account
-from core.utils.fetchers.exceptions import MailAccountError
+from core.tasks import fetch_account_emails
+from core.utils.fetchers.exceptions import FetcherError
 
 
 if TYPE_CHECKING:
@@ -74,6 +83,30 @@ if TYPE_CHECKING:
         },
         description="Tests the account instance.",
     ),
+    fetch=extend_schema(
+        request=inline_serializer(
+            name="fetch_account_criterion_data",
+            fields={
+                "criterion": ChoiceField(choices=EmailFetchingCriterionChoices.choices)
+            },
+        ),
+        responses={
+            202: OpenApiResponse(
+                response=inline_serializer(
+                    name="fetch_account_response",
+                    fields={
+                        "detail": OpenApiTypes.STR,
+                        "task_id": OpenApiTypes.STR,
+                        "data": AccountSerializer,
+                    },
+                ),
+                description="Fetching was queued",
+            ),
+        },
+        description="Fetches the emails from all healthy mailboxes of the account instance concurrently based on the given criterion in a background task. "
+        "Only criteria available for the instance are accepted. "
+        "The errors of the mailboxes that failed to fetch are recorded in the result of the task.",
+    ),
 )
 class AccountViewSet(viewsets.ModelViewSet[Account], ToggleFavoriteMixin):
     """Viewset for the :class:`core.models.Account`.
@@ -136,7 +169,7 @@ class AccountViewSet(viewsets.ModelViewSet[Account], ToggleFavoriteMixin):
         account = self.get_object()
         try:
             account.update_mailboxes()
-        except MailAccountError as error:
+        except FetcherError as error:
             response = Response(
                 data={
                     "detail": _("An error with the mailaccount occurred."),
@@ -174,7 +207,7 @@ class AccountViewSet(viewsets.ModelViewSet[Account], ToggleFavoriteMixin):
         )
         try:
             account.test()
-        except MailAccountError as error:
+        except FetcherError as error:
             response.data["result"] = False
             response.data["error"] = str(error)
         else:
@@ -182,3 +215,52 @@ class AccountViewSet(viewsets.ModelViewSet[Account], ToggleFavoriteMixin):
         account.refresh_from_db()
         response.data["data"] = self.get_serializer(account).data
         return response
+
+    URL_PATH_FETCH = "fetch"
+    URL_NAME_FETCH = "fetch"
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path=URL_PATH_FETCH,
+        url_name=URL_NAME_FETCH,
+    )
+    def fetch(self, request: Request, pk: int | None = None) -> Response:
+        """Action method fetching the mails from all healthy mailboxes of the account.
+
+        The mailboxes are fetched by the :func:`core.tasks.fetch_account_emails` task.
+
+        Args:
+            request: The request triggering the action.
+            pk: The private key of the account. Defaults to None.
+
+        Raises:
+            ValidationError: If the criterion is missing or not available for the account.
+
+        Returns:
+            A response with the id of the fetching task and the account data.
+        """
+        account = self.get_object()
+        criterion = request.data.get("criterion")
+        if not criterion:
+            raise ValidationError(
+                {"criterion": _("Fetching criterion is required.")},
+            )
+        if criterion not in account.get_fetcher_class().AVAILABLE_FETCHING_CRITERIA:
+            raise ValidationError(
+                {
+                    "criterion": _(
+                        "The given criterion %(criterion)s is not available for this account."
+                    )
+                    % {"criterion": criterion}
+                },
+            )
+        task = fetch_account_emails.delay(account.pk, criterion)
+        return Response(
+            {
+                "detail": _("Fetching of the mailboxes started."),
+                "task_id": task.id,
+                "data": self.get_serializer(account).data,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
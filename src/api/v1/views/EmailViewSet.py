@@ -42,6 +42,7 @@ from api.v1.mixins.ToggleFavoriteMixin import ToggleFavoriteMixin
 from api.v1.serializers import BaseEmailSerializer, FullEmailSerializer
 from core.constants import SupportedEmailDownloadFormats
 from core.models import Email, EmailCorrespondent
+from core.tasks import restore_emails
 from core.utils.fetchers.exceptions import FetcherError
 
 
@@ -118,6 +119,38 @@ if TYPE_CHECKING:
         },
         description="Restores the email to its mailbox.",
     ),
+    restore_batch=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "id",
+                OpenApiTypes.INT,
+                OpenApiParameter.QUERY,
+                required=True,
+                explode=True,
+                many=True,
+                description="Accepts both id=1,2,3 and id=1&id=2&id=3 notation",
+            ),
+        ],
+        request=None,
+        responses={
+            202: OpenApiResponse(
+                response=inline_serializer(
+                    name="restore_batch_response",
+                    fields={
+                        "detail": OpenApiTypes.STR,
+                        "task_id": OpenApiTypes.STR,
+                        "count": OpenApiTypes.INT,
+                    },
+                ),
+                description="Restoring was queued",
+            ),
+            404: OpenApiResponse(
+                response=OpenApiTypes.STR, description="No emails were found"
+            ),
+        },
+        description="Restores multiple emails to their mailboxes in a background task. "
+        "The progress and the errors of the emails that failed to restore are recorded in the result of the task.",
+    ),
     reprocess=extend_schema(
         responses={
             200: OpenApiResponse(
@@ -396,6 +429,60 @@ class EmailViewSet(
             )
         return Response({"detail": _("Email successfully restored to mailbox.")})
 
+    URL_PATH_RESTORE_BATCH = "restore"
+    URL_NAME_RESTORE_BATCH = "restore-batch"
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path=URL_PATH_RESTORE_BATCH,
+        url_name=URL_NAME_RESTORE_BATCH,
+    )
+    def restore_batch(self, request: Request) -> Response:
+        """Action method restoring a batch of emails to their mailboxes.
+
+        The emails are restored by the :func:`core.tasks.restore_emails` task.
+
+        Args:
+            request: The request triggering the action.
+
+        Raises:
+            Http404: If none of the emails are found.
+            ValidationError: If the id param is missing or in invalid format.
+
+        Returns:
+            A response with the id of the restoring task.
+        """
+        requested_id_query_params = request.query_params.getlist("id", [])
+        if not requested_id_query_params:
+            raise ValidationError(
+                {"id": _("Email ids are required.")},
+            )
+        try:
+            requested_ids = query_param_list_to_typed_list(
+                requested_id_query_params, int
+            )
+        except ValueError:
+            raise ValidationError(
+                {"id": _("Email ids given in invalid format.")},
+            ) from None
+        email_ids = list(
+            self.get_queryset()
+            .filter(pk__in=requested_ids)
+            .values_list("pk", flat=True)
+        )
+        if not email_ids:
+            raise Http404(_("No emails found"))
+        task = restore_emails.delay(email_ids)
+        return Response(
+            {
+                "detail": _("Restoring of emails to their mailboxes started."),
+                "task_id": task.id,
+                "count": len(email_ids),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     URL_PATH_REPROCESS = "reprocess"
     URL_NAME_REPROCESS = "reprocess"
 
@@ -30,11 +30,12 @@ from .models import (
     Email,
     EmailCorrespondent,
     Mailbox,
+    MailHostThrottle,
     StorageShard,
 )
 
 
-admin.site.register([StorageShard])
+admin.site.register([MailHostThrottle, StorageShard])
 
 AccountResource = modelresource_factory(Account)
 AttachmentResource = modelresource_factory(Attachment)
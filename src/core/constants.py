@@ -59,6 +59,11 @@ class EmailFetchingCriterionChoices(TextChoices):
     ALL = "ALL", _("All emails")
     """Filter by "ALL" flag."""
 
+    INCREMENTAL = "INCREMENTAL", _("All emails that arrived since the last fetch")
+    """Filter by "UID" for mails with a UID higher than the last fetched one.
+    Falls back to "ALL" if the UIDVALIDITY of the mailbox has changed.
+    """
+
     NEW = "NEW", _("All RECENT and UNSEEN emails")
     """Filter by "NEW" flag."""
 
@@ -105,6 +110,9 @@ class EmailProtocolChoices(TextChoices):
     EXCHANGE = "EXCHANGE", _("Microsoft Exchange")
     """Microsoft's Exchange protocol"""
 
+    JMAP = "JMAP", _("JMAP")
+    """The JSON Meta Application Protocol"""
+
 
 class HeaderFields:
     """Namespace class with all header fields that have their own column in the emails table.
@@ -195,6 +203,7 @@ PROTOCOLS_SUPPORTING_RESTORE = (
     EmailProtocolChoices.IMAP,
     EmailProtocolChoices.IMAP4_SSL,
     EmailProtocolChoices.EXCHANGE,
+    EmailProtocolChoices.JMAP,
 )
 """All protocols supporting restoring of emails."""
 
@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the `listen_for_emails` management command."""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, override
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Daemon
+from core.utils.IdleListener import IdleListener
+
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+    from uuid import UUID
+
+
+class Command(BaseCommand):
+    """Listens for new emails with IMAP IDLE and fetches them right away.
+
+    Watches the mailboxes of all active daemons with the incremental fetching criterion
+    on IMAP accounts, with one connection per mailbox.
+    The watched daemons are refreshed regularly, so added, changed and removed daemons are picked up.
+    """
+
+    help = "Listens for new emails with IMAP IDLE and fetches them right away."
+
+    WATCHED_PROTOCOLS = (EmailProtocolChoices.IMAP, EmailProtocolChoices.IMAP4_SSL)
+    """The protocols of the accounts that can be listened to."""
+
+    @override
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--refresh-interval",
+            type=float,
+            default=60,
+            help="Seconds between checks for added, changed or removed daemons.",
+        )
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        listeners: dict[UUID, IdleListener] = {}
+        try:
+            while True:
+                self.refresh_listeners(listeners)
+                close_old_connections()
+                time.sleep(options["refresh_interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for listener in listeners.values():
+                listener.stop()
+
+    def refresh_listeners(self, listeners: dict[UUID, IdleListener]) -> None:
+        """Starts and stops the listeners to match the daemons to watch.
+
+        Listeners whose daemon has changed or which have stopped are replaced.
+
+        Args:
+            listeners: The running listeners by the uuids of their daemons.
+                Updated in place.
+        """
+        watched_daemons = {
+            daemon.uuid: daemon
+            for daemon in Daemon.objects.filter(
+                fetching_criterion=EmailFetchingCriterionChoices.INCREMENTAL,
+                celery_task__enabled=True,
+                mailbox__account__protocol__in=self.WATCHED_PROTOCOLS,
+            ).select_related("mailbox__account")
+        }
+        for uuid, listener in list(listeners.items()):
+            daemon = watched_daemons.get(uuid)
+            if (
+                daemon is None
+                or not listener.is_alive()
+                or daemon.updated != listener.email_daemon.updated
+                or daemon.mailbox.account.updated
+                != listener.email_daemon.mailbox.account.updated
+            ):
+                listener.stop()
+                del listeners[uuid]
+        for uuid, daemon in watched_daemons.items():
+            if uuid not in listeners:
+                self.stdout.write(f"Listening for new emails for {daemon}.")
+                listeners[uuid] = IdleListener(daemon)
+                listeners[uuid].start()
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0055_alter_account_is_favorite_alter_account_is_healthy_and_more"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="daemon",
+            name="fetching_criterion_valid_choice",
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="highest_uid",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="The highest UID of the emails fetched from this mailbox.",
+                null=True,
+                verbose_name="highest UID",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="uid_validity",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="The UIDVALIDITY value of the mailbox at the last fetch.",
+                null=True,
+                verbose_name="UID validity",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="daemon",
+            name="fetching_criterion",
+            field=models.CharField(
+                choices=[
+                    ("DAILY", "All emails received the last DAY"),
+                    ("WEEKLY", "All emails received the last WEEK"),
+                    ("MONTHLY", "All emails received the last MONTH"),
+                    ("ANNUALLY", "All emails received the last YEAR"),
+                    ("RECENT", "All RECENT emails"),
+                    ("UNSEEN", "All UNSEEN emails"),
+                    ("SEEN", "All SEEN emails"),
+                    ("ALL", "All emails"),
+                    ("INCREMENTAL", "All emails that arrived since the last fetch"),
+                    ("NEW", "All RECENT and UNSEEN emails"),
+                    ("OLD", "All emails that are not RECENT"),
+                    ("FLAGGED", "FLAGGED emails"),
+                    ("DRAFT", "All email DRAFTs"),
+                    ("UNDRAFT", "All emails that are not DRAFTs"),
+                    ("ANSWERED", "All ANSWERED emails"),
+                    ("UNANSWERED", "All UNANSWERED emails"),
+                    ("DELETED", "All DELETED emails"),
+                    ("UNDELETED", "All UNDELETED emails"),
+                ],
+                default="ALL",
+                help_text="The selection criterion for emails to archive.",
+                max_length=127,
+                verbose_name="fetching criterion",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="daemon",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    (
+                        "fetching_criterion__in",
+                        [
+                            "DAILY",
+                            "WEEKLY",
+                            "MONTHLY",
+                            "ANNUALLY",
+                            "RECENT",
+                            "UNSEEN",
+                            "SEEN",
+                            "ALL",
+                            "INCREMENTAL",
+                            "NEW",
+                            "OLD",
+                            "FLAGGED",
+                            "DRAFT",
+                            "UNDRAFT",
+                            "ANSWERED",
+                            "UNANSWERED",
+                            "DELETED",
+                            "UNDELETED",
+                        ],
+                    )
+                ),
+                name="fetching_criterion_valid_choice",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0056_mailbox_highest_uid_mailbox_uid_validity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetched_uidls",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="The unique ids of the emails on the POP server that have already been fetched.",
+                verbose_name="fetched UIDLs",
+            ),
+        ),
+    ]
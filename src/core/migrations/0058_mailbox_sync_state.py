@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0057_mailbox_fetched_uidls"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailbox",
+            name="sync_state",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="The state of the Exchange folder at the last fetch.",
+                verbose_name="sync state",
+            ),
+        ),
+    ]
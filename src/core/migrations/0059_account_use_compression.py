@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0058_mailbox_sync_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="use_compression",
+            field=models.BooleanField(
+                default=False,
+                help_text="Whether to compress the connection to the mailserver if it supports it. Only applies to IMAP.",
+                verbose_name="use compression",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.9 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0059_account_use_compression"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetch_checkpoint",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="The server id of the last email that was saved in the latest fetching run.",
+                verbose_name="fetch checkpoint",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetch_checkpoint_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="The time the progress of the latest fetching run was last saved.",
+                null=True,
+                verbose_name="fetch checkpoint time",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetch_progress",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The number of emails saved in the latest fetching run.",
+                verbose_name="fetch progress",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetch_run_id",
+            field=models.UUIDField(
+                blank=True,
+                help_text="The id of the latest fetching run of the mailbox.",
+                null=True,
+                verbose_name="fetch run id",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="is_fetch_complete",
+            field=models.BooleanField(
+                default=True,
+                help_text="Whether the latest fetching run of the mailbox has finished.",
+                verbose_name="fetch complete",
+            ),
+        ),
+    ]
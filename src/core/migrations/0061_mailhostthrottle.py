@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-17 04:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0060_mailbox_fetch_checkpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailHostThrottle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="time of creation"
+                    ),
+                ),
+                (
+                    "updated",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="time of last update"
+                    ),
+                ),
+                (
+                    "mail_host",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="mail host"
+                    ),
+                ),
+                ("tokens", models.FloatField(default=0, verbose_name="tokens")),
+                (
+                    "refilled_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="time of refill"
+                    ),
+                ),
+                ("backoff", models.FloatField(default=0, verbose_name="backoff")),
+                (
+                    "backoff_until",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="backoff until"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "mail host throttle",
+                "verbose_name_plural": "mail host throttles",
+                "db_table": "mail_host_throttles",
+            },
+        ),
+    ]
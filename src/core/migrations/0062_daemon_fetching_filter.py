@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-17 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0061_mailhostthrottle"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="daemon",
+            name="fetching_filter",
+            field=models.JSONField(
+                blank=True,
+                default=None,
+                help_text='Additional filter for the emails to archive, e.g. {"and": [{"from": "example.org"}, {"not": {"subject": "newsletter"}}]}. Available are from, to, subject, larger, smaller, since and before, combined with and, or and not.',
+                null=True,
+                verbose_name="fetching filter",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.9 on 2026-10-17 05:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0062_daemon_fetching_filter"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="account",
+            name="protocol_valid_choice",
+        ),
+        migrations.AlterField(
+            model_name="account",
+            name="protocol",
+            field=models.CharField(
+                choices=[
+                    ("IMAP4_SSL", "IMAP4"),
+                    ("IMAP", "IMAP4 (unencrypted)"),
+                    ("POP3_SSL", "POP3"),
+                    ("POP3", "POP3 (unencrypted)"),
+                    ("EXCHANGE", "Microsoft Exchange"),
+                    ("JMAP", "JMAP"),
+                ],
+                help_text="The email protocol implemented by the server.",
+                max_length=10,
+                verbose_name="email protocol",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mailbox",
+            name="sync_state",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="The state of the Exchange folder or JMAP emails at the last fetch.",
+                verbose_name="sync state",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="account",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    (
+                        "protocol__in",
+                        ["IMAP4_SSL", "IMAP", "POP3_SSL", "POP3", "EXCHANGE", "JMAP"],
+                    )
+                ),
+                name="protocol_valid_choice",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0063_account_jmap_protocol"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mailbox",
+            name="sync_state",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="The state of the Exchange folder, JMAP emails or IMAP mailbox at the last fetch.",
+                verbose_name="sync state",
+            ),
+        ),
+    ]
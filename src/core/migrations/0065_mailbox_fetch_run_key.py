@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-17 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0064_mailbox_sync_state_imap"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailbox",
+            name="fetch_run_key",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="The criterion and filter of the latest fetching run of the mailbox.",
+                max_length=255,
+                verbose_name="fetch run key",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailbox",
+            name="interrupted_fetch_runs",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="The progress of the interrupted fetching runs with other criteria or filters.",
+                verbose_name="interrupted fetch runs",
+            ),
+        ),
+    ]
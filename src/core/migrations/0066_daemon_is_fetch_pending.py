@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0065_mailbox_fetch_run_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="daemon",
+            name="is_fetch_pending",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Whether the routine is due and waits to be fetched together with other routines.",
+                verbose_name="fetch pending",
+            ),
+        ),
+    ]
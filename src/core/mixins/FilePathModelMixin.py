@@ -22,7 +22,7 @@ from __future__ import annotations
 
 import logging
 from io import BytesIO
-from typing import TYPE_CHECKING, Any, override
+from typing import TYPE_CHECKING, Any, BinaryIO, override
 
 from django.core.files.storage import default_storage
 from django.db.models import CharField, Model
@@ -61,14 +61,19 @@ class FilePathModelMixin(Model):
         """Extended :django::func:`django.models.Model.save` method.
 
         Saves the data to storage if configured.
+        The `file_payload` may be given as :class:`bytes` or as a binary file,
+        which is copied to the storage from its start.
         """
-        file_payload = kwargs.pop("file_payload", None)
+        file_payload: bytes | BinaryIO | None = kwargs.pop("file_payload", None)
         super().save(*args, **kwargs)
         if file_payload is not None and not self.file_path:
             logger.debug("Storing file for %s ...", self)
+            if isinstance(file_payload, bytes):
+                file_payload = BytesIO(file_payload)
+            file_payload.seek(0)
             self.file_path = default_storage.save(
                 self._get_storage_file_name(),
-                BytesIO(file_payload),
+                file_payload,
             )
             self.save(update_fields=["file_path"])
             logger.debug("Successfully stored file.")
@@ -21,13 +21,15 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import Context, copy_context
 from typing import TYPE_CHECKING, ClassVar, override
 
 from dirtyfields import DirtyFieldsMixin
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models
 from django.utils.translation import gettext_lazy as _
 from django_prometheus.models import ExportModelOperationsMixin
 
@@ -42,12 +44,20 @@ from core.utils.fetchers import (
     ExchangeFetcher,
     IMAP4_SSL_Fetcher,
     IMAP4Fetcher,
+    JMAPFetcher,
     POP3_SSL_Fetcher,
     POP3Fetcher,
+    fetcher_pool,
 )
-from core.utils.fetchers.exceptions import MailAccountError
+from core.utils.fetchers.exceptions import (
+    FetcherError,
+    MailAccountError,
+    MailHostThrottledError,
+)
+from eonvelope.utils.workarounds import get_config
 
 from .Mailbox import Mailbox
+from .MailHostThrottle import MailHostThrottle
 
 
 if TYPE_CHECKING:
@@ -133,6 +143,16 @@ class Account(
     )
     """The timeout parameter for the connection to the host, defaults to 10s."""
 
+    use_compression = models.BooleanField(
+        default=False,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("use compression"),
+        help_text=_(
+            "Whether to compress the connection to the mailserver if it supports it. Only applies to IMAP."
+        ),
+    )
+    """Whether the connection to the mail server is compressed if possible. Only used by the IMAP fetchers."""
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name="accounts",
@@ -235,6 +255,8 @@ class Account(
             return POP3_SSL_Fetcher
         if self.protocol == ExchangeFetcher.PROTOCOL:
             return ExchangeFetcher
+        if self.protocol == JMAPFetcher.PROTOCOL:
+            return JMAPFetcher
 
         logger.error(
             "The protocol %s is not implemented in a fetcher class!", self.protocol
@@ -246,22 +268,38 @@ class Account(
             _("The protocol %s is not implemented in a fetcher class!") % self.protocol
         )
 
-    def get_fetcher(self) -> BaseFetcher:
-        """Instantiates the fetcher from :class:`core.utils.fetchers` corresponding to :attr:`protocol`.
+    def get_fetcher(self, *, pooled: bool = True) -> BaseFetcher:
+        """Leases a fetcher from :class:`core.utils.fetchers` corresponding to :attr:`protocol`.
 
+        The fetcher is taken from the worker's :class:`core.utils.fetchers.FetcherPool`,
+        reusing an open connection to the account if possible.
+        It is handed back to the pool when its `with` block is left.
+        Every lease is rate limited per mailserver via :class:`core.models.MailHostThrottle`.
         Handles possible errors instantiating the fetcher.
 
+        Args:
+            pooled: Whether the fetcher is taken from the pool. Defaults to `True`.
+                Connections that are held open indefinitely must not be pooled,
+                so they don't block the connection slots of the account.
+
         Returns:
-            A fetcher instance for the account.
+            A connected fetcher instance for the account.
 
         Raises:
             ValueError: If the protocol doesn't match any fetcher class.
                 Marks the account as unhealthy in this case.
+            MailHostThrottledError: If the mailserver is throttling requests.
+                Backs off from the mailserver in this case, the account stays healthy.
             MailAccountError: If the fetcher fails to initialize.
                 Marks the account as unhealthy in this case.
         """
+        MailHostThrottle.acquire(self.mail_host)
         try:
-            fetcher = self.get_fetcher_class()(self)
+            fetcher = fetcher_pool.acquire(self, pooled=pooled)
+        except MailHostThrottledError:
+            logger.warning("%s is throttling requests for %s!", self.mail_host, self)
+            MailHostThrottle.back_off(self.mail_host)
+            raise
         except MailAccountError as error:
             logger.exception("Failed to instantiate fetcher for %s!", self)
             self.set_unhealthy(error)
@@ -313,3 +351,107 @@ class Account(
             Mailbox.create_from_data(mailbox_data, self)
 
         logger.info("Successfully updated mailboxes.")
+
+    def fetch(self, criterion: str) -> dict[Mailbox, FetcherError]:
+        """Fetches emails from all healthy mailboxes of this account concurrently and adds them to the db.
+
+        Every mailbox is fetched via :func:`core.models.Mailbox.Mailbox.fetch`
+        by one of up to `ACCOUNT_FETCH_CONCURRENCY` threads.
+        Each thread runs in a copy of the calling context
+        and leases its own connection from the fetcher pool,
+        so the number of connections also stays within `FETCHER_POOL_MAX_CONNECTIONS`.
+        Mailboxes that are flagged as unhealthy are skipped.
+        So are mailboxes that are unchanged since their last fetch,
+        which is checked for all of them at once beforehand,
+        see :func:`core.utils.fetchers.BaseFetcher.BaseFetcher.find_unchanged_mailboxes`.
+
+        Args:
+            criterion: The criterion used to fetch emails from the mailboxes.
+
+        Returns:
+            The errors of the mailboxes that failed to fetch.
+
+        Raises:
+            ValueError: If the criterion is not available for this account.
+        """
+        if criterion not in self.get_fetcher_class().AVAILABLE_FETCHING_CRITERIA:
+            raise ValueError(
+                _("The criterion %s is not available for this account.") % criterion
+            )
+        mailboxes = list(
+            self.mailboxes.exclude(is_healthy=False).select_related("account")
+        )
+        if not mailboxes:
+            return {}
+        try:
+            with self.get_fetcher() as fetcher:
+                unchanged_mailboxes = fetcher.find_unchanged_mailboxes(
+                    mailboxes, criterion
+                )
+        except FetcherError as error:
+            logger.info("Failed to check %s for changes with error: %s.", self, error)
+        else:
+            if unchanged_mailboxes:
+                logger.info(
+                    "Skipping %d unchanged mailboxes in %s.",
+                    len(unchanged_mailboxes),
+                    self,
+                )
+            mailboxes = [
+                mailbox for mailbox in mailboxes if mailbox not in unchanged_mailboxes
+            ]
+            if not mailboxes:
+                return {}
+        max_workers = min(
+            len(mailboxes),
+            max(1, get_config("ACCOUNT_FETCH_CONCURRENCY")),
+            max(1, get_config("FETCHER_POOL_MAX_CONNECTIONS")),
+        )
+        logger.info(
+            "Fetching emails with criterion %s from %d mailboxes in %s with %d connections ...",
+            criterion,
+            len(mailboxes),
+            self,
+            max_workers,
+        )
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"fetch-account-{self.pk}"
+        ) as executor:
+            results = executor.map(
+                Context.run,
+                [copy_context() for _ in mailboxes],
+                [self._fetch_mailbox] * len(mailboxes),
+                mailboxes,
+                [criterion] * len(mailboxes),
+            )
+            errors = {
+                mailbox: error
+                for mailbox, error in zip(mailboxes, results, strict=True)
+                if error is not None
+            }
+        logger.info(
+            "Finished fetching %s, %d of %d mailboxes failed.",
+            self,
+            len(errors),
+            len(mailboxes),
+        )
+        return errors
+
+    @staticmethod
+    def _fetch_mailbox(mailbox: Mailbox, criterion: str) -> FetcherError | None:
+        """Fetches a mailbox in a worker thread of :func:`fetch`.
+
+        Args:
+            mailbox: The mailbox to fetch.
+            criterion: The criterion used to fetch emails from the mailbox.
+
+        Returns:
+            The error that occurred during fetching, `None` if successful.
+        """
+        try:
+            mailbox.fetch(criterion)
+        except FetcherError as error:
+            return error
+        finally:
+            connection.close()
+        return None
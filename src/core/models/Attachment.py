@@ -23,7 +23,6 @@ from __future__ import annotations
 import logging
 import os
 from functools import cached_property
-from hashlib import md5
 from tempfile import NamedTemporaryFile
 from typing import TYPE_CHECKING, Any, override
 from zipfile import ZipFile
@@ -48,7 +47,6 @@ from core.constants import (
     PAPERLESS_SUPPORTED_IMAGE_TYPES,
     PAPERLESS_TIKA_SUPPORTED_MIMETYPES,
     VCARD_TEMPLATE,
-    HeaderFields,
 )
 from core.mixins import (
     DownloadMixin,
@@ -58,7 +56,11 @@ from core.mixins import (
     TimestampModelMixin,
     URLMixin,
 )
-from core.utils.mail_parsing import make_icalendar_readout, make_vcard_readout
+from core.utils.mail_parsing import (
+    get_attachment_parts,
+    make_icalendar_readout,
+    make_vcard_readout,
+)
 from eonvelope.utils.workarounds import get_config
 
 
@@ -68,6 +70,8 @@ if TYPE_CHECKING:
 
     from django.db.models import QuerySet
 
+    from core.utils.mail_parsing import ParsedAttachment
+
     from .Email import Email
 
 
@@ -546,52 +550,48 @@ class Attachment(
         Returns:
             A list of :class:`core.models.Attachment` in the email message.
         """
+        logger.debug("Parsing attachments in email %s ...", email.message_id)
+        parsed_attachments = get_attachment_parts(
+            email_message,
+            get_config("DONT_PARSE_CONTENT_MAINTYPES"),
+            get_config("DONT_PARSE_CONTENT_SUBTYPES"),
+        )
+        return cls.create_from_parsed_attachments(parsed_attachments, email)
+
+    @classmethod
+    def create_from_parsed_attachments(
+        cls, parsed_attachments: list[ParsedAttachment], email: Email
+    ) -> list[Attachment]:
+        """Creates :class:`core.models.Attachment`s from parsed attachment parts.
+
+        Args:
+            parsed_attachments: The attachment parts parsed from the email data.
+            email: The email model the attachments belong to.
+
+        Returns:
+            A list of the new :class:`core.models.Attachment`.
+
+        Raises:
+            ValueError: If the `email` argument is not in the db.
+        """
         if email.pk is None:
             raise ValueError("Email is not in db!")
-        logger.debug("Parsing and saving attachments in email %s ...", email.message_id)
-        ignore_maintypes = get_config("DONT_PARSE_CONTENT_MAINTYPES")
-        ignore_subtypes = get_config("DONT_PARSE_CONTENT_SUBTYPES")
+        logger.debug("Saving attachments in email %s ...", email.message_id)
         new_attachments = []
-        for part in email_message.walk():
-            if part.is_multipart():
-                # for safe get_payload
-                continue
-            content_disposition = part.get_content_disposition()
-            content_maintype = part.get_content_maintype()
-            content_subtype = part.get_content_subtype()
-            # first part of the condition checks whether the part qualifies as attachment in general,
-            # the second one whether the parts contenttype is blacklisted
-            if (
-                content_disposition
-                or (
-                    content_maintype != "text"
-                    or content_subtype not in ["plain", "html"]
-                )
-            ) and (
-                content_maintype not in ignore_maintypes
-                and content_subtype not in ignore_subtypes
-            ):
-                part_payload = part.get_payload(decode=True)
-                if isinstance(part_payload, bytes):
-                    new_attachment = cls(
-                        file_name=(
-                            part.get_filename()
-                            or md5(  # noqa: S324  # no safe hash required here
-                                part_payload
-                            ).hexdigest()
-                            + f".{content_subtype}"
-                        ),
-                        content_disposition=content_disposition or "",
-                        content_id=part.get(HeaderFields.CONTENT_ID, ""),
-                        content_maintype=content_maintype,
-                        content_subtype=content_subtype,
-                        datasize=len(part_payload),
-                        email=email,
-                    )
-                    logger.debug("Saving attachment %s to db ...", part.get_filename())
-                    new_attachment.save(file_payload=part_payload)
-                    new_attachments.append(new_attachment)
-        logger.debug("Successfully parsed and saved attachments.")
+        for parsed_attachment in parsed_attachments:
+            new_attachment = cls(
+                file_name=parsed_attachment.file_name,
+                content_disposition=parsed_attachment.content_disposition,
+                content_id=parsed_attachment.content_id,
+                content_maintype=parsed_attachment.content_maintype,
+                content_subtype=parsed_attachment.content_subtype,
+                datasize=len(parsed_attachment.payload),
+                email=email,
+            )
+            logger.debug("Saving attachment %s to db ...", parsed_attachment.file_name)
+            new_attachment.save(file_payload=parsed_attachment.payload)
+            new_attachments.append(new_attachment)
+        logger.debug("Successfully saved attachments.")
         return new_attachments
 
     @staticmethod
@@ -22,12 +22,12 @@ from __future__ import annotations
 
 import logging
 from io import BytesIO
-from typing import TYPE_CHECKING, ClassVar, override
+from typing import TYPE_CHECKING, Any, ClassVar, override
 
 import httpcore
 import httpx
 from django.conf import settings
-from django.db import models
+from django.db import connection, models
 from django.utils.translation import gettext_lazy as _
 from django_prometheus.models import ExportModelOperationsMixin
 from rest_framework import status
@@ -43,6 +43,8 @@ from core.utils.mail_parsing import find_best_href_in_header
 
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+
     from django.contrib.auth.models import User
     from django.db.models import QuerySet
 
@@ -71,6 +73,19 @@ class Correspondent(
         "This will only delete the records of these correspondents, not of their emails."
     )
 
+    UPSERT_FIELDS: ClassVar[list[str]] = [
+        "email_name",
+        "list_id",
+        "list_owner",
+        "list_subscribe",
+        "list_unsubscribe",
+        "list_unsubscribe_post",
+        "list_post",
+        "list_help",
+        "list_archive",
+    ]
+    """The fields that are set from the email data by :func:`bulk_upsert`."""
+
     email_address = models.CharField(
         max_length=255,
         # Translators: Do not capitalize the very first letter unless your language requires it.
@@ -405,6 +420,137 @@ class Correspondent(
             logger.debug("Successfully saved correspondent %s to db.", address)
         return correspondent
 
+    @classmethod
+    def bulk_upsert(
+        cls,
+        correspondents_fields: dict[str, dict[str, str]],
+        user: User,
+        cache: dict[tuple[int, str], dict[str, Any]] | None = None,
+    ) -> dict[str, int]:
+        """Creates or updates correspondents of a user with a single bulk query.
+
+        Only the fields in :attr:`UPSERT_FIELDS` are written, other fields like :attr:`real_name` are kept.
+        Correspondents whose fields are unchanged are not written at all.
+        The known correspondents are looked up in :attr:`cache`
+        and the ones missing there are loaded from the db with a single query.
+
+        Args:
+            correspondents_fields: The values of :attr:`UPSERT_FIELDS` to set by the email addresses of the correspondents.
+                Fields that are not given keep their current value.
+            user: The user the correspondents belong to.
+            cache: The ids and field values of the correspondents
+                by their users ids and email addresses, updated in place.
+                Must be cleared if the transaction of the upsert is rolled back.
+                Defaults to `None`, a new cache for this call only.
+
+        Returns:
+            The ids of the correspondents by their email addresses.
+        """
+        if cache is None:
+            cache = {}
+        cls._cache_known_correspondents(correspondents_fields, user, cache)
+        changed_correspondents = cls._get_changed_correspondents(
+            correspondents_fields, user, cache
+        )
+        if changed_correspondents:
+            cls.objects.bulk_create(
+                changed_correspondents,
+                update_conflicts=True,
+                unique_fields=(
+                    ["email_address", "user"]
+                    if connection.features.supports_update_conflicts_with_target
+                    else None
+                ),
+                update_fields=[*cls.UPSERT_FIELDS, "updated"],
+            )
+            correspondents_without_id = {
+                correspondent.email_address: correspondent
+                for correspondent in changed_correspondents
+                if correspondent.pk is None
+            }
+            if correspondents_without_id:
+                # some backends, e.g. mysql, don't return the ids of upserted rows
+                for address, correspondent_id in cls.objects.filter(
+                    user=user, email_address__in=correspondents_without_id
+                ).values_list("email_address", "id"):
+                    correspondents_without_id[address].pk = correspondent_id
+            for correspondent in changed_correspondents:
+                cache[(user.pk, correspondent.email_address)] = {
+                    "id": correspondent.pk,
+                    **{
+                        field: getattr(correspondent, field)
+                        for field in cls.UPSERT_FIELDS
+                    },
+                }
+            logger.debug(
+                "Upserted %d of %d correspondents.",
+                len(changed_correspondents),
+                len(correspondents_fields),
+            )
+        return {
+            address: cache[(user.pk, address)]["id"]
+            for address in correspondents_fields
+        }
+
+    @classmethod
+    def _cache_known_correspondents(
+        cls,
+        addresses: Iterable[str],
+        user: User,
+        cache: dict[tuple[int, str], dict[str, Any]],
+    ) -> None:
+        """Loads the correspondents of a user that are missing in the cache from the db with a single query.
+
+        Args:
+            addresses: The email addresses of the correspondents.
+            user: The user the correspondents belong to.
+            cache: The cache of :func:`bulk_upsert`, updated in place.
+        """
+        missing_addresses = [
+            address for address in addresses if (user.pk, address) not in cache
+        ]
+        if not missing_addresses:
+            return
+        for known_fields in cls.objects.filter(
+            user=user, email_address__in=missing_addresses
+        ).values("id", "email_address", *cls.UPSERT_FIELDS):
+            cache[(user.pk, known_fields.pop("email_address"))] = known_fields
+
+    @classmethod
+    def _get_changed_correspondents(
+        cls,
+        correspondents_fields: dict[str, dict[str, str]],
+        user: User,
+        cache: dict[tuple[int, str], dict[str, Any]],
+    ) -> list[Correspondent]:
+        """Builds the correspondents that are new or whose fields changed compared to the cache.
+
+        Args:
+            correspondents_fields: The fields to set by the email addresses of the correspondents,
+                see :func:`bulk_upsert`.
+            user: The user the correspondents belong to.
+            cache: The cache of :func:`bulk_upsert`.
+
+        Returns:
+            The unsaved correspondents to write, with the cached values for the fields that are not given.
+        """
+        changed_correspondents = []
+        for address, fields in correspondents_fields.items():
+            known_fields = cache.get((user.pk, address))
+            if known_fields is not None and all(
+                known_fields[field] == value for field, value in fields.items()
+            ):
+                continue
+            new_fields = {
+                field: (known_fields or {}).get(field, "")
+                for field in cls.UPSERT_FIELDS
+            }
+            new_fields.update(fields)
+            changed_correspondents.append(
+                cls(email_address=address, user=user, **new_fields)
+            )
+        return changed_correspondents
+
     @staticmethod
     def queryset_as_file(queryset: QuerySet) -> BytesIO:
         """Parse the correspondents in the queryset into a vcard object bytestream.
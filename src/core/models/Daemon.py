@@ -35,6 +35,7 @@ from django_prometheus.models import ExportModelOperationsMixin
 
 from core.constants import EmailFetchingCriterionChoices
 from core.mixins import HealthModelMixin, TimestampModelMixin, URLMixin
+from core.utils.fetchers import FetchingFilter
 
 
 if TYPE_CHECKING:
@@ -94,6 +95,19 @@ class Daemon(
     )
     """The fetching criterion for this mailbox. :attr:`eonvelope.constants.EmailFetchingCriterionChoices.ALL` by default."""
 
+    fetching_filter = models.JSONField(
+        null=True,
+        blank=True,
+        default=None,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetching filter"),
+        help_text=_(
+            'Additional filter for the emails to archive, e.g. {"and": [{"from": "example.org"}, {"not": {"subject": "newsletter"}}]}. '
+            "Available are from, to, subject, larger, smaller, since and before, combined with and, or and not."
+        ),
+    )
+    """The additional filter for the fetched emails, see :class:`core.utils.fetchers.FetchingFilter`. `None` by default."""
+
     celery_task: models.OneToOneField[PeriodicTask] = models.OneToOneField(
         PeriodicTask,
         on_delete=models.CASCADE,
@@ -112,6 +126,17 @@ class Daemon(
     )
     """The period with which the daemon is running."""
 
+    is_fetch_pending = models.BooleanField(
+        default=False,
+        editable=False,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch pending"),
+        help_text=_(
+            "Whether the routine is due and waits to be fetched together with other routines."
+        ),
+    )
+    """Whether the scheduled run of this daemon was handed to :func:`core.tasks.dispatch_pending_fetches`."""
+
     class Meta:
         """Metadata class for the model."""
 
@@ -174,7 +199,12 @@ class Daemon(
 
     @override
     def clean(self) -> None:
-        """Validates that :attr:`fetching_criterion` is available for the :attr:`mailbox.account`."""
+        """Validates that :attr:`fetching_criterion` is available for the :attr:`mailbox.account` and :attr:`fetching_filter` is wellformed."""
+        if self.fetching_filter:
+            try:
+                FetchingFilter.validate(self.fetching_filter)
+            except ValueError as error:
+                raise ValidationError({"fetching_filter": str(error)}) from error
         try:
             if self.fetching_criterion not in self.mailbox.available_fetching_criteria:
                 raise ValidationError(
@@ -189,6 +219,21 @@ class Daemon(
                 {"mailbox": _("No valid mailbox selected!")}
             ) from None
 
+    @property
+    def fetch_run_key(self) -> str:
+        """The key of the fetching runs of this daemon, see :func:`core.models.Mailbox.Mailbox.make_fetch_run_key`."""
+        return self.mailbox.make_fetch_run_key(
+            self.fetching_criterion, self.get_fetching_filter()
+        )
+
+    def get_fetching_filter(self) -> FetchingFilter | None:
+        """Gets the :attr:`fetching_filter` in the form used by the fetchers.
+
+        Returns:
+            The fetching filter, `None` if there is none.
+        """
+        return FetchingFilter(self.fetching_filter) if self.fetching_filter else None
+
     def test(self) -> None:
         """Tests whether the data in the model is correct and the daemons task can be run.
 
@@ -21,16 +21,14 @@
 from __future__ import annotations
 
 import contextlib
-import email
+import itertools
 import logging
 import os
-import re
 import shutil
-from email import policy
 from functools import cached_property
-from hashlib import md5
+from hashlib import file_digest, md5
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import TYPE_CHECKING, Any, ClassVar, override
+from typing import TYPE_CHECKING, Any, BinaryIO, ClassVar, override
 from zipfile import ZipFile
 
 from django.db import connection, models, transaction
@@ -53,25 +51,33 @@ from core.mixins import (
     TimestampModelMixin,
     URLMixin,
 )
-from core.utils.fetchers.exceptions import MailboxError
+from core.utils.fetchers.exceptions import FetcherError, MailboxError
 from core.utils.mail_parsing import (
-    get_bodytexts,
+    get_correspondent_tuples,
     get_header,
+    get_referenced_message_ids,
     is_x_spam,
+    message_from_data,
     parse_datetime_header,
+    parse_email,
+    parse_email_message,
 )
 from eonvelope.utils.workarounds import get_config
 
 from .Attachment import Attachment
+from .Correspondent import Correspondent
 from .EmailCorrespondent import EmailCorrespondent
 
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+    from email.message import EmailMessage
     from tempfile import _TemporaryFileWrapper
 
     from django.db.models import QuerySet
 
-    from .Correspondent import Correspondent
+    from core.utils.mail_parsing import ParsedEmail
+
     from .Mailbox import Mailbox
 
 
@@ -247,76 +253,131 @@ class Email(
         """Create the filename for the stored eml."""
         return str(self.pk) + "_" + self.message_id + ".eml"
 
-    def fill_from_email_bytes(self, email_bytes: bytes) -> Email:
+    @staticmethod
+    def parse_email_data(email_data: bytes | BinaryIO) -> EmailMessage:
+        """Parses an email in bytes form or spooled to a binary file.
+
+        Files are parsed from their start without reading them into memory as a whole.
+
+        Args:
+            email_data: The email bytes or file.
+
+        Returns:
+            The parsed email message.
+        """
+        return message_from_data(email_data)
+
+    @staticmethod
+    def hash_email_data(email_data: bytes | BinaryIO) -> str:
+        """Hashes an email in bytes form or spooled to a binary file.
+
+        Used as fallback for a missing Message-ID.
+
+        Args:
+            email_data: The email bytes or file.
+
+        Returns:
+            The md5 hexdigest of the email data.
+        """
+        if isinstance(email_data, bytes):
+            return md5(  # noqa: S324  # no safe hash required here
+                email_data
+            ).hexdigest()
+        email_data.seek(0)
+        return file_digest(email_data, md5).hexdigest()
+
+    def fill_from_email_bytes(self, email_bytes: bytes | BinaryIO) -> Email:
         """Fills the :class:`core.models.Email` with data from an email in bytes form.
 
         Args:
-            email_bytes: The email bytes data.
+            email_bytes: The email bytes data or a binary file it is spooled to.
 
         Returns:
             The :class:`core.models.Email` instance with data from the bytes.
         """
-        email_message = email.message_from_bytes(email_bytes, policy=policy.default)
-        header_dict: dict[str, str | None] = {}
-        for header_name in email_message:
-            header_dict[header_name.lower()] = get_header(email_message, header_name)
-        bodytexts = get_bodytexts(email_message)
-
-        self.headers = header_dict
-        self.message_id = (
-            header_dict.get(HeaderFields.MESSAGE_ID)
-            or md5(email_bytes).hexdigest()  # noqa: S324  # no safe hash required here
-        )
-        self.datetime = parse_datetime_header(header_dict.get(HeaderFields.DATE))
-        self.subject = header_dict.get(HeaderFields.SUBJECT) or __("No subject")
-        self.x_spam_flag = is_x_spam(header_dict.get(HeaderFields.X_SPAM))
-        self.datasize = len(email_bytes)
-        self.plain_bodytext = bodytexts.get("plain", "")
-        self.html_bodytext = bodytexts.get("html", "")
+        return self.fill_from_parsed_email(parse_email(email_bytes), email_bytes)
+
+    def fill_from_parsed_email(
+        self, parsed_email: ParsedEmail, email_data: bytes | BinaryIO
+    ) -> Email:
+        """Fills the :class:`core.models.Email` with the data parsed from an email.
+
+        Args:
+            parsed_email: The data parsed from the email.
+            email_data: The email bytes data or a binary file it is spooled to.
+                Only used to hash a missing Message-ID.
+
+        Returns:
+            The :class:`core.models.Email` instance with the parsed data.
+        """
+        headers = parsed_email.headers
+        self.headers = headers
+        self.message_id = parsed_email.message_id or self.hash_email_data(email_data)
+        self.datetime = parse_datetime_header(headers.get(HeaderFields.DATE))
+        self.subject = headers.get(HeaderFields.SUBJECT) or __("No subject")
+        self.x_spam_flag = is_x_spam(headers.get(HeaderFields.X_SPAM))
+        self.datasize = parsed_email.datasize
+        self.plain_bodytext = parsed_email.bodytexts.get("plain", "")
+        self.html_bodytext = parsed_email.bodytexts.get("html", "")
 
         return self
 
-    def add_correspondents(self) -> None:
-        """Adds the correspondents from the headerfields to the model."""
-        if self.headers:
-            for mention in HeaderFields.Correspondents.values:
-                correspondent_header = self.headers.get(mention)
-                if correspondent_header:
-                    new_emailcorrespondents = EmailCorrespondent.create_from_header(
-                        correspondent_header, mention, self
-                    )
-                    if (
-                        mention == HeaderFields.Correspondents.FROM
-                        and new_emailcorrespondents is not None
-                    ):
-                        for new_emailcorrespondent in new_emailcorrespondents:
-                            new_emailcorrespondent.correspondent.list_id = (
-                                self.headers.get(HeaderFields.MailingList.ID, "")
-                            )
-                            new_emailcorrespondent.correspondent.list_help = (
-                                self.headers.get(HeaderFields.MailingList.HELP, "")
-                            )
-                            new_emailcorrespondent.correspondent.list_archive = (
-                                self.headers.get(HeaderFields.MailingList.ARCHIVE, "")
-                            )
-                            new_emailcorrespondent.correspondent.list_subscribe = (
-                                self.headers.get(HeaderFields.MailingList.SUBSCRIBE, "")
-                            )
-                            new_emailcorrespondent.correspondent.list_unsubscribe = (
-                                self.headers.get(
-                                    HeaderFields.MailingList.UNSUBSCRIBE, ""
-                                )
-                            )
-                            new_emailcorrespondent.correspondent.list_unsubscribe_post = self.headers.get(
-                                HeaderFields.MailingList.UNSUBSCRIBE_POST, ""
-                            )
-                            new_emailcorrespondent.correspondent.list_post = (
-                                self.headers.get(HeaderFields.MailingList.POST, "")
-                            )
-                            new_emailcorrespondent.correspondent.list_owner = (
-                                self.headers.get(HeaderFields.MailingList.OWNER, "")
-                            )
-                            new_emailcorrespondent.correspondent.save()
+    def add_correspondents(
+        self,
+        correspondents: dict[str, list[tuple[str, str]]] | None = None,
+        correspondent_cache: dict[tuple[int, str], dict[str, Any]] | None = None,
+    ) -> None:
+        """Adds the correspondents from the headerfields to the model.
+
+        All correspondents of the email are created or updated with a single bulk upsert,
+        the From correspondents get the mailinglist fields of the email.
+        The connections to the email are then created with a single bulk insert.
+
+        Args:
+            correspondents: The correspondent tuples already parsed from the headerfields by their mention types.
+                Parsed from :attr:`headers` if not given.
+            correspondent_cache: The cache of correspondents for
+                :func:`core.models.Correspondent.Correspondent.bulk_upsert`.
+                Defaults to `None`, no cache.
+        """
+        if not self.headers:
+            return
+        if correspondents is None:
+            correspondents = get_correspondent_tuples(self.headers)
+        mailinglist_fields = {
+            "list_id": self.headers.get(HeaderFields.MailingList.ID, ""),
+            "list_owner": self.headers.get(HeaderFields.MailingList.OWNER, ""),
+            "list_subscribe": self.headers.get(HeaderFields.MailingList.SUBSCRIBE, ""),
+            "list_unsubscribe": self.headers.get(
+                HeaderFields.MailingList.UNSUBSCRIBE, ""
+            ),
+            "list_unsubscribe_post": self.headers.get(
+                HeaderFields.MailingList.UNSUBSCRIBE_POST, ""
+            ),
+            "list_post": self.headers.get(HeaderFields.MailingList.POST, ""),
+            "list_help": self.headers.get(HeaderFields.MailingList.HELP, ""),
+            "list_archive": self.headers.get(HeaderFields.MailingList.ARCHIVE, ""),
+        }
+        correspondents_fields: dict[str, dict[str, str]] = {}
+        for mention, correspondent_tuples in correspondents.items():
+            for name, address in correspondent_tuples:
+                if not address.strip():
+                    continue
+                fields = correspondents_fields.setdefault(address.strip(), {})
+                fields["email_name"] = name
+                if mention == HeaderFields.Correspondents.FROM:
+                    fields.update(mailinglist_fields)
+        correspondent_ids = Correspondent.bulk_upsert(
+            correspondents_fields, self.mailbox.account.user, correspondent_cache
+        )
+        new_email_correspondents: list[EmailCorrespondent] = []
+        for mention, correspondent_tuples in correspondents.items():
+            new_email_correspondents.extend(
+                EmailCorrespondent.prepare_from_correspondent_tuples(
+                    correspondent_tuples, mention, self, correspondent_ids
+                )
+            )
+        EmailCorrespondent.bulk_save(new_email_correspondents)
 
     def add_in_reply_to(self) -> None:
         """Adds the in-reply-to emails from the headerfields to the model."""
@@ -329,22 +390,24 @@ class Email(
                 ):
                     self.in_reply_to.add(in_reply_to_email)
 
-    def add_references(self) -> None:
-        """Adds the references from the headerfields to the model."""
+    def add_references(self, referenced_message_ids: list[str] | None = None) -> None:
+        """Adds the references from the headerfields to the model.
+
+        Args:
+            referenced_message_ids: The Message-IDs already parsed from the References header.
+                Parsed from :attr:`headers` if not given.
+        """
         if self.headers:
-            references_header = self.headers.get(HeaderFields.REFERENCES)
-            if references_header:
-                referenced_message_ids = [
-                    message_id.strip()
-                    for message_id in re.split(r"[ ,]", references_header)
-                ]
-                for referenced_message_id in referenced_message_ids:
-                    if referenced_message_id:  # re.split may produce empty strings
-                        for referenced_email in Email.objects.filter(
-                            message_id=referenced_message_id,
-                            mailbox__account__user=self.mailbox.account.user,
-                        ):
-                            self.references.add(referenced_email)
+            if referenced_message_ids is None:
+                referenced_message_ids = get_referenced_message_ids(
+                    self.headers.get(HeaderFields.REFERENCES)
+                )
+            for referenced_message_id in referenced_message_ids:
+                for referenced_email in Email.objects.filter(
+                    message_id=referenced_message_id,
+                    mailbox__account__user=self.mailbox.account.user,
+                ):
+                    self.references.add(referenced_email)
 
     def reprocess(self) -> None:
         """Reprocesses the mails connections to other emails in the database."""
@@ -378,6 +441,68 @@ class Email(
                 raise
         logger.debug("Successfully restored email.")
 
+    @staticmethod
+    def restore_queryset_to_mailboxes(
+        queryset: QuerySet[Email],
+        progress_callback: Callable[[int, int], None] | None = None,
+    ) -> dict[Email, Exception]:
+        """Restores all emails in the queryset to their mailboxes.
+
+        The emails are grouped by account and mailbox.
+        Every account is restored via a single connection,
+        using :func:`core.utils.fetchers.BaseFetcher.BaseFetcher.restore_batch`.
+        A failing email or account does not stop the restoring of the others.
+
+        Args:
+            queryset: The emails to restore.
+            progress_callback: Called with the number of processed emails and the total number of emails
+                every time an email has been processed. Defaults to `None`.
+
+        Returns:
+            The errors of the emails that failed to restore.
+        """
+        emails = list(
+            queryset.select_related("mailbox", "mailbox__account").order_by(
+                "mailbox__account", "mailbox", "id"
+            )
+        )
+        logger.info("Restoring %d emails to their mailboxes ...", len(emails))
+        errors: dict[Email, Exception] = {}
+        done_count = 0
+        for account, account_email_group in itertools.groupby(
+            emails, key=lambda email: email.mailbox.account
+        ):
+            account_emails = list(account_email_group)
+            account_done_count = 0
+            try:
+                with account.get_fetcher() as fetcher:
+                    for restored_email, error in fetcher.restore_batch(account_emails):
+                        if error is not None:
+                            logger.warning(
+                                "Restoring of email %s failed: %s",
+                                restored_email,
+                                error,
+                            )
+                            errors[restored_email] = error
+                        account_done_count += 1
+                        if progress_callback is not None:
+                            progress_callback(
+                                done_count + account_done_count, len(emails)
+                            )
+            except (NotImplementedError, FetcherError) as error:
+                logger.exception("Restoring of emails to %s failed!", account)
+                for unrestored_email in account_emails[account_done_count:]:
+                    errors[unrestored_email] = error
+                if progress_callback is not None:
+                    progress_callback(done_count + len(account_emails), len(emails))
+            done_count += len(account_emails)
+        logger.info(
+            "Restored %d of %d emails to their mailboxes.",
+            len(emails) - len(errors),
+            len(emails),
+        )
+        return errors
+
     @cached_property
     def conversation(self) -> QuerySet[Email]:
         """Recursively gets all emails that are part of this emails conversation,
@@ -501,13 +626,23 @@ class Email(
 
     @classmethod
     def create_from_email_bytes(
-        cls, email_bytes: bytes, mailbox: Mailbox
+        cls,
+        email_bytes: bytes | BinaryIO,
+        mailbox: Mailbox,
+        correspondent_cache: dict[tuple[int, str], dict[str, Any]] | None = None,
     ) -> Email | None:
         """Creates an :class:`core.models.Email` from an email in bytes form.
 
+        Large emails that have been spooled to a binary file by the fetcher can be passed as that file,
+        it is then parsed and stored from the file, so the raw email is never held in memory.
+        The file is not closed.
+
         Args:
-            email_bytes: The email bytes to parse the emaildata from.
+            email_bytes: The email bytes to parse the emaildata from or a binary file they are spooled to.
             mailbox: The mailbox the email is in.
+            correspondent_cache: The cache of correspondents for
+                :func:`core.models.Correspondent.Correspondent.bulk_upsert`.
+                Defaults to `None`, no cache.
 
         Returns:
             The :class:`core.models.Email` instance with data from the bytes.
@@ -515,45 +650,164 @@ class Email(
             if the mail already exists in the db or
             if the mail is spam and is supposed to be thrown out.
         """
-        email_message = email.message_from_bytes(email_bytes, policy=policy.default)
+        email_message = cls.parse_email_data(email_bytes)
 
-        message_id = (
-            get_header(
-                email_message,
-                HeaderFields.MESSAGE_ID,
-            )
-            or md5(email_bytes).hexdigest()  # noqa: S324  # no safe hash required here
-        )
+        message_id = get_header(
+            email_message,
+            HeaderFields.MESSAGE_ID,
+        ) or cls.hash_email_data(email_bytes)
         logger.debug("Parsed email %s ...", message_id)
-        x_spam = is_x_spam(get_header(email_message, HeaderFields.X_SPAM))
-        if x_spam and get_config("THROW_OUT_SPAM"):
+        if cls.is_skipped(
+            message_id, get_header(email_message, HeaderFields.X_SPAM), mailbox
+        ):
+            return None
+
+        parsed_email = parse_email_message(
+            email_message,
+            (
+                len(email_bytes)
+                if isinstance(email_bytes, bytes)
+                else email_bytes.seek(0, os.SEEK_END)
+            ),
+            get_config("DONT_PARSE_CONTENT_MAINTYPES"),
+            get_config("DONT_PARSE_CONTENT_SUBTYPES"),
+        )
+        logger.debug("Successfully parsed email.")
+        return cls.save_parsed_email(
+            parsed_email, email_bytes, mailbox, correspondent_cache
+        )
+
+    @classmethod
+    def is_skipped(
+        cls, message_id: str, x_spam_header: str | None, mailbox: Mailbox
+    ) -> bool:
+        """Checks whether an email is not to be saved.
+
+        Args:
+            message_id: The Message-ID of the email.
+            x_spam_header: The X-Spam-Flag header of the email.
+            mailbox: The mailbox the email is in.
+
+        Returns:
+            Whether the mail is spam and is supposed to be thrown out
+            or already exists in the db.
+        """
+        if is_x_spam(x_spam_header) and get_config("THROW_OUT_SPAM"):
             logger.debug(
                 "Skipping email with Message-ID %s in %s, it is flagged as spam.",
                 message_id,
                 mailbox,
             )
-            return None
-
+            return True
         if cls.objects.filter(message_id=message_id, mailbox=mailbox).exists():
             logger.debug(
                 "Skipping email with Message-ID %s in %s, it already exists in the db.",
                 message_id,
                 mailbox,
             )
-            return None
+            return True
+        return False
 
-        new_email = cls(mailbox=mailbox).fill_from_email_bytes(email_bytes=email_bytes)
+    @classmethod
+    def is_skipped_batch(
+        cls, email_data_batch: list[bytes | BinaryIO], mailbox: Mailbox
+    ) -> list[bool]:
+        """Checks for a batch of emails which of them are not to be saved.
 
-        logger.debug("Successfully parsed email.")
-        logger.debug("Saving email %s to db...", message_id)
+        Only the headers of the emails are parsed
+        and the Message-IDs already in the mailbox are looked up with a single query.
+        Later copies of an email within the batch are skipped as well.
+
+        Args:
+            email_data_batch: The email bytes or binary files they are spooled to.
+            mailbox: The mailbox the emails are in.
+
+        Returns:
+            For every email in the batch, whether it is spam and supposed to be thrown out,
+            already exists in the db or occurs earlier in the batch.
+        """
+        throw_out_spam = get_config("THROW_OUT_SPAM")
+        batch_headers = []
+        for email_data in email_data_batch:
+            headers = message_from_data(email_data, headersonly=True)
+            batch_headers.append(
+                (
+                    get_header(headers, HeaderFields.MESSAGE_ID)
+                    or cls.hash_email_data(email_data),
+                    throw_out_spam
+                    and is_x_spam(get_header(headers, HeaderFields.X_SPAM)),
+                )
+            )
+        known_message_ids = set(
+            cls.objects.filter(
+                mailbox=mailbox,
+                message_id__in={message_id for message_id, _ in batch_headers},
+            ).values_list("message_id", flat=True)
+        )
+        skipped = []
+        for message_id, is_thrown_out_spam in batch_headers:
+            if is_thrown_out_spam:
+                logger.debug(
+                    "Skipping email with Message-ID %s in %s, it is flagged as spam.",
+                    message_id,
+                    mailbox,
+                )
+                skipped.append(True)
+            elif message_id in known_message_ids:
+                logger.debug(
+                    "Skipping email with Message-ID %s in %s, it already exists in the db or batch.",
+                    message_id,
+                    mailbox,
+                )
+                skipped.append(True)
+            else:
+                known_message_ids.add(message_id)
+                skipped.append(False)
+        return skipped
+
+    @classmethod
+    def save_parsed_email(
+        cls,
+        parsed_email: ParsedEmail,
+        email_data: bytes | BinaryIO,
+        mailbox: Mailbox,
+        correspondent_cache: dict[tuple[int, str], dict[str, Any]] | None = None,
+    ) -> Email | None:
+        """Saves the data parsed from an email to the db with all its relations.
+
+        Everything is saved in one transaction, or a savepoint if there is a transaction already.
+
+        Args:
+            parsed_email: The data parsed from the email.
+            email_data: The email bytes or a binary file they are spooled to.
+            mailbox: The mailbox the email is in.
+            correspondent_cache: The cache of correspondents for
+                :func:`core.models.Correspondent.Correspondent.bulk_upsert`.
+                It is cleared if saving fails, as the upserts are rolled back.
+                Defaults to `None`, no cache.
+
+        Returns:
+            The new :class:`core.models.Email` instance.
+            None if saving failed.
+        """
+        new_email = cls(mailbox=mailbox).fill_from_parsed_email(
+            parsed_email, email_data
+        )
+        logger.debug("Saving email %s to db...", new_email.message_id)
         try:
             with transaction.atomic():
-                new_email.save(file_payload=email_bytes)
-                new_email.add_correspondents()
+                new_email.save(file_payload=email_data)
+                new_email.add_correspondents(
+                    parsed_email.correspondents, correspondent_cache
+                )
                 new_email.add_in_reply_to()
-                new_email.add_references()
-                Attachment.create_from_email_message(email_message, new_email)
+                new_email.add_references(parsed_email.references)
+                Attachment.create_from_parsed_attachments(
+                    parsed_email.attachments, new_email
+                )
         except Exception:
+            if correspondent_cache is not None:
+                correspondent_cache.clear()
             logger.exception(
                 "Failed creating email from bytes: Error while saving email to db!"
             )
@@ -20,10 +20,12 @@
 
 from __future__ import annotations
 
+import logging
 from email.utils import getaddresses
 from typing import TYPE_CHECKING, ClassVar, override
 
 from django.db import models
+from django.db.models.signals import post_save
 from django.utils.translation import gettext_lazy as _
 from django_prometheus.models import ExportModelOperationsMixin
 
@@ -37,6 +39,10 @@ if TYPE_CHECKING:
     from .Email import Email
 
 
+logger = logging.getLogger(__name__)
+"""The logger instance for the module."""
+
+
 class EmailCorrespondent(
     ExportModelOperationsMixin("email_correspondent"), TimestampModelMixin, models.Model
 ):
@@ -122,21 +128,157 @@ class EmailCorrespondent(
             If the correspondent already exists in the db.
             `None` if the correspondent could not be parsed.
 
+        Raises:
+            ValueError: If the `email` argument is not in the db.
+        """
+        return cls.create_from_correspondent_tuples(
+            getaddresses([header]), header_name, email
+        )
+
+    @classmethod
+    def create_from_correspondent_tuples(
+        cls,
+        correspondent_tuples: list[tuple[str, str]],
+        header_name: str,
+        email: Email,
+        correspondent_ids: dict[str, int] | None = None,
+    ) -> list[EmailCorrespondent]:
+        """Creates :class:`core.models.EmailCorrespondent`s from parsed correspondent data.
+
+        Args:
+            correspondent_tuples: The name and address tuples parsed from the header.
+            header_name: The name of the header, the mention type of the correspondents.
+            email: The email for the new emailcorrespondents.
+            correspondent_ids: The ids of the correspondents by their email addresses,
+                if they have already been saved.
+                Defaults to `None`, then the correspondents are saved
+                via :func:`core.models.Correspondent.Correspondent.bulk_upsert`.
+
+        Returns:
+            The list of :class:`core.models.EmailCorrespondent` instances with the given data.
+
         Raises:
             ValueError: If the `email` argument is not in the db.
         """
         if email.pk is None:
             raise ValueError("Email is not in the db!")
-        new_email_correspondent_models = []
-        for correspondent_tuple in getaddresses([header]):
-            correspondent = Correspondent.create_from_correspondent_tuple(
-                correspondent_tuple, email.mailbox.account.user
+        if correspondent_ids is None:
+            correspondents_fields = {}
+            for name, address in correspondent_tuples:
+                if address.strip():
+                    correspondents_fields[address.strip()] = {"email_name": name}
+            correspondent_ids = Correspondent.bulk_upsert(
+                correspondents_fields, email.mailbox.account.user
+            )
+        return cls.bulk_save(
+            cls.prepare_from_correspondent_tuples(
+                correspondent_tuples, header_name, email, correspondent_ids
             )
-            if correspondent is None:
+        )
+
+    @classmethod
+    def prepare_from_correspondent_tuples(
+        cls,
+        correspondent_tuples: list[tuple[str, str]],
+        header_name: str,
+        email: Email,
+        correspondent_ids: dict[str, int],
+    ) -> list[EmailCorrespondent]:
+        """Prepares unsaved :class:`core.models.EmailCorrespondent`s from parsed correspondent data.
+
+        Addresses that are mentioned more than once in the header are only connected once.
+
+        Args:
+            correspondent_tuples: The name and address tuples parsed from the header.
+            header_name: The name of the header, the mention type of the correspondents.
+            email: The email for the new emailcorrespondents.
+            correspondent_ids: The ids of the saved correspondents by their email addresses.
+
+        Returns:
+            The list of unsaved :class:`core.models.EmailCorrespondent` instances with the given data.
+        """
+        new_email_correspondent_models: dict[int, EmailCorrespondent] = {}
+        for name, address in correspondent_tuples:
+            if not address.strip():
+                logger.debug(
+                    "Skipping correspondent %s with empty mailaddress.",
+                    name,
+                )
                 continue
-            new_email_correspondent = cls(
-                correspondent=correspondent, email=email, mention=header_name
+            correspondent_id = correspondent_ids[address.strip()]
+            if correspondent_id not in new_email_correspondent_models:
+                new_email_correspondent_models[correspondent_id] = cls(
+                    correspondent_id=correspondent_id,
+                    email=email,
+                    mention=header_name,
+                )
+        return list(new_email_correspondent_models.values())
+
+    @classmethod
+    def bulk_save(
+        cls, email_correspondents: list[EmailCorrespondent]
+    ) -> list[EmailCorrespondent]:
+        """Saves new :class:`core.models.EmailCorrespondent`s with a single bulk insert.
+
+        Sends the `post_save` signal for every saved instance,
+        as :func:`django.db.models.query.QuerySet.bulk_create` does not.
+
+        Args:
+            email_correspondents: The unsaved emailcorrespondents.
+
+        Returns:
+            The saved emailcorrespondents with their primary keys.
+
+        Raises:
+            ValueError: If the email of one of the emailcorrespondents is not in the db.
+        """
+        if any(
+            email_correspondent.email.pk is None
+            for email_correspondent in email_correspondents
+        ):
+            raise ValueError("Email is not in the db!")
+        if not email_correspondents:
+            return []
+        cls.objects.bulk_create(email_correspondents)
+        email_correspondents_without_id = {
+            (
+                email_correspondent.email_id,
+                email_correspondent.correspondent_id,
+                email_correspondent.mention,
+            ): email_correspondent
+            for email_correspondent in email_correspondents
+            if email_correspondent.pk is None
+        }
+        if email_correspondents_without_id:
+            # some backends, e.g. mysql, don't return the ids of inserted rows
+            for (
+                email_id,
+                correspondent_id,
+                mention,
+                email_correspondent_id,
+            ) in cls.objects.filter(
+                email_id__in={key[0] for key in email_correspondents_without_id},
+                correspondent_id__in={
+                    key[1] for key in email_correspondents_without_id
+                },
+            ).values_list(
+                "email_id", "correspondent_id", "mention", "id"
+            ):
+                email_correspondent = email_correspondents_without_id.get(
+                    (email_id, correspondent_id, mention)
+                )
+                if email_correspondent is not None:
+                    email_correspondent.pk = email_correspondent_id
+        for email_correspondent in email_correspondents:
+            # bulk_create leaves the instances marked as unsaved
+            state = email_correspondent._state  # noqa: SLF001 ; no public api
+            state.adding = False
+            post_save.send(
+                sender=cls,
+                instance=email_correspondent,
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=state.db,
             )
-            new_email_correspondent.save()
-            new_email_correspondent_models.append(new_email_correspondent)
-        return new_email_correspondent_models
+        return email_correspondents
@@ -0,0 +1,271 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Module with the :class:`MailHostThrottle` model class."""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import TYPE_CHECKING, override
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from django_prometheus.models import ExportModelOperationsMixin
+
+from core.mixins.TimestampModelMixin import TimestampModelMixin
+from core.utils.fetchers.exceptions import MailHostThrottledError
+from eonvelope.utils.workarounds import get_config
+
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+
+logger = logging.getLogger(__name__)
+"""The logger instance for this module."""
+
+_is_waiting_allowed: ContextVar[bool] = ContextVar("is_waiting_allowed", default=False)
+"""Whether :func:`MailHostThrottle.acquire` may wait for a free slot in the current context."""
+
+
+class MailHostThrottle(
+    ExportModelOperationsMixin("mail_host_throttle"), TimestampModelMixin, models.Model
+):
+    """A database model limiting the rate of requests to a mailserver across all workers.
+
+    Every mailserver has a token bucket that is refilled with `MAIL_HOST_RATE_LIMIT` tokens per minute.
+    Every lease of a fetcher takes one token via :func:`acquire`.
+    Within :func:`waiting`, that is in the celery tasks, it waits for the token if necessary,
+    everywhere else it fails right away, so web and API requests are not blocked.
+    If the mailserver throttles requests nonetheless, :func:`back_off` pauses all requests to it
+    for a time that doubles with every throttling up to `MAIL_HOST_MAX_BACKOFF` seconds
+    and is halved again by every successful fetch via :func:`recover`.
+
+    Important:
+        Use the custom methods to create and change instances, never use :func:`create`!
+    """
+
+    ACQUIRE_TIMEOUT = 600
+    """The maximum number of seconds to wait for a request to a mailserver to be allowed within :func:`waiting`."""
+
+    MIN_BACKOFF = 30
+    """The number of seconds that requests to a mailserver are paused after it throttled them for the first time."""
+
+    mail_host = models.CharField(
+        max_length=255,
+        unique=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("mail host"),
+    )
+    """The lowercase hostname of the mailserver. Unique."""
+
+    tokens = models.FloatField(
+        default=0,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("tokens"),
+    )
+    """The number of requests that may currently be made to the mailserver."""
+
+    refilled_at = models.DateTimeField(
+        default=timezone.now,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("time of refill"),
+    )
+    """The time :attr:`tokens` was last refilled."""
+
+    backoff = models.FloatField(
+        default=0,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("backoff"),
+    )
+    """The number of seconds requests are paused for when the mailserver throttles them next."""
+
+    backoff_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("backoff until"),
+    )
+    """The time until which requests to the mailserver are paused. `None` if they are not."""
+
+    class Meta:
+        """Metadata class for the model."""
+
+        db_table = "mail_host_throttles"
+        """The name of the database table for the mailserver throttles."""
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name = _("mail host throttle")
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name_plural = _("mail host throttles")
+
+    @override
+    def __str__(self) -> str:
+        """Returns a string representation of the model data.
+
+        Returns:
+            The string representation of the throttle, using :attr:`mail_host`.
+        """
+        return _("Throttle for mailserver %(mail_host)s") % {
+            "mail_host": self.mail_host
+        }
+
+    @staticmethod
+    @contextmanager
+    def waiting() -> Generator[None]:
+        """Lets :func:`acquire` wait for a request to be allowed within the block.
+
+        Only meant for background tasks, where waiting doesn't block a web or API request.
+        Threads started within the block must be run in a copy of its context to inherit this.
+        """
+        token = _is_waiting_allowed.set(True)
+        try:
+            yield
+        finally:
+            _is_waiting_allowed.reset(token)
+
+    @classmethod
+    def acquire(cls, mail_host: str) -> None:
+        """Takes a token for a request to a mailserver.
+
+        Within :func:`waiting` waits until a request is allowed,
+        otherwise fails right away if it isn't.
+
+        Args:
+            mail_host: The hostname of the mailserver.
+
+        Raises:
+            MailHostThrottledError: If no request is allowed right away
+                or, within :func:`waiting`, within :attr:`ACQUIRE_TIMEOUT`.
+        """
+        timeout = cls.ACQUIRE_TIMEOUT if _is_waiting_allowed.get() else 0
+        deadline = time.monotonic() + timeout
+        while (wait_time := cls._take_token(mail_host)) > 0:
+            if time.monotonic() + wait_time > deadline:
+                logger.error("No request to %s is allowed in time!", mail_host)
+                raise MailHostThrottledError(
+                    TimeoutError(
+                        _("No request is allowed within %(timeout)s seconds.")
+                        % {"timeout": timeout}
+                    ),
+                    _("waiting for a free slot"),
+                )
+            logger.info(
+                "Waiting %.1f seconds for a request to %s to be allowed ...",
+                wait_time,
+                mail_host,
+            )
+            time.sleep(wait_time)
+
+    @classmethod
+    def _take_token(cls, mail_host: str) -> float:
+        """Refills the token bucket of a mailserver and takes a token from it if possible.
+
+        Args:
+            mail_host: The hostname of the mailserver.
+
+        Returns:
+            0 if a token was taken, otherwise the number of seconds to wait before trying again.
+        """
+        rate_limit = get_config("MAIL_HOST_RATE_LIMIT")
+        with transaction.atomic():
+            throttle, _created = cls.objects.select_for_update().get_or_create(
+                mail_host=mail_host.lower(), defaults={"tokens": rate_limit}
+            )
+            now = timezone.now()
+            if throttle.backoff_until is not None and throttle.backoff_until > now:
+                return (throttle.backoff_until - now).total_seconds()
+            if rate_limit <= 0:
+                return 0
+            throttle.tokens = min(
+                rate_limit,
+                throttle.tokens
+                + (now - throttle.refilled_at).total_seconds() * rate_limit / 60,
+            )
+            throttle.refilled_at = now
+            wait_time = 0.0
+            if throttle.tokens >= 1:
+                throttle.tokens -= 1
+            else:
+                wait_time = (1 - throttle.tokens) * 60 / rate_limit
+            throttle.save(update_fields=["tokens", "refilled_at", "updated"])
+        return wait_time
+
+    @classmethod
+    def back_off(cls, mail_host: str) -> float:
+        """Pauses the requests to a mailserver after it throttled them.
+
+        Args:
+            mail_host: The hostname of the mailserver.
+
+        Returns:
+            The number of seconds the requests are paused for.
+        """
+        with transaction.atomic():
+            throttle, _created = cls.objects.select_for_update().get_or_create(
+                mail_host=mail_host.lower()
+            )
+            throttle.backoff = min(
+                max(1, get_config("MAIL_HOST_MAX_BACKOFF")),
+                max(cls.MIN_BACKOFF, 2 * throttle.backoff),
+            )
+            throttle.backoff_until = timezone.now() + timedelta(
+                seconds=throttle.backoff
+            )
+            throttle.save(update_fields=["backoff", "backoff_until", "updated"])
+        logger.warning(
+            "%s is throttling requests, pausing them for %d seconds.",
+            mail_host,
+            throttle.backoff,
+        )
+        return throttle.backoff
+
+    @classmethod
+    def recover(cls, mail_host: str) -> None:
+        """Halves the backoff of a mailserver after a request to it succeeded.
+
+        Args:
+            mail_host: The hostname of the mailserver.
+        """
+        cls.objects.filter(mail_host=mail_host.lower(), backoff__gt=0).update(
+            backoff=F("backoff") / 2
+        )
+
+    @classmethod
+    def get_pause(cls, mail_host: str) -> float:
+        """Gets the remaining time that requests to a mailserver are paused for.
+
+        Args:
+            mail_host: The hostname of the mailserver.
+
+        Returns:
+            The number of seconds until requests are allowed again, 0 if they are not paused.
+        """
+        backoff_until = (
+            cls.objects.filter(mail_host=mail_host.lower())
+            .values_list("backoff_until", flat=True)
+            .first()
+        )
+        if backoff_until is None:
+            return 0
+        return max(0, (backoff_until - timezone.now()).total_seconds())
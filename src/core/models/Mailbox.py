@@ -20,20 +20,23 @@
 
 from __future__ import annotations
 
-import contextlib
 import logging
 import os
 import re
+from copy import copy
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import TYPE_CHECKING, BinaryIO, ClassVar, override
+from typing import TYPE_CHECKING, Any, BinaryIO, ClassVar, override
+from uuid import UUID, uuid4
 from zipfile import BadZipFile, ZipFile
 
 from dirtyfields import DirtyFieldsMixin
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_prometheus.models import ExportModelOperationsMixin
 
 from core.constants import (
+    PROTOCOLS_SUPPORTING_RESTORE,
     EmailFetchingCriterionChoices,
     SupportedEmailDownloadFormats,
     SupportedEmailUploadFormats,
@@ -47,16 +50,25 @@ from core.mixins import (
     UploadMixin,
     URLMixin,
 )
-from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+from core.utils.IngestionPipeline import IngestionPipeline
 from core.utils.mail_parsing import parse_mailbox_name
 from eonvelope.utils.workarounds import get_config
 
-from .Email import Email
+from .MailHostThrottle import MailHostThrottle
 
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
     from django_stubs_ext import StrOrPromise
 
+    from core.utils.fetchers import FetchingFilter
+
     from .Account import Account
 
 
@@ -87,6 +99,15 @@ class Mailbox(
         "This will delete the records of these mailboxes and all emails and attachments found in them!"
     )
 
+    FETCHER_STATE_FIELDS: ClassVar[tuple[str, ...]] = (
+        "uid_validity",
+        "highest_uid",
+        "fetched_uidls",
+        "sync_state",
+        "fetch_checkpoint",
+    )
+    """The fields that the fetchers move ahead while they stream the emails."""
+
     name = models.CharField(
         max_length=255,
         # Translators: Do not capitalize the very first letter unless your language requires it.
@@ -121,6 +142,118 @@ class Mailbox(
     )
     """Whether to save the mails found in this mailbox as .eml files. :attr:`constance.get_config('DEFAULT_SAVE_TO_EML')` by default."""
 
+    uid_validity = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("UID validity"),
+        help_text=_("The UIDVALIDITY value of the mailbox at the last fetch."),
+    )
+    """The IMAP UIDVALIDITY of this mailbox at the last incremental fetch. Empty if it was never fetched incrementally."""
+
+    highest_uid = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("highest UID"),
+        help_text=_("The highest UID of the emails fetched from this mailbox."),
+    )
+    """The highest IMAP UID fetched from this mailbox. Only valid together with :attr:`uid_validity`."""
+
+    fetched_uidls = models.JSONField(
+        default=list,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetched UIDLs"),
+        help_text=_(
+            "The unique ids of the emails on the POP server that have already been fetched."
+        ),
+    )
+    """The POP UIDLs of the messages fetched from this mailbox that are still on the server."""
+
+    sync_state = models.TextField(
+        default="",
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("sync state"),
+        help_text=_(
+            "The state of the Exchange folder, JMAP emails or IMAP mailbox at the last fetch."
+        ),
+    )
+    """The Exchange SyncFolderItems state or the JMAP Email state of this mailbox at the last incremental fetch
+    or the IMAP status of this mailbox at the last complete fetch. Empty if it was never fetched that way."""
+
+    fetch_run_id = models.UUIDField(
+        null=True,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch run id"),
+        help_text=_("The id of the latest fetching run of the mailbox."),
+    )
+    """The id of the latest fetching run of this mailbox. Retries of a run share its id. Empty if it was never fetched."""
+
+    fetch_run_key = models.CharField(
+        max_length=255,
+        default="",
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch run key"),
+        help_text=_(
+            "The criterion and filter of the latest fetching run of the mailbox."
+        ),
+    )
+    """The criterion and filter of the run :attr:`fetch_run_id`, see :func:`make_fetch_run_key`.
+    Empty if the mailbox was never fetched."""
+
+    interrupted_fetch_runs = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("interrupted fetch runs"),
+        help_text=_(
+            "The progress of the interrupted fetching runs with other criteria or filters."
+        ),
+    )
+    """The id, checkpoint and progress of the interrupted runs that were put aside for a run with another key,
+    by their :attr:`fetch_run_key`. Each is resumed by the next run with its key."""
+
+    fetch_checkpoint = models.TextField(
+        default="",
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch checkpoint"),
+        help_text=_(
+            "The server id of the last email that was saved in the latest fetching run."
+        ),
+    )
+    """The server id of the last email committed in the run :attr:`fetch_run_id`. Empty if none was committed yet."""
+
+    fetch_progress = models.PositiveIntegerField(
+        default=0,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch progress"),
+        help_text=_("The number of emails saved in the latest fetching run."),
+    )
+    """The number of emails committed in the run :attr:`fetch_run_id`, including earlier attempts."""
+
+    fetch_checkpoint_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch checkpoint time"),
+        help_text=_("The time the progress of the latest fetching run was last saved."),
+    )
+    """The time :attr:`fetch_checkpoint` was last saved. Empty if the mailbox was never fetched."""
+
+    is_fetch_complete = models.BooleanField(
+        default=True,
+        # Translators: Do not capitalize the very first letter unless your language requires it.
+        verbose_name=_("fetch complete"),
+        help_text=_("Whether the latest fetching run of the mailbox has finished."),
+    )
+    """Whether the run :attr:`fetch_run_id` has finished. If not, the next run resumes it."""
+
     class Meta:
         """Metadata class for the model."""
 
@@ -178,22 +311,178 @@ class Mailbox(
         self.set_healthy()
         logger.info("Successfully tested mailbox")
 
-    def fetch(self, criterion: str) -> None:
+    @staticmethod
+    def make_fetch_run_key(
+        criterion: str, fetching_filter: FetchingFilter | None = None
+    ) -> str:
+        """Makes the key of a fetching run with a criterion and filter.
+
+        Runs with different keys fetch different emails,
+        so they must not resume each other's checkpoints.
+        As there is at most one daemon per criterion of a mailbox,
+        the key also tells apart the runs of its daemons.
+
+        Args:
+            criterion: The criterion of the run.
+            fetching_filter: The additional filter of the run. Defaults to `None`.
+
+        Returns:
+            The key of the run.
+        """
+        if fetching_filter is None:
+            return criterion
+        return f"{criterion} {fetching_filter.make_digest()}"
+
+    def start_fetch_run(self, run_id: UUID | None = None, run_key: str = "") -> None:
+        """Starts a fetching run of this mailbox or resumes the previous one with the same key.
+
+        If the previous run with :attr:`run_key` did not finish, its id and checkpoint are kept,
+        so the new attempt continues after the last email it saved.
+        Otherwise a new run is started from scratch.
+        An interrupted run with another key is put aside in :attr:`interrupted_fetch_runs`,
+        so it can still be resumed later.
+
+        Args:
+            run_id: The id for a new run, e.g. the id of the task that fetches the mailbox.
+                A random id is generated if none is given.
+            run_key: The key of the run, see :func:`make_fetch_run_key`. Defaults to `""`.
+        """
+        if run_key != self.fetch_run_key:
+            self.switch_fetch_run(run_key)
+        if self.is_fetch_complete or self.fetch_run_id is None:
+            self.fetch_run_id = run_id or uuid4()
+            self.fetch_checkpoint = ""
+            self.fetch_progress = 0
+        else:
+            logger.info(
+                "Resuming the interrupted fetching run %s of %s after %s emails.",
+                self.fetch_run_id,
+                self,
+                self.fetch_progress,
+            )
+        self.save_fetch_checkpoint()
+
+    def switch_fetch_run(self, run_key: str) -> None:
+        """Puts the current fetching run aside and restores the interrupted run with another key.
+
+        Runs from before the keys were introduced have an empty key and are dropped,
+        as it is unknown what they fetched.
+
+        Args:
+            run_key: The key of the run to switch to.
+        """
+        if (
+            self.fetch_run_key
+            and not self.is_fetch_complete
+            and self.fetch_run_id is not None
+        ):
+            self.interrupted_fetch_runs[self.fetch_run_key] = {
+                "run_id": str(self.fetch_run_id),
+                "checkpoint": self.fetch_checkpoint,
+                "progress": self.fetch_progress,
+            }
+        self.fetch_run_key = run_key
+        if interrupted_run := self.interrupted_fetch_runs.pop(run_key, None):
+            self.fetch_run_id = UUID(interrupted_run["run_id"])
+            self.fetch_checkpoint = interrupted_run["checkpoint"]
+            self.fetch_progress = interrupted_run["progress"]
+            self.is_fetch_complete = False
+        else:
+            self.is_fetch_complete = True
+
+    def save_fetch_checkpoint(self, *, is_complete: bool = False) -> None:
+        """Saves the progress of the running fetch together with the sync state set by the fetcher.
+
+        Must only be called once all emails fetched up to :attr:`fetch_checkpoint` are saved.
+
+        Args:
+            is_complete: Whether the fetching run has finished. Defaults to `False`.
+        """
+        self.is_fetch_complete = is_complete
+        self.fetch_checkpoint_at = timezone.now()
+        self.save(
+            update_fields=[
+                "uid_validity",
+                "highest_uid",
+                "fetched_uidls",
+                "sync_state",
+                "fetch_run_id",
+                "fetch_run_key",
+                "interrupted_fetch_runs",
+                "fetch_checkpoint",
+                "fetch_progress",
+                "fetch_checkpoint_at",
+                "is_fetch_complete",
+            ]
+        )
+
+    def get_fetcher_state(self) -> dict[str, Any]:
+        """Takes a snapshot of the fields in :attr:`FETCHER_STATE_FIELDS`.
+
+        Returns:
+            The values of the fields by their names.
+        """
+        return {
+            field: copy(getattr(self, field)) for field in self.FETCHER_STATE_FIELDS
+        }
+
+    def set_fetcher_state(self, fetcher_state: dict[str, Any]) -> None:
+        """Resets the fields in :attr:`FETCHER_STATE_FIELDS` to a snapshot.
+
+        Args:
+            fetcher_state: The snapshot from :func:`get_fetcher_state`.
+        """
+        for field, value in fetcher_state.items():
+            setattr(self, field, value)
+
+    def fetch(
+        self,
+        criterion: str,
+        run_id: UUID | None = None,
+        fetching_filter: FetchingFilter | None = None,
+    ) -> None:
         """Fetches emails from this mailbox based on :attr:`criterion` and adds them to the db.
 
+        The emails are parsed in parallel and saved in batches by an :class:`core.utils.IngestionPipeline.IngestionPipeline`
+        while they are streamed from the server, so only a batch of emails is held in memory at a time.
+        The progress is checkpointed every `FETCH_CHECKPOINT_INTERVAL` saved emails
+        and in any case at the end, so a retry of an interrupted run continues where it stopped.
+        If the run fails, the state of the fetcher from after the last saved email is checkpointed,
+        as the fetcher has already moved it past the emails that were not saved yet.
         If successful, marks this mailbox as healthy, otherwise unhealthy.
+        If the mailserver throttles the requests, backs off from it and leaves the health flags untouched.
 
         Args:
             criterion: The criterion used to fetch emails from the mailbox.
+            run_id: The id of the fetching run, see :func:`start_fetch_run`.
+            fetching_filter: Additional filter that the emails must match. Defaults to `None`.
 
         Raises:
+            MailHostThrottledError: Reraised if fetching failed due to throttling by the mailserver.
             MailboxError: Reraised if fetching failed due to a MailboxError.
             MailAccountError: Reraised if fetching failed due to a MailAccountError.
         """
         logger.info("Fetching emails with criterion %s from %s ...", criterion, self)
-        with self.account.get_fetcher() as fetcher:
+        checkpoint_interval = max(1, get_config("FETCH_CHECKPOINT_INTERVAL"))
+        is_complete = False
+        self.start_fetch_run(
+            run_id, self.make_fetch_run_key(criterion, fetching_filter)
+        )
+        saved_fetcher_state = self.get_fetcher_state()
+        with self.account.get_fetcher() as fetcher, IngestionPipeline(self) as pipeline:
             try:
-                fetched_mails = fetcher.fetch_emails(self, criterion)
+                for _email in pipeline.ingest(
+                    fetcher.stream_emails(self, criterion, fetching_filter)
+                ):
+                    self.fetch_progress += 1
+                    saved_fetcher_state = self.get_fetcher_state()
+                    if self.fetch_progress % checkpoint_interval == 0:
+                        self.save_fetch_checkpoint()
+                is_complete = True
+            except MailHostThrottledError as error:
+                logger.info("Failed fetching %s with error: %s.", self, error)
+                MailHostThrottle.back_off(self.account.mail_host)
+                raise
             except MailboxError as error:
                 logger.info("Failed fetching %s with error: %s.", self, error)
                 self.set_unhealthy(error)
@@ -202,27 +491,31 @@ class Mailbox(
                 logger.info("Failed fetching %s with error: %s.", self, error)
                 self.account.set_unhealthy(error)
                 raise
+            finally:
+                if not is_complete:
+                    self.set_fetcher_state(saved_fetcher_state)
+                self.save_fetch_checkpoint(is_complete=is_complete)
+        MailHostThrottle.recover(self.account.mail_host)
         self.set_healthy()
-        logger.info("Successfully fetched emails.")
+        logger.info("Successfully fetched and saved emails.")
 
-        logger.info("Saving fetched emails ...")
-        for fetched_mail in fetched_mails:
-            Email.create_from_email_bytes(fetched_mail, self)
-
-        logger.info("Successfully saved fetched emails.")
+    def _add_emails(self, emails: Iterable[bytes | BinaryIO]) -> None:
+        """Adds emails to the db with an :class:`core.utils.IngestionPipeline.IngestionPipeline`."""
+        with IngestionPipeline(self) as pipeline:
+            for _email in pipeline.ingest(emails):
+                pass
 
     def _add_email_from_eml(self, file: BinaryIO) -> None:
-        """Reads emails from a zipped mailbox dir."""
-        Email.create_from_email_bytes(file.read(), mailbox=self)
+        """Adds the email from an eml file to the db."""
+        self._add_emails([file])
 
-    def _add_emails_from_zip_eml(self, file: BinaryIO) -> None:
+    @staticmethod
+    def _read_emails_from_zip_eml(file: BinaryIO) -> Iterator[bytes]:
         """Reads emails from a zip of eml files."""
         try:
             with ZipFile(file) as zipfile:
                 for zipped_file in zipfile.namelist():
-                    Email.create_from_email_bytes(
-                        zipfile.read(zipped_file), mailbox=self
-                    )
+                    yield zipfile.read(zipped_file)
         except BadZipFile as error:
             logger.exception("Error parsing file as zip!")
             raise ValueError(
@@ -230,7 +523,10 @@ class Mailbox(
                 % {"file_format": "zip"}
             ) from error
 
-    def _add_emails_from_mailbox_file(self, file: BinaryIO, file_format: str) -> None:
+    @staticmethod
+    def _read_emails_from_mailbox_file(
+        file: BinaryIO, file_format: str
+    ) -> Iterator[bytes]:
         """Reads emails from a mailbox file.
 
         Note:
@@ -242,14 +538,21 @@ class Mailbox(
             tempfile.seek(0)
             parser = parser_class(tempfile.name, create=False)
             parser.lock()
-            for key in parser.iterkeys():
-                with contextlib.suppress(
-                    AssertionError
-                ):  # Babyl.get_bytes can raise AssertionError for a bad message
-                    Email.create_from_email_bytes(parser.get_bytes(key), mailbox=self)
-            parser.close()
-
-    def _add_emails_from_mailbox_zip(self, file: BinaryIO, file_format: str) -> None:
+            try:
+                for key in parser.iterkeys():
+                    try:
+                        email_bytes = parser.get_bytes(key)
+                    except AssertionError:
+                        # Babyl.get_bytes can raise AssertionError for a bad message
+                        continue
+                    yield email_bytes
+            finally:
+                parser.close()
+
+    @staticmethod
+    def _read_emails_from_mailbox_zip(
+        file: BinaryIO, file_format: str
+    ) -> Iterator[bytes]:
         """Reads emails from a zipped mailbox dir.
 
         Note:
@@ -273,9 +576,7 @@ class Mailbox(
                     parser.lock()
                     try:
                         for key in parser.iterkeys():
-                            Email.create_from_email_bytes(
-                                parser.get_bytes(key), mailbox=self
-                            )
+                            yield parser.get_bytes(key)
                     except (
                         FileNotFoundError
                     ) as error:  # raised if the given maildir doesn't have the expected structure
@@ -284,7 +585,8 @@ class Mailbox(
                             _("The given file is not a valid %(file_format)s.")
                             % {"file_format": file_format}
                         ) from error
-                    parser.close()
+                    finally:
+                        parser.close()
 
     def add_emails_from_file(self, file: BinaryIO, file_format: str) -> None:
         """Adds emails from a file to the db.
@@ -301,18 +603,18 @@ class Mailbox(
         if file_format == SupportedEmailUploadFormats.EML:
             self._add_email_from_eml(file)
         elif file_format == SupportedEmailUploadFormats.ZIP_EML:
-            self._add_emails_from_zip_eml(file)
+            self._add_emails(self._read_emails_from_zip_eml(file))
         elif file_format in [
             SupportedEmailUploadFormats.MBOX,
             SupportedEmailUploadFormats.MMDF,
             SupportedEmailUploadFormats.BABYL,
         ]:
-            self._add_emails_from_mailbox_file(file, file_format)
+            self._add_emails(self._read_emails_from_mailbox_file(file, file_format))
         elif file_format in [
             SupportedEmailUploadFormats.MAILDIR,
             SupportedEmailUploadFormats.MH,
         ]:
-            self._add_emails_from_mailbox_zip(file, file_format)
+            self._add_emails(self._read_emails_from_mailbox_zip(file, file_format))
         else:
             logger.error("Unsupported fileformat for uploaded file.")
             raise ValueError(
@@ -354,6 +656,15 @@ class Mailbox(
             if criterion in self.account.get_fetcher_class().AVAILABLE_FETCHING_CRITERIA
         ]
 
+    @property
+    def can_restore_emails(self) -> bool:
+        """Checks if emails can be restored to this mailbox.
+
+        Returns:
+            Whether emails can be restored to this mailbox.
+        """
+        return self.account.protocol in PROTOCOLS_SUPPORTING_RESTORE and self.is_healthy
+
     @property
     def available_download_formats(self) -> list[tuple[str, StrOrPromise]]:
         """Get all formats that emails in this mailbox can be downloaded in.
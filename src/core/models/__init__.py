@@ -25,6 +25,7 @@ from .Daemon import Daemon
 from .Email import Email
 from .EmailCorrespondent import EmailCorrespondent
 from .Mailbox import Mailbox
+from .MailHostThrottle import MailHostThrottle
 from .StorageShard import StorageShard
 
 
@@ -35,6 +36,7 @@ __all__ = [
     "Daemon",
     "Email",
     "EmailCorrespondent",
+    "MailHostThrottle",
     "Mailbox",
     "StorageShard",
 ]
@@ -18,25 +18,45 @@
 
 """Module with the tasks for celery."""
 
+from itertools import batched
 from uuid import UUID
 
-from celery import shared_task
+from celery import Task, shared_task
+from django.db import transaction
 
-from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from core.utils.AsyncFetchEngine import AsyncFetchEngine
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+from eonvelope.utils.workarounds import get_config
 
+from .models.Account import Account
 from .models.Daemon import Daemon
+from .models.Email import Email
+from .models.MailHostThrottle import MailHostThrottle
 
 
-@shared_task
+@shared_task(bind=True)
 def fetch_emails(  # this must not be renamed or moved, otherwise existing daemons will break!
+    self: Task,
     daemon_uuid_string: str,
 ) -> None:
     """Celery task to fetch and store emails.
 
+    The id of the task is used as the id of the fetching run,
+    so a retried or redelivered task resumes the run it started.
+    If the mailserver throttles the requests, the task is retried
+    once the backoff from the mailserver is over and the daemon stays healthy.
+    If `ASYNC_FETCH_GROUP_SIZE` is set, scheduled runs of daemons that can be fetched concurrently
+    are only marked as pending and fetched in groups by :func:`dispatch_pending_fetches`.
+
     Args:
         daemon_uuid_string: The uuid of the daemon instance that manages this task.
 
     Raises:
+        Retry: If the mailserver throttled the requests.
         Exception: Any exception that is raised during fetching.
     """
     try:
@@ -45,8 +65,25 @@ def fetch_emails(  # this must not be renamed or moved, otherwise existing daemo
         )
     except Daemon.DoesNotExist:
         return
+    if (
+        getattr(self.request, "periodic_task_name", None)
+        and get_config("ASYNC_FETCH_GROUP_SIZE") > 0
+        and is_fetched_concurrently(daemon)
+    ):
+        Daemon.objects.filter(pk=daemon.pk).update(is_fetch_pending=True)
+        return
     try:
-        daemon.mailbox.fetch(daemon.fetching_criterion)
+        with MailHostThrottle.waiting():
+            daemon.mailbox.fetch(
+                daemon.fetching_criterion,
+                run_id=UUID(self.request.id) if self.request.id else None,
+                fetching_filter=daemon.get_fetching_filter(),
+            )
+    except MailHostThrottledError as exc:
+        raise self.retry(
+            exc=exc,
+            countdown=MailHostThrottle.get_pause(daemon.mailbox.account.mail_host),
+        ) from exc
     except Exception as exc:
         daemon.set_unhealthy(exc)
         if isinstance(exc, MailAccountError):
@@ -55,3 +92,136 @@ def fetch_emails(  # this must not be renamed or moved, otherwise existing daemo
             daemon.mailbox.set_unhealthy(exc)
         raise
     daemon.set_healthy()
+
+
+@shared_task
+def fetch_account_emails(account_id: int, criterion: str) -> dict[str, str]:
+    """Celery task to fetch and store emails from all mailboxes of an account concurrently.
+
+    Args:
+        account_id: The id of the account to fetch.
+        criterion: The criterion used to fetch emails from the mailboxes.
+
+    Returns:
+        The errors of the mailboxes that failed to fetch by mailbox name.
+
+    Raises:
+        ValueError: If the criterion is not available for the account.
+    """
+    try:
+        account = Account.objects.get(id=account_id)
+    except Account.DoesNotExist:
+        return {}
+    with MailHostThrottle.waiting():
+        errors = account.fetch(criterion)
+    return {mailbox.name: str(error) for mailbox, error in errors.items()}
+
+
+@shared_task
+def fetch_emails_concurrently(daemon_uuid_strings: list[str]) -> dict[str, str]:
+    """Celery task to fetch and store emails for many daemons concurrently in one worker.
+
+    The mailboxes supported by the :class:`core.utils.AsyncFetchEngine.AsyncFetchEngine`
+    are fetched together on its event loop,
+    the fetching tasks of all other daemons and the daemons with a fetching filter are queued separately.
+    Daemons whose mailserver throttled the requests keep their health flag.
+
+    Args:
+        daemon_uuid_strings: The uuids of the daemons to run.
+
+    Returns:
+        The errors of the daemons that failed to fetch by daemon uuid.
+    """
+    daemons = Daemon.objects.select_related("mailbox__account").filter(
+        uuid__in=[
+            UUID(daemon_uuid_string) for daemon_uuid_string in daemon_uuid_strings
+        ]
+    )
+    async_daemons = []
+    for daemon in daemons:
+        if is_fetched_concurrently(daemon):
+            async_daemons.append(daemon)
+        else:
+            fetch_emails.delay(str(daemon.uuid))
+    with MailHostThrottle.waiting():
+        errors = AsyncFetchEngine().run(
+            [(daemon.mailbox, daemon.fetching_criterion) for daemon in async_daemons]
+        )
+    for daemon, error in zip(async_daemons, errors, strict=True):
+        if error is None:
+            daemon.set_healthy()
+        elif not isinstance(error, MailHostThrottledError):
+            daemon.set_unhealthy(error)
+    return {
+        str(daemon.uuid): str(error)
+        for daemon, error in zip(async_daemons, errors, strict=True)
+        if error is not None
+    }
+
+
+@shared_task
+def dispatch_pending_fetches() -> int:
+    """Celery task to fetch the pending daemons in groups of `ASYNC_FETCH_GROUP_SIZE`.
+
+    Runs regularly with the celery beat schedule and queues a :func:`fetch_emails_concurrently`
+    task for every group of daemons marked as pending by :func:`fetch_emails`.
+
+    Returns:
+        The number of dispatched daemons.
+    """
+    with transaction.atomic():
+        pending_daemons = Daemon.objects.select_for_update().filter(
+            is_fetch_pending=True
+        )
+        daemon_uuid_strings = [
+            str(daemon_uuid)
+            for daemon_uuid in pending_daemons.values_list("uuid", flat=True)
+        ]
+        pending_daemons.update(is_fetch_pending=False)
+    for daemon_group in batched(
+        daemon_uuid_strings,
+        max(1, get_config("ASYNC_FETCH_GROUP_SIZE")),
+        strict=False,
+    ):
+        fetch_emails_concurrently.delay(list(daemon_group))
+    return len(daemon_uuid_strings)
+
+
+def is_fetched_concurrently(daemon: Daemon) -> bool:
+    """Checks whether a daemon can be fetched by :func:`fetch_emails_concurrently` on the event loop.
+
+    Args:
+        daemon: The daemon to check.
+
+    Returns:
+        Whether the :class:`core.utils.AsyncFetchEngine.AsyncFetchEngine` supports the mailbox of the daemon
+        and the daemon has no fetching filter.
+    """
+    return AsyncFetchEngine.supports(daemon.mailbox) and not daemon.fetching_filter
+
+
+@shared_task(bind=True)
+def restore_emails(self: Task, email_ids: list[int]) -> dict[str, str]:
+    """Celery task to restore many emails to their mailboxes.
+
+    The progress is reported as the custom `PROGRESS` state of the task
+    with the number of `done` and the `total` number of emails in its meta data,
+    updated after every `RESTORE_BATCH_SIZE` emails.
+
+    Args:
+        email_ids: The ids of the emails to restore.
+
+    Returns:
+        The errors of the emails that failed to restore by email id.
+    """
+    progress_interval = max(1, get_config("RESTORE_BATCH_SIZE"))
+
+    def report_progress(done: int, total: int) -> None:
+        if self.request.id and (done % progress_interval == 0 or done == total):
+            self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+
+    with MailHostThrottle.waiting():
+        errors = Email.restore_queryset_to_mailboxes(
+            Email.objects.filter(id__in=email_ids), report_progress
+        )
+    return {str(email.id): str(error) for email, error in errors.items()}
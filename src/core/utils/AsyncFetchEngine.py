@@ -0,0 +1,353 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`AsyncFetchEngine` class."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import queue
+import threading
+from typing import TYPE_CHECKING, BinaryIO
+
+from core.constants import EmailProtocolChoices
+from core.models import MailHostThrottle
+from core.utils.fetchers import AsyncIMAP4_SSL_Fetcher, AsyncIMAP4Fetcher
+from core.utils.fetchers.exceptions import (
+    FetcherError,
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+from core.utils.IngestionPipeline import IngestionPipeline
+from eonvelope.utils.workarounds import get_config
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from core.models import Mailbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFetchEngine:
+    """Fetches many mailboxes concurrently with :mod:`asyncio` in a single worker process.
+
+    The sessions with the mailservers all run on one event loop in a background thread,
+    the number of sessions per mailserver is limited by `ASYNC_FETCH_HOST_CONCURRENCY`.
+    The fetched mails are passed through a bounded queue to the calling thread,
+    which saves them with an :class:`core.utils.IngestionPipeline.IngestionPipeline` per mailbox.
+    So all database access stays in the calling thread,
+    including the check for duplicates, which is done once per batch of every mailbox,
+    and slow saving holds back the download instead of piling up mails in memory.
+    Mails spooled to temporary files by the fetchers are closed once they are saved.
+    """
+
+    FETCHER_CLASSES: dict[str, type[AsyncIMAP4Fetcher]] = {
+        EmailProtocolChoices.IMAP: AsyncIMAP4Fetcher,
+        EmailProtocolChoices.IMAP4_SSL: AsyncIMAP4_SSL_Fetcher,
+    }
+    """The asynchronous fetcher classes by the protocols they implement."""
+
+    QUEUE_SIZE = 100
+    """The maximum number of fetched mails waiting to be saved."""
+
+    def __init__(self) -> None:
+        """Sets up the engine with the current settings."""
+        self.host_concurrency = max(1, get_config("ASYNC_FETCH_HOST_CONCURRENCY"))
+        self.throw_out_spam = get_config("THROW_OUT_SPAM")
+
+    @classmethod
+    def supports(cls, mailbox: Mailbox) -> bool:
+        """Checks whether a mailbox can be fetched by the engine.
+
+        Accounts that use compression are left to the synchronous fetchers,
+        as the engine doesn't implement COMPRESS=DEFLATE.
+
+        Args:
+            mailbox: The mailbox to check.
+
+        Returns:
+            Whether the protocol of the mailbox's account is implemented by the engine
+            and its account doesn't use compression.
+        """
+        return (
+            mailbox.account.protocol in cls.FETCHER_CLASSES
+            and not mailbox.account.use_compression
+        )
+
+    def run(self, jobs: Sequence[tuple[Mailbox, str]]) -> list[Exception | None]:
+        """Fetches emails from mailboxes concurrently and adds them to the db.
+
+        Like :func:`core.models.Mailbox.Mailbox.fetch`, every mailbox starts or resumes a fetching run
+        and its sync state and progress are saved once it is done
+        and the mailbox or its account is marked healthy or unhealthy.
+        Every job takes a token from the rate limit of its mailserver via :class:`core.models.MailHostThrottle`
+        before the fetching starts, jobs that don't get one fail with a :class:`MailHostThrottledError`.
+
+        Args:
+            jobs: The mailboxes to fetch with the criterion to fetch them by.
+
+        Returns:
+            The error of every job or `None` if it was successful, in the order of the jobs.
+
+        Raises:
+            ValueError: If a mailbox can't be fetched by the engine
+                or the criterion is not available for it.
+        """
+        fetchers = self.make_fetchers(jobs)
+        errors: list[Exception | None] = [None] * len(jobs)
+        for job_index, (mailbox, criterion) in enumerate(jobs):
+            try:
+                MailHostThrottle.acquire(mailbox.account.mail_host)
+            except MailHostThrottledError as error:
+                errors[job_index] = error
+                fetchers[job_index] = None
+                continue
+            mailbox.start_fetch_run(run_key=mailbox.make_fetch_run_key(criterion))
+
+        logger.info("Fetching %d mailboxes concurrently ...", len(jobs))
+        results: queue.Queue[tuple[int, bytes | BinaryIO | Exception | None] | None] = (
+            queue.Queue(self.QUEUE_SIZE)
+        )
+        stop_event = threading.Event()
+        loop_thread = threading.Thread(
+            target=asyncio.run,
+            args=(self.fetch_all(jobs, fetchers, results, stop_event),),
+            name="async-fetch-engine",
+            daemon=True,
+        )
+        loop_thread.start()
+        try:
+            self.save_results(jobs, results, errors)
+        finally:
+            stop_event.set()
+            while loop_thread.is_alive():
+                # unblock the producers, so the event loop can shut down
+                with contextlib.suppress(queue.Empty):
+                    results.get(timeout=0.1)
+            loop_thread.join()
+        logger.info(
+            "Successfully fetched %d mailboxes, %d failed.",
+            len(jobs),
+            sum(error is not None for error in errors),
+        )
+        return errors
+
+    def make_fetchers(
+        self, jobs: Sequence[tuple[Mailbox, str]]
+    ) -> list[AsyncIMAP4Fetcher | None]:
+        """Creates an unconnected fetcher for every job.
+
+        Args:
+            jobs: The mailboxes to fetch with the criterion to fetch them by.
+
+        Returns:
+            The fetchers in the order of the jobs.
+
+        Raises:
+            ValueError: If a mailbox can't be fetched by the engine
+                or the criterion is not available for it.
+        """
+        fetchers: list[AsyncIMAP4Fetcher | None] = []
+        for mailbox, criterion in jobs:
+            if not self.supports(mailbox):
+                raise ValueError(
+                    f"{mailbox.account} is not supported by the async fetch engine!"
+                )
+            fetcher_class = self.FETCHER_CLASSES[mailbox.account.protocol]
+            if criterion not in fetcher_class.AVAILABLE_FETCHING_CRITERIA:
+                raise ValueError(
+                    f"Fetching by {criterion} is not available via protocol {fetcher_class.PROTOCOL}!"
+                )
+            fetchers.append(fetcher_class(mailbox.account, connect=False))
+        return fetchers
+
+    def save_results(
+        self,
+        jobs: Sequence[tuple[Mailbox, str]],
+        results: queue.Queue[tuple[int, bytes | BinaryIO | Exception | None] | None],
+        errors: list[Exception | None],
+    ) -> None:
+        """Saves the fetched mails from the results of the jobs until they end.
+
+        Every job has its own :class:`core.utils.IngestionPipeline.IngestionPipeline`,
+        all of them share the process pool and correspondent cache of the first one.
+        The pending batch of a job is saved once the job is done, before its progress is saved.
+
+        Args:
+            jobs: The mailboxes to fetch with the criterion to fetch them by.
+            results: The queue of results from the event loop.
+            errors: The error of every job, updated in place.
+        """
+        pipelines: list[IngestionPipeline] = []
+        for mailbox, _criterion in jobs:
+            pipelines.append(
+                IngestionPipeline(mailbox, pipelines[0] if pipelines else None)
+            )
+        try:
+            while (result := results.get()) is not None:
+                job_index, item = result
+                mailbox = jobs[job_index][0]
+                pipeline = pipelines[job_index]
+                if isinstance(item, bytes):
+                    mailbox.fetch_progress += len(pipeline.add(item))
+                elif item is not None and not isinstance(item, Exception):
+                    with item:
+                        mailbox.fetch_progress += len(pipeline.add(item))
+                else:
+                    mailbox.fetch_progress += len(pipeline.flush())
+                    errors[job_index] = item
+                    self.finish(mailbox, item)
+        finally:
+            if pipelines:
+                pipelines[0].close()
+
+    @staticmethod
+    def finish(mailbox: Mailbox, error: Exception | None) -> None:
+        """Saves the sync state and fetching progress of a fetched mailbox and records its health.
+
+        The checkpoint is only saved here, as the fetcher moves it ahead of the emails
+        that are still waiting to be saved in the queue.
+        If the mailserver throttled the requests, backs off from it instead of changing the health flags.
+
+        Args:
+            mailbox: The mailbox that has been fetched.
+            error: The error that stopped the fetching or `None` if it was successful.
+        """
+        mailbox.save_fetch_checkpoint(is_complete=error is None)
+        if error is None:
+            MailHostThrottle.recover(mailbox.account.mail_host)
+            mailbox.set_healthy()
+        elif isinstance(error, MailHostThrottledError):
+            logger.info("Failed fetching %s with error: %s.", mailbox, error)
+            MailHostThrottle.back_off(mailbox.account.mail_host)
+        elif isinstance(error, MailAccountError):
+            logger.info("Failed fetching %s with error: %s.", mailbox, error)
+            mailbox.account.set_unhealthy(error)
+        elif isinstance(error, MailboxError):
+            logger.info("Failed fetching %s with error: %s.", mailbox, error)
+            mailbox.set_unhealthy(error)
+
+    async def fetch_all(
+        self,
+        jobs: Sequence[tuple[Mailbox, str]],
+        fetchers: list[AsyncIMAP4Fetcher | None],
+        results: queue.Queue[tuple[int, bytes | BinaryIO | Exception | None] | None],
+        stop_event: threading.Event,
+    ) -> None:
+        """Runs all jobs concurrently and forwards their results to the calling thread.
+
+        Ends the results with `None` in any case.
+
+        Args:
+            jobs: The mailboxes to fetch with the criterion to fetch them by.
+            fetchers: The unconnected fetcher for every job, `None` for jobs that are skipped.
+            results: The queue to the calling thread.
+            stop_event: Set by the calling thread if it stops consuming the results.
+        """
+        host_semaphores: dict[str, asyncio.Semaphore] = {}
+        job_results: asyncio.Queue[tuple[int, bytes | BinaryIO | Exception | None]] = (
+            asyncio.Queue(self.QUEUE_SIZE)
+        )
+
+        async def forward_results() -> None:
+            while True:
+                result = await job_results.get()
+                await asyncio.to_thread(results.put, result)
+                job_results.task_done()
+
+        forwarder = asyncio.create_task(forward_results())
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for job_index, (mailbox, criterion) in enumerate(jobs):
+                    fetcher = fetchers[job_index]
+                    if fetcher is None:
+                        continue
+                    mail_host = mailbox.account.mail_host.lower()
+                    if mail_host not in host_semaphores:
+                        host_semaphores[mail_host] = asyncio.Semaphore(
+                            self.host_concurrency
+                        )
+                    task_group.create_task(
+                        self.fetch_mailbox(
+                            job_index,
+                            mailbox,
+                            criterion,
+                            fetcher,
+                            host_semaphores[mail_host],
+                            job_results,
+                            stop_event,
+                        )
+                    )
+            await job_results.join()
+        finally:
+            forwarder.cancel()
+            await asyncio.to_thread(results.put, None)
+
+    async def fetch_mailbox(  # all the state of one job
+        self,
+        job_index: int,
+        mailbox: Mailbox,
+        criterion: str,
+        fetcher: AsyncIMAP4Fetcher,
+        host_semaphore: asyncio.Semaphore,
+        job_results: asyncio.Queue[tuple[int, bytes | BinaryIO | Exception | None]],
+        stop_event: threading.Event,
+    ) -> None:
+        """Fetches a single mailbox once its mailserver has a free slot.
+
+        Puts every fetched mail and finally the error or `None` into the results.
+        Errors don't affect the other jobs.
+
+        Args:
+            job_index: The index of the job.
+            mailbox: The mailbox to fetch.
+            criterion: The criterion to fetch the mailbox by.
+            fetcher: The unconnected fetcher for the mailbox.
+            host_semaphore: The semaphore limiting the sessions with the mailserver.
+            job_results: The queue of results to forward to the calling thread.
+            stop_event: Set by the calling thread if it stops consuming the results.
+        """
+        async with host_semaphore:
+            if stop_event.is_set():
+                return
+            error = None
+            try:
+                await fetcher.aconnect()
+                async with contextlib.aclosing(
+                    fetcher.astream_emails(
+                        mailbox, criterion, throw_out_spam=self.throw_out_spam
+                    )
+                ) as emails_stream:
+                    async for fetched_mail in emails_stream:
+                        if stop_event.is_set():
+                            return
+                        await job_results.put((job_index, fetched_mail))
+            except Exception as fetch_error:
+                if not isinstance(fetch_error, FetcherError):
+                    logger.exception("Unexpected error fetching %s!", mailbox)
+                error = fetch_error
+            finally:
+                await fetcher.aclose()
+            await job_results.put((job_index, error))
@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`IdleListener` class."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TYPE_CHECKING, override
+
+from django.db import DatabaseError, close_old_connections
+
+from core.tasks import fetch_emails
+from core.utils.fetchers import IMAP4Fetcher
+from core.utils.fetchers.exceptions import FetcherError
+
+
+if TYPE_CHECKING:
+    from core.models import Daemon
+
+
+logger = logging.getLogger(__name__)
+
+
+class IdleListener(threading.Thread):
+    """Listens for new emails in the mailbox of a daemon using IMAP IDLE.
+
+    Holds its own connection to the mailserver while running
+    and queues the fetching task of the daemon as soon as new emails arrive.
+    This is a push-based alternative to waiting for the next scheduled run of the daemon.
+    """
+
+    RETRY_DELAY = 60
+    """Seconds to wait before reconnecting after the connection failed."""
+
+    def __init__(
+        self, email_daemon: Daemon, idle_timeout: float = IMAP4Fetcher.IDLE_TIMEOUT
+    ) -> None:
+        """Sets up the listener thread.
+
+        Args:
+            email_daemon: The daemon whose mailbox is watched.
+            idle_timeout: The maximum time to idle on the connection in seconds
+                before it is renewed. Defaults to :attr:`core.utils.fetchers.IMAP4Fetcher.IDLE_TIMEOUT`.
+        """
+        super().__init__(name=f"idle-{email_daemon.uuid}", daemon=True)
+        self.email_daemon = email_daemon
+        self.idle_timeout = idle_timeout
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """Stops the listener after the current wait for new emails."""
+        self.stop_event.set()
+
+    @override
+    def run(self) -> None:
+        """Listens until stopped, reconnects if the connection or the database failed.
+
+        Database errors are caught as well,
+        as getting a fetcher acquires the throttle of the mailhost in the database.
+        """
+        while not self.stop_event.is_set():
+            try:
+                self.listen()
+            except (FetcherError, DatabaseError):
+                logger.exception(
+                    "Error listening for new emails in %s!", self.email_daemon.mailbox
+                )
+                self.stop_event.wait(self.RETRY_DELAY)
+            finally:
+                close_old_connections()
+
+    def listen(self) -> None:
+        """Waits for new emails on a single connection and queues their fetching until stopped.
+
+        Queues a fetch right after connecting to catch up on emails
+        that arrived while the listener was not connected.
+        The connection is not taken from the fetcher pool,
+        so the fetching task can lease its own pooled connection meanwhile.
+
+        Raises:
+            FetcherError: If the connection to the mailserver fails.
+            DatabaseError: If the throttle of the mailhost can not be acquired.
+        """
+        mailbox = self.email_daemon.mailbox
+        with mailbox.account.get_fetcher(pooled=False) as fetcher:
+            if not isinstance(fetcher, IMAP4Fetcher):
+                logger.error("%s does not support IDLE!", mailbox.account)
+                self.stop()
+                return
+            logger.info("Listening for new emails in %s.", mailbox)
+            self.fetch()
+            while not self.stop_event.is_set():
+                if fetcher.wait_for_new_emails(mailbox, self.idle_timeout):
+                    logger.info("New emails arrived in %s.", mailbox)
+                    self.fetch()
+
+    def fetch(self) -> None:
+        """Queues the fetching task of the daemon.
+
+        The emails are fetched by a celery worker, so the task is subject to the worker limits
+        and its result and retries are handled by celery.
+        Errors queuing the task are logged, they do not stop the listener.
+        """
+        try:
+            fetch_emails.delay(str(self.email_daemon.uuid))
+        except Exception:
+            logger.exception(
+                "Error queuing the fetching of new emails for %s!", self.email_daemon
+            )
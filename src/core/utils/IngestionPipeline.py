@@ -0,0 +1,286 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Module with the :class:`IngestionPipeline` class."""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, BinaryIO, Self
+
+from django.db import transaction
+
+from core.models.Email import Email
+from core.utils.mail_parsing import parse_email
+from eonvelope.utils.workarounds import get_config
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from types import TracebackType
+
+    from core.models.Mailbox import Mailbox
+    from core.utils.mail_parsing import ParsedEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionPipeline:
+    """Adds emails to a mailbox, parsing them in parallel and saving them one after the other.
+
+    The CPU-bound parsing by :func:`core.utils.mail_parsing.parse_email`
+    runs in a pool of `INGESTION_PARSE_WORKERS` processes,
+    while all database access stays in the calling thread.
+    Every batch of `INGESTION_BATCH_SIZE` emails is checked for duplicates with a single query,
+    only the new emails are parsed.
+    They are saved in a single transaction,
+    with a savepoint per email, so a single failing email doesn't roll back the others.
+
+    The process pool is started with the first email and shut down when the pipeline is closed.
+    If a worker of the pool dies, the pool is discarded and the pending emails are parsed inline,
+    the next batch starts a new pool.
+    Its workers are forked from a server process, as the calling process may run other threads.
+    Processes that are daemons themselves, like the workers of a prefork celery worker,
+    can't start a pool, so they parse the emails inline, like with less than 2 workers.
+
+    Emails spooled to files are parsed and saved inline once the pending batch is saved,
+    as the fetchers delete the files when the next email is requested.
+
+    The correspondents of the emails are cached for the lifetime of the pipeline,
+    so correspondents that are mentioned again are only written if their data changed.
+    """
+
+    def __init__(
+        self, mailbox: Mailbox, shared_pipeline: IngestionPipeline | None = None
+    ) -> None:
+        """Sets up the pipeline with the current settings.
+
+        Args:
+            mailbox: The mailbox to add the emails to.
+            shared_pipeline: Another pipeline whose process pool and correspondent cache are used,
+                so emails can be added to several mailboxes at once with a single process pool.
+                Only that pipeline shuts the process pool down.
+                Defaults to `None`, the pipeline has its own.
+        """
+        self.mailbox = mailbox
+        self.workers = get_config("INGESTION_PARSE_WORKERS")
+        self.batch_size = max(1, get_config("INGESTION_BATCH_SIZE"))
+        self.ignore_maintypes = get_config("DONT_PARSE_CONTENT_MAINTYPES")
+        self.ignore_subtypes = get_config("DONT_PARSE_CONTENT_SUBTYPES")
+        self.correspondent_cache: dict[tuple[int, str], dict[str, Any]] = (
+            {} if shared_pipeline is None else shared_pipeline.correspondent_cache
+        )
+        self.shared_pipeline = shared_pipeline
+        self._batch: list[bytes] = []
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> Self:
+        """Returns the pipeline, the process pool is started lazily."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Shuts down the process pool."""
+        self.close()
+
+    def close(self) -> None:
+        """Shuts down the process pool, pending parses are cancelled."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def discard_pool(self) -> None:
+        """Shuts down a broken process pool without waiting for it, the next email starts a new one."""
+        if self.shared_pipeline is not None:
+            self.shared_pipeline.discard_pool()
+            return
+        if self._executor is not None:
+            logger.warning(
+                "A process parsing emails died, parsing the pending emails inline!"
+            )
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def is_parallel(self) -> bool:
+        """Whether the emails are parsed in a process pool."""
+        return self.workers > 1 and not multiprocessing.current_process().daemon
+
+    def submit(self, email_data: bytes) -> Future[ParsedEmail] | None:
+        """Hands an email to the process pool for parsing.
+
+        Args:
+            email_data: The email bytes.
+
+        Returns:
+            The future of the parsed email data.
+            `None` if the emails are parsed inline or the process pool is broken.
+        """
+        if not self.is_parallel:
+            return None
+        if self.shared_pipeline is not None:
+            return self.shared_pipeline.submit(email_data)
+        if self._executor is None:
+            logger.debug("Starting %d processes to parse emails ...", self.workers)
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        try:
+            return self._executor.submit(
+                parse_email, email_data, self.ignore_maintypes, self.ignore_subtypes
+            )
+        except BrokenProcessPool:
+            self.discard_pool()
+            return None
+
+    def parse(
+        self, email_data: bytes, parsed_email_future: Future[ParsedEmail] | None
+    ) -> ParsedEmail:
+        """Gets the parsed data of an email from the process pool or parses it inline.
+
+        Args:
+            email_data: The email bytes.
+            parsed_email_future: The future returned by :func:`submit` for the email.
+
+        Returns:
+            The parsed email data.
+            Parsed inline if the email was not handed to the process pool or the pool broke.
+        """
+        if parsed_email_future is not None:
+            try:
+                return parsed_email_future.result()
+            except BrokenProcessPool:
+                self.discard_pool()
+        return parse_email(email_data, self.ignore_maintypes, self.ignore_subtypes)
+
+    def ingest(self, emails: Iterable[bytes | BinaryIO]) -> Iterator[Email | None]:
+        """Parses emails and saves them to the db in batches.
+
+        The next emails are only requested from :attr:`emails`
+        after all emails yielded so far have been saved.
+        So the state of a fetcher that is streaming the emails is safe to checkpoint
+        whenever a result is yielded.
+        If requesting the next email fails, the pending batch is saved before the error is reraised.
+
+        Args:
+            emails: The emails as :class:`bytes` or spooled to a binary file.
+
+        Yields:
+            The new :class:`core.models.Email` instances in the order of the emails,
+            once the batch of an email is saved.
+            `None` for emails that are skipped or failed to save.
+        """
+        emails_iterator = iter(emails)
+        while True:
+            try:
+                email_data = next(emails_iterator)
+            except StopIteration:
+                break
+            except Exception:
+                # the emails streamed before the error may be checkpointed already
+                yield from self.flush()
+                raise
+            yield from self.add(email_data)
+        yield from self.flush()
+
+    def add(self, email_data: bytes | BinaryIO) -> list[Email | None]:
+        """Adds an email to the pending batch and saves the batch once it is full.
+
+        For consumers that receive the emails one by one instead of as an iterable,
+        which must call :func:`flush` after the last email.
+        Emails spooled to files are saved right away, after the pending batch.
+
+        Args:
+            email_data: The email as :class:`bytes` or spooled to a binary file.
+
+        Returns:
+            The results of the emails that were saved by this call, like :func:`ingest`.
+        """
+        if not isinstance(email_data, bytes):
+            return [
+                *self.flush(),
+                Email.create_from_email_bytes(
+                    email_data, self.mailbox, self.correspondent_cache
+                ),
+            ]
+        self._batch.append(email_data)
+        if len(self._batch) < self.batch_size:
+            return []
+        return self.flush()
+
+    def flush(self) -> list[Email | None]:
+        """Saves the pending batch.
+
+        Returns:
+            The results of the emails in the pending batch, like :func:`ingest`.
+        """
+        pending_batch, self._batch = self._batch, []
+        return self.save_batch(pending_batch)
+
+    def save_batch(self, batch: list[bytes]) -> list[Email | None]:
+        """Parses a batch of emails and saves them in one transaction.
+
+        The emails that are skipped are found by :func:`core.models.Email.Email.is_skipped_batch`
+        before any of them is parsed.
+
+        Args:
+            batch: The email bytes.
+
+        Returns:
+            The new :class:`core.models.Email` instances in the order of the batch.
+            `None` for emails that are skipped or failed to save.
+        """
+        if not batch:
+            return []
+        skipped = Email.is_skipped_batch(batch, self.mailbox)
+        parsed_email_futures = [
+            None if is_skipped else self.submit(email_data)
+            for email_data, is_skipped in zip(batch, skipped, strict=True)
+        ]
+        results: list[Email | None] = []
+        with transaction.atomic():
+            for email_data, is_skipped, parsed_email_future in zip(
+                batch, skipped, parsed_email_futures, strict=True
+            ):
+                if is_skipped:
+                    results.append(None)
+                    continue
+                try:
+                    parsed_email = self.parse(email_data, parsed_email_future)
+                except Exception:
+                    logger.exception("Failed to parse email in %s!", self.mailbox)
+                    results.append(None)
+                    continue
+                results.append(
+                    Email.save_parsed_email(
+                        parsed_email,
+                        email_data,
+                        self.mailbox,
+                        self.correspondent_cache,
+                    )
+                )
+        logger.debug("Saved a batch of %d emails to %s.", len(batch), self.mailbox)
+        return results
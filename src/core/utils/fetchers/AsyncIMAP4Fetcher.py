@@ -0,0 +1,1037 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`AsyncIMAP4Fetcher` class and its :class:`AsyncIMAP4Client`."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import re
+from tempfile import TemporaryFile
+from typing import TYPE_CHECKING, BinaryIO, Self, override
+
+from django.utils.translation import gettext_lazy as _
+from imap_tools.imap_utf7 import utf7_encode
+
+from core.constants import (
+    EmailFetchingCriterionChoices,
+    EmailProtocolChoices,
+    HeaderFields,
+)
+from core.utils.fetchers.exceptions import (
+    BadServerResponseError,
+    FetcherError,
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+    wrap_fetcher_error,
+)
+from eonvelope.utils.workarounds import get_config
+
+from .BaseFetcher import BaseFetcher
+from .IMAP4Fetcher import IMAP4Fetcher
+from .IMAP4FetchingMixin import IMAP4FetchingMixin
+
+
+if TYPE_CHECKING:
+    import ssl
+    from collections.abc import (
+        AsyncGenerator,
+        Awaitable,
+        Generator,
+        Sequence,
+    )
+
+    from core.models.Account import Account
+    from core.models.Email import Email
+    from core.models.Mailbox import Mailbox
+
+    from .FetchingFilter import FetchingFilter
+
+
+type IMAP4Data = list[bytes | tuple[bytes, bytes]]
+
+
+class AsyncIMAP4Client:
+    """A minimal IMAP4rev1 client on top of :mod:`asyncio` streams.
+
+    Sends one tagged command at a time and collects the untagged responses to it
+    in the format of :mod:`imaplib`, so their data can be handled the same way.
+    String arguments are sent as they are, bytes arguments are sent as literals.
+    """
+
+    LITERAL_PATTERN = re.compile(rb"\{(\d+)\}$")
+    """Pattern of the announcement of a literal at the end of a response line."""
+
+    STREAM_LIMIT = 2**24
+    """The maximum length of a response line in bytes. Search results of large mailboxes can be long."""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        timeout: float | None,
+    ) -> None:
+        """Sets up the client on an open connection.
+
+        Args:
+            reader: The reading end of the connection.
+            writer: The writing end of the connection.
+            timeout: The maximum time to wait for the server in seconds, `None` to wait forever.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.capabilities: tuple[str, ...] = ()
+        self.tag_counter = itertools.count(1)
+
+    @classmethod
+    async def connect(
+        cls,
+        host: str,
+        port: int,
+        *,
+        ssl_context: ssl.SSLContext | None = None,
+        read_timeout: float | None = None,
+    ) -> Self:
+        """Opens a connection to an IMAP server and reads its greeting.
+
+        Args:
+            host: The hostname of the server.
+            port: The port of the server.
+            ssl_context: The context for an SSL connection. Defaults to `None`, for a plain connection.
+            read_timeout: The maximum time to wait for the server in seconds, `None` to wait forever.
+
+        Returns:
+            The client connected to the server.
+
+        Raises:
+            BadServerResponseError: If the server does not greet with OK or PREAUTH.
+            OSError: If the connection fails.
+            TimeoutError: If the server does not respond in time.
+        """
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port, ssl=ssl_context, limit=cls.STREAM_LIMIT
+            ),
+            read_timeout,
+        )
+        client = cls(reader, writer, read_timeout)
+        greeting = await client.read_line()
+        if not greeting.startswith((b"* OK", b"* PREAUTH")):
+            await client.close()
+            raise BadServerResponseError(greeting)
+        return client
+
+    async def read_line(self) -> bytes:
+        """Reads a line from the server.
+
+        Returns:
+            The line without its line break.
+
+        Raises:
+            ConnectionError: If the server closed the connection.
+            TimeoutError: If the server does not respond in time.
+        """
+        line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        if not line:
+            raise ConnectionError("The server closed the connection.")
+        return line.rstrip(b"\r\n")
+
+    async def read_response(self, line: bytes) -> bytes | tuple[bytes, bytes]:
+        """Reads the rest of an untagged response, including all of its literals.
+
+        Args:
+            line: The first line of the response, without the leading `* `.
+
+        Returns:
+            The line or, if it announces literals, the line with its first literal.
+            Further literals and the closing part of the response are appended like :mod:`imaplib` does.
+        """
+        if not (literal_match := self.LITERAL_PATTERN.search(line)):
+            return line
+        literal = await asyncio.wait_for(
+            self.reader.readexactly(int(literal_match[1])), self.timeout
+        )
+        return (line, literal)
+
+    async def command(self, name: str, *args: str | bytes) -> tuple[str, IMAP4Data]:
+        """Runs an IMAP command and collects its untagged responses.
+
+        Args:
+            name: The name of the command.
+            args: The arguments of the command.
+                :class:`bytes` are sent as literals, everything else as is.
+
+        Returns:
+            The status of the tagged response, e.g. `"OK"`,
+            and the data of the untagged responses in the format of :mod:`imaplib`,
+            followed by the text of the tagged response if the status is not OK.
+
+        Raises:
+            ConnectionError: If the server closed the connection.
+            TimeoutError: If the server does not respond in time.
+        """
+        tag = b"A%04d" % next(self.tag_counter)
+        data: IMAP4Data = []
+        line = tag + b" " + name.encode()
+        for arg in args:
+            if isinstance(arg, bytes):
+                self.writer.write(line + b" {%d}\r\n" % len(arg))
+                await self.writer.drain()
+                if (
+                    status := await self.collect(tag, data, is_literal_sent=True)
+                ) is not None:
+                    return status, data
+                line = arg
+            else:
+                line += b" " + arg.encode()
+        self.writer.write(line + b"\r\n")
+        await self.writer.drain()
+        status = await self.collect(tag, data)
+        return status or "BAD", data
+
+    async def collect(
+        self, tag: bytes, data: IMAP4Data, *, is_literal_sent: bool = False
+    ) -> str | None:
+        """Collects the responses to a command until it completes.
+
+        Args:
+            tag: The tag of the command.
+            data: The list the untagged response data
+                and the text of a failed tagged response is appended to.
+            is_literal_sent: Whether a literal is about to be sent,
+                so a continuation request completes the collection.
+
+        Returns:
+            The status of the tagged response or `None` if the server requests the literal.
+        """
+        while True:
+            line = await self.read_line()
+            if line.startswith(tag + b" "):
+                _, status, text = (*line.split(b" ", 2), b"")[:3]
+                if status.upper() != b"OK":
+                    # like imaplib, keep the reason of a failure, e.g. a throttling code
+                    data.append(text)
+                return status.decode().upper()
+            if line.startswith(b"+") and is_literal_sent:
+                return None
+            if not line.startswith(b"* "):
+                # the rest of a response with several literals
+                if data and line:
+                    data.append(await self.read_response(line))
+                continue
+            response = await self.read_response(line[2:])
+            if isinstance(response, bytes) and response.upper().startswith(
+                b"CAPABILITY "
+            ):
+                self.capabilities = tuple(response.decode().upper().split()[1:])
+            data.append(response)
+
+    async def close(self) -> None:
+        """Closes the connection without logging out."""
+        self.writer.close()
+        with contextlib.suppress(OSError, TimeoutError):
+            await asyncio.wait_for(self.writer.wait_closed(), self.timeout)
+
+
+class AsyncIMAP4Fetcher(BaseFetcher, IMAP4FetchingMixin):
+    """Maintains a connection to the IMAP server and fetches data using :mod:`asyncio`.
+
+    All interaction with the server happens in coroutines that never touch the database,
+    so many instances can share one event loop, e.g. in :class:`core.utils.AsyncFetchEngine.AsyncFetchEngine`.
+    For use in synchronous code, the instance runs its coroutines on a private event loop
+    and provides the same interface as :class:`core.utils.fetchers.IMAP4Fetcher`.
+    """
+
+    PROTOCOL = EmailProtocolChoices.IMAP.value
+    """Name of the used protocol, refers to :attr:`MailFetchingProtocols.IMAP`."""
+
+    AVAILABLE_FETCHING_CRITERIA = IMAP4Fetcher.AVAILABLE_FETCHING_CRITERIA
+    """Tuple of all criteria available for fetching, the same as for :class:`core.utils.fetchers.IMAP4Fetcher`."""
+
+    DEFAULT_PORT = 143
+    """The port used if the account has none set."""
+
+    UIDVALIDITY_PATTERN = re.compile(rb"\[UIDVALIDITY (\d+)\]")
+    """Pattern to extract the UIDVALIDITY from the response to selecting a mailbox."""
+
+    @override
+    def __init__(self, account: Account, *, connect: bool = True) -> None:
+        """Constructor, starts the IMAP connection and logs into the account.
+
+        Args:
+            account: The model of the account to be fetched from.
+            connect: Whether to connect right away.
+                Pass `False` to connect later with :func:`aconnect` in a running event loop.
+        """
+        super().__init__(account)
+        self.chunk_size = max(1, get_config("IMAP_FETCH_CHUNK_SIZE"))
+        self.max_datasize = get_config("FETCH_MAX_EMAIL_DATASIZE")
+        self.spool_datasize = get_config("FETCH_SPOOL_EMAIL_DATASIZE")
+        self._mail_client: AsyncIMAP4Client | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        if connect:
+            self.connect_to_host()
+
+    def run[T](self, awaitable: Awaitable[T]) -> T:
+        """Runs a coroutine of this instance on its private event loop.
+
+        Args:
+            awaitable: The coroutine to run.
+
+        Returns:
+            The result of the coroutine.
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(awaitable)
+
+    def make_ssl_context(self) -> ssl.SSLContext | None:
+        """Creates the SSL context for the connection.
+
+        Returns:
+            The SSL context or `None` for a plain connection.
+        """
+        return None
+
+    @staticmethod
+    def quote(value: str) -> str | bytes:
+        """Formats a string as an argument for :func:`AsyncIMAP4Client.command`.
+
+        Args:
+            value: The string to format.
+
+        Returns:
+            The quoted string or, if it can't be quoted, the string as literal.
+        """
+        if value.isascii() and "\r" not in value and "\n" not in value:
+            return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        return value.encode()
+
+    @classmethod
+    def quote_mailbox_name(cls, mailbox: Mailbox) -> str | bytes:
+        """Formats the name of a mailbox as an argument for :func:`AsyncIMAP4Client.command`.
+
+        Args:
+            mailbox: The mailbox to name.
+
+        Returns:
+            The modified UTF-7 encoded and quoted name of the mailbox.
+        """
+        return cls.quote(utf7_encode(mailbox.name).decode())
+
+    async def acommand(
+        self,
+        name: str,
+        *args: str | bytes,
+        exception_class: type[FetcherError] | None = MailboxError,
+    ) -> IMAP4Data:
+        """Safely runs an IMAP command.
+
+        Catches expected errors, checks for correct responses and raises a FetcherError in case.
+
+        Args:
+            name: The name of the command.
+            args: The arguments of the command.
+            exception_class: The exception class to raise if an error occurs or the status is not OK.
+                Defaults to :class:`core.utils.fetchers.exceptions.MailboxError`.
+                If `None` is passed, no exception is raised, all errors are logged nonetheless.
+
+        Returns:
+            The data of the untagged responses to the command. Empty if an error was suppressed.
+
+        Raises:
+            exception_class: If an error occurs or the status is not OK.
+            MailHostThrottledError: Instead of :attr:`exception_class` if the server reports throttling.
+        """
+        command_name = name.lower()
+        if self._mail_client is None:
+            error: Exception = ConnectionError("Not connected.")
+            self.logger.error("Error during %s: not connected!", command_name)
+            if exception_class is not None:
+                raise wrap_fetcher_error(exception_class, error, command_name)
+            return []
+        try:
+            status, data = await self._mail_client.command(name, *args)
+        except Exception as error:
+            self.logger.exception("Error during %s!", command_name)
+            if exception_class is not None:
+                raise wrap_fetcher_error(
+                    exception_class, error, command_name
+                ) from error
+            return []
+        if status != "OK":
+            self.logger.error(
+                "Bad server response for %s:\n%s", command_name, (status, data)
+            )
+            if exception_class is not None:
+                raise wrap_fetcher_error(
+                    exception_class,
+                    BadServerResponseError((status, data)),
+                    command_name,
+                )
+        return data
+
+    @override
+    def connect_to_host(self) -> None:
+        """Opens the connection to the IMAP server and logs into the account.
+
+        Raises:
+            MailAccountError: If an error occurs or a bad response is returned.
+        """
+        self.run(self.aconnect())
+
+    async def aconnect(self) -> None:
+        """Opens the connection to the IMAP server and logs into the account.
+
+        Raises:
+            MailAccountError: If an error occurs or a bad response is returned.
+        """
+        self.logger.debug("Connecting to %s ...", self.account)
+        try:
+            self._mail_client = await AsyncIMAP4Client.connect(
+                self.account.mail_host,
+                self.account.mail_host_port or self.DEFAULT_PORT,
+                ssl_context=self.make_ssl_context(),
+                read_timeout=self.account.timeout,
+            )
+        except Exception as error:
+            self.logger.exception("Error connecting to %s!", self.account)
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("connecting")
+            ) from error
+        self.logger.info("Successfully connected to %s.", self.account)
+
+        await self.acommand(
+            "LOGIN",
+            self.quote(self.account.mail_address),
+            self.quote(self.account.password),
+            exception_class=MailAccountError,
+        )
+        await self.acommand("CAPABILITY", exception_class=MailAccountError)
+
+    @override
+    def test(self, mailbox: Mailbox | None = None) -> None:
+        """Tests the connection to the mailserver and, if a mailbox is provided, whether it can be opened.
+
+        Args:
+            mailbox: The mailbox to be tested. Default is None.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+            MailAccountError: If the account test fails because an error occurs or a bad response is returned.
+            MailboxError: If the mailbox test fails because an error occurs or a bad response is returned testing the mailbox.
+        """
+        super().test(mailbox)
+        self.run(self.atest(mailbox))
+
+    async def atest(self, mailbox: Mailbox | None = None) -> None:
+        """Tests the connection to the mailserver and, if a mailbox is provided, whether it can be opened.
+
+        Args:
+            mailbox: The mailbox to be tested. Default is None.
+
+        Raises:
+            MailAccountError: If the account test fails because an error occurs or a bad response is returned.
+            MailboxError: If the mailbox test fails because an error occurs or a bad response is returned testing the mailbox.
+        """
+        self.logger.debug("Testing %s ...", self.account)
+        await self.acommand("NOOP", exception_class=MailAccountError)
+        self.logger.debug("Successfully tested %s.", self.account)
+
+        if mailbox is not None:
+            self.logger.debug("Testing %s ...", mailbox)
+            await self.acommand("EXAMINE", self.quote_mailbox_name(mailbox))
+            await self.acommand("CHECK")
+            await self.aunselect()
+            self.logger.debug("Successfully tested %s.", mailbox)
+
+    async def aunselect(self) -> None:
+        """Leaves the selected mailbox, errors are only logged."""
+        if (
+            self._mail_client is not None
+            and "UNSELECT" in self._mail_client.capabilities
+        ):
+            await self.acommand("UNSELECT", exception_class=None)
+        else:
+            await self.acommand("CLOSE", exception_class=None)
+
+    @override
+    def stream_emails(
+        self,
+        mailbox: Mailbox,
+        criterion: str = EmailFetchingCriterionChoices.ALL,
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Generator[bytes | BinaryIO]:
+        """Lazily fetches maildata from a mailbox based on a given criterion.
+
+        Runs :func:`astream_emails` on the private event loop.
+        Spooled mails are closed once the next mail is requested.
+
+        Args:
+            mailbox: Database model of the mailbox to fetch data from.
+            criterion: Formatted criterion to filter mails in the IMAP request.
+                Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
+
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes` or spooled to a file.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+                If :attr:`criterion` is not in :attr:`AVAILABLE_FETCHING_CRITERIA`.
+            MailboxError: If an error occurs or a bad response is returned during an action on the mailbox.
+        """
+        super().stream_emails(mailbox, criterion, fetching_filter)
+        emails_stream = self.astream_emails(
+            mailbox,
+            criterion,
+            fetching_filter=fetching_filter,
+            throw_out_spam=get_config("THROW_OUT_SPAM"),
+        )
+        try:
+            while True:
+                try:
+                    mail = self.run(anext(emails_stream))
+                except StopAsyncIteration:
+                    break
+                if isinstance(mail, bytes):
+                    yield mail
+                else:
+                    with mail:
+                        yield mail
+        finally:
+            self.run(emails_stream.aclose())
+
+    async def astream_emails(
+        self,
+        mailbox: Mailbox,
+        criterion: str = EmailFetchingCriterionChoices.ALL,
+        *,
+        fetching_filter: FetchingFilter | None = None,
+        throw_out_spam: bool = False,
+    ) -> AsyncGenerator[bytes | BinaryIO]:
+        """Lazily fetches maildata from a mailbox based on a given criterion.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.stream_emails`,
+        but doesn't access the database, so it can run on an event loop.
+        Messages that are already in the mailbox are downloaded as well,
+        the consumer must skip them, e.g. by saving them with an :class:`core.utils.IngestionPipeline.IngestionPipeline`.
+        Mails spooled to a temporary file are handed over to the consumer, which must close them.
+
+        Args:
+            mailbox: Database model of the mailbox to fetch data from.
+            criterion: Formatted criterion to filter mails in the IMAP request.
+                Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
+            throw_out_spam: Whether spam messages are skipped. Defaults to `False`.
+
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes` or spooled to a file.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+                If :attr:`criterion` is not in :attr:`AVAILABLE_FETCHING_CRITERIA`.
+            MailboxError: If an error occurs or a bad response is returned during an action on the mailbox.
+        """
+        super().stream_emails(mailbox, criterion, fetching_filter)
+
+        is_syncing = fetching_filter is None
+        status_snapshot = (
+            await self.atake_status_snapshot(mailbox, criterion, fetching_filter)
+            if is_syncing
+            else None
+        )
+        if status_snapshot is not None and status_snapshot == mailbox.sync_state:
+            self.logger.info(
+                "%s is unchanged since the last fetch, skipping it.", mailbox
+            )
+            return
+
+        self.logger.debug("Opening mailbox %s ...", mailbox)
+        select_data = await self.acommand("EXAMINE", self.quote_mailbox_name(mailbox))
+        self.logger.debug("Successfully opened mailbox.")
+        try:
+            search_criterion, client_filter = self.make_search_criterion(
+                mailbox,
+                criterion,
+                fetching_filter,
+                self.parse_uid_validity(select_data),
+            )
+            message_uids = self.drop_synced_uids(
+                mailbox, await self.asearch(mailbox, search_criterion), criterion
+            )
+            new_message_sizes = await self.afilter_new_messages(
+                mailbox,
+                self.skip_to_checkpoint(mailbox, message_uids, bytes.decode),
+                throw_out_spam=throw_out_spam,
+            )
+            is_watermark_moving = (
+                is_syncing and criterion == EmailFetchingCriterionChoices.INCREMENTAL
+            )
+            is_complete = True
+            async for uid, message_data in self.afetch_messages(
+                mailbox, new_message_sizes
+            ):
+                if message_data is None:
+                    # don't skip the failed message in the next incremental fetch
+                    is_watermark_moving = False
+                    is_complete = False
+                    continue
+                if client_filter is None or client_filter.matches_mail(message_data):
+                    yield message_data
+                elif not isinstance(message_data, bytes):
+                    message_data.close()
+                if is_syncing:
+                    self.record_fetched_message(
+                        mailbox, uid, is_watermark_moving=is_watermark_moving
+                    )
+            if is_syncing:
+                self.record_finished_fetch(
+                    mailbox,
+                    message_uids,
+                    status_snapshot,
+                    is_watermark_moving=is_watermark_moving,
+                    is_complete=is_complete,
+                )
+            self.logger.debug(
+                "Successfully fetched %s messages from %s.", search_criterion, mailbox
+            )
+        finally:
+            self.logger.debug("Leaving mailbox %s ...", mailbox)
+            await self.aunselect()
+            self.logger.debug("Successfully left mailbox.")
+
+    async def atake_status_snapshot(
+        self,
+        mailbox: Mailbox,
+        criterion: str,
+        fetching_filter: FetchingFilter | None,
+    ) -> str | None:
+        """Requests the status of a mailbox and combines it with the criterion and filter of a fetch.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.take_status_snapshot`.
+
+        Args:
+            mailbox: The mailbox to fetch.
+            criterion: The criterion of the fetch.
+            fetching_filter: The additional filter of the fetch.
+
+        Returns:
+            The snapshot of the mailbox, see :func:`make_status_snapshot`.
+            `None` if the status could not be requested.
+        """
+        status_data = await self.acommand(
+            "STATUS",
+            self.quote_mailbox_name(mailbox),
+            self.get_status_items(),
+            exception_class=None,
+        )
+        for line in reversed(status_data):
+            if isinstance(line, bytes) and line.upper().startswith(b"STATUS "):
+                return self.make_status_snapshot(criterion, fetching_filter, line)
+        return None
+
+    def parse_uid_validity(self, select_data: IMAP4Data) -> int | None:
+        """Extracts the UIDVALIDITY of a selected mailbox from the response to selecting it.
+
+        Args:
+            select_data: The data of the response to selecting the mailbox.
+
+        Returns:
+            The UIDVALIDITY of the selected mailbox, `None` if the server didn't send it.
+        """
+        uid_validity = None
+        for line in select_data:
+            if isinstance(line, bytes) and (
+                uid_validity_match := self.UIDVALIDITY_PATTERN.search(line)
+            ):
+                uid_validity = int(uid_validity_match[1])
+        return uid_validity
+
+    async def asearch(self, mailbox: Mailbox, search_criterion: str) -> list[bytes]:
+        """Searches the selected mailbox for messages.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            search_criterion: Formatted criterion to be used in the IMAP request.
+
+        Returns:
+            The UIDs of the matching messages, in ascending order.
+
+        Raises:
+            MailboxError: If an error occurs or a bad response is returned.
+        """
+        self.logger.debug("Searching %s messages in %s ...", search_criterion, mailbox)
+        search_data = await self.acommand("UID", "SEARCH", search_criterion)
+        message_uids = sorted(
+            (
+                uid
+                for line in search_data
+                if isinstance(line, bytes) and line.upper().startswith(b"SEARCH")
+                for uid in line.split()[1:]
+            ),
+            key=int,
+        )
+        self.logger.info(
+            "Found %s messages with uIDs %s in %s.",
+            search_criterion,
+            message_uids,
+            mailbox,
+        )
+        return message_uids
+
+    async def afetch_message_parts(
+        self, message_uids: Sequence[bytes], message_parts: str
+    ) -> dict[int, tuple[bytes, bytes]]:
+        """Fetches parts of a set of messages from the selected mailbox in one request.
+
+        Args:
+            message_uids: The UIDs of the messages to fetch.
+            message_parts: The IMAP message data items to fetch, must include one literal.
+
+        Returns:
+            The metadata and the literal of the fetched messages by their UID.
+            Messages that are missing in the response are not included.
+
+        Raises:
+            MailboxError: If an error occurs or a bad response is returned.
+        """
+        response_data = await self.acommand(
+            "UID", "FETCH", b",".join(message_uids).decode(), message_parts
+        )
+        return self.parse_fetch_response(response_data)
+
+    async def afilter_new_messages(
+        self,
+        mailbox: Mailbox,
+        message_uids: Sequence[bytes],
+        *,
+        throw_out_spam: bool,
+    ) -> dict[bytes, int]:
+        """Drops the messages that are thrown out as spam or too large.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.filter_new_messages`,
+        but keeps the messages that are already in the mailbox, as their lookup needs the database.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs of the candidate messages.
+            throw_out_spam: Whether spam messages are skipped.
+
+        Returns:
+            The sizes of the messages that need to be downloaded by their UIDs, 0 if unknown.
+        """
+        new_message_sizes: dict[bytes, int] = {}
+        for chunk_uids in itertools.batched(
+            message_uids, self.HEADER_CHUNK_SIZE, strict=False
+        ):
+            try:
+                chunk_headers = await self.afetch_message_parts(
+                    chunk_uids,
+                    f"(RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HeaderFields.MESSAGE_ID} {HeaderFields.X_SPAM})])",
+                )
+            except MailHostThrottledError:
+                raise
+            except FetcherError:
+                self.logger.warning(
+                    "Failed to fetch headers of messages %s from %s, downloading them all!",
+                    chunk_uids,
+                    mailbox,
+                    exc_info=True,
+                )
+                new_message_sizes.update(dict.fromkeys(chunk_uids, 0))
+                continue
+            skipped_uids = self.find_skippable_messages(
+                mailbox,
+                {uid: header_data for uid, (_, header_data) in chunk_headers.items()},
+                throw_out_spam=throw_out_spam,
+                # duplicates are skipped once per batch when they are saved
+                known_message_ids=frozenset(),
+            )
+            new_message_sizes.update(
+                (uid, self.parse_message_size(chunk_headers.get(int(uid))))
+                for uid in chunk_uids
+                if int(uid) not in skipped_uids
+            )
+        self.logger.info(
+            "Skipping %d spam messages in %s.",
+            len(message_uids) - len(new_message_sizes),
+            mailbox,
+        )
+        return self.drop_oversized_messages(
+            mailbox, new_message_sizes, self.max_datasize
+        )
+
+    async def afetch_messages(
+        self, mailbox: Mailbox, message_sizes: dict[bytes, int]
+    ) -> AsyncGenerator[tuple[bytes, bytes | BinaryIO | None]]:
+        """Lazily fetches messages from the selected mailbox in chunks.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.fetch_messages`.
+        The files of spooled messages must be closed by the consumer.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_sizes: The sizes of the messages to fetch by their UIDs, 0 if unknown.
+
+        Yields:
+            The UID of every message with its data as :class:`bytes` or spooled to a file
+            or `None` if the message could not be fetched.
+        """
+        for chunk_uids in itertools.batched(
+            message_sizes, self.chunk_size, strict=False
+        ):
+            spooled_uids = {
+                uid
+                for uid in chunk_uids
+                if 0 < self.spool_datasize < message_sizes[uid]
+            }
+            chunk_data = await self.afetch_messages_in_memory(
+                mailbox, [uid for uid in chunk_uids if uid not in spooled_uids]
+            )
+            for uid in chunk_uids:
+                if uid in spooled_uids:
+                    yield uid, await self.aspool_message(mailbox, uid)
+                else:
+                    message_parts = chunk_data.pop(int(uid), None)
+                    yield uid, message_parts[1] if message_parts else None
+
+    async def afetch_messages_in_memory(
+        self, mailbox: Mailbox, message_uids: Sequence[bytes]
+    ) -> dict[int, tuple[bytes, bytes]]:
+        """Fetches a set of messages from the selected mailbox, retrying the failed ones one by one.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.fetch_messages_in_memory`.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs of the messages to fetch.
+
+        Returns:
+            The metadata and data of the fetched messages by their UID.
+            Messages that could not be fetched are not included.
+        """
+        if not message_uids:
+            return {}
+        try:
+            chunk_data = await self.afetch_message_parts(message_uids, "(BODY.PEEK[])")
+        except MailHostThrottledError:
+            raise
+        except FetcherError:
+            self.logger.warning(
+                "Failed to fetch messages %s from %s, retrying them one by one!",
+                message_uids,
+                mailbox,
+                exc_info=True,
+            )
+            chunk_data = {}
+        for uid in message_uids:
+            if int(uid) not in chunk_data:
+                try:
+                    chunk_data.update(
+                        await self.afetch_message_parts((uid,), "(BODY.PEEK[])")
+                    )
+                except MailHostThrottledError:
+                    raise
+                except FetcherError:
+                    self.logger.warning(
+                        "Failed to fetch message %s from %s!",
+                        uid,
+                        mailbox,
+                        exc_info=True,
+                    )
+        return chunk_data
+
+    async def aspool_message(self, mailbox: Mailbox, uid: bytes) -> BinaryIO | None:
+        """Fetches a large message from the selected mailbox into a temporary file.
+
+        Works like :func:`core.utils.fetchers.IMAP4Fetcher.spool_message`.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            uid: The UID of the message to fetch.
+
+        Returns:
+            The file positioned at the start of the message, which must be closed by the caller.
+            `None` if the message could not be fetched.
+        """
+        # the file is handed over to the caller
+        spool_file = (
+            TemporaryFile()  # noqa: SIM115  # pylint: disable=consider-using-with
+        )
+        offset = 0
+        try:
+            while True:
+                message_parts = await self.afetch_message_parts(
+                    (uid,),
+                    f"(BODY.PEEK[]<{offset}.{self.SPOOL_PIECE_SIZE}>)",
+                )
+                piece = message_parts[int(uid)][1] if message_parts else b""
+                offset += spool_file.write(piece)
+                if len(piece) < self.SPOOL_PIECE_SIZE:
+                    break
+        except MailHostThrottledError:
+            raise
+        except FetcherError:
+            self.logger.warning(
+                "Failed to spool message %s from %s!", uid, mailbox, exc_info=True
+            )
+            offset = 0
+        if not offset:
+            spool_file.close()
+            return None
+        self.logger.debug("Spooled message %s with %d bytes to disk.", uid, offset)
+        spool_file.seek(0)
+        return spool_file
+
+    @override
+    def fetch_mailboxes(self) -> list[bytes]:
+        """Retrieves and returns the data of the mailboxes in the account.
+
+        Returns:
+            List of data of all mailboxes in the account in the format of :mod:`imaplib`.
+            Empty if none are found.
+
+        Raises:
+            MailAccountError: If an error occurs or a bad response is returned.
+        """
+        self.logger.debug("Fetching mailboxes in %s ...", self.account)
+        list_data = self.run(
+            self.acommand("LIST", '""', '"*"', exception_class=MailAccountError)
+        )
+        self.logger.debug("Successfully fetched mailboxes in %s.", self.account)
+        return [
+            line.removeprefix(b"LIST ")
+            for line in list_data
+            if isinstance(line, bytes) and line.upper().startswith(b"LIST ")
+        ]
+
+    @override
+    def restore(self, email: Email) -> None:
+        """Places an email in its mailbox.
+
+        Args:
+            email: The email to restore.
+
+        Raises:
+            ValueError: If the emails mailbox is not in this fetchers account.
+            FileNotFoundError: If the email has no eml file in storage.
+            MailboxError: If uploading the email to the mailserver fails or returns a bad response.
+        """
+        super().restore(email)
+        self.logger.debug("Restoring email %s to its mailbox ...", email)
+        with email.open_file() as email_file:
+            self.run(
+                self.acommand(
+                    "APPEND",
+                    self.quote_mailbox_name(email.mailbox),
+                    email_file.read(),
+                )
+            )
+        self.logger.debug("Successfully restored email.")
+
+    @override
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+        """
+        return self.run(self.aappend_batch(mailbox, email_data))
+
+    async def aappend_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox.
+
+        If the server supports MULTIAPPEND, all emails are uploaded in a single command.
+        Otherwise or if that fails, the emails are uploaded one by one,
+        so every email gets its own error.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+        """
+        mailbox_name = self.quote_mailbox_name(mailbox)
+        if len(email_data) > 1:
+            # servers may only announce MULTIAPPEND after the login
+            await self.acommand("CAPABILITY", exception_class=None)
+            if (
+                self._mail_client is not None
+                and "MULTIAPPEND" in self._mail_client.capabilities
+            ):
+                try:
+                    await self.acommand("APPEND", mailbox_name, *email_data)
+                except MailboxError:
+                    self.logger.warning(
+                        "MULTIAPPEND to %s failed, uploading the emails one by one.",
+                        mailbox,
+                    )
+                else:
+                    self.logger.debug(
+                        "Successfully uploaded %d emails with MULTIAPPEND.",
+                        len(email_data),
+                    )
+                    return [None] * len(email_data)
+        errors: list[MailboxError | None] = []
+        for data in email_data:
+            try:
+                await self.acommand("APPEND", mailbox_name, data)
+            except MailboxError as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+        return errors
+
+    @override
+    def close(self) -> None:
+        """Logs out of the account and closes the connection and the private event loop."""
+        self.run(self.aclose())
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+
+    async def aclose(self) -> None:
+        """Logs out of the account and closes the connection to the IMAP server if it is open.
+
+        Errors are only logged.
+        """
+        if self._mail_client is None:
+            return
+        self.logger.debug("Closing connection to %s ...", self.account)
+        await self.acommand("LOGOUT", exception_class=None)
+        await self._mail_client.close()
+        self._mail_client = None
+        self.logger.info("Successfully closed connection to %s.", self.account)
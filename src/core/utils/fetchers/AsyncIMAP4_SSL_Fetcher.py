@@ -0,0 +1,56 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`AsyncIMAP4_SSL_Fetcher` class."""
+
+from __future__ import annotations
+
+import ssl
+from typing import override
+
+from core import constants
+
+from .AsyncIMAP4Fetcher import AsyncIMAP4Fetcher
+
+
+class AsyncIMAP4_SSL_Fetcher(  # noqa: N801  # naming consistent with IMAP4_SSL class
+    AsyncIMAP4Fetcher
+):
+    """Subclass of :class:`core.utils.fetchers.AsyncIMAP4Fetcher`.
+
+    Does the same things, just using IMAP4_SSL protocol.
+    """
+
+    PROTOCOL = constants.EmailProtocolChoices.IMAP4_SSL
+    """Name of the used protocol, refers to :attr:`constants.MailFetchingProtocols.IMAP4_SSL`."""
+
+    DEFAULT_PORT = 993
+    """The port used if the account has none set."""
+
+    @override
+    def make_ssl_context(self) -> ssl.SSLContext:
+        """Overrides :func:`core.utils.fetchers.AsyncIMAP4Fetcher.make_ssl_context` to use SSL.
+
+        Important:
+            Using ssl_context is urgently required, see https://www.pentagrid.ch/en/blog/python-mail-libraries-certificate-verification/ .
+
+        Returns:
+            The default SSL context.
+        """
+        return ssl.create_default_context()
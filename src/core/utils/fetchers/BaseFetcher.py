@@ -20,20 +20,30 @@
 
 from __future__ import annotations
 
+import email
+import itertools
 import logging
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Self, override
+from email import policy
+from typing import TYPE_CHECKING, BinaryIO, Self, override
 
-from core.constants import EmailFetchingCriterionChoices
+from core.constants import EmailFetchingCriterionChoices, HeaderFields
+from core.utils.mail_parsing import get_header, is_x_spam
+from eonvelope.utils.workarounds import get_config
 
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Container, Iterable, Iterator, Sequence
     from types import TracebackType
 
     from core.models.Account import Account
     from core.models.Email import Email
     from core.models.Mailbox import Mailbox
 
+    from .exceptions import MailboxError
+    from .FetcherPool import FetcherPool
+    from .FetchingFilter import FetchingFilter
+
 
 class BaseFetcher(ABC):
     """Template class for the mailfetcher classes.
@@ -47,6 +57,14 @@ class BaseFetcher(ABC):
     AVAILABLE_FETCHING_CRITERIA: tuple[str, ...] = ("",)
     """Tuple of all criteria available for fetching. Should refer to :class:`MailFetchingCriteria`. Must be immutable!"""
 
+    IS_REUSABLE = True
+    """Whether a connection of this fetcher can be kept open in the :class:`core.utils.fetchers.FetcherPool.FetcherPool` and reused."""
+
+    HEADER_CHUNK_SIZE = 1000
+    """The number of messages whose headers are checked at once before downloading them.
+    Headers are small, so this can be much larger than `IMAP_FETCH_CHUNK_SIZE`.
+    """
+
     @abstractmethod
     def __init__(self, account: Account) -> None:
         """Constructor basis, sets up the instance logger.
@@ -55,6 +73,7 @@ class BaseFetcher(ABC):
             account: The model of the account to fetch from.
         """
         self.account = account
+        self.pool: FetcherPool | None = None
         self.logger = logging.getLogger(self.__module__)
         if account.protocol != self.PROTOCOL:
             self.logger.error(
@@ -85,21 +104,29 @@ class BaseFetcher(ABC):
             raise ValueError(f"{mailbox} is not in {self.account}!")
 
     @abstractmethod
-    def fetch_emails(  # type: ignore[return]  # this abstractmethod just provides basic arg-checking
+    def stream_emails(  # type: ignore[return]  # this abstractmethod just provides basic arg-checking
         self,
         mailbox: Mailbox,
         criterion: str = EmailFetchingCriterionChoices.ALL,
-    ) -> list[bytes]:
-        """Fetches emails based on a criterion from the server.
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Iterator[bytes | BinaryIO]:
+        """Lazily fetches emails based on a criterion from the server.
+
+        Implementations must be generators that yield every mail as soon as it has been received,
+        so that at most one mail is held in memory at once.
+        Mails larger than `FETCH_SPOOL_EMAIL_DATASIZE` may be yielded as a temporary binary file instead,
+        which is only valid until the next mail is requested.
+        The arg-checks of this method run once the first mail is requested.
 
         Args:
             mailbox: The model of the mailbox to fetch data from.
             criterion: Formatted criterion to filter mails by.
                 Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
 
-        Returns:
-            List of mails in the mailbox matching the criterion as :class:`bytes`.
-            Empty if no such messages are found.
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes` or spooled to a file.
 
         Raises:
             ValueError: If the :attr:`fetching_criterion` is not available for this fetcher.
@@ -117,6 +144,201 @@ class BaseFetcher(ABC):
             self.logger.error("%s is not a mailbox of %s!", mailbox, self.account)
             raise ValueError(f"{mailbox} is not in {self.account}!")
 
+    @staticmethod
+    def find_filtered_out_messages(
+        message_headers: dict[int, bytes],
+        fetching_filter: FetchingFilter,
+        message_sizes: dict[int, int] | None = None,
+    ) -> set[int]:
+        """Finds the messages that don't match a fetching filter.
+
+        Args:
+            message_headers: The header block of the messages by their id on the server.
+            fetching_filter: The filter that the messages must match.
+            message_sizes: The sizes of the messages in bytes by their id on the server,
+                for the size conditions of :attr:`fetching_filter`. Defaults to `None`.
+
+        Returns:
+            The ids of the messages that are filtered out.
+        """
+        return {
+            server_id
+            for server_id, header_data in message_headers.items()
+            if not fetching_filter.matches(
+                email.message_from_bytes(header_data, policy=policy.default),
+                (message_sizes or {}).get(server_id, 0),
+            )
+        }
+
+    @classmethod
+    def find_skippable_messages(
+        cls,
+        mailbox: Mailbox,
+        message_headers: dict[int, bytes],
+        *,
+        throw_out_spam: bool,
+        known_message_ids: Container[str] | None = None,
+        fetching_filter: FetchingFilter | None = None,
+        message_sizes: dict[int, int] | None = None,
+    ) -> set[int]:
+        """Finds the messages that are already in the mailbox, thrown out as spam or filtered out.
+
+        Args:
+            mailbox: The mailbox the messages are in.
+            message_headers: The header block of the messages by their id on the server.
+                Only the Message-ID and X-Spam-Flag headers are used,
+                plus the headers in the conditions of :attr:`fetching_filter` if given.
+            throw_out_spam: Whether spam messages are skipped.
+            known_message_ids: The Message-IDs of the emails in the mailbox.
+                If not given, they are looked up in the database.
+            fetching_filter: The filter that the messages must match. Defaults to `None`.
+            message_sizes: The sizes of the messages in bytes by their id on the server,
+                for the size conditions of :attr:`fetching_filter`. Defaults to `None`.
+
+        Returns:
+            The ids of the messages that don't need to be downloaded.
+        """
+        skipped_ids = (
+            cls.find_filtered_out_messages(
+                message_headers, fetching_filter, message_sizes
+            )
+            if fetching_filter is not None
+            else set()
+        )
+        message_ids = {}
+        for server_id, header_data in message_headers.items():
+            if server_id in skipped_ids:
+                continue
+            headers = email.message_from_bytes(header_data, policy=policy.default)
+            if throw_out_spam and is_x_spam(get_header(headers, HeaderFields.X_SPAM)):
+                skipped_ids.add(server_id)
+            elif message_id := get_header(headers, HeaderFields.MESSAGE_ID):
+                message_ids[server_id] = message_id
+        if known_message_ids is None:
+            known_message_ids = set(
+                mailbox.emails.filter(message_id__in=message_ids.values()).values_list(
+                    "message_id", flat=True
+                )
+            )
+        skipped_ids.update(
+            server_id
+            for server_id, message_id in message_ids.items()
+            if message_id in known_message_ids
+        )
+        return skipped_ids
+
+    def skip_to_checkpoint[T](
+        self,
+        mailbox: Mailbox,
+        server_ids: Sequence[T],
+        key: Callable[[T], str] = str,
+    ) -> Sequence[T]:
+        """Drops the messages that were already fetched in an interrupted run.
+
+        If the run of the mailbox is not complete and :attr:`core.models.Mailbox.fetch_checkpoint`
+        is among the candidates, it and all messages before it were committed by a previous attempt of the run.
+        Otherwise the run starts from the beginning.
+
+        Args:
+            mailbox: The mailbox the messages are in.
+            server_ids: The ids of the candidate messages on the server, in fetching order.
+            key: Maps a server id to its string form as stored in the checkpoint.
+                Defaults to :func:`str`.
+
+        Returns:
+            The ids of the messages that remain to be fetched in this run.
+        """
+        if mailbox.is_fetch_complete or not mailbox.fetch_checkpoint:
+            return server_ids
+        for index, server_id in enumerate(server_ids):
+            if key(server_id) == mailbox.fetch_checkpoint:
+                self.logger.info(
+                    "Resuming fetching of %s after %s already fetched messages.",
+                    mailbox,
+                    index + 1,
+                )
+                return server_ids[index + 1 :]
+        return server_ids
+
+    def drop_oversized_messages[T](
+        self, mailbox: Mailbox, message_sizes: dict[T, int], max_datasize: int
+    ) -> dict[T, int]:
+        """Drops the messages that are too large to be archived.
+
+        Args:
+            mailbox: The mailbox the messages are in.
+            message_sizes: The sizes of the candidate messages in bytes by their id on the server.
+                A size of 0 means that it is unknown.
+            max_datasize: The maximum size of a message in bytes, usually `FETCH_MAX_EMAIL_DATASIZE`.
+                0 disables the limit.
+
+        Returns:
+            The sizes of the messages that remain to be fetched, in the original order.
+        """
+        if max_datasize <= 0:
+            return message_sizes
+        kept_message_sizes = {}
+        for server_id, size in message_sizes.items():
+            if size > max_datasize:
+                self.logger.warning(
+                    "Skipping message %s with %d bytes in %s, it is larger than the maximum of %d bytes!",
+                    server_id,
+                    size,
+                    mailbox,
+                    max_datasize,
+                )
+            else:
+                kept_message_sizes[server_id] = size
+        return kept_message_sizes
+
+    def fetch_emails(
+        self,
+        mailbox: Mailbox,
+        criterion: str = EmailFetchingCriterionChoices.ALL,
+        fetching_filter: FetchingFilter | None = None,
+    ) -> list[bytes]:
+        """Fetches emails based on a criterion from the server.
+
+        Note:
+            This collects all mails from :func:`stream_emails` in memory,
+            including the ones that would be spooled to disk.
+            Prefer :func:`stream_emails` for large mailboxes.
+
+        Args:
+            mailbox: The model of the mailbox to fetch data from.
+            criterion: Formatted criterion to filter mails by.
+                Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
+
+        Returns:
+            List of mails in the mailbox matching the criterion as :class:`bytes`.
+            Empty if no such messages are found.
+
+        Raises:
+            ValueError: If the :attr:`fetching_criterion` is not available for this fetcher.
+        """
+        return [
+            mail if isinstance(mail, bytes) else mail.read()
+            for mail in self.stream_emails(mailbox, criterion, fetching_filter)
+        ]
+
+    def find_unchanged_mailboxes(
+        self, mailboxes: Sequence[Mailbox], criterion: str
+    ) -> list[Mailbox]:
+        """Finds the mailboxes that can't have new emails since their last complete fetch with the criterion.
+
+        Protocols that can't tell cheaply consider all mailboxes changed.
+
+        Args:
+            mailboxes: The mailboxes to check, all in the account of this fetcher.
+            criterion: The criterion that the mailboxes are about to be fetched with.
+
+        Returns:
+            The mailboxes that don't need to be fetched.
+        """
+        return []
+
     @abstractmethod
     def fetch_mailboxes(self) -> list[bytes] | list[str]:
         """Fetches all mailbox names from the server.
@@ -129,6 +351,17 @@ class BaseFetcher(ABC):
     def restore(self, email: Email) -> None:
         """Restores an email to a mailbox.
 
+        Args:
+            email: The email to restore.
+
+        Raises:
+            ValueError: If the emails mailbox is not in this fetchers account.
+        """
+        self.check_restorable(email)
+
+    def check_restorable(self, email: Email) -> None:
+        """Checks whether an email can be restored with this fetcher.
+
         Args:
             email: The email to restore.
 
@@ -139,6 +372,70 @@ class BaseFetcher(ABC):
             self.logger.error("Mailbox of %s is not in %s!", email, self.account)
             raise ValueError(f"Mailbox of {email} is not in {self.account}!")
 
+    def restore_batch(
+        self, emails: Iterable[Email]
+    ) -> Iterator[tuple[Email, Exception | None]]:
+        """Restores many emails to their mailboxes using this connection.
+
+        Consecutive emails in the same mailbox are uploaded together
+        in batches of `RESTORE_BATCH_SIZE` via :func:`append_batch`,
+        so the emails should be ordered by mailbox.
+        A failing email does not stop the restoring of the others.
+
+        Args:
+            emails: The emails to restore.
+
+        Yields:
+            Every email with the error that prevented its restoring or `None` if it was restored.
+
+        Raises:
+            NotImplementedError: If the protocol can't restore emails.
+            FetcherError: If the connection to the account fails.
+        """
+        batch_size = max(1, get_config("RESTORE_BATCH_SIZE"))
+        for _mailbox_id, mailbox_emails in itertools.groupby(
+            emails, key=lambda restore_email: restore_email.mailbox_id
+        ):
+            for batch in itertools.batched(mailbox_emails, batch_size, strict=False):
+                batch_emails = []
+                batch_data = []
+                for restore_email in batch:
+                    try:
+                        self.check_restorable(restore_email)
+                        with restore_email.open_file() as email_file:
+                            batch_data.append(email_file.read())
+                    except (ValueError, FileNotFoundError) as error:
+                        yield restore_email, error
+                    else:
+                        batch_emails.append(restore_email)
+                if not batch_emails:
+                    continue
+                self.logger.debug(
+                    "Restoring %d emails to %s ...",
+                    len(batch_emails),
+                    batch_emails[0].mailbox,
+                )
+                errors = self.append_batch(batch_emails[0].mailbox, batch_data)
+                yield from zip(batch_emails, errors, strict=True)
+
+    @abstractmethod
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+
+        Raises:
+            NotImplementedError: If the protocol can't upload emails.
+            FetcherError: If the connection to the account fails.
+        """
+
     @abstractmethod
     def close(self) -> None:
         """Closes the connection to the mail server."""
@@ -168,6 +465,8 @@ class BaseFetcher(ABC):
     ) -> None:
         """Framework method for use of class in 'with' statement, closes an instance.
 
+        Pooled instances are released to their pool instead, unless an error occurred.
+
         Args:
             exc_type: The exception type that raised close.
             exc_value: The exception value that raised close.
@@ -177,4 +476,7 @@ class BaseFetcher(ABC):
             self.logger.error(
                 "An error %s occurred, exiting Fetcher!", exc_type, exc_info=exc_value
             )
-        self.close()
+        if self.pool is not None:
+            self.pool.release(self, discard=bool(exc_value or exc_type))
+        else:
+            self.close()
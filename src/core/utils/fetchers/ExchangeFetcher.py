@@ -20,8 +20,11 @@
 
 from __future__ import annotations
 
+import collections
 import datetime
+import itertools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, override
 
 import exchangelib
@@ -30,24 +33,34 @@ from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
-from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    wrap_fetcher_error,
+)
+from eonvelope.utils.workarounds import get_config
 
 from .BaseFetcher import BaseFetcher
 
 
 if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Sequence
+
     from exchangelib.queryset import QuerySet
 
     from core.models.Account import Account
     from core.models.Email import Email
     from core.models.Mailbox import Mailbox
 
+    from .FetchingFilter import FetchingFilter
+
 
 class ExchangeFetcher(BaseFetcher):
     """Maintains a connection to the Exchange server and fetches data using :mod:`imaplib`.
 
     Opens a connection to the Exchange server on construction and is preferably used in a 'with' environment.
     Allows fetching of mails and mailboxes from an account on an Exchange host.
+    The contents of the mails are downloaded by several worker threads sharing the session pool of the connection.
     """
 
     PROTOCOL = EmailProtocolChoices.EXCHANGE.value
@@ -55,6 +68,7 @@ class ExchangeFetcher(BaseFetcher):
 
     AVAILABLE_FETCHING_CRITERIA = (
         EmailFetchingCriterionChoices.ALL.value,
+        EmailFetchingCriterionChoices.INCREMENTAL.value,
         EmailFetchingCriterionChoices.SEEN.value,
         EmailFetchingCriterionChoices.UNSEEN.value,
         EmailFetchingCriterionChoices.DRAFT.value,
@@ -68,6 +82,9 @@ class ExchangeFetcher(BaseFetcher):
     Must be immutable!
     """
 
+    LISTING_PAGE_SIZE = 1000
+    """Number of items listed per request. Only a few small fields are listed, so this is kept high."""
+
     @staticmethod
     def make_fetching_query(criterion: str, base_query: QuerySet) -> QuerySet:
         """Returns the queryset for the Exchange request.
@@ -125,11 +142,14 @@ class ExchangeFetcher(BaseFetcher):
             self.account.mail_address, self.account.password
         )
         retry_policy = exchangelib.FaultTolerance(max_wait=self.account.timeout)
+        # every download worker needs its own session
+        max_connections = max(1, get_config("EXCHANGE_FETCH_WORKERS"))
         config = (
             exchangelib.Configuration(
                 service_endpoint=self.account.mail_host,
                 credentials=credentials,
                 retry_policy=retry_policy,
+                max_connections=max_connections,
             )
             if self.account.mail_host.startswith("http://")
             or self.account.mail_host.startswith("https://")
@@ -141,6 +161,7 @@ class ExchangeFetcher(BaseFetcher):
                 ),
                 credentials=credentials,
                 retry_policy=retry_policy,
+                max_connections=max_connections,
             )
         )
         exchange_account = exchangelib.Account(
@@ -159,7 +180,7 @@ class ExchangeFetcher(BaseFetcher):
                 "Error connecting to %s!",
                 self.account,
             )
-            raise MailAccountError(error, "connecting") from error
+            raise wrap_fetcher_error(MailAccountError, error, "connecting") from error
         self.logger.info("Successfully set up connection to %s.", self.account)
 
     @override
@@ -181,7 +202,7 @@ class ExchangeFetcher(BaseFetcher):
             self._mail_client.refresh()
         except exchangelib.errors.EWSError as error:
             self.logger.exception("Error during refresh of message_root!")
-            raise MailAccountError(error, _("refresh")) from error
+            raise wrap_fetcher_error(MailAccountError, error, _("refresh")) from error
         self.logger.debug("Successfully tested %s.", self.account)
 
         if mailbox is not None:
@@ -193,56 +214,267 @@ class ExchangeFetcher(BaseFetcher):
                     "Error during refresh of %s!",
                     mailbox.name,
                 )
-                raise MailboxError(error, _("refresh")) from error
+                raise wrap_fetcher_error(MailboxError, error, _("refresh")) from error
             self.logger.debug("Successfully tested %s.", mailbox)
 
     @override
-    def fetch_emails(
+    def stream_emails(
         self,
         mailbox: Mailbox,
         criterion: str = EmailFetchingCriterionChoices.ALL,
-    ) -> list[bytes]:
-        """Fetches and returns maildata from a mailbox based on a given criterion.
-
-        Todo:
-            Rewrite this into a generator.
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Generator[bytes]:
+        """Lazily fetches maildata from a mailbox based on a given criterion.
+
+        Only the ids of the matching items are listed first,
+        items that are already in the mailbox or larger than `FETCH_MAX_EMAIL_DATASIZE` are skipped.
+        The contents of the others are then requested in chunks of `EXCHANGE_FETCH_CHUNK_SIZE` items
+        by `EXCHANGE_FETCH_WORKERS` threads in parallel, see :func:`fetch_item_chunks`.
+        For the incremental criterion, only the items created since :attr:`core.models.Mailbox.sync_state`
+        are fetched and the new sync state is set on :attr:`mailbox`
+        if all of them could be fetched, saving it is left to the caller.
+        :attr:`core.models.Mailbox.fetch_checkpoint` is moved to the id of every consumed item,
+        items up to the checkpoint of an interrupted run are not fetched again.
+        The :attr:`fetching_filter` is added to the query on the server,
+        the conditions that can't be queried and the filter of incremental fetches
+        are checked on the fetched mails.
+        A fetch with a :attr:`fetching_filter` leaves the sync state and the checkpoint untouched,
+        as the other daemons of the mailbox still need the items it filters out.
 
         Args:
             mailbox: Database model of the mailbox to fetch data from.
             criterion: Formatted criterion to filter mails in the Exchange server.
                 Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
 
-        Returns:
-            List of mails in the mailbox matching the criterion as :class:`bytes`.
-            Empty if no such messages are found.
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes`.
 
         Raises:
             ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
                 If :attr:`criterion` is not in :attr:`ExchangeFetcher.AVAILABLE_FETCHING_CRITERIA`.
             MailboxError: If an error occurs or a bad response is returned during an action on the mailbox..
         """
-        super().fetch_emails(mailbox, criterion)
+        super().stream_emails(mailbox, criterion, fetching_filter)
         self.logger.debug(
             "Searching and fetching %s messages in %s...",
             criterion,
             mailbox,
         )
+        is_incremental = criterion == EmailFetchingCriterionChoices.INCREMENTAL
+        filter_query, is_filter_exact = (
+            fetching_filter.make_exchange_query() if fetching_filter else (None, True)
+        )
+        # the changes of a sync can't be queried
+        client_filter = (
+            None if is_filter_exact and not is_incremental else fetching_filter
+        )
+        is_syncing = fetching_filter is None
+        mail_count = 0
+        is_complete = True
         try:
             mailbox_folder = self.open_mailbox(mailbox)
-            mail_query = self.make_fetching_query(
-                criterion, mailbox_folder.all().order_by("datetime_received")
+            item_data = (
+                self.sync_item_ids(mailbox_folder, mailbox)
+                if is_incremental
+                else self.query_item_ids(mailbox_folder, criterion, filter_query)
             )
-            mail_data_list = [mail.mime_content for mail in mail_query]
+            item_ids = self.skip_to_checkpoint(
+                mailbox,
+                self.list_new_items(mailbox, item_data),
+                lambda item_id: item_id[0],
+            )
+            for item in self.fetch_item_chunks(mailbox_folder, item_ids):
+                if isinstance(item, Exception):
+                    self.logger.warning(
+                        "Failed to fetch a message from %s: %s",
+                        mailbox,
+                        item,
+                    )
+                    is_complete = False
+                    continue
+                if client_filter is None or client_filter.matches_mail(
+                    item.mime_content
+                ):
+                    mail_count += 1
+                    yield item.mime_content
+                if is_syncing:
+                    mailbox.fetch_checkpoint = item.id
         except exchangelib.errors.EWSError as error:
             self.logger.exception("Error during fetching of mail contents!")
-            raise MailboxError(error, _("fetching of mail contents")) from error
+            raise wrap_fetcher_error(
+                MailboxError, error, _("fetching of mail contents")
+            ) from error
+        if is_syncing and is_incremental and is_complete:
+            mailbox.sync_state = mailbox_folder.item_sync_state or ""
         self.logger.info(
             "Successfully searched and fetched %s %s messages in %s.",
-            len(mail_data_list),
+            mail_count,
             criterion,
             mailbox,
         )
-        return mail_data_list
+
+    def query_item_ids(
+        self,
+        mailbox_folder: exchangelib.Folder,
+        criterion: str,
+        filter_query: exchangelib.Q | None,
+    ) -> Iterable[tuple[str, str, int | None, str | None]]:
+        """Lists the items in a folder matching a criterion, oldest first.
+
+        Only the ids and the fields needed to skip items are requested,
+        in pages of :attr:`LISTING_PAGE_SIZE` items.
+
+        Args:
+            mailbox_folder: The opened folder of the mailbox.
+            criterion: The criterion of the fetch.
+            filter_query: The query of the additional filter of the fetch, `None` if there is none.
+
+        Returns:
+            The id, changekey, size and Message-ID of every matching item.
+        """
+        item_query = self.make_fetching_query(
+            criterion, mailbox_folder.all().order_by("datetime_received")
+        )
+        if filter_query is not None:
+            item_query = item_query.filter(filter_query)
+        item_query.page_size = self.LISTING_PAGE_SIZE
+        return item_query.values_list(  # type: ignore[no-any-return]  # exchangelib is untyped
+            "id", "changekey", "size", "message_id"
+        )
+
+    def list_new_items(
+        self,
+        mailbox: Mailbox,
+        item_data: Iterable[tuple[str, str, int | None, str | None]],
+    ) -> list[tuple[str, str]]:
+        """Drops the listed items that are already in the mailbox or too large.
+
+        Args:
+            mailbox: The mailbox the items are in.
+            item_data: The id, changekey, size and Message-ID of the listed items.
+
+        Returns:
+            The ids and changekeys of the items to download, in listing order.
+        """
+        item_sizes = {}
+        item_headers = {}
+        for item_id, changekey, size, message_id in item_data:
+            item_sizes[item_id, changekey] = size or 0
+            if message_id:
+                item_headers[item_id, changekey] = (
+                    f"Message-ID: {message_id}\r\n\r\n".encode()
+                )
+        skipped_ids = set()
+        for header_batch in itertools.batched(
+            item_headers.items(), self.LISTING_PAGE_SIZE, strict=False
+        ):
+            skipped_ids.update(
+                self.find_skippable_messages(
+                    mailbox, dict(header_batch), throw_out_spam=False
+                )
+            )
+        return list(
+            self.drop_oversized_messages(
+                mailbox,
+                {
+                    item_id: size
+                    for item_id, size in item_sizes.items()
+                    if item_id not in skipped_ids
+                },
+                get_config("FETCH_MAX_EMAIL_DATASIZE"),
+            )
+        )
+
+    def fetch_item_chunks(
+        self,
+        mailbox_folder: exchangelib.Folder,
+        item_ids: Iterable[tuple[str, str]],
+    ) -> Generator[exchangelib.Message | Exception]:
+        """Lazily downloads the contents of items in parallel chunks, keeping their order.
+
+        The items are requested in chunks of `EXCHANGE_FETCH_CHUNK_SIZE` via GetItem,
+        up to `EXCHANGE_FETCH_WORKERS` chunks are in flight at the same time.
+        Chunks are only requested once the earlier ones are consumed,
+        so no more than that many chunks are held in memory.
+
+        Args:
+            mailbox_folder: The opened folder of the mailbox.
+            item_ids: The ids and changekeys of the items to download.
+
+        Yields:
+            The items with their mime_content or the error that prevented their download.
+
+        Raises:
+            exchangelib.errors.EWSError: If a chunk can't be requested.
+        """
+        chunks = itertools.batched(
+            item_ids, max(1, get_config("EXCHANGE_FETCH_CHUNK_SIZE")), strict=False
+        )
+        worker_count = max(1, get_config("EXCHANGE_FETCH_WORKERS"))
+
+        def fetch_chunk(
+            chunk_ids: tuple[tuple[str, str], ...],
+        ) -> list[exchangelib.Message | Exception]:
+            return list(
+                mailbox_folder.account.fetch(
+                    ids=chunk_ids, folder=mailbox_folder, only_fields=["mime_content"]
+                )
+            )
+
+        executor = ThreadPoolExecutor(
+            max_workers=worker_count,
+            thread_name_prefix=f"exchange-fetch-{self.account.pk}",
+        )
+        try:
+            pending_chunks = collections.deque(
+                executor.submit(fetch_chunk, chunk_ids)
+                for chunk_ids in itertools.islice(chunks, worker_count)
+            )
+            while pending_chunks:
+                items = pending_chunks.popleft().result()
+                if (next_chunk_ids := next(chunks, None)) is not None:
+                    pending_chunks.append(executor.submit(fetch_chunk, next_chunk_ids))
+                yield from items
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def sync_item_ids(
+        self, mailbox_folder: exchangelib.Folder, mailbox: Mailbox
+    ) -> Generator[tuple[str, str, int | None, str | None]]:
+        """Lazily lists the items created in a mailbox folder since the last incremental fetch.
+
+        Uses the SyncFolderItems operation starting from :attr:`core.models.Mailbox.sync_state`.
+        If the server rejects that state, all items in the folder are listed for a full resync.
+        Once exhausted, the new sync state is available at `mailbox_folder.item_sync_state`.
+
+        Args:
+            mailbox_folder: The opened folder of the mailbox.
+            mailbox: The mailbox to sync.
+
+        Yields:
+            The id, changekey, size and Message-ID of every created item.
+        """
+        try:
+            changes = mailbox_folder.sync_items(
+                sync_state=mailbox.sync_state or None,
+                only_fields=["datetime_received", "size", "message_id"],
+            )
+            change_type, item = next(changes, (None, None))
+        except exchangelib.errors.ErrorInvalidSyncStateData:
+            self.logger.info(
+                "The sync state of %s is invalid, fetching all messages.", mailbox
+            )
+            mailbox_folder.item_sync_state = None
+            changes = mailbox_folder.sync_items(
+                only_fields=["datetime_received", "size", "message_id"]
+            )
+            change_type, item = next(changes, (None, None))
+        while change_type is not None:
+            if change_type == "create":
+                yield item.id, item.changekey, item.size, item.message_id
+            change_type, item = next(changes, (None, None))
 
     @override
     def fetch_mailboxes(self) -> list[str]:
@@ -272,7 +504,9 @@ class ExchangeFetcher(BaseFetcher):
             ]
         except exchangelib.errors.EWSError as error:
             self.logger.exception("Error during scan of message_root!")
-            raise MailAccountError(error, _("scan for mailboxes")) from error
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("scan for mailboxes")
+            ) from error
         self.logger.debug("Successfully fetched mailboxes in %s.", self.account)
         return mailbox_names
 
@@ -298,9 +532,54 @@ class ExchangeFetcher(BaseFetcher):
                 ).save()
             except exchangelib.errors.EWSError as error:
                 self.logger.exception("Error during restoring of email!")
-                raise MailboxError(error, _("restoring of email")) from error
+                raise wrap_fetcher_error(
+                    MailboxError, error, _("restoring of email")
+                ) from error
         self.logger.debug("Successfully restored email.")
 
+    @override
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox in a single CreateItem request.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+
+        Raises:
+            MailboxError: If the mailbox can't be opened.
+        """
+        mailbox_folder = self.open_mailbox(mailbox)
+        try:
+            results = mailbox_folder.account.bulk_create(
+                mailbox_folder,
+                [
+                    exchangelib.Message(folder=mailbox_folder, mime_content=data)
+                    for data in email_data
+                ],
+                chunk_size=len(email_data),
+            )
+        except exchangelib.errors.EWSError as error:
+            self.logger.exception("Error during restoring of emails!")
+            batch_error = wrap_fetcher_error(
+                MailboxError, error, _("restoring of email")
+            )
+            if not isinstance(batch_error, MailboxError):
+                raise batch_error from error
+            return [batch_error] * len(email_data)
+        errors: list[MailboxError | None] = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error("Error during restoring of email: %s", result)
+                errors.append(MailboxError(result, _("restoring of email")))
+            else:
+                errors.append(None)
+        return errors
+
     @override
     def close(self) -> None:
         """No cleanup of :class:`exchangelib.Account` required."""
@@ -0,0 +1,279 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`FetcherPool` class and its worker-local instance :data:`fetcher_pool`."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from django.utils.translation import gettext_lazy as _
+
+from eonvelope.utils.workarounds import get_config
+
+from .exceptions import FetcherError, MailAccountError
+
+
+if TYPE_CHECKING:
+    from core.models.Account import Account
+
+    from .BaseFetcher import BaseFetcher
+
+
+logger = logging.getLogger(__name__)
+"""The logger instance for this module."""
+
+
+class FetcherPool:
+    """Pool of connected and logged in fetchers, shared by all threads of a worker process.
+
+    Fetchers are leased per account via :func:`acquire` and handed back by leaving their `with` block.
+    Idle fetchers are checked for health before being reused and closed after `FETCHER_POOL_IDLE_TIMEOUT` seconds.
+    At most `FETCHER_POOL_MAX_CONNECTIONS` fetchers are open for one account at the same time,
+    further requests wait for one of them to be released.
+    """
+
+    ACQUIRE_TIMEOUT = 600
+    """The maximum number of seconds to wait for a free connection to an account."""
+
+    def __init__(self) -> None:
+        """Sets up the empty pool."""
+        self._condition = threading.Condition()
+        self._idle_fetchers: defaultdict[tuple, list[tuple[BaseFetcher, float]]] = (
+            defaultdict(list)
+        )
+        self._open_counts: defaultdict[int, int] = defaultdict(int)
+
+    @staticmethod
+    def get_key(account: Account) -> tuple:
+        """Builds the key of an account in the pool.
+
+        Contains all connection data, so fetchers are never shared across changes to it.
+
+        Args:
+            account: The account to get the key for.
+
+        Returns:
+            The pool key of the account.
+        """
+        return (
+            account.pk,
+            account.protocol,
+            account.mail_host,
+            account.mail_host_port,
+            account.mail_address,
+            account.password,
+            account.timeout,
+            account.use_compression,
+        )
+
+    def acquire(self, account: Account, *, pooled: bool = True) -> BaseFetcher:
+        """Leases a healthy fetcher for an account.
+
+        Reuses an idle fetcher if possible, otherwise opens a new one.
+        Fetchers for accounts that are not saved yet and
+        fetchers that cannot be reused are not pooled.
+
+        Args:
+            account: The account to get a fetcher for.
+            pooled: Whether the fetcher is taken from the pool.
+                Defaults to `True`. Otherwise a new fetcher is opened
+                that does not count towards the connection limit of the account,
+                e.g. for a connection that is held for a long time.
+
+        Returns:
+            A connected fetcher for the account.
+
+        Raises:
+            ValueError: If the protocol of the account doesn't match any fetcher class.
+            MailAccountError: If the fetcher fails to initialize
+                or no connection to the account becomes free in time.
+        """
+        fetcher_class = account.get_fetcher_class()
+        if not pooled or account.pk is None or not fetcher_class.IS_REUSABLE:
+            return fetcher_class(account)
+        while True:
+            fetcher = self._reserve(account)
+            if fetcher is None:
+                return self._open(account)
+            fetcher.account = account
+            try:
+                fetcher.test()
+            except FetcherError:
+                logger.info("Discarding broken connection %s.", fetcher)
+                self._discard(fetcher)
+            else:
+                logger.debug("Reusing connection %s.", fetcher)
+                return fetcher
+
+    def release(self, fetcher: BaseFetcher, *, discard: bool = False) -> None:
+        """Hands a leased fetcher back to the pool.
+
+        Args:
+            fetcher: The fetcher to release.
+            discard: Whether the fetcher must be closed instead of being kept for reuse,
+                e.g. because an error occurred while it was used.
+        """
+        if discard or get_config("FETCHER_POOL_IDLE_TIMEOUT") <= 0:
+            self._discard(fetcher)
+            return
+        with self._condition:
+            self._idle_fetchers[self.get_key(fetcher.account)].append(
+                (fetcher, time.monotonic())
+            )
+            self._condition.notify_all()
+        self.close_expired()
+
+    def close_expired(self) -> None:
+        """Closes all fetchers that have been idle for longer than `FETCHER_POOL_IDLE_TIMEOUT` seconds."""
+        deadline = time.monotonic() - get_config("FETCHER_POOL_IDLE_TIMEOUT")
+        expired_fetchers = []
+        with self._condition:
+            for idle_fetchers in self._idle_fetchers.values():
+                expired_fetchers.extend(
+                    fetcher
+                    for fetcher, released in idle_fetchers
+                    if released < deadline
+                )
+                idle_fetchers[:] = [
+                    (fetcher, released)
+                    for fetcher, released in idle_fetchers
+                    if released >= deadline
+                ]
+        for fetcher in expired_fetchers:
+            self._discard(fetcher)
+
+    def close_all(self) -> None:
+        """Closes all idle fetchers. Leased fetchers are closed when they are released."""
+        with self._condition:
+            idle_fetchers = [
+                fetcher
+                for fetchers in self._idle_fetchers.values()
+                for fetcher, _released in fetchers
+            ]
+            self._idle_fetchers.clear()
+        for fetcher in idle_fetchers:
+            self._discard(fetcher)
+
+    def _reserve(self, account: Account) -> BaseFetcher | None:
+        """Takes an idle fetcher for the account out of the pool or reserves a slot for a new one.
+
+        Idle fetchers for outdated connection data of the account are closed.
+        Waits if the account has no idle fetcher and its connection limit is reached.
+
+        Args:
+            account: The account to reserve a fetcher for.
+
+        Returns:
+            The most recently released idle fetcher, `None` if a new one may be opened.
+
+        Raises:
+            MailAccountError: If no connection becomes free within :attr:`ACQUIRE_TIMEOUT`.
+        """
+        self.close_expired()
+        key = self.get_key(account)
+        deadline = time.monotonic() + self.ACQUIRE_TIMEOUT
+        with self._condition:
+            outdated_fetchers = [
+                fetcher
+                for other_key in list(self._idle_fetchers)
+                if other_key[0] == account.pk and other_key != key
+                for fetcher, _released in self._idle_fetchers.pop(other_key)
+            ]
+            self._open_counts[account.pk] -= len(outdated_fetchers)
+        for fetcher in outdated_fetchers:
+            logger.debug("Closing outdated connection %s.", fetcher)
+            self._close(fetcher)
+        with self._condition:
+            while True:
+                if self._idle_fetchers[key]:
+                    return self._idle_fetchers[key].pop()[0]
+                if self._open_counts[account.pk] < max(
+                    1, get_config("FETCHER_POOL_MAX_CONNECTIONS")
+                ):
+                    self._open_counts[account.pk] += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error("No free connection to %s available!", account)
+                    raise MailAccountError(
+                        TimeoutError(
+                            _("All %(count)s connections are in use.")
+                            % {"count": self._open_counts[account.pk]}
+                        ),
+                        _("waiting for a free connection"),
+                    )
+                self._condition.wait(remaining)
+
+    def _open(self, account: Account) -> BaseFetcher:
+        """Opens a new pooled fetcher in a reserved slot of the account.
+
+        Args:
+            account: The account to open a fetcher for.
+
+        Returns:
+            The new fetcher.
+        """
+        try:
+            fetcher = account.get_fetcher_class()(account)
+        except BaseException:
+            self._free_slot(account.pk)
+            raise
+        fetcher.pool = self
+        logger.debug("Opened new connection %s.", fetcher)
+        return fetcher
+
+    def _discard(self, fetcher: BaseFetcher) -> None:
+        """Closes a fetcher and frees its slot.
+
+        Args:
+            fetcher: The fetcher to close.
+        """
+        self._free_slot(fetcher.account.pk)
+        self._close(fetcher)
+
+    @staticmethod
+    def _close(fetcher: BaseFetcher) -> None:
+        """Closes a fetcher, ignoring errors as the connection is not used anymore.
+
+        Args:
+            fetcher: The fetcher to close.
+        """
+        try:
+            fetcher.close()
+        except FetcherError:
+            logger.debug("Error closing connection %s.", fetcher, exc_info=True)
+
+    def _free_slot(self, account_pk: int) -> None:
+        """Frees a connection slot of an account.
+
+        Args:
+            account_pk: The primary key of the account.
+        """
+        with self._condition:
+            self._open_counts[account_pk] = max(0, self._open_counts[account_pk] - 1)
+            self._condition.notify_all()
+
+
+fetcher_pool = FetcherPool()
+"""The fetcher pool of this worker process."""
@@ -0,0 +1,387 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Module with the :class:`FetchingFilter` class."""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import imaplib
+import json
+import operator
+import os
+from email import policy
+from email.parser import BytesParser
+from functools import reduce
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+import exchangelib
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from core.constants import HeaderFields
+from core.utils.mail_parsing import get_header, parse_datetime_header
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from email.message import EmailMessage
+
+
+class FetchingFilter:
+    """A composable filter for the emails to fetch, in addition to the fetching criterion.
+
+    The filter is a tree of single-key objects, for example::
+
+        {"and": [{"from": "example.org"}, {"not": {"subject": "newsletter"}}, {"larger": 1000}]}
+
+    The conditions are `from`, `to` and `subject` with a case-insensitive substring,
+    `larger` and `smaller` with a size in bytes and `since` and `before` with an ISO date.
+    `since` includes the given day, `before` excludes it.
+    They are combined with `and` and `or` over a list of filters and `not` over a single filter.
+
+    The filter is translated to an IMAP SEARCH key, an Exchange query or a JMAP filter,
+    so that the mailserver only returns the matching emails.
+    Conditions the mailserver can't search for are checked by :func:`matches_mail`
+    on the fetched emails instead.
+    POP can't search at all, so the filter is checked by :func:`matches`
+    on the headers of the messages before they are retrieved.
+    """
+
+    TEXT_CONDITIONS: dict[str, str] = {
+        "from": "FROM",
+        "to": "TO",
+        "subject": "SUBJECT",
+    }
+    """The conditions matching a header by substring and their IMAP SEARCH keys."""
+
+    SIZE_CONDITIONS: dict[str, str] = {
+        "larger": "LARGER",
+        "smaller": "SMALLER",
+    }
+    """The conditions matching the size of the email and their IMAP SEARCH keys."""
+
+    DATE_CONDITIONS: dict[str, str] = {
+        "since": "SENTSINCE",
+        "before": "SENTBEFORE",
+    }
+    """The conditions matching the date of the email and their IMAP SEARCH keys."""
+
+    def __init__(self, filter_data: dict[str, Any]) -> None:
+        """Constructor, validates the filter.
+
+        Args:
+            filter_data: The filter tree.
+
+        Raises:
+            ValueError: If the filter is malformed.
+        """
+        self.validate(filter_data)
+        self.filter_data = filter_data
+
+    @classmethod
+    def validate(cls, node: object) -> None:
+        """Checks a filter tree recursively.
+
+        Args:
+            node: The filter tree to check.
+
+        Raises:
+            ValueError: If the filter is malformed.
+        """
+        if not isinstance(node, dict) or len(node) != 1:
+            raise ValueError(_("Every filter must be an object with exactly one key."))
+        key, value = next(iter(node.items()))
+        if key in ("and", "or"):
+            if not isinstance(value, list) or not value:
+                raise ValueError(
+                    _("The value of %(key)s must be a non-empty list of filters.")
+                    % {"key": key}
+                )
+            for child in value:
+                cls.validate(child)
+        elif key == "not":
+            cls.validate(value)
+        else:
+            cls.validate_condition(key, value)
+
+    @classmethod
+    def validate_condition(cls, key: str, value: object) -> None:
+        """Checks a single condition of a filter tree.
+
+        Args:
+            key: The name of the condition.
+            value: The value of the condition.
+
+        Raises:
+            ValueError: If the condition is unknown or its value is malformed.
+        """
+        if key in cls.TEXT_CONDITIONS:
+            if not isinstance(value, str) or not value:
+                raise ValueError(
+                    _("The value of %(key)s must be a non-empty text.") % {"key": key}
+                )
+        elif key in cls.SIZE_CONDITIONS:
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise ValueError(
+                    _("The value of %(key)s must be a size in bytes.") % {"key": key}
+                )
+        elif key in cls.DATE_CONDITIONS:
+            try:
+                dt.date.fromisoformat(value)  # type: ignore[arg-type]  # checked by the except
+            except (TypeError, ValueError):
+                raise ValueError(
+                    _("The value of %(key)s must be a date like 2024-12-31.")
+                    % {"key": key}
+                ) from None
+        else:
+            raise ValueError(_("Unknown filter %(key)s.") % {"key": key})
+
+    def translate[T](
+        self,
+        translate_condition: Callable[[str, Any], T | None],
+        combine_and: Callable[[list[T]], T],
+        combine_or: Callable[[list[T]], T],
+        negate: Callable[[T], T],
+    ) -> tuple[T | None, bool]:
+        """Translates the filter for a mailserver that may not support all conditions.
+
+        If the filter is an `and`, the children that can be translated are kept,
+        so the translation matches a superset of the emails and the rest is left to :func:`matches`.
+        Otherwise the filter can only be translated as a whole.
+
+        Args:
+            translate_condition: Translates a condition with its value, returns `None` if that is not possible.
+            combine_and: Combines translations so that all of them must match.
+            combine_or: Combines translations so that any of them must match.
+            negate: Negates a translation.
+
+        Returns:
+            The translation, `None` if nothing could be translated,
+            and whether it matches exactly the emails matched by the filter.
+        """
+
+        def translate_node(node: dict[str, Any]) -> T | None:
+            key, value = next(iter(node.items()))
+            if key in ("and", "or"):
+                translations = [translate_node(child) for child in value]
+                if None in translations:
+                    return None
+                return (combine_and if key == "and" else combine_or)(translations)
+            if key == "not":
+                translation = translate_node(value)
+                return None if translation is None else negate(translation)
+            return translate_condition(key, value)
+
+        key, value = next(iter(self.filter_data.items()))
+        if key != "and":
+            translation = translate_node(self.filter_data)
+            return translation, translation is not None
+        translations = [translate_node(child) for child in value]
+        exact_translations = [
+            translation for translation in translations if translation is not None
+        ]
+        return (
+            combine_and(exact_translations) if exact_translations else None,
+            len(exact_translations) == len(translations),
+        )
+
+    def make_digest(self) -> str:
+        """Makes a short fingerprint of the filter to compare it with others.
+
+        Returns:
+            The start of the SHA-256 hash of the filter tree with sorted keys.
+        """
+        return hashlib.sha256(
+            json.dumps(self.filter_data, sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+    def make_imap_search(self) -> tuple[str | None, bool]:
+        """Translates the filter to IMAP SEARCH keys.
+
+        Texts that are not plain ASCII can't be searched for without a literal, so they are left out.
+
+        Returns:
+            The search keys, `None` if nothing could be translated,
+            and whether they match exactly the emails matched by the filter.
+        """
+
+        def translate_condition(
+            key: str,
+            value: Any,  # noqa: ANN401 ; the type of the value depends on the key
+        ) -> str | None:
+            if key in self.TEXT_CONDITIONS:
+                if not value.isascii() or "\r" in value or "\n" in value:
+                    return None
+                quoted_value = value.replace("\\", "\\\\").replace('"', '\\"')
+                return f'{self.TEXT_CONDITIONS[key]} "{quoted_value}"'
+            if key in self.SIZE_CONDITIONS:
+                return f"{self.SIZE_CONDITIONS[key]} {value}"
+            date = dt.date.fromisoformat(value)
+            return f"{self.DATE_CONDITIONS[key]} {date.day:02d}-{imaplib.Months[date.month]}-{date.year}"
+
+        return self.translate(
+            translate_condition,
+            lambda translations: f"({' '.join(translations)})",
+            lambda translations: reduce(
+                lambda first, second: f"OR {first} {second}", translations
+            ),
+            lambda translation: f"NOT {translation}",
+        )
+
+    def make_exchange_query(self) -> tuple[exchangelib.Q | None, bool]:
+        """Translates the filter to an Exchange query.
+
+        Exchange can't search the addresses of the sender and recipients by substring,
+        so these conditions are left out.
+
+        Returns:
+            The query, `None` if nothing could be translated,
+            and whether it matches exactly the emails matched by the filter.
+        """
+
+        def translate_condition(
+            key: str,
+            value: Any,  # noqa: ANN401 ; the type of the value depends on the key
+        ) -> exchangelib.Q | None:
+            if key == "subject":
+                return exchangelib.Q(subject__icontains=value)
+            if key == "larger":
+                return exchangelib.Q(size__gt=value)
+            if key == "smaller":
+                return exchangelib.Q(size__lt=value)
+            if key in self.DATE_CONDITIONS:
+                start_of_day = timezone.make_aware(
+                    dt.datetime.combine(dt.date.fromisoformat(value), dt.time.min)
+                )
+                if key == "since":
+                    return exchangelib.Q(datetime_sent__gte=start_of_day)
+                return exchangelib.Q(datetime_sent__lt=start_of_day)
+            return None
+
+        return self.translate(
+            translate_condition,
+            lambda translations: reduce(operator.and_, translations),
+            lambda translations: reduce(operator.or_, translations),
+            operator.invert,
+        )
+
+    def make_jmap_filter(self) -> tuple[dict[str, Any] | None, bool]:
+        """Translates the filter to a JMAP filter for the Email/query method.
+
+        JMAP servers may search texts by words instead of substrings
+        and can only query the date an email was received, not when it was sent,
+        so these conditions are left out.
+
+        Returns:
+            The filter, `None` if nothing could be translated,
+            and whether it matches exactly the emails matched by the filter.
+        """
+
+        def translate_condition(
+            key: str,
+            value: Any,  # noqa: ANN401 ; the type of the value depends on the key
+        ) -> dict[str, Any] | None:
+            if key == "larger":
+                return {"minSize": value + 1}
+            if key == "smaller":
+                return {"maxSize": value}
+            return None
+
+        return self.translate(
+            translate_condition,
+            lambda translations: {"operator": "AND", "conditions": translations},
+            lambda translations: {"operator": "OR", "conditions": translations},
+            lambda translation: {"operator": "NOT", "conditions": [translation]},
+        )
+
+    def matches(self, headers: EmailMessage, size: int) -> bool:
+        """Checks whether a message matches the filter.
+
+        Args:
+            headers: The headers of the message.
+            size: The size of the message in bytes.
+
+        Returns:
+            Whether the message matches the filter.
+        """
+
+        def matches_node(node: dict[str, Any]) -> bool:
+            key, value = next(iter(node.items()))
+            if key == "and":
+                return all(matches_node(child) for child in value)
+            if key == "or":
+                return any(matches_node(child) for child in value)
+            if key == "not":
+                return not matches_node(value)
+            return self.matches_condition(key, value, headers, size)
+
+        return matches_node(self.filter_data)
+
+    def matches_condition(
+        self,
+        key: str,
+        value: Any,  # noqa: ANN401 ; the type of the value depends on the key
+        headers: EmailMessage,
+        size: int,
+    ) -> bool:
+        """Checks whether a message matches a single condition of the filter.
+
+        Args:
+            key: The name of the condition.
+            value: The value of the condition.
+            headers: The headers of the message.
+            size: The size of the message in bytes.
+
+        Returns:
+            Whether the message matches the condition.
+        """
+        if key in self.TEXT_CONDITIONS:
+            return bool(value.lower() in get_header(headers, key).lower())
+        if key == "larger":
+            return bool(size > value)
+        if key == "smaller":
+            return bool(size < value)
+        sent_date = parse_datetime_header(get_header(headers, HeaderFields.DATE)).date()
+        if key == "since":
+            return sent_date >= dt.date.fromisoformat(value)
+        return sent_date < dt.date.fromisoformat(value)
+
+    def matches_mail(self, mail_data: bytes | BinaryIO) -> bool:
+        """Checks whether a fetched email matches the filter.
+
+        Only the headers of the email are parsed for this.
+
+        Args:
+            mail_data: The email as :class:`bytes` or spooled to a file.
+                The file is rewound afterwards.
+
+        Returns:
+            Whether the email matches the filter.
+        """
+        parser = BytesParser(policy=policy.default)
+        if isinstance(mail_data, bytes):
+            headers = parser.parsebytes(mail_data, headersonly=True)
+            size = len(mail_data)
+        else:
+            mail_data.seek(0)
+            headers = parser.parse(mail_data, headersonly=True)
+            size = mail_data.seek(0, os.SEEK_END)
+            mail_data.seek(0)
+        return self.matches(headers, size)
@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`IMAP4DeflateStream` class."""
+
+from __future__ import annotations
+
+import imaplib
+import zlib
+from typing import Self
+
+
+class IMAP4DeflateStream:
+    """Compresses the connection of an :class:`imaplib.IMAP4` client with DEFLATE, see https://datatracker.ietf.org/doc/html/rfc4978.
+
+    Replaces the read and write methods of the client, so all other methods,
+    including the literal handling of :mod:`imaplib`, work on the uncompressed data.
+    Must be installed right after the server accepted the COMPRESS command,
+    before anything else is sent or received.
+    """
+
+    RECEIVE_SIZE = 65536
+    """The maximum number of compressed bytes received from the socket at once."""
+
+    def __init__(self, mail_client: imaplib.IMAP4) -> None:
+        """Sets up the compression for a client.
+
+        Args:
+            mail_client: The client whose connection is compressed.
+        """
+        self.mail_client = mail_client
+        self.compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+        )
+        self.decompressor = zlib.decompressobj(-15)
+        self.buffer = bytearray()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    @classmethod
+    def install(cls, mail_client: imaplib.IMAP4) -> Self:
+        """Compresses all further communication of a client.
+
+        Args:
+            mail_client: The client whose connection is compressed.
+
+        Returns:
+            The installed stream, which counts the compressed bytes.
+        """
+        stream = cls(mail_client)
+        mail_client.read = stream.read  # type: ignore[method-assign]
+        mail_client.readline = stream.readline  # type: ignore[method-assign]
+        mail_client.send = stream.send  # type: ignore[method-assign]
+        return stream
+
+    def receive(self) -> bool:
+        """Receives compressed data from the server and decompresses it into the buffer.
+
+        Returns:
+            Whether any data was received, `False` if the connection is closed.
+        """
+        data = self.mail_client.socket().recv(self.RECEIVE_SIZE)
+        if not data:
+            return False
+        self.bytes_received += len(data)
+        self.buffer += self.decompressor.decompress(data)
+        return True
+
+    def read(self, size: int) -> bytes:
+        """Replaces :func:`imaplib.IMAP4.read`.
+
+        Args:
+            size: The number of bytes to read.
+
+        Returns:
+            The read bytes, fewer only if the connection is closed.
+        """
+        while len(self.buffer) < size and self.receive():
+            pass
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readline(self) -> bytes:
+        """Replaces :func:`imaplib.IMAP4.readline`.
+
+        Returns:
+            The read line including its line break, without it only if the connection is closed.
+
+        Raises:
+            imaplib.IMAP4.error: If the line is longer than imaplib allows.
+        """
+        max_length = imaplib._MAXLINE  # noqa: SLF001  # the same limit as imaplib
+        while (
+            (line_end := self.buffer.find(b"\n")) < 0
+            and len(self.buffer) <= max_length
+            and self.receive()
+        ):
+            pass
+        size = line_end + 1 if line_end >= 0 else len(self.buffer)
+        if size > max_length:
+            raise self.mail_client.error(f"got more than {max_length} bytes")
+        return self.read(size)
+
+    def send(self, data: bytes) -> None:
+        """Replaces :func:`imaplib.IMAP4.send`.
+
+        Every sent chunk is flushed, so the server can decompress it right away.
+
+        Args:
+            data: The data to send.
+        """
+        compressed_data = self.compressor.compress(data) + self.compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        self.bytes_sent += len(compressed_data)
+        self.mail_client.socket().sendall(compressed_data)
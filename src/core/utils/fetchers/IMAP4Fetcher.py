@@ -20,28 +20,46 @@
 
 from __future__ import annotations
 
-import datetime
 import imaplib
-from typing import TYPE_CHECKING, override
+import itertools
+import re
+from tempfile import TemporaryFile
+from typing import TYPE_CHECKING, BinaryIO, override
 
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from imap_tools.imap_utf7 import utf7_encode
 
-from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
-from core.utils.fetchers.exceptions import FetcherError, MailAccountError
+from core.constants import (
+    EmailFetchingCriterionChoices,
+    EmailProtocolChoices,
+    HeaderFields,
+)
+from core.utils.fetchers.exceptions import (
+    FetcherError,
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+    wrap_fetcher_error,
+)
+from core.utils.fetchers.IMAP4DeflateStream import IMAP4DeflateStream
+from core.utils.fetchers.IMAP4FetchingMixin import IMAP4FetchingMixin
 from core.utils.fetchers.SafeIMAPMixin import SafeIMAPMixin
+from eonvelope.utils.workarounds import get_config
 
 from .BaseFetcher import BaseFetcher
 
 
 if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+
     from core.models.Account import Account
     from core.models.Email import Email
     from core.models.Mailbox import Mailbox
 
+    from .FetchingFilter import FetchingFilter
+
 
-class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
+class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin, IMAP4FetchingMixin):
     """Maintains a connection to the IMAP server and fetches data using :mod:`imaplib`.
 
     Opens a connection to the IMAP server on construction and is preferably used in a 'with' environment.
@@ -53,6 +71,7 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
 
     AVAILABLE_FETCHING_CRITERIA = (
         EmailFetchingCriterionChoices.ALL.value,
+        EmailFetchingCriterionChoices.INCREMENTAL.value,
         EmailFetchingCriterionChoices.UNSEEN.value,
         EmailFetchingCriterionChoices.SEEN.value,
         EmailFetchingCriterionChoices.RECENT.value,
@@ -72,27 +91,11 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
     For a list of all existing IMAP criteria see https://datatracker.ietf.org/doc/html/rfc3501.html#section-6.4.4.
     """
 
-    @staticmethod
-    def make_fetching_criterion(criterion_name: str) -> str | None:
-        """Returns the formatted criterion for the IMAP request, handles dates in particular.
+    EXISTS_PATTERN = re.compile(rb"\* \d+ EXISTS")
+    """Pattern of the untagged response announcing new messages in the selected mailbox."""
 
-        Args:
-            criterion_name: The criterion to prepare for the IMAP request.
-
-        Returns:
-            Formatted criterion to be used in IMAP request.
-        """
-        if criterion_name == EmailFetchingCriterionChoices.DAILY:
-            start_time = timezone.now() - datetime.timedelta(days=1)
-        elif criterion_name == EmailFetchingCriterionChoices.WEEKLY:
-            start_time = timezone.now() - datetime.timedelta(weeks=1)
-        elif criterion_name == EmailFetchingCriterionChoices.MONTHLY:
-            start_time = timezone.now() - datetime.timedelta(weeks=4)
-        elif criterion_name == EmailFetchingCriterionChoices.ANNUALLY:
-            start_time = timezone.now() - datetime.timedelta(weeks=52)
-        else:
-            return criterion_name
-        return f"SENTSINCE {imaplib.Time2Internaldate(start_time).split(' ')[0].strip('" ')}"
+    IDLE_TIMEOUT = 29 * 60
+    """Seconds to idle at most. Servers may drop clients that idle for 30 minutes, see RFC 2177."""
 
     @override
     def __init__(self, account: Account) -> None:
@@ -102,11 +105,52 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
             account: The model of the account to be fetched from.
         """
         super().__init__(account)
+        self.compression: IMAP4DeflateStream | None = None
 
         self.connect_to_host()
         self.safe_login(  # dont use kwargs here, this would kill the utf-8 fallback!
             self.account.mail_address, self.account.password
         )
+        if self.account.use_compression:
+            self.enable_compression()
+
+    def fetch_capabilities(self) -> list[bytes]:
+        """Requests the current capabilities of the server.
+
+        Servers may announce some capabilities only after the login,
+        so the capabilities cached by :mod:`imaplib` from the greeting may be incomplete.
+
+        Returns:
+            The uppercased capabilities of the server. Empty if the request failed.
+        """
+        capability_response = self.safe_capability()
+        return (
+            capability_response[1][-1].upper().split()
+            if capability_response and capability_response[1]
+            else []
+        )
+
+    def enable_compression(self) -> None:
+        """Compresses the connection with DEFLATE if the server supports it.
+
+        The capabilities are requested again for this,
+        as servers may only announce compression after the login.
+        If the server does not support or refuses compression, the connection stays uncompressed.
+        """
+        if b"COMPRESS=DEFLATE" not in self.fetch_capabilities():
+            self.logger.info(
+                "%s does not support compression, continuing uncompressed.",
+                self.account,
+            )
+            return
+        compress_response = self.safe_compress()
+        if compress_response is None or compress_response[0] != "OK":
+            self.logger.warning(
+                "%s refused compression, continuing uncompressed.", self.account
+            )
+            return
+        self.compression = IMAP4DeflateStream.install(self._mail_client)
+        self.logger.info("Compressed the connection to %s.", self.account)
 
     @override
     def connect_to_host(self) -> None:
@@ -129,7 +173,9 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
                 self._mail_client = imaplib.IMAP4(host=mail_host, timeout=timeout)
         except Exception as error:
             self.logger.exception("Error connecting to %s!", self.account)
-            raise MailAccountError(error, _("connecting")) from error
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("connecting")
+            ) from error
         self.logger.info("Successfully connected to %s.", self.account)
 
     @override
@@ -158,45 +204,179 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
             self.logger.debug("Successfully tested %s.", mailbox)
 
     @override
-    def fetch_emails(
+    def stream_emails(
         self,
         mailbox: Mailbox,
         criterion: str = EmailFetchingCriterionChoices.ALL,
-    ) -> list[bytes]:
-        """Fetches and returns maildata from a mailbox based on a given criterion.
-
-        Todo:
-            Rewrite this into a generator.
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Generator[bytes | BinaryIO]:
+        """Lazily fetches maildata from a mailbox based on a given criterion.
+
+        Messages that are already archived or thrown out as spam are skipped
+        based on their headers before their bodies are downloaded.
+        So are messages larger than `FETCH_MAX_EMAIL_DATASIZE`,
+        messages larger than `FETCH_SPOOL_EMAIL_DATASIZE` are spooled to a temporary file.
+        The mailbox is left again once the generator is exhausted or closed.
+        For the incremental criterion, :attr:`core.models.Mailbox.highest_uid` is moved
+        after every consumed message until the first message that failed to be fetched.
+        :attr:`core.models.Mailbox.fetch_checkpoint` is moved after every consumed message,
+        messages up to the checkpoint of an interrupted run are not fetched again.
+        The :attr:`fetching_filter` is added to the search on the server,
+        the conditions that can't be searched for are checked on the fetched mails.
+        Before the mailbox is selected, its status is compared to :attr:`core.models.Mailbox.sync_state`,
+        if it is unchanged since the last complete fetch with the same criterion and filter,
+        the mailbox is not searched at all, see :func:`make_status_snapshot`.
+        Once all messages were fetched, the status is set on :attr:`mailbox`, saving it is left to the caller.
+        A fetch with a :attr:`fetching_filter` leaves all of this sync state untouched,
+        as the other daemons of the mailbox still need the messages it filters out.
 
         Args:
             mailbox: Database model of the mailbox to fetch data from.
             criterion: Formatted criterion to filter mails in the IMAP request.
                 Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
 
-        Returns:
-            List of mails in the mailbox matching the criterion as :class:`bytes`.
-            Empty if no such messages are found.
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes` or spooled to a file.
 
         Raises:
             ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
                 If :attr:`criterion` is not in :attr:`IMAP4Fetcher.AVAILABLE_FETCHING_CRITERIA`.
             MailboxError: If an error occurs or a bad response is returned during an action on the mailbox.
         """
-        super().fetch_emails(mailbox, criterion)
-
-        search_criterion = self.make_fetching_criterion(criterion)
+        super().stream_emails(mailbox, criterion, fetching_filter)
 
-        self.logger.debug(
-            "Searching and fetching %s messages in %s...",
-            search_criterion,
-            mailbox,
+        is_syncing = fetching_filter is None
+        status_snapshot = (
+            self.take_status_snapshot(mailbox, criterion, fetching_filter)
+            if is_syncing
+            else None
         )
+        if status_snapshot is not None and status_snapshot == mailbox.sync_state:
+            self.logger.info(
+                "%s is unchanged since the last fetch, skipping it.", mailbox
+            )
+            return
+
         self.logger.debug("Opening mailbox %s ...", mailbox)
         self.safe_select(utf7_encode(mailbox.name), readonly=True)
         self.logger.debug("Successfully opened mailbox.")
 
+        search_criterion, client_filter = self.make_search_criterion(
+            mailbox,
+            criterion,
+            fetching_filter,
+            (
+                self.get_uid_validity()
+                if criterion == EmailFetchingCriterionChoices.INCREMENTAL
+                else None
+            ),
+        )
+        message_uids = self.drop_synced_uids(
+            mailbox,
+            self.search_messages(mailbox, search_criterion, criterion),
+            criterion,
+        )
+
+        self.logger.debug("Fetching %s messages in %s ...", search_criterion, mailbox)
+        is_watermark_moving = (
+            is_syncing and criterion == EmailFetchingCriterionChoices.INCREMENTAL
+        )
+        is_complete = True
+        try:
+            new_message_sizes = self.filter_new_messages(
+                mailbox, self.skip_to_checkpoint(mailbox, message_uids, bytes.decode)
+            )
+            for uid, message_data in self.fetch_messages(mailbox, new_message_sizes):
+                if message_data is None:
+                    # don't skip the failed message in the next incremental fetch
+                    is_watermark_moving = False
+                    is_complete = False
+                    continue
+                if client_filter is None or client_filter.matches_mail(message_data):
+                    yield message_data
+                if is_syncing:
+                    self.record_fetched_message(
+                        mailbox, uid, is_watermark_moving=is_watermark_moving
+                    )
+            if is_syncing:
+                self.record_finished_fetch(
+                    mailbox,
+                    message_uids,
+                    status_snapshot,
+                    is_watermark_moving=is_watermark_moving,
+                    is_complete=is_complete,
+                )
+            self.logger.debug(
+                "Successfully fetched %s messages from %s.",
+                search_criterion,
+                mailbox,
+            )
+        finally:
+            self.logger.debug("Leaving mailbox %s ...", mailbox)
+            self.safe_unselect()
+            self.logger.debug("Successfully left mailbox.")
+
+    def take_status_snapshot(
+        self,
+        mailbox: Mailbox,
+        criterion: str,
+        fetching_filter: FetchingFilter | None,
+    ) -> str | None:
+        """Requests the status of a mailbox and combines it with the criterion and filter of a fetch.
+
+        Args:
+            mailbox: The mailbox to fetch.
+            criterion: The criterion of the fetch.
+            fetching_filter: The additional filter of the fetch.
+
+        Returns:
+            The snapshot of the mailbox, see :func:`make_status_snapshot`.
+            `None` if the status could not be requested.
+        """
+        status_response = self.safe_status(
+            utf7_encode(mailbox.name), self.get_status_items()
+        )
+        if status_response is None or not isinstance(status_response[1][-1], bytes):
+            return None
+        return self.make_status_snapshot(
+            criterion, fetching_filter, status_response[1][-1]
+        )
+
+    def get_uid_validity(self) -> int | None:
+        """Reads the UIDVALIDITY of the selected mailbox from the response to selecting it.
+
+        Returns:
+            The UIDVALIDITY of the selected mailbox, `None` if the server didn't send it.
+        """
+        _, response_data = self._mail_client.response("UIDVALIDITY")
+        return int(response_data[-1]) if response_data[-1] else None
+
+    def search_messages(
+        self, mailbox: Mailbox, search_criterion: str, criterion: str
+    ) -> list[bytes]:
+        """Searches the selected mailbox for messages.
+
+        The UIDs are sorted by date if the server supports SORT, except for the incremental criterion,
+        which requires ascending UIDs to move the high-water mark.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            search_criterion: Formatted criterion to be used in the IMAP request.
+            criterion: The criterion of the fetch.
+
+        Returns:
+            The UIDs of the matching messages.
+
+        Raises:
+            MailboxError: If an error occurs or a bad response is returned.
+        """
         self.logger.debug("Searching %s messages in %s ...", search_criterion, mailbox)
-        if "SORT" in self._mail_client.capabilities:
+        if (
+            criterion != EmailFetchingCriterionChoices.INCREMENTAL
+            and "SORT" in self._mail_client.capabilities
+        ):
             _, message_uids = self.safe_uid("SORT", "(DATE)", "UTF-8", search_criterion)
         else:
             _, message_uids = self.safe_uid("SEARCH", search_criterion)
@@ -206,38 +386,318 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
             message_uids,
             mailbox,
         )
+        return message_uids[0].split()
 
-        self.logger.debug("Fetching %s messages in %s ...", search_criterion, mailbox)
-        mail_data_list = []
-        for uid in message_uids[0].split():
+    def wait_for_new_emails(
+        self, mailbox: Mailbox, timeout: float = IDLE_TIMEOUT
+    ) -> bool:
+        """Waits for new messages to arrive in a mailbox using IMAP IDLE.
+
+        Returns as soon as the server reports any change in the mailbox or when the timeout has passed.
+
+        Args:
+            mailbox: Database model of the mailbox to wait for.
+            timeout: The maximum time to wait in seconds.
+                Defaults to :attr:`IDLE_TIMEOUT`.
+
+        Returns:
+            Whether new messages have arrived in the mailbox.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+            MailAccountError: If the server does not support IDLE or an error occurs while idling.
+            MailboxError: If an error occurs or a bad response is returned opening the mailbox.
+        """
+        if mailbox.account != self.account:
+            self.logger.error("%s is not a mailbox of %s!", mailbox, self.account)
+            raise ValueError(f"{mailbox} is not in {self.account}!")
+        if "IDLE" not in self._mail_client.capabilities:
+            self.logger.error("%s does not support IDLE!", self.account)
+            raise MailAccountError(
+                NotImplementedError(_("The server does not support IDLE.")),
+                _("idling"),
+            )
+
+        self.logger.debug("Opening mailbox %s ...", mailbox)
+        self.safe_select(utf7_encode(mailbox.name), readonly=True)
+        self.logger.debug("Successfully opened mailbox.")
+
+        self.logger.debug("Waiting for new messages in %s ...", mailbox)
+        responses = self.safe_idle(timeout)[1]
+        has_new_messages = any(
+            self.EXISTS_PATTERN.match(response) for response in responses
+        )
+        self.logger.debug(
+            "Finished waiting for new messages in %s, new messages arrived: %s.",
+            mailbox,
+            has_new_messages,
+        )
+
+        self.logger.debug("Leaving mailbox %s ...", mailbox)
+        self.safe_unselect()
+        self.logger.debug("Successfully left mailbox.")
+        return has_new_messages
+
+    def fetch_messages(
+        self, mailbox: Mailbox, message_sizes: dict[bytes, int]
+    ) -> Generator[tuple[bytes, bytes | BinaryIO | None]]:
+        """Lazily fetches messages from the selected mailbox in chunks.
+
+        Every chunk of `IMAP_FETCH_CHUNK_SIZE` messages is requested in a single round trip.
+        Messages of a failed chunk or missing in its response are retried one by one,
+        so a single broken message does not spoil the rest of its chunk.
+        Messages larger than `FETCH_SPOOL_EMAIL_DATASIZE` are spooled to disk by :func:`spool_message` instead.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_sizes: The sizes of the messages to fetch by their UIDs, 0 if unknown.
+
+        Yields:
+            The UID of every message with its data as :class:`bytes` or spooled to a file
+            or `None` if the message could not be fetched.
+        """
+        chunk_size = max(1, get_config("IMAP_FETCH_CHUNK_SIZE"))
+        spool_datasize = get_config("FETCH_SPOOL_EMAIL_DATASIZE")
+        for chunk_uids in itertools.batched(message_sizes, chunk_size, strict=False):
+            spooled_uids = {
+                uid for uid in chunk_uids if 0 < spool_datasize < message_sizes[uid]
+            }
+            chunk_data = self.fetch_messages_in_memory(
+                mailbox, [uid for uid in chunk_uids if uid not in spooled_uids]
+            )
+            for uid in chunk_uids:
+                if uid in spooled_uids:
+                    yield from self.spool_message(mailbox, uid)
+                else:
+                    yield uid, chunk_data.pop(int(uid), None)
+
+    def fetch_messages_in_memory(
+        self, mailbox: Mailbox, message_uids: Sequence[bytes]
+    ) -> dict[int, bytes]:
+        """Fetches a set of messages from the selected mailbox, retrying the failed ones one by one.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs of the messages to fetch.
+
+        Returns:
+            The data of the fetched messages by their UID.
+            Messages that could not be fetched are not included.
+        """
+        if not message_uids:
+            return {}
+        try:
+            chunk_data = self.fetch_message_chunk(message_uids)
+        except MailHostThrottledError:
+            raise
+        except FetcherError:
+            self.logger.warning(
+                "Failed to fetch messages %s from %s, retrying them one by one!",
+                message_uids,
+                mailbox,
+                exc_info=True,
+            )
+            chunk_data = {}
+        for uid in message_uids:
+            if int(uid) not in chunk_data:
+                try:
+                    chunk_data.update(self.fetch_message_chunk((uid,)))
+                except MailHostThrottledError:
+                    raise
+                except FetcherError:
+                    self.logger.warning(
+                        "Failed to fetch message %s from %s!",
+                        uid,
+                        mailbox,
+                        exc_info=True,
+                    )
+        return chunk_data
+
+    def spool_message(
+        self, mailbox: Mailbox, uid: bytes
+    ) -> Generator[tuple[bytes, BinaryIO | None]]:
+        """Fetches a large message from the selected mailbox into a temporary file.
+
+        The message is requested in partial fetches of :attr:`SPOOL_PIECE_SIZE` bytes,
+        so it is never held in memory as a whole.
+        The file is deleted once the generator is resumed.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            uid: The UID of the message to fetch.
+
+        Yields:
+            The UID of the message with the file positioned at its start
+            or `None` if the message could not be fetched.
+        """
+        with TemporaryFile() as spool_file:
+            offset = 0
             try:
-                _, message_data = self.safe_uid("FETCH", uid, "(RFC822)")
+                while True:
+                    message_parts = self.fetch_message_parts(
+                        (uid,), f"(BODY.PEEK[]<{offset}.{self.SPOOL_PIECE_SIZE}>)"
+                    )
+                    piece = message_parts[int(uid)][1] if message_parts else b""
+                    offset += spool_file.write(piece)
+                    if len(piece) < self.SPOOL_PIECE_SIZE:
+                        break
+            except MailHostThrottledError:
+                raise
             except FetcherError:
                 self.logger.warning(
-                    "Failed to fetch message %s from %s!",
-                    uid,
+                    "Failed to spool message %s from %s!", uid, mailbox, exc_info=True
+                )
+                yield uid, None
+                return
+            self.logger.debug("Spooled message %s with %d bytes to disk.", uid, offset)
+            spool_file.seek(0)
+            yield uid, spool_file if offset else None
+
+    def fetch_message_chunk(self, message_uids: Sequence[bytes]) -> dict[int, bytes]:
+        """Fetches a set of messages from the selected mailbox in one request.
+
+        Uses BODY.PEEK[] to leave the flags of the messages untouched.
+
+        Args:
+            message_uids: The UIDs of the messages to fetch.
+
+        Returns:
+            The data of the fetched messages by their UID.
+            Messages that are missing in the response are not included.
+
+        Raises:
+            MailboxError: If an error occurs or a bad response is returned.
+        """
+        return {
+            uid: message_data
+            for uid, (_, message_data) in self.fetch_message_parts(
+                message_uids, "(BODY.PEEK[])"
+            ).items()
+        }
+
+    def fetch_message_parts(
+        self, message_uids: Sequence[bytes], message_parts: str
+    ) -> dict[int, tuple[bytes, bytes]]:
+        """Fetches parts of a set of messages from the selected mailbox in one request.
+
+        Args:
+            message_uids: The UIDs of the messages to fetch.
+            message_parts: The IMAP message data items to fetch, must include one literal.
+
+        Returns:
+            The metadata and the literal of the fetched messages by their UID.
+            The metadata contains all non-literal data items of the message.
+            Messages that are missing in the response are not included.
+
+        Raises:
+            MailboxError: If an error occurs or a bad response is returned.
+        """
+        _, response_data = self.safe_uid(
+            "FETCH", b",".join(message_uids), message_parts
+        )
+        return self.parse_fetch_response(response_data)
+
+    def filter_new_messages(
+        self, mailbox: Mailbox, message_uids: Sequence[bytes]
+    ) -> dict[bytes, int]:
+        """Drops the messages that are already in the mailbox, thrown out as spam or too large.
+
+        Only the size and the Message-ID and X-Spam-Flag headers of the messages are fetched for this,
+        in chunks of :attr:`HEADER_CHUNK_SIZE` with one database lookup per chunk.
+        Messages without Message-ID and messages whose headers failed to be fetched are kept.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs of the candidate messages.
+
+        Returns:
+            The sizes of the messages that need to be downloaded by their UIDs, 0 if unknown.
+        """
+        throw_out_spam = get_config("THROW_OUT_SPAM")
+        new_message_sizes: dict[bytes, int] = {}
+        skipped_size = 0
+        for chunk_uids in itertools.batched(
+            message_uids, self.HEADER_CHUNK_SIZE, strict=False
+        ):
+            try:
+                chunk_headers = self.fetch_message_parts(
+                    chunk_uids,
+                    f"(RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HeaderFields.MESSAGE_ID} {HeaderFields.X_SPAM})])",
+                )
+            except MailHostThrottledError:
+                raise
+            except FetcherError:
+                self.logger.warning(
+                    "Failed to fetch headers of messages %s from %s, downloading them all!",
+                    chunk_uids,
                     mailbox,
                     exc_info=True,
                 )
+                new_message_sizes.update(dict.fromkeys(chunk_uids, 0))
                 continue
-            mail_data_list.append(message_data[0][1])
-        self.logger.debug(
-            "Successfully fetched %s messages from %s.",
-            search_criterion,
+            skipped_uids = self.find_skippable_messages(
+                mailbox,
+                {uid: header_data for uid, (_, header_data) in chunk_headers.items()},
+                throw_out_spam=throw_out_spam,
+            )
+            for uid in chunk_uids:
+                size = self.parse_message_size(chunk_headers.get(int(uid)))
+                if int(uid) in skipped_uids:
+                    skipped_size += size
+                else:
+                    new_message_sizes[uid] = size
+        self.logger.info(
+            "Skipping %d already archived or spam messages with %d bytes in %s.",
+            len(message_uids) - len(new_message_sizes),
+            skipped_size,
             mailbox,
         )
+        return self.drop_oversized_messages(
+            mailbox, new_message_sizes, get_config("FETCH_MAX_EMAIL_DATASIZE")
+        )
 
-        self.logger.debug("Leaving mailbox %s ...", mailbox)
-        self.safe_unselect()
-        self.logger.debug("Successfully left mailbox.")
+    @override
+    def find_unchanged_mailboxes(
+        self, mailboxes: Sequence[Mailbox], criterion: str
+    ) -> list[Mailbox]:
+        """Finds the mailboxes whose status didn't change since their last complete fetch with the criterion.
+
+        The status of all mailboxes is requested in a single round trip, see :func:`safe_status_batch`.
+        If that fails, all mailboxes are considered changed.
 
+        Args:
+            mailboxes: The mailboxes to check, all in the account of this fetcher.
+            criterion: The criterion that the mailboxes are about to be fetched with.
+
+        Returns:
+            The mailboxes that don't need to be fetched.
+        """
+        if not mailboxes:
+            return []
+        status_response = self.safe_status_batch(
+            [utf7_encode(mailbox.name) for mailbox in mailboxes],
+            self.get_status_items(),
+        )
+        if status_response is None:
+            return []
+        status_data_by_name = dict(status_response[1])
+        unchanged_mailboxes = []
+        for mailbox in mailboxes:
+            status_data = status_data_by_name.get(utf7_encode(mailbox.name))
+            if (
+                status_data is not None
+                and mailbox.is_fetch_complete
+                and mailbox.sync_state
+                == self.make_status_snapshot(criterion, None, status_data)
+            ):
+                unchanged_mailboxes.append(mailbox)
         self.logger.debug(
-            "Successfully searched and fetched %s messages in %s.",
-            search_criterion,
-            mailbox,
+            "%d of %d mailboxes in %s are unchanged.",
+            len(unchanged_mailboxes),
+            len(mailboxes),
+            self.account,
         )
-
-        return mail_data_list
+        return unchanged_mailboxes
 
     @override
     def fetch_mailboxes(self) -> list[bytes]:
@@ -284,6 +744,48 @@ class IMAP4Fetcher(BaseFetcher, SafeIMAPMixin):
             self.safe_append(email.mailbox.name, None, None, email_file.read())
         self.logger.debug("Successfully restored email.")
 
+    @override
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox.
+
+        If the server supports MULTIAPPEND, all emails are uploaded in a single command.
+        Otherwise or if that fails, the emails are uploaded one by one,
+        so every email gets its own error.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+        """
+        mailbox_name = utf7_encode(mailbox.name)
+        if len(email_data) > 1 and b"MULTIAPPEND" in self.fetch_capabilities():
+            try:
+                self.safe_multiappend(mailbox_name, email_data)
+            except MailboxError:
+                self.logger.warning(
+                    "MULTIAPPEND to %s failed, uploading the emails one by one.",
+                    mailbox,
+                )
+            else:
+                self.logger.debug(
+                    "Successfully uploaded %d emails with MULTIAPPEND.",
+                    len(email_data),
+                )
+                return [None] * len(email_data)
+        errors: list[MailboxError | None] = []
+        for data in email_data:
+            try:
+                self.safe_append(mailbox_name, None, None, data)
+            except MailboxError as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+        return errors
+
     @override
     def close(self) -> None:
         """Logs out of the account and closes the connection to the IMAP server if it is open."""
@@ -0,0 +1,317 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Module with the IMAP4FetchingMixin mixin."""
+
+from __future__ import annotations
+
+import datetime as dt
+import imaplib
+import re
+from typing import TYPE_CHECKING
+
+from django.utils import timezone
+
+from core.constants import EmailFetchingCriterionChoices
+
+
+if TYPE_CHECKING:
+    import logging
+    from collections.abc import Sequence
+
+    from core.models.Mailbox import Mailbox
+
+    from .FetchingFilter import FetchingFilter
+
+
+class IMAP4FetchingMixin:
+    """Mixin with the parts of fetching from an IMAP mailbox that don't talk to the server.
+
+    Shared by :class:`core.utils.fetchers.IMAP4Fetcher` and :class:`core.utils.fetchers.AsyncIMAP4Fetcher`,
+    so both build the same searches and keep the sync state of a mailbox the same way.
+
+    The implementing class must have
+    an :attr:`_mail_client` with the :attr:`capabilities` of the server
+    and an instance logger.
+    """
+
+    logger: logging.Logger
+
+    UID_PATTERN = re.compile(rb"UID (\d+)")
+    """Pattern to extract the UID from a FETCH response."""
+
+    SIZE_PATTERN = re.compile(rb"RFC822\.SIZE (\d+)")
+    """Pattern to extract the size of the message from a FETCH response."""
+
+    SPOOL_PIECE_SIZE = 1024 * 1024
+    """The number of bytes requested at once when spooling a large message to disk."""
+
+    STATUS_ITEMS_PATTERN = re.compile(rb"\(([^()]*)\)\s*$")
+    """Pattern to extract the status data items from a STATUS response."""
+
+    FLAG_CRITERIA = (
+        EmailFetchingCriterionChoices.UNSEEN.value,
+        EmailFetchingCriterionChoices.SEEN.value,
+        EmailFetchingCriterionChoices.OLD.value,
+        EmailFetchingCriterionChoices.FLAGGED.value,
+        EmailFetchingCriterionChoices.DRAFT.value,
+        EmailFetchingCriterionChoices.ANSWERED.value,
+    )
+    """Criteria whose matches change with the flags of the messages.
+    Flag changes only show in the status of a mailbox via HIGHESTMODSEQ, see RFC 7162.
+    """
+
+    SESSION_CRITERIA = (
+        EmailFetchingCriterionChoices.RECENT.value,
+        EmailFetchingCriterionChoices.NEW.value,
+    )
+    """Criteria whose matches depend on the sessions of other clients and never show in the status of a mailbox."""
+
+    @staticmethod
+    def make_fetching_criterion(criterion_name: str) -> str | None:
+        """Returns the formatted criterion for the IMAP request, handles dates in particular.
+
+        Args:
+            criterion_name: The criterion to prepare for the IMAP request.
+
+        Returns:
+            Formatted criterion to be used in IMAP request.
+        """
+        if criterion_name == EmailFetchingCriterionChoices.DAILY:
+            start_time = timezone.now() - dt.timedelta(days=1)
+        elif criterion_name == EmailFetchingCriterionChoices.WEEKLY:
+            start_time = timezone.now() - dt.timedelta(weeks=1)
+        elif criterion_name == EmailFetchingCriterionChoices.MONTHLY:
+            start_time = timezone.now() - dt.timedelta(weeks=4)
+        elif criterion_name == EmailFetchingCriterionChoices.ANNUALLY:
+            start_time = timezone.now() - dt.timedelta(weeks=52)
+        else:
+            return criterion_name
+        return f"SENTSINCE {imaplib.Time2Internaldate(start_time).split(' ')[0].strip('" ')}"
+
+    @classmethod
+    def make_status_snapshot(
+        cls,
+        criterion: str,
+        fetching_filter: FetchingFilter | None,
+        status_data: bytes,
+    ) -> str | None:
+        """Combines the status of a mailbox with the criterion and filter of a fetch.
+
+        If two fetches with the same snapshot follow each other,
+        the second can't find any message that the first didn't.
+
+        Args:
+            criterion: The criterion of the fetch.
+            fetching_filter: The additional filter of the fetch.
+            status_data: The response to a STATUS command for the mailbox.
+
+        Returns:
+            The snapshot to store in :attr:`core.models.Mailbox.sync_state`.
+            `None` if the status of the mailbox doesn't tell whether the matches of the criterion changed.
+        """
+        status_match = cls.STATUS_ITEMS_PATTERN.search(status_data)
+        if status_match is None:
+            return None
+        status_items = b" ".join(status_match.group(1).split()).decode()
+        if criterion in cls.SESSION_CRITERIA or (
+            criterion in cls.FLAG_CRITERIA and "HIGHESTMODSEQ" not in status_items
+        ):
+            return None
+        filter_digest = (
+            fetching_filter.make_digest() if fetching_filter is not None else "-"
+        )
+        return f"{criterion} {filter_digest} {status_items}"
+
+    def get_status_items(self) -> str:
+        """The status data items requested to check whether a mailbox changed.
+
+        HIGHESTMODSEQ is only requested from servers that support CONDSTORE, see RFC 7162.
+
+        Returns:
+            The parenthesized list of status data items.
+        """
+        if "CONDSTORE" in self._mail_client.capabilities:
+            return "(MESSAGES UIDNEXT UIDVALIDITY HIGHESTMODSEQ)"
+        return "(MESSAGES UIDNEXT UIDVALIDITY)"
+
+    def make_search_criterion(
+        self,
+        mailbox: Mailbox,
+        criterion: str,
+        fetching_filter: FetchingFilter | None,
+        uid_validity: int | None,
+    ) -> tuple[str, FetchingFilter | None]:
+        """Prepares the search for a fetch in a selected mailbox.
+
+        The :attr:`fetching_filter` is added to the search on the server,
+        as far as IMAP can search for its conditions.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            criterion: The criterion of the fetch.
+            fetching_filter: The additional filter of the fetch.
+            uid_validity: The UIDVALIDITY of the selected mailbox, `None` if the server didn't send it.
+
+        Returns:
+            Formatted criterion to be used in the IMAP request
+            and the filter that the fetched mails must be checked against,
+            `None` if the search on the server is exact.
+        """
+        if criterion == EmailFetchingCriterionChoices.INCREMENTAL:
+            search_criterion = self.make_incremental_criterion(mailbox, uid_validity)
+        else:
+            search_criterion = self.make_fetching_criterion(criterion)
+        if fetching_filter is None:
+            return search_criterion, None
+        filter_search, is_filter_exact = fetching_filter.make_imap_search()
+        if filter_search:
+            search_criterion = f"{search_criterion} {filter_search}"
+        return search_criterion, None if is_filter_exact else fetching_filter
+
+    def make_incremental_criterion(
+        self, mailbox: Mailbox, uid_validity: int | None
+    ) -> str:
+        """Prepares the incremental fetch of a selected mailbox.
+
+        Compares the UIDVALIDITY of the selected mailbox to the one stored in :attr:`mailbox`.
+        If they match, only UIDs above :attr:`core.models.Mailbox.highest_uid` are requested.
+        Otherwise the stored UIDs are invalid and all messages are requested for a full resync.
+        The new UIDVALIDITY is set on :attr:`mailbox`, saving it is left to the caller.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            uid_validity: The UIDVALIDITY of the selected mailbox, `None` if the server didn't send it.
+
+        Returns:
+            Formatted criterion to be used in the IMAP request.
+        """
+        if (
+            uid_validity is not None
+            and uid_validity == mailbox.uid_validity
+            and mailbox.highest_uid is not None
+        ):
+            return f"UID {mailbox.highest_uid + 1}:*"
+        self.logger.info(
+            "UIDVALIDITY of %s changed from %s to %s, resyncing all messages.",
+            mailbox,
+            mailbox.uid_validity,
+            uid_validity,
+        )
+        mailbox.uid_validity = uid_validity
+        mailbox.highest_uid = None
+        return EmailFetchingCriterionChoices.ALL
+
+    @staticmethod
+    def drop_synced_uids(
+        mailbox: Mailbox, message_uids: Sequence[bytes], criterion: str
+    ) -> list[bytes]:
+        """Drops the messages of an incremental search that are below the high-water mark.
+
+        'n:*' always matches the last message in the mailbox, even if its UID is below n.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs found by the search.
+            criterion: The criterion of the fetch.
+
+        Returns:
+            The UIDs of the messages that are left to fetch.
+        """
+        if criterion != EmailFetchingCriterionChoices.INCREMENTAL:
+            return list(message_uids)
+        return [uid for uid in message_uids if int(uid) > (mailbox.highest_uid or 0)]
+
+    @staticmethod
+    def record_fetched_message(
+        mailbox: Mailbox, uid: bytes, *, is_watermark_moving: bool
+    ) -> None:
+        """Moves the sync state of a mailbox past a message that has been consumed.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            uid: The UID of the consumed message.
+            is_watermark_moving: Whether :attr:`core.models.Mailbox.highest_uid` is moved as well.
+        """
+        mailbox.fetch_checkpoint = uid.decode()
+        if is_watermark_moving:
+            mailbox.highest_uid = int(uid)
+
+    @staticmethod
+    def record_finished_fetch(
+        mailbox: Mailbox,
+        message_uids: Sequence[bytes],
+        status_snapshot: str | None,
+        *,
+        is_watermark_moving: bool,
+        is_complete: bool,
+    ) -> None:
+        """Sets the sync state of a mailbox after all messages of a fetch have been consumed.
+
+        Args:
+            mailbox: The currently selected mailbox.
+            message_uids: The UIDs of all messages found by the search.
+            status_snapshot: The snapshot of the mailbox status taken before the fetch.
+            is_watermark_moving: Whether :attr:`core.models.Mailbox.highest_uid` is moved.
+            is_complete: Whether all messages were fetched.
+        """
+        if is_watermark_moving and message_uids:
+            # the skipped messages behind the last fetched one are done as well
+            mailbox.highest_uid = int(message_uids[-1])
+        if is_complete:
+            mailbox.sync_state = status_snapshot or ""
+
+    @classmethod
+    def parse_fetch_response(
+        cls, response_data: list[bytes | tuple[bytes, bytes]]
+    ) -> dict[int, tuple[bytes, bytes]]:
+        """Sorts the data of a FETCH response by the UIDs of the messages.
+
+        Args:
+            response_data: The data of the FETCH response in the format of :mod:`imaplib`.
+
+        Returns:
+            The metadata and the literal of the fetched messages by their UID.
+            The metadata contains all non-literal data items of the message.
+        """
+        messages: list[tuple[bytes, bytes]] = []
+        for item in response_data:
+            if isinstance(item, tuple):
+                messages.append(item)
+            elif isinstance(item, bytes) and messages:
+                # some servers send data items like the UID after the literal
+                messages[-1] = (messages[-1][0] + item, messages[-1][1])
+        fetched_parts = {}
+        for metadata, literal in messages:
+            if uid_match := cls.UID_PATTERN.search(metadata):
+                fetched_parts[int(uid_match[1])] = (metadata, literal)
+        return fetched_parts
+
+    @classmethod
+    def parse_message_size(cls, message_parts: tuple[bytes, bytes] | None) -> int:
+        """Extracts the RFC822.SIZE of a message from its fetched parts.
+
+        Args:
+            message_parts: The metadata and literal of the message from a FETCH response.
+
+        Returns:
+            The size of the message in bytes, 0 if it is unknown.
+        """
+        if message_parts and (size_match := cls.SIZE_PATTERN.search(message_parts[0])):
+            return int(size_match[1])
+        return 0
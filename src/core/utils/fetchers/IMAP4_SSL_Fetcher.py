@@ -28,7 +28,7 @@ from django.utils.translation import gettext_lazy as _
 
 from core import constants
 
-from .exceptions import MailAccountError
+from .exceptions import MailAccountError, wrap_fetcher_error
 from .IMAP4Fetcher import IMAP4Fetcher
 
 
@@ -73,5 +73,7 @@ class IMAP4_SSL_Fetcher(  # noqa: N801  # naming consistent with IMAP4_SSL class
                 )
         except Exception as error:
             self.logger.exception("Error connecting to %s!", self.account)
-            raise MailAccountError(error, _("connecting")) from error
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("connecting")
+            ) from error
         self.logger.info("Successfully connected to %s.", self.account)
@@ -0,0 +1,820 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`JMAPFetcher` class."""
+
+from __future__ import annotations
+
+import datetime as dt
+from tempfile import TemporaryFile
+from typing import TYPE_CHECKING, Any, BinaryIO, override
+from urllib.parse import quote
+
+import httpx
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from eonvelope.utils.workarounds import get_config
+
+from .BaseFetcher import BaseFetcher
+from .exceptions import (
+    BadServerResponseError,
+    MailAccountError,
+    MailboxError,
+    wrap_fetcher_error,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Sequence
+
+    from core.models.Account import Account
+    from core.models.Email import Email
+    from core.models.Mailbox import Mailbox
+
+    from .FetchingFilter import FetchingFilter
+
+
+class JMAPFetcher(BaseFetcher):
+    """Maintains a session with a JMAP server and fetches data using :mod:`httpx`, see RFC 8620 and RFC 8621.
+
+    Opens the session on construction and is preferably used in a 'with' environment.
+    Allows fetching of mails and mailboxes from an account on a JMAP host.
+
+    Method calls that depend on each other are batched into a single HTTP request using back-references,
+    so listing a mailbox takes one request per `JMAP_FETCH_CHUNK_SIZE` emails.
+    The emails themselves are downloaded as blobs.
+    """
+
+    PROTOCOL = EmailProtocolChoices.JMAP.value
+    """Name of the used protocol, refers to :attr:`EmailProtocolChoices.JMAP`."""
+
+    AVAILABLE_FETCHING_CRITERIA = (
+        EmailFetchingCriterionChoices.ALL.value,
+        EmailFetchingCriterionChoices.INCREMENTAL.value,
+        EmailFetchingCriterionChoices.UNSEEN.value,
+        EmailFetchingCriterionChoices.SEEN.value,
+        EmailFetchingCriterionChoices.FLAGGED.value,
+        EmailFetchingCriterionChoices.DRAFT.value,
+        EmailFetchingCriterionChoices.UNDRAFT.value,
+        EmailFetchingCriterionChoices.DAILY.value,
+        EmailFetchingCriterionChoices.WEEKLY.value,
+        EmailFetchingCriterionChoices.MONTHLY.value,
+        EmailFetchingCriterionChoices.ANNUALLY.value,
+    )
+    """Tuple of all criteria available for fetching. Refers to :class:`EmailFetchingCriterionChoices`.
+    Constructed analogous to the IMAP4 criteria.
+    Must be immutable!
+    """
+
+    CORE_CAPABILITY = "urn:ietf:params:jmap:core"
+    """The capability of the JMAP core protocol."""
+
+    MAIL_CAPABILITY = "urn:ietf:params:jmap:mail"
+    """The capability of the JMAP mail protocol."""
+
+    HEADER_PROPERTIES = {
+        "header:Message-ID": "Message-ID",
+        "header:X-Spam-Flag": "X-Spam-Flag",
+        "header:From": "From",
+        "header:To": "To",
+        "header:Subject": "Subject",
+        "header:Date": "Date",
+    }
+    """The raw header properties requested for every email and their header names.
+    They cover all headers needed to skip emails before they are downloaded.
+    """
+
+    EMAIL_PROPERTIES = ("id", "blobId", "size", "mailboxIds", *HEADER_PROPERTIES)
+    """The properties requested for every email when listing a mailbox."""
+
+    ERRORS = (httpx.HTTPError, BadServerResponseError, KeyError, ValueError)
+    """The errors that a request to the JMAP server may raise, including malformed responses."""
+
+    KEYWORD_CONDITIONS: dict[str, tuple[str, str]] = {
+        EmailFetchingCriterionChoices.UNSEEN.value: ("notKeyword", "$seen"),
+        EmailFetchingCriterionChoices.SEEN.value: ("hasKeyword", "$seen"),
+        EmailFetchingCriterionChoices.FLAGGED.value: ("hasKeyword", "$flagged"),
+        EmailFetchingCriterionChoices.DRAFT.value: ("hasKeyword", "$draft"),
+        EmailFetchingCriterionChoices.UNDRAFT.value: ("notKeyword", "$draft"),
+    }
+    """The criteria matching the keywords of the emails with their filter operator and keyword."""
+
+    TIMESPAN_CONDITIONS: dict[str, dt.timedelta] = {
+        EmailFetchingCriterionChoices.DAILY.value: dt.timedelta(days=1),
+        EmailFetchingCriterionChoices.WEEKLY.value: dt.timedelta(weeks=1),
+        EmailFetchingCriterionChoices.MONTHLY.value: dt.timedelta(weeks=4),
+        EmailFetchingCriterionChoices.ANNUALLY.value: dt.timedelta(weeks=52),
+    }
+    """The criteria matching the emails received within a timespan with that timespan."""
+
+    @classmethod
+    def make_fetching_condition(cls, criterion: str) -> dict[str, Any] | None:
+        """Returns the JMAP filter condition for a criterion.
+
+        Args:
+            criterion: The criterion to translate.
+
+        Returns:
+            The filter condition for the Email/query method, `None` if all emails match.
+        """
+        if criterion in cls.KEYWORD_CONDITIONS:
+            operator, keyword = cls.KEYWORD_CONDITIONS[criterion]
+            return {operator: keyword}
+        if criterion in cls.TIMESPAN_CONDITIONS:
+            start_time = timezone.now() - cls.TIMESPAN_CONDITIONS[criterion]
+            return {
+                "after": start_time.astimezone(dt.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+            }
+        return None
+
+    @classmethod
+    def make_header_block(cls, email_data: dict[str, Any]) -> bytes:
+        """Reassembles the header block of an email from its raw header properties.
+
+        Args:
+            email_data: The properties of the email, see :attr:`EMAIL_PROPERTIES`.
+
+        Returns:
+            The header block with the headers in :attr:`HEADER_PROPERTIES` that the email has.
+        """
+        return (
+            "".join(
+                f"{header_name}:{email_data[header_property]}\r\n"
+                for header_property, header_name in cls.HEADER_PROPERTIES.items()
+                if email_data.get(header_property) is not None
+            ).encode()
+            + b"\r\n"
+        )
+
+    @override
+    def __init__(self, account: Account) -> None:
+        """Constructor, opens the JMAP session of the account.
+
+        Args:
+            account: The model of the account to be fetched from.
+        """
+        super().__init__(account)
+
+        self.connect_to_host()
+
+    @override
+    def connect_to_host(self) -> None:
+        """Opens the JMAP session using the credentials from :attr:`account`.
+
+        The session resource is looked up at `/.well-known/jmap` on the mailserver,
+        unless the mailserver is given as a full URL to it.
+        The credentials are sent via basic authentication,
+        if the server rejects that, the password is sent as bearer token, as used for API tokens.
+
+        Raises:
+            MailAccountError: If an error occurs or a bad response is returned.
+        """
+        self.logger.debug("Connecting to %s ...", self.account)
+
+        mail_host = self.account.mail_host
+        if mail_host.startswith(("http://", "https://")):
+            session_url = mail_host
+        elif self.account.mail_host_port:
+            session_url = (
+                f"https://{mail_host}:{self.account.mail_host_port}/.well-known/jmap"
+            )
+        else:
+            session_url = f"https://{mail_host}/.well-known/jmap"
+        self._mail_client = httpx.Client(
+            auth=httpx.BasicAuth(self.account.mail_address, self.account.password),
+            timeout=self.account.timeout,
+            follow_redirects=True,
+        )
+        self._mailbox_ids: dict[str, str] = {}
+        try:
+            response = self._mail_client.get(session_url)
+            if response.status_code == httpx.codes.UNAUTHORIZED:
+                self._mail_client.auth = None
+                self._mail_client.headers["Authorization"] = (
+                    f"Bearer {self.account.password}"
+                )
+                response = self._mail_client.get(session_url)
+            response.raise_for_status()
+            session = response.json()
+            self.api_url = session["apiUrl"]
+            self.download_url = session["downloadUrl"]
+            self.upload_url = session["uploadUrl"]
+            self.account_id = session["primaryAccounts"][self.MAIL_CAPABILITY]
+            self.max_objects_in_get = int(
+                session["capabilities"][self.CORE_CAPABILITY]["maxObjectsInGet"]
+            )
+        except self.ERRORS as error:
+            self._mail_client.close()
+            self.logger.exception("Error connecting to %s!", self.account)
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("connecting")
+            ) from error
+        self.logger.info("Successfully connected to %s.", self.account)
+
+    def call(self, method_calls: list[list[Any]]) -> list[list[Any]]:
+        """Sends a batch of method calls in a single request to the JMAP API.
+
+        Args:
+            method_calls: The method calls as `[name, arguments, call id]`.
+                Later calls may refer to the results of earlier ones.
+
+        Returns:
+            The method responses in the same format.
+
+        Raises:
+            httpx.HTTPError: If the request fails.
+            BadServerResponseError: If any of the method calls failed.
+        """
+        response = self._mail_client.post(
+            self.api_url,
+            json={
+                "using": [self.CORE_CAPABILITY, self.MAIL_CAPABILITY],
+                "methodCalls": method_calls,
+            },
+        )
+        response.raise_for_status()
+        method_responses: list[list[Any]] = response.json()["methodResponses"]
+        for name, arguments, _call_id in method_responses:
+            if name == "error":
+                raise BadServerResponseError(arguments)
+        return method_responses
+
+    @override
+    def test(self, mailbox: Mailbox | None = None) -> None:
+        """Tests the session and, if a mailbox is provided, whether it can be found.
+
+        Args:
+            mailbox: The mailbox to be tested. Default is None.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+            MailAccountError: If the account test fails because an error occurs or a bad response is returned.
+            MailboxError: If the mailbox test fails because an error occurs or a bad response is returned testing the mailbox.
+        """
+        super().test(mailbox)
+
+        self.logger.debug("Testing %s ...", self.account)
+        try:
+            self.call([["Core/echo", {}, "echo"]])
+        except self.ERRORS as error:
+            self.logger.exception("Error during echo of the session!")
+            raise wrap_fetcher_error(MailAccountError, error, _("echo")) from error
+        self.logger.debug("Successfully tested %s.", self.account)
+
+        if mailbox is not None:
+            self.logger.debug("Testing %s ...", mailbox)
+            self.open_mailbox(mailbox)
+            self.logger.debug("Successfully tested %s.", mailbox)
+
+    @override
+    def stream_emails(
+        self,
+        mailbox: Mailbox,
+        criterion: str = EmailFetchingCriterionChoices.ALL,
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Generator[bytes | BinaryIO]:
+        """Lazily fetches maildata from a mailbox based on a given criterion.
+
+        The matching emails are listed in pages with their size and a few headers,
+        so emails that are already archived, thrown out as spam or filtered out are skipped
+        before their blobs are downloaded.
+        So are emails larger than `FETCH_MAX_EMAIL_DATASIZE`,
+        emails larger than `FETCH_SPOOL_EMAIL_DATASIZE` are spooled to a temporary file.
+        For the incremental criterion, only the emails created since :attr:`core.models.Mailbox.sync_state`
+        are listed using Email/changes and the new state is set on :attr:`mailbox`
+        once all of them have been fetched, saving it is left to the caller.
+        :attr:`core.models.Mailbox.fetch_checkpoint` is moved to the id of every consumed email,
+        emails up to the checkpoint of an interrupted run are not fetched again.
+        A fetch with a :attr:`fetching_filter` leaves the sync state and the checkpoint untouched,
+        as the other daemons of the mailbox still need the emails it filters out.
+
+        Args:
+            mailbox: Database model of the mailbox to fetch data from.
+            criterion: Formatted criterion to filter mails in the JMAP server.
+                Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
+
+        Yields:
+            The mails in the mailbox matching the criterion as :class:`bytes` or spooled to a file.
+
+        Raises:
+            ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
+                If :attr:`criterion` is not in :attr:`JMAPFetcher.AVAILABLE_FETCHING_CRITERIA`.
+            MailboxError: If an error occurs or a bad response is returned during an action on the mailbox.
+        """
+        super().stream_emails(mailbox, criterion, fetching_filter)
+        self.logger.debug(
+            "Searching and fetching %s messages in %s...", criterion, mailbox
+        )
+        mailbox_id = self.open_mailbox(mailbox)
+        is_syncing = fetching_filter is None
+        mail_count = 0
+        try:
+            if criterion == EmailFetchingCriterionChoices.INCREMENTAL:
+                email_pages = self.sync_email_pages(mailbox_id, mailbox)
+            else:
+                email_pages = self.query_email_pages(
+                    self.make_query_condition(mailbox_id, criterion, fetching_filter)
+                )
+            email_sizes, new_state = self.list_new_emails(
+                mailbox, email_pages, fetching_filter
+            )
+            email_sizes = self.drop_oversized_messages(
+                mailbox, email_sizes, get_config("FETCH_MAX_EMAIL_DATASIZE")
+            )
+            remaining_ids = self.skip_to_checkpoint(
+                mailbox, list(email_sizes), lambda email_ids: email_ids[0]
+            )
+            for email_id, mail_data in self.download_messages(
+                mailbox,
+                {email_ids: email_sizes[email_ids] for email_ids in remaining_ids},
+            ):
+                if mail_data is not None:
+                    mail_count += 1
+                    yield mail_data
+                if is_syncing:
+                    mailbox.fetch_checkpoint = email_id
+        except self.ERRORS as error:
+            self.logger.exception("Error during fetching of mail contents!")
+            raise wrap_fetcher_error(
+                MailboxError, error, _("fetching of mail contents")
+            ) from error
+        if (
+            is_syncing
+            and criterion == EmailFetchingCriterionChoices.INCREMENTAL
+            and new_state
+        ):
+            mailbox.sync_state = new_state
+        self.logger.info(
+            "Successfully searched and fetched %s %s messages in %s.",
+            mail_count,
+            criterion,
+            mailbox,
+        )
+
+    def make_query_condition(
+        self,
+        mailbox_id: str,
+        criterion: str,
+        fetching_filter: FetchingFilter | None,
+    ) -> dict[str, Any]:
+        """Combines the filter condition for listing the emails of a mailbox matching a criterion.
+
+        The :attr:`fetching_filter` is added as far as JMAP can query its conditions.
+
+        Args:
+            mailbox_id: The id of the mailbox on the server.
+            criterion: The criterion of the fetch.
+            fetching_filter: The additional filter of the fetch.
+
+        Returns:
+            The filter condition for the Email/query method.
+        """
+        conditions = [{"inMailbox": mailbox_id}]
+        if criterion_condition := self.make_fetching_condition(criterion):
+            conditions.append(criterion_condition)
+        if fetching_filter is not None:
+            filter_condition, _is_filter_exact = fetching_filter.make_jmap_filter()
+            if filter_condition is not None:
+                conditions.append(filter_condition)
+        return {"operator": "AND", "conditions": conditions}
+
+    def list_new_emails(
+        self,
+        mailbox: Mailbox,
+        email_pages: Iterable[tuple[list[dict[str, Any]], str]],
+        fetching_filter: FetchingFilter | None,
+    ) -> tuple[dict[tuple[str, str], int], str | None]:
+        """Drops the listed emails that are already archived, thrown out as spam or filtered out.
+
+        Args:
+            mailbox: The mailbox the emails are in.
+            email_pages: The listed pages of emails with the state after each of them,
+                see :func:`query_email_pages` and :func:`sync_email_pages`.
+            fetching_filter: The filter that the emails must match.
+
+        Returns:
+            The sizes of the emails to download by their id and blob id
+            and the state after the last page, `None` if there were no pages.
+        """
+        throw_out_spam = get_config("THROW_OUT_SPAM")
+        email_sizes: dict[tuple[str, str], int] = {}
+        new_state = None
+        for email_page, page_state in email_pages:
+            new_state = page_state
+            skipped_ids = self.find_skippable_messages(
+                mailbox,
+                {
+                    email_data["id"]: self.make_header_block(email_data)
+                    for email_data in email_page
+                },
+                throw_out_spam=throw_out_spam,
+                fetching_filter=fetching_filter,
+                message_sizes={
+                    email_data["id"]: email_data["size"] for email_data in email_page
+                },
+            )
+            email_sizes.update(
+                ((email_data["id"], email_data["blobId"]), email_data["size"])
+                for email_data in email_page
+                if email_data["id"] not in skipped_ids
+            )
+        return email_sizes, new_state
+
+    def get_chunk_size(self) -> int:
+        """The number of emails listed per request, `JMAP_FETCH_CHUNK_SIZE` capped by the limit of the server."""
+        return max(1, min(get_config("JMAP_FETCH_CHUNK_SIZE"), self.max_objects_in_get))
+
+    def query_email_pages(
+        self, condition: dict[str, Any]
+    ) -> Generator[tuple[list[dict[str, Any]], str]]:
+        """Lazily lists the emails matching a filter condition, oldest first.
+
+        Every page is listed by a single request batching Email/query with an Email/get of its results.
+
+        Args:
+            condition: The filter condition for Email/query.
+
+        Yields:
+            The properties of the emails in every page, see :attr:`EMAIL_PROPERTIES`,
+            with the state of the emails before the first page.
+        """
+        chunk_size = self.get_chunk_size()
+        position = 0
+        start_state = None
+        while True:
+            query_response, get_response = self.call(
+                [
+                    [
+                        "Email/query",
+                        {
+                            "accountId": self.account_id,
+                            "filter": condition,
+                            "sort": [{"property": "receivedAt", "isAscending": True}],
+                            "position": position,
+                            "limit": chunk_size,
+                        },
+                        "query",
+                    ],
+                    [
+                        "Email/get",
+                        {
+                            "accountId": self.account_id,
+                            "#ids": {
+                                "resultOf": "query",
+                                "name": "Email/query",
+                                "path": "/ids",
+                            },
+                            "properties": self.EMAIL_PROPERTIES,
+                        },
+                        "get",
+                    ],
+                ]
+            )
+            email_ids = query_response[1]["ids"]
+            start_state = start_state or get_response[1]["state"]
+            emails_by_id = {
+                email_data["id"]: email_data for email_data in get_response[1]["list"]
+            }
+            yield (
+                [
+                    emails_by_id[email_id]
+                    for email_id in email_ids
+                    if email_id in emails_by_id
+                ],
+                start_state,
+            )
+            if len(email_ids) < chunk_size:
+                return
+            position += chunk_size
+
+    def sync_email_pages(
+        self, mailbox_id: str, mailbox: Mailbox
+    ) -> Generator[tuple[list[dict[str, Any]], str]]:
+        """Lazily lists the emails created in a mailbox since the last incremental fetch.
+
+        Every page is listed by a single request batching Email/changes from :attr:`core.models.Mailbox.sync_state`
+        with an Email/get of the created emails.
+        If there is no state yet or the server can't calculate the changes from it,
+        all emails in the mailbox are listed for a full resync.
+
+        Args:
+            mailbox_id: The id of the mailbox on the server.
+            mailbox: The mailbox to sync.
+
+        Yields:
+            The properties of the created emails in every page, see :attr:`EMAIL_PROPERTIES`,
+            with the state of the emails after that page.
+        """
+        if not mailbox.sync_state:
+            yield from self.query_email_pages({"inMailbox": mailbox_id})
+            return
+        chunk_size = self.get_chunk_size()
+        state = mailbox.sync_state
+        has_more_changes = True
+        while has_more_changes:
+            try:
+                changes_response, get_response = self.call(
+                    [
+                        [
+                            "Email/changes",
+                            {
+                                "accountId": self.account_id,
+                                "sinceState": state,
+                                "maxChanges": chunk_size,
+                            },
+                            "changes",
+                        ],
+                        [
+                            "Email/get",
+                            {
+                                "accountId": self.account_id,
+                                "#ids": {
+                                    "resultOf": "changes",
+                                    "name": "Email/changes",
+                                    "path": "/created",
+                                },
+                                "properties": self.EMAIL_PROPERTIES,
+                            },
+                            "get",
+                        ],
+                    ]
+                )
+            except BadServerResponseError as error:
+                if (
+                    state != mailbox.sync_state
+                    or not isinstance(error.response, dict)
+                    or error.response.get("type") != "cannotCalculateChanges"
+                ):
+                    raise
+                self.logger.info(
+                    "The sync state of %s is invalid, fetching all messages.", mailbox
+                )
+                yield from self.query_email_pages({"inMailbox": mailbox_id})
+                return
+            state = changes_response[1]["newState"]
+            has_more_changes = changes_response[1]["hasMoreChanges"]
+            yield (
+                [
+                    email_data
+                    for email_data in get_response[1]["list"]
+                    if email_data["mailboxIds"].get(mailbox_id)
+                ],
+                state,
+            )
+
+    def download_messages(
+        self, mailbox: Mailbox, email_sizes: dict[tuple[str, str], int]
+    ) -> Generator[tuple[str, bytes | BinaryIO | None]]:
+        """Lazily downloads the blobs of emails.
+
+        Emails larger than `FETCH_SPOOL_EMAIL_DATASIZE` are streamed to a temporary file,
+        which is deleted once the generator is resumed.
+
+        Args:
+            mailbox: The mailbox the emails are in.
+            email_sizes: The sizes of the emails to download by their id and blob id.
+
+        Yields:
+            The id of every email with its data as :class:`bytes` or spooled to a file
+            or `None` if the email no longer exists.
+
+        Raises:
+            httpx.HTTPError: If a download fails for another reason.
+        """
+        spool_datasize = get_config("FETCH_SPOOL_EMAIL_DATASIZE")
+        for (email_id, blob_id), size in email_sizes.items():
+            download_url = (
+                self.download_url.replace("{accountId}", quote(self.account_id))
+                .replace("{blobId}", quote(blob_id))
+                .replace("{name}", "email.eml")
+                .replace("{type}", quote("message/rfc822", safe=""))
+            )
+            try:
+                if 0 < spool_datasize < size:
+                    with TemporaryFile() as spool_file:
+                        with self._mail_client.stream("GET", download_url) as response:
+                            response.raise_for_status()
+                            for chunk in response.iter_bytes():
+                                spool_file.write(chunk)
+                        spool_file.seek(0)
+                        yield email_id, spool_file
+                    continue
+                response = self._mail_client.get(download_url)
+                response.raise_for_status()
+            except httpx.HTTPStatusError as error:
+                if error.response.status_code != httpx.codes.NOT_FOUND:
+                    raise
+                self.logger.warning(
+                    "Failed to fetch message %s from %s, it no longer exists!",
+                    email_id,
+                    mailbox,
+                )
+                yield email_id, None
+                continue
+            yield email_id, response.content
+
+    def fetch_mailbox_ids(self) -> dict[str, str]:
+        """Lists the mailboxes in the account.
+
+        Returns:
+            The ids of the mailboxes by their path, with the names of nested mailboxes joined by `/`.
+
+        Raises:
+            httpx.HTTPError: If the request fails.
+            BadServerResponseError: If the method call fails.
+        """
+        [(_name, get_result, _call_id)] = self.call(
+            [
+                [
+                    "Mailbox/get",
+                    {
+                        "accountId": self.account_id,
+                        "ids": None,
+                        "properties": ["id", "name", "parentId"],
+                    },
+                    "mailboxes",
+                ]
+            ]
+        )
+        mailboxes = {
+            mailbox_data["id"]: mailbox_data for mailbox_data in get_result["list"]
+        }
+
+        def make_path(mailbox_data: dict[str, Any]) -> str:
+            parent_id = mailbox_data.get("parentId")
+            if parent_id not in mailboxes:
+                return str(mailbox_data["name"])
+            return f"{make_path(mailboxes[parent_id])}/{mailbox_data['name']}"
+
+        return {
+            make_path(mailbox_data): mailbox_id
+            for mailbox_id, mailbox_data in mailboxes.items()
+        }
+
+    def open_mailbox(self, mailbox: Mailbox) -> str:
+        """Looks up the id of a mailbox on the server.
+
+        The ids of all mailboxes are cached for the session and refreshed if the mailbox is not among them.
+
+        Args:
+            mailbox: The mailbox to look up.
+
+        Returns:
+            The id of the mailbox.
+
+        Raises:
+            MailboxError: If the mailbox is not found or an error occurs looking it up.
+        """
+        if mailbox.name not in self._mailbox_ids:
+            try:
+                self._mailbox_ids = self.fetch_mailbox_ids()
+            except self.ERRORS as error:
+                self.logger.exception("Error during lookup of %s!", mailbox)
+                raise wrap_fetcher_error(
+                    MailboxError, error, _("lookup of mailbox")
+                ) from error
+        if mailbox.name not in self._mailbox_ids:
+            self.logger.error("%s does not exist on the server!", mailbox)
+            raise MailboxError(KeyError(mailbox.name), _("lookup of mailbox"))
+        return self._mailbox_ids[mailbox.name]
+
+    @override
+    def fetch_mailboxes(self) -> list[str]:
+        """Retrieves and returns the data of the mailboxes in the account.
+
+        Returns:
+            List of paths of all mailboxes in the account.
+            Empty if none are found.
+
+        Raises:
+            MailAccountError: If an error occurs or a bad response is returned.
+        """
+        self.logger.debug("Fetching mailboxes in %s ...", self.account)
+        try:
+            self._mailbox_ids = self.fetch_mailbox_ids()
+        except self.ERRORS as error:
+            self.logger.exception("Error during listing of mailboxes!")
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("scan for mailboxes")
+            ) from error
+        self.logger.debug("Successfully fetched mailboxes in %s.", self.account)
+        return list(self._mailbox_ids)
+
+    @override
+    def restore(self, email: Email) -> None:
+        """Places an email in its mailbox.
+
+        Args:
+            email: The email to restore.
+
+        Raises:
+            ValueError: If the emails mailbox is not in this fetchers account.
+            FileNotFoundError: If the email has no eml file in storage.
+            MailboxError: If uploading the email to the mailserver fails or returns a bad response.
+        """
+        super().restore(email)
+        self.logger.debug("Restoring email %s to its mailbox ...", email)
+        with email.open_file() as email_file:
+            [error] = self.append_batch(email.mailbox, [email_file.read()])
+        if error is not None:
+            raise error
+        self.logger.debug("Successfully restored email.")
+
+    @override
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails as blobs and imports all of them with a single Email/import call.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Returns:
+            The error that prevented the upload of each email or `None` if it was uploaded.
+
+        Raises:
+            MailboxError: If the mailbox can't be found.
+            MailHostThrottledError: If the server throttles the requests.
+        """
+        mailbox_id = self.open_mailbox(mailbox)
+        upload_url = self.upload_url.replace("{accountId}", quote(self.account_id))
+        try:
+            blob_ids = []
+            for data in email_data:
+                response = self._mail_client.post(
+                    upload_url,
+                    content=data,
+                    headers={"Content-Type": "message/rfc822"},
+                )
+                response.raise_for_status()
+                blob_ids.append(response.json()["blobId"])
+            [(_name, import_result, _call_id)] = self.call(
+                [
+                    [
+                        "Email/import",
+                        {
+                            "accountId": self.account_id,
+                            "emails": {
+                                str(index): {
+                                    "blobId": blob_id,
+                                    "mailboxIds": {mailbox_id: True},
+                                }
+                                for index, blob_id in enumerate(blob_ids)
+                            },
+                        },
+                        "import",
+                    ]
+                ]
+            )
+        except self.ERRORS as error:
+            self.logger.exception("Error during restoring of emails!")
+            batch_error = wrap_fetcher_error(
+                MailboxError, error, _("restoring of email")
+            )
+            if not isinstance(batch_error, MailboxError):
+                raise batch_error from error
+            return [batch_error] * len(email_data)
+        not_created = import_result.get("notCreated") or {}
+        errors: list[MailboxError | None] = []
+        for index in range(len(email_data)):
+            if str(index) in not_created:
+                self.logger.error(
+                    "Error during restoring of email: %s", not_created[str(index)]
+                )
+                errors.append(
+                    MailboxError(
+                        BadServerResponseError(not_created[str(index)]),
+                        _("restoring of email"),
+                    )
+                )
+            else:
+                errors.append(None)
+        return errors
+
+    @override
+    def close(self) -> None:
+        """Closes the HTTP connections to the JMAP server."""
+        self.logger.debug("Closing connection to %s ...", self.account)
+        self._mail_client.close()
+        self.logger.info("Successfully closed connection to %s.", self.account)
@@ -20,23 +20,36 @@
 
 from __future__ import annotations
 
+import itertools
 import poplib
-from typing import TYPE_CHECKING, override
+from tempfile import TemporaryFile
+from typing import TYPE_CHECKING, BinaryIO, override
 
 from django.utils.translation import gettext_lazy as _
 
 from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from eonvelope.utils.workarounds import get_config
 
 from .BaseFetcher import BaseFetcher
-from .exceptions import FetcherError, MailAccountError
+from .exceptions import (
+    FetcherError,
+    MailAccountError,
+    MailHostThrottledError,
+    wrap_fetcher_error,
+)
 from .SafePOPMixin import SafePOPMixin
 
 
 if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+
     from core.models.Account import Account
     from core.models.Email import Email
     from core.models.Mailbox import Mailbox
 
+    from .exceptions import MailboxError
+    from .FetchingFilter import FetchingFilter
+
 
 class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
     """Maintains a connection to the POP server and fetches data using :mod:`poplib`.
@@ -50,11 +63,17 @@ class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
     PROTOCOL = EmailProtocolChoices.POP3.value
     """Name of the used protocol, refers to :attr:`MailFetchingProtocols.POP3`."""
 
-    AVAILABLE_FETCHING_CRITERIA = (EmailFetchingCriterionChoices.ALL.value,)
+    AVAILABLE_FETCHING_CRITERIA = (
+        EmailFetchingCriterionChoices.ALL.value,
+        EmailFetchingCriterionChoices.INCREMENTAL.value,
+    )
     """Tuple of all criteria available for fetching. Refers to :class:`MailFetchingCriteria`.
     Must be immutable!
     """
 
+    IS_REUSABLE = False
+    """POP servers only list the messages that were in the maildrop at login, so sessions are not reused."""
+
     @override
     def __init__(self, account: Account) -> None:
         """Constructor, starts the POP connection and logs into the account.
@@ -89,7 +108,9 @@ class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
                 self._mail_client = poplib.POP3(host=mail_host, timeout=timeout)
         except Exception as error:
             self.logger.exception("Error connecting to %s!", self.account)
-            raise MailAccountError(error, _("connecting")) from error
+            raise wrap_fetcher_error(
+                MailAccountError, error, _("connecting")
+            ) from error
         self.logger.info("Successfully connected to %s.", self.account)
 
     @override
@@ -115,43 +136,164 @@ class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
             self.logger.debug("Successfully tested %s.", mailbox)
 
     @override
-    def fetch_emails(
+    def stream_emails(
         self,
         mailbox: Mailbox,
         criterion: str = EmailFetchingCriterionChoices.ALL,
-    ) -> list[bytes]:
-        """Fetches and returns all maildata from the server.
+        fetching_filter: FetchingFilter | None = None,
+    ) -> Generator[bytes | BinaryIO]:
+        """Lazily fetches maildata from the server.
+
+        Messages that are already archived or thrown out as spam are skipped
+        based on their headers before they are downloaded.
+        POP can't search, so the same goes for the messages that don't match the :attr:`fetching_filter`.
+        So are messages larger than `FETCH_MAX_EMAIL_DATASIZE` by their size in the LIST response,
+        messages larger than `FETCH_SPOOL_EMAIL_DATASIZE` are spooled to a temporary file.
+        For the incremental criterion, messages whose UIDL is in :attr:`core.models.Mailbox.fetched_uidls`
+        are skipped as well and the UIDLs of the consumed messages are added to it.
+        Messages that don't match the :attr:`fetching_filter` are not added,
+        as the other daemons of the mailbox still need them.
+        :attr:`core.models.Mailbox.fetch_checkpoint` is moved to the UIDL of every consumed message,
+        messages up to the checkpoint of an interrupted run are not retrieved again.
+        Message numbers are only valid within a session, so without UIDLs
+        the run is not checkpointed and restarts from the beginning, relying on the duplicate check.
+        A fetch with a :attr:`fetching_filter` leaves the checkpoint untouched.
 
         Args:
             mailbox: Database model of the mailbox to fetch data from.
-            criterion: POP only supports ALL lookups.
+            criterion: POP only supports ALL and INCREMENTAL lookups.
                 Defaults to :attr:`eonvelope.MailFetchingCriteria.ALL`.
                 This arg ensures compatibility with the other fetchers.
+            fetching_filter: Additional filter that the mails must match.
+                Defaults to `None`, meaning no additional filter.
 
-        Returns:
-            List of :class:`email.message.EmailMessage` mails in the mailbox.
+        Yields:
+            The mails in the mailbox as :class:`bytes` or spooled to a file.
 
         Raises:
             ValueError: If the :attr:`mailbox` does not belong to :attr:`self.account`.
-                If :attr:`criterion` is not :attr:`eonvelope.MailFetchingCriteria.ALL`.
+                If :attr:`criterion` is not in :attr:`POP3Fetcher.AVAILABLE_FETCHING_CRITERIA`.
             MailAccountError: If an error occurs or a bad response is returned.
         """
-        self.logger.debug("Fetching all messages in %s ...", mailbox)
+        self.logger.debug("Fetching %s messages in %s ...", criterion, mailbox)
 
-        super().fetch_emails(mailbox, criterion)
+        super().stream_emails(mailbox, criterion, fetching_filter)
 
         self.logger.debug("Listing all messages in %s ...", mailbox)
 
         _, message_numbers_list, _ = self.safe_list()
 
-        message_count = len(message_numbers_list)
-        self.logger.info("Found %s messages in %s.", message_count, mailbox)
+        message_numbers = list(range(1, len(message_numbers_list) + 1))
+        message_sizes = self.parse_message_sizes(message_numbers_list)
+        self.logger.info("Found %s messages in %s.", len(message_numbers), mailbox)
+
+        message_uidls = self.list_unique_ids(mailbox)
+        fetched_uidls: set[str] = set()
+        if criterion == EmailFetchingCriterionChoices.INCREMENTAL:
+            fetched_uidls = set(mailbox.fetched_uidls).intersection(
+                message_uidls.values()
+            )
+            message_numbers = [
+                number
+                for number in message_numbers
+                if message_uidls.get(number) not in fetched_uidls
+            ]
+            self.logger.info(
+                "Found %s messages that were not fetched yet in %s.",
+                len(message_numbers),
+                mailbox,
+            )
+
+        self.logger.debug("Retrieving %s messages in %s ...", criterion, mailbox)
+        try:
+            new_message_numbers, filtered_out_numbers = self.filter_new_messages(
+                mailbox,
+                self.skip_to_checkpoint(
+                    mailbox,
+                    message_numbers,
+                    lambda number: message_uidls.get(number, ""),
+                ),
+                fetching_filter=fetching_filter,
+                message_sizes=message_sizes,
+            )
+            new_message_sizes = self.drop_oversized_messages(
+                mailbox,
+                {
+                    number: message_sizes.get(number, 0)
+                    for number in new_message_numbers
+                },
+                get_config("FETCH_MAX_EMAIL_DATASIZE"),
+            )
+            fetched_uidls.update(
+                message_uidls[number]
+                for number in set(message_numbers).difference(
+                    new_message_sizes, filtered_out_numbers
+                )
+                if number in message_uidls
+            )
+            for number, message_data in self.retrieve_messages(
+                mailbox, new_message_sizes
+            ):
+                if message_data is None:
+                    continue
+                yield message_data
+                if number in message_uidls:
+                    if fetching_filter is None:
+                        mailbox.fetch_checkpoint = message_uidls[number]
+                    fetched_uidls.add(message_uidls[number])
+            self.logger.debug(
+                "Successfully fetched %s messages in %s.", criterion, mailbox
+            )
+        finally:
+            if criterion == EmailFetchingCriterionChoices.INCREMENTAL and message_uidls:
+                mailbox.fetched_uidls = sorted(fetched_uidls)
+
+    @staticmethod
+    def parse_message_sizes(message_numbers_list: list[bytes]) -> dict[int, int]:
+        """Reads the sizes of the messages from a LIST response.
+
+        Args:
+            message_numbers_list: The lines of the LIST response.
+
+        Returns:
+            The sizes of the messages in bytes by their number.
+            Messages with a malformed line are not included.
+        """
+        message_sizes = {}
+        for line in message_numbers_list:
+            number, _, size = line.partition(b" ")
+            if number.isdigit() and size.strip().isdigit():
+                message_sizes[int(number)] = int(size)
+        return message_sizes
+
+    def retrieve_messages(
+        self, mailbox: Mailbox, message_sizes: dict[int, int]
+    ) -> Generator[tuple[int, bytes | BinaryIO | None]]:
+        """Lazily retrieves messages from the server.
+
+        Messages larger than `FETCH_SPOOL_EMAIL_DATASIZE` are written line by line to a temporary file,
+        which is deleted once the generator is resumed.
 
-        self.logger.debug("Retrieving all messages in %s ...", mailbox)
-        mail_data_list = []
-        for number in range(message_count):
+        Args:
+            mailbox: The mailbox the messages are in.
+            message_sizes: The sizes of the messages to retrieve by their number, 0 if unknown.
+
+        Yields:
+            The number of every message with its data as :class:`bytes` or spooled to a file
+            or `None` if the message could not be retrieved.
+        """
+        spool_datasize = get_config("FETCH_SPOOL_EMAIL_DATASIZE")
+        for number, size in message_sizes.items():
             try:
-                _, message_data, _ = self.safe_retr(number + 1)
+                if 0 < spool_datasize < size:
+                    with TemporaryFile() as spool_file:
+                        self.safe_retr_to_file(number, spool_file)
+                        spool_file.seek(0)
+                        yield number, spool_file
+                    continue
+                _, message_data, _ = self.safe_retr(number)
+            except MailHostThrottledError:
+                raise
             except FetcherError:
                 self.logger.warning(
                     "Failed to fetch message %s from %s!",
@@ -159,13 +301,108 @@ class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
                     mailbox,
                     exc_info=True,
                 )
+                yield number, None
                 continue
+            yield number, b"\n".join(message_data)
+
+    def list_unique_ids(self, mailbox: Mailbox) -> dict[int, str]:
+        """Lists the unique ids of all messages on the server.
+
+        Args:
+            mailbox: The mailbox the messages are in.
+
+        Returns:
+            The UIDLs of the messages by their message number.
+            Empty if the server does not support UIDL.
+        """
+        self.logger.debug("Listing the unique ids of all messages in %s ...", mailbox)
+        try:
+            _, uidl_lines, _ = self.safe_uidl()
+        except MailHostThrottledError:
+            raise
+        except FetcherError:
+            self.logger.warning(
+                "Failed to list the unique ids of the messages in %s!",
+                mailbox,
+                exc_info=True,
+            )
+            return {}
+        message_uidls = {}
+        for line in uidl_lines:
+            number, _, uidl = line.decode("utf-8", errors="replace").partition(" ")
+            message_uidls[int(number)] = uidl.strip()
+        return message_uidls
+
+    def filter_new_messages(
+        self,
+        mailbox: Mailbox,
+        message_numbers: list[int],
+        fetching_filter: FetchingFilter | None = None,
+        message_sizes: dict[int, int] | None = None,
+    ) -> tuple[list[int], set[int]]:
+        """Drops the messages that are already in the mailbox, thrown out as spam or filtered out.
+
+        Only the headers of the messages are retrieved for this using TOP,
+        in chunks of :attr:`HEADER_CHUNK_SIZE` with one database lookup per chunk.
+        Messages without Message-ID and messages whose headers failed to be retrieved are kept.
 
-            full_message = b"\n".join(message_data)
-            mail_data_list.append(full_message)
-        self.logger.debug("Successfully fetched all messages in %s.", mailbox)
+        Args:
+            mailbox: The mailbox the messages are in.
+            message_numbers: The numbers of the candidate messages.
+            fetching_filter: The filter that the messages must match. Defaults to `None`.
+            message_sizes: The sizes of the messages in bytes by their number. Defaults to `None`.
 
-        return mail_data_list
+        Returns:
+            The numbers of the messages that need to be downloaded
+            and the numbers of the messages that don't match :attr:`fetching_filter`.
+        """
+        throw_out_spam = get_config("THROW_OUT_SPAM")
+        new_message_numbers = []
+        filtered_out_numbers: set[int] = set()
+        for chunk_numbers in itertools.batched(
+            message_numbers, self.HEADER_CHUNK_SIZE, strict=False
+        ):
+            chunk_headers = {}
+            for number in chunk_numbers:
+                try:
+                    _, header_lines, _ = self.safe_top(number, 0)
+                except MailHostThrottledError:
+                    raise
+                except FetcherError:
+                    self.logger.warning(
+                        "Failed to fetch headers of message %s from %s, downloading it!",
+                        number,
+                        mailbox,
+                        exc_info=True,
+                    )
+                    continue
+                chunk_headers[number] = b"\r\n".join(header_lines)
+            if fetching_filter is not None:
+                filtered_out_numbers.update(
+                    self.find_filtered_out_messages(
+                        chunk_headers, fetching_filter, message_sizes
+                    )
+                )
+            skipped_numbers = filtered_out_numbers.union(
+                self.find_skippable_messages(
+                    mailbox,
+                    {
+                        number: header_data
+                        for number, header_data in chunk_headers.items()
+                        if number not in filtered_out_numbers
+                    },
+                    throw_out_spam=throw_out_spam,
+                )
+            )
+            new_message_numbers.extend(
+                number for number in chunk_numbers if number not in skipped_numbers
+            )
+        self.logger.info(
+            "Skipping %d already archived, spam or filtered out messages in %s.",
+            len(message_numbers) - len(new_message_numbers),
+            mailbox,
+        )
+        return new_message_numbers, filtered_out_numbers
 
     @override
     def fetch_mailboxes(self) -> list[str]:
@@ -194,6 +431,24 @@ class POP3Fetcher(BaseFetcher, poplib.POP3, SafePOPMixin):
         """
         raise NotImplementedError("Restoring to POP account is not possible.")
 
+    @override
+    def append_batch(
+        self, mailbox: Mailbox, email_data: Sequence[bytes]
+    ) -> list[MailboxError | None]:
+        """Uploads the data of several emails to a mailbox.
+
+        Note:
+            POP doesn't offer an action to upload emails.
+
+        Args:
+            mailbox: The mailbox to upload to.
+            email_data: The data of the emails to upload.
+
+        Raises:
+            NotImplementedError: POP can't upload emails.
+        """
+        raise NotImplementedError("Restoring to POP account is not possible.")
+
     @override
     def close(self) -> None:
         """Logs out of the account and closes the connection to the POP server if it is open."""
@@ -20,6 +20,8 @@
 
 from __future__ import annotations
 
+import re
+import select
 from typing import TYPE_CHECKING, Any, Literal, Protocol, Self, TypeVar, overload
 
 from core.utils.fetchers.exceptions import (
@@ -27,13 +29,14 @@ from core.utils.fetchers.exceptions import (
     FetcherError,
     MailAccountError,
     MailboxError,
+    wrap_fetcher_error,
 )
 
 
 if TYPE_CHECKING:
     import imaplib
     import logging
-    from collections.abc import Callable
+    from collections.abc import Callable, Sequence
 
 type IMAP4Response = tuple[
     str,
@@ -89,6 +92,7 @@ class SafeIMAPMixin:
 
         Raises:
             exception_class: If the response status doesn't match the expectation.
+            MailHostThrottledError: Instead of :attr:`exception_class` if the server reports throttling.
         """
         status = response[0]
         if status != expected_status:
@@ -98,7 +102,9 @@ class SafeIMAPMixin:
                 response,
             )
             if exception_class is not None:
-                raise exception_class(BadServerResponseError(response), command_name)
+                raise wrap_fetcher_error(
+                    exception_class, BadServerResponseError(response), command_name
+                )
         self.logger.debug(
             "Server responded %s to %s as expected.",
             expected_status,
@@ -150,6 +156,7 @@ class SafeIMAPMixin:
 
         Raises:
             exception_class: If an error occurs or the status doesn't match the expectation.
+            MailHostThrottledError: Instead of :attr:`exception_class` if the server reports throttling.
         """
 
         def safe_wrapper(
@@ -166,7 +173,9 @@ class SafeIMAPMixin:
                         imap_action.__name__,
                     )
                     if exception_class is not None:
-                        raise exception_class(error, imap_action.__name__) from error
+                        raise wrap_fetcher_error(
+                            exception_class, error, imap_action.__name__
+                        ) from error
                     return None
                 else:
                     self.check_response(
@@ -201,6 +210,18 @@ class SafeIMAPMixin:
             )
         return response
 
+    @safe(exception_class=None)
+    def safe_capability(
+        self: IMAP4FetcherClass, *args: Any, **kwargs: Any
+    ) -> tuple[str, list[bytes]]:
+        """The :func:`safe` wrapped version of :func:`imaplib.IMAP4.capability`."""
+        return self._mail_client.capability(*args, **kwargs)
+
+    @safe(exception_class=None)
+    def safe_compress(self: IMAP4FetcherClass) -> tuple[str, list[bytes]]:
+        """The :func:`safe` wrapped IMAP COMPRESS command with DEFLATE, see https://datatracker.ietf.org/doc/html/rfc4978."""
+        return self._mail_client.xatom("COMPRESS", "DEFLATE")
+
     @safe(exception_class=MailboxError)
     def safe_select(
         self: IMAP4FetcherClass, *args: Any, **kwargs: Any
@@ -229,6 +250,79 @@ class SafeIMAPMixin:
         """The :func:`safe` wrapped version of :func:`imaplib.IMAP4.uid`."""
         return self._mail_client.uid(*args, **kwargs)
 
+    @safe(exception_class=None)
+    def safe_status(
+        self: IMAP4FetcherClass, *args: Any, **kwargs: Any
+    ) -> tuple[str, list[bytes | tuple[bytes, bytes]]]:
+        """The :func:`safe` wrapped version of :func:`imaplib.IMAP4.status`."""
+        return self._mail_client.status(*args, **kwargs)
+
+    @safe(exception_class=None)
+    def safe_status_batch(
+        self: IMAP4FetcherClass, mailbox_names: Sequence[bytes], status_items: str
+    ) -> tuple[str, list[tuple[bytes, bytes]]]:
+        """The :func:`safe` wrapped IMAP STATUS command for several mailboxes in a single round trip.
+
+        All STATUS commands are sent at once before any response is read, see RFC 3501 section 5.5.
+        The commands are spoken directly, as :mod:`imaplib` waits for the completion of every command.
+
+        Args:
+            mailbox_names: The modified UTF-7 encoded names of the mailboxes. Must not be empty.
+            status_items: The parenthesized list of status data items to request.
+
+        Returns:
+            `OK` if all STATUS commands succeeded, otherwise the status of the first that failed,
+            and the name and status data items of every mailbox that the server reported on.
+        """
+        tags = [b"STATUS%d" % number for number in range(len(mailbox_names))]
+        self._mail_client.send(
+            b"".join(
+                b'%s STATUS "%s" %s\r\n'
+                % (
+                    tag,
+                    mailbox_name.replace(b"\\", b"\\\\").replace(b'"', b'\\"'),
+                    status_items.encode(),
+                )
+                for tag, mailbox_name in zip(tags, mailbox_names, strict=True)
+            )
+        )
+        pending_tags = set(tags)
+        status = "OK"
+        responses = []
+        while pending_tags:
+            line = self._mail_client.readline()
+            if not line:
+                raise EOFError("The connection was closed during STATUS.")
+            if line.startswith(b"* STATUS "):
+                responses.append(self.parse_status_line(line[9:].rstrip(b"\r\n")))
+                continue
+            tag, _, result = line.partition(b" ")
+            if tag in pending_tags:
+                pending_tags.remove(tag)
+                if status == "OK":
+                    status = result.split(b" ", 1)[0].decode()
+        return status, responses
+
+    def parse_status_line(self: IMAP4FetcherClass, line: bytes) -> tuple[bytes, bytes]:
+        """Splits the rest of an untagged STATUS response into the mailbox name and the status data items.
+
+        A name sent as literal is read from the connection.
+
+        Args:
+            line: The response after `* STATUS ` without the line ending.
+
+        Returns:
+            The unquoted name of the mailbox and the parenthesized status data items.
+        """
+        if line.startswith(b'"'):
+            name, _, items = line[1:].partition(b'" (')
+            return re.sub(rb"\\(.)", rb"\1", name), b"(" + items
+        if literal_match := re.fullmatch(rb"\{(\d+)\}", line):
+            name = self._mail_client.read(int(literal_match.group(1)))
+            return name, self._mail_client.readline().strip()
+        name, _, items = line.partition(b" ")
+        return name, items
+
     @safe(exception_class=MailAccountError)
     def safe_noop(
         self: IMAP4FetcherClass, *args: Any, **kwargs: Any
@@ -250,6 +344,74 @@ class SafeIMAPMixin:
         """The :func:`safe` wrapped version of :func:`imaplib.IMAP4.append`."""
         return self._mail_client.append(*args, **kwargs)
 
+    @safe(exception_class=MailboxError)
+    def safe_multiappend(
+        self: IMAP4FetcherClass, mailbox_name: bytes, messages: Sequence[bytes]
+    ) -> tuple[str, list[bytes]]:
+        """The :func:`safe` wrapped IMAP MULTIAPPEND command, see https://datatracker.ietf.org/doc/html/rfc3502.
+
+        Uploads all messages to the mailbox in a single command.
+        The server appends either all or none of the messages.
+        The command is spoken directly, as :mod:`imaplib` only sends one literal per command.
+
+        Args:
+            mailbox_name: The modified UTF-7 encoded name of the mailbox, as for :func:`imaplib.IMAP4.append`.
+            messages: The messages to upload. Must not be empty.
+
+        Returns:
+            The status of the MULTIAPPEND command and the untagged responses received meanwhile.
+        """
+        tag = b"MULTIAPPEND"
+        line = tag + b" APPEND " + mailbox_name
+        responses = []
+        for message in messages:
+            self._mail_client.send(line + b" {%d}\r\n" % len(message))
+            while not (response := self._mail_client.readline()).startswith(b"+"):
+                if not response:
+                    raise EOFError("The connection was closed during MULTIAPPEND.")
+                if response.startswith(tag + b" "):
+                    return response.split()[1].decode(), responses
+                responses.append(response)
+            line = message
+        self._mail_client.send(line + b"\r\n")
+        while not (response := self._mail_client.readline()).startswith(tag + b" "):
+            if not response:
+                raise EOFError("The connection was closed during MULTIAPPEND.")
+            responses.append(response)
+        return response.split()[1].decode(), responses
+
+    @safe(exception_class=MailAccountError)
+    def safe_idle(self: IMAP4FetcherClass, timeout: float) -> tuple[str, list[bytes]]:
+        """The :func:`safe` wrapped IMAP IDLE command, see https://datatracker.ietf.org/doc/html/rfc2177.
+
+        Idles in the selected mailbox until the server sends an untagged response
+        or until the timeout has passed.
+        The command is spoken directly, the socket timeout of the connection can not be used for waiting
+        as a timed out socket can not be read from anymore.
+
+        Args:
+            timeout: The maximum time to idle in seconds.
+
+        Returns:
+            The status of the IDLE command and the untagged responses received while idling.
+        """
+        tag = b"IDLE"
+        self._mail_client.send(tag + b" IDLE\r\n")
+        line = self._mail_client.readline()
+        if not line.startswith(b"+"):
+            return line.split()[1].decode(), [line]
+        responses = []
+        # lines already buffered by the client are only picked up after the timeout
+        readable, _, _ = select.select([self._mail_client.socket()], [], [], timeout)
+        if readable:
+            responses.append(self._mail_client.readline())
+        self._mail_client.send(b"DONE\r\n")
+        while not (line := self._mail_client.readline()).startswith(tag + b" "):
+            if not line:
+                raise EOFError("The connection was closed during IDLE.")
+            responses.append(line)
+        return line.split()[1].decode(), responses
+
     @safe(exception_class=None, expected_status="BYE")
     def safe_logout(
         self: IMAP4FetcherClass, *args: Any, **kwargs: Any
@@ -20,12 +20,13 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Protocol, Self, TypeVar, overload
+from typing import TYPE_CHECKING, Any, BinaryIO, Protocol, Self, TypeVar, overload
 
 from core.utils.fetchers.exceptions import (
     BadServerResponseError,
     FetcherError,
     MailAccountError,
+    wrap_fetcher_error,
 )
 
 
@@ -79,6 +80,7 @@ class SafePOPMixin:
 
         Raises:
             exception_class: If the response status doesn't match the expectation.
+            MailHostThrottledError: Instead of :attr:`exception_class` if the server reports throttling.
         """
         status = response if isinstance(response, bytes) else response[0]
         if not status.startswith(expected_status):
@@ -88,7 +90,9 @@ class SafePOPMixin:
                 response,
             )
             if exception_class is not None:
-                raise exception_class(BadServerResponseError(response), command_name)
+                raise wrap_fetcher_error(
+                    exception_class, BadServerResponseError(response), command_name
+                )
         self.logger.debug(
             "Server responded %s to %s as expected.",
             status,
@@ -140,6 +144,7 @@ class SafePOPMixin:
 
         Raises:
             exception_class: If an error occurs or the status doesn't match the expectation.
+            MailHostThrottledError: Instead of :attr:`exception_class` if the server reports throttling.
         """
 
         def safe_wrapper(
@@ -156,7 +161,9 @@ class SafePOPMixin:
                         pop_action.__name__,
                     )
                     if exception_class is not None:
-                        raise exception_class(error, pop_action.__name__) from error
+                        raise wrap_fetcher_error(
+                            exception_class, error, pop_action.__name__
+                        ) from error
                     return None
                 else:
                     self.check_response(
@@ -197,6 +204,45 @@ class SafePOPMixin:
         """The :func:`safe` wrapped version of :func:`poplib.POP3.retr`."""
         return self._mail_client.retr(*args, **kwargs)
 
+    @safe(exception_class=MailAccountError)
+    def safe_retr_to_file(
+        self: POP3FetcherClass, which: int, spool_file: BinaryIO
+    ) -> tuple[bytes, list[bytes], int]:
+        """The :func:`safe` wrapped version of :func:`poplib.POP3.retr`
+        that writes the message line by line to :attr:`spool_file` instead of collecting its lines.
+
+        Returns:
+            The response of the server with an empty list of lines and the size of the message.
+        """
+        # poplib has no public way to receive a message in pieces,
+        # this follows poplib.POP3._longcmd
+        self._mail_client._putcmd(f"RETR {which}")  # noqa: SLF001
+        response = self._mail_client._getresp()  # noqa: SLF001
+        octets = 0
+        line, line_octets = self._mail_client._getline()  # noqa: SLF001
+        while line != b".":
+            if line.startswith(b".."):
+                line_octets -= 1
+                line = line[1:]
+            octets += line_octets
+            spool_file.write(line + b"\n")
+            line, line_octets = self._mail_client._getline()  # noqa: SLF001
+        return response, [], octets
+
+    @safe(exception_class=MailAccountError)
+    def safe_uidl(
+        self: POP3FetcherClass, *args: Any, **kwargs: Any
+    ) -> tuple[bytes, list[bytes], int]:
+        """The :func:`safe` wrapped version of :func:`poplib.POP3.uidl`."""
+        return self._mail_client.uidl(*args, **kwargs)
+
+    @safe(exception_class=MailAccountError)
+    def safe_top(
+        self: POP3FetcherClass, *args: Any, **kwargs: Any
+    ) -> tuple[bytes, list[bytes], int]:
+        """The :func:`safe` wrapped version of :func:`poplib.POP3.top`."""
+        return self._mail_client.top(*args, **kwargs)
+
     @safe(exception_class=None)
     def safe_quit(self: POP3FetcherClass, *args: Any, **kwargs: Any) -> bytes:
         """The :func:`safe` wrapped version of :func:`poplib.POP3.quit`."""
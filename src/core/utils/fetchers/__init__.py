@@ -18,19 +18,30 @@
 
 """core.utils.fetchers package containing the email fetcher classes for Eonvelope project."""
 
+from .AsyncIMAP4_SSL_Fetcher import AsyncIMAP4_SSL_Fetcher
+from .AsyncIMAP4Fetcher import AsyncIMAP4Fetcher
 from .BaseFetcher import BaseFetcher
 from .ExchangeFetcher import ExchangeFetcher
+from .FetcherPool import FetcherPool, fetcher_pool
+from .FetchingFilter import FetchingFilter
 from .IMAP4_SSL_Fetcher import IMAP4_SSL_Fetcher
 from .IMAP4Fetcher import IMAP4Fetcher
+from .JMAPFetcher import JMAPFetcher
 from .POP3_SSL_Fetcher import POP3_SSL_Fetcher
 from .POP3Fetcher import POP3Fetcher
 
 
 __all__ = [
+    "AsyncIMAP4Fetcher",
+    "AsyncIMAP4_SSL_Fetcher",
     "BaseFetcher",
     "ExchangeFetcher",
+    "FetcherPool",
+    "FetchingFilter",
     "IMAP4Fetcher",
     "IMAP4_SSL_Fetcher",
+    "JMAPFetcher",
     "POP3Fetcher",
     "POP3_SSL_Fetcher",
+    "fetcher_pool",
 ]
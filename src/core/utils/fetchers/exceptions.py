@@ -20,6 +20,7 @@
 
 from __future__ import annotations
 
+import re
 from typing import TYPE_CHECKING, Any
 
 from django.utils.translation import gettext_lazy as _
@@ -69,9 +70,80 @@ class MailboxError(FetcherError):
         )
 
 
+class MailHostThrottledError(FetcherError):
+    """Exception for a mailserver refusing requests because too many have been made.
+
+    Deliberately not a :class:`MailAccountError` or :class:`MailboxError`,
+    as throttling says nothing about the health of the account or mailbox.
+    """
+
+    THROTTLING_PATTERN = re.compile(
+        r"\[(?:THROTTLED|LOGIN-DELAY)\]|too many|throttl|rate limit|ServerBusy",
+        re.IGNORECASE,
+    )
+    """Pattern of the response codes and messages that servers use to report throttling.
+
+    Covers the THROTTLED IMAP response code, the LOGIN-DELAY POP3 response code of RFC 2449
+    and the busy errors of Exchange.
+    Codes like IN-USE or UNAVAILABLE are not included, as they report a locked mailbox
+    or an outage rather than too many requests.
+    """
+
+    def __init__(
+        self, error: Exception, command_name: StrOrPromise = "interaction"
+    ) -> None:
+        """Extended for consistent message formatting."""
+        super().__init__(
+            _(
+                "A %(error_class_name)s: %(error)s occurred during %(command_name)s, the mailserver is throttling requests!"
+            )
+            % {
+                "error_class_name": error.__class__.__name__,
+                "error": error,
+                "command_name": _(str(command_name)),
+            }
+        )
+
+    @classmethod
+    def is_throttling(cls, error: Exception) -> bool:
+        """Checks whether an error reports that the mailserver is throttling requests.
+
+        Args:
+            error: The error to check.
+
+        Returns:
+            Whether the error or its message matches :attr:`THROTTLING_PATTERN`.
+        """
+        return bool(
+            cls.THROTTLING_PATTERN.search(f"{error.__class__.__name__}: {error}")
+        )
+
+
+def wrap_fetcher_error(
+    exception_class: type[FetcherError],
+    error: Exception,
+    command_name: StrOrPromise = "interaction",
+) -> FetcherError:
+    """Wraps an error during an operation on a mailserver.
+
+    Args:
+        exception_class: The class to wrap the error in.
+        error: The error to wrap.
+        command_name: The name of the failed operation.
+
+    Returns:
+        A :class:`MailHostThrottledError` if the error reports throttling,
+        otherwise an instance of :attr:`exception_class`.
+    """
+    if MailHostThrottledError.is_throttling(error):
+        return MailHostThrottledError(error, command_name)
+    return exception_class(error, command_name)
+
+
 class BadServerResponseError(Exception):
     """Exception for unexpected server responses."""
 
     def __init__(self, response: Any = "") -> None:
-        """Extended for consistent message formatting."""
+        """Extended for consistent message formatting, keeps the response for inspection."""
         super().__init__(_("Server responded %(response)s!") % {"response": response})
+        self.response = response
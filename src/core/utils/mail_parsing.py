@@ -25,28 +25,84 @@ Global variables:
 from __future__ import annotations
 
 import contextlib
+import email
 import email.header
+import email.parser
 import email.utils
 import logging
+import os
 import re
 from base64 import b64encode
+from dataclasses import dataclass, field
 from datetime import datetime, time
-from typing import TYPE_CHECKING, TextIO
+from email import policy
+from hashlib import md5
+from typing import TYPE_CHECKING, BinaryIO, TextIO
 
 import imap_tools.imap_utf7
 import vobject
 from django.utils import timezone
 from django.utils.timezone import get_current_timezone
 
+from core.constants import HeaderFields
+
 
 if TYPE_CHECKING:
+    from collections.abc import Container
     from email.header import Header
-    from email.message import EmailMessage
+    from email.message import EmailMessage, Message
 
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class ParsedAttachment:
+    """An attachment part of an email as parsed by :func:`get_attachment_parts`.
+
+    Attributes:
+        file_name: The filename of the part or the hash of its payload if it has none.
+        content_disposition: The content disposition of the part.
+        content_id: The Content-ID header of the part.
+        content_maintype: The content maintype of the part.
+        content_subtype: The content subtype of the part.
+        payload: The decoded payload of the part.
+    """
+
+    file_name: str
+    content_disposition: str
+    content_id: str
+    content_maintype: str
+    content_subtype: str
+    payload: bytes
+
+
+@dataclass(frozen=True)
+class ParsedEmail:
+    """The data of an email as parsed by :func:`parse_email`.
+
+    Holds only plain values, so it can be pickled
+    and passed between the processes parsing and saving the emails.
+
+    Attributes:
+        message_id: The Message-ID header, empty if there is none.
+        headers: The decoded headers by their lowercase names.
+        bodytexts: The bodytexts by their content subtypes.
+        datasize: The size of the email data in bytes.
+        attachments: The attachment parts of the email.
+        correspondents: The name and address tuples of the correspondents by their mention types.
+        references: The Message-IDs in the References header.
+    """
+
+    message_id: str
+    headers: dict[str, str]
+    bodytexts: dict[str, str]
+    datasize: int
+    attachments: list[ParsedAttachment] = field(default_factory=list)
+    correspondents: dict[str, list[tuple[str, str]]] = field(default_factory=dict)
+    references: list[str] = field(default_factory=list)
+
+
 def decode_header(header: Header | str) -> str:
     """Decodes an email header field.
 
@@ -97,6 +153,34 @@ def get_header(
     )
 
 
+def get_headers(
+    email_message: EmailMessage,
+    joining_string: str = ",",
+) -> dict[str, str]:
+    """Gets all headers from a :class:`email.message.EmailMessage` in a single pass.
+
+    Equivalent to calling :func:`get_header` for every header name,
+    without searching the header list again for each of them.
+
+    Args:
+        email_message: The message to get the headers from.
+        joining_string: The string to join multiple headers with. Default to ',' which is safe for CharFields.
+
+    Returns:
+        The decoded header fields by their lowercase names,
+        in the order of their first occurrence.
+    """
+    header_values: dict[str, list[str]] = {}
+    for header_name, header in email_message.items():
+        header_values.setdefault(header_name.lower(), []).append(
+            decode_header(header).strip()
+        )
+    return {
+        header_name: joining_string.join(values)
+        for header_name, values in header_values.items()
+    }
+
+
 def parse_datetime_header(date_header: str | None) -> datetime:
     """Parses the date header into a datetime object.
 
@@ -138,13 +222,243 @@ def get_bodytexts(email_message: EmailMessage) -> dict[str, str]:
     Returns:
         A dict containing the bodytexts with their contenttypes as keys.
     """
+    bodytexts, _ = get_bodytexts_and_attachment_parts(email_message)
+    return bodytexts
+
+
+def parse_attachment_part(
+    part: Message,
+    content_disposition: str | None,
+    content_maintype: str,
+    content_subtype: str,
+    ignore_maintypes: Container[str] = (),
+    ignore_subtypes: Container[str] = (),
+) -> ParsedAttachment | None:
+    """Parses a non-multipart part of an email if it is an attachment.
+
+    Args:
+        part: The part to parse.
+        content_disposition: The content disposition of the part.
+        content_maintype: The content maintype of the part.
+        content_subtype: The content subtype of the part.
+        ignore_maintypes: Content maintypes of parts that are not parsed. Defaults to none.
+        ignore_subtypes: Content subtypes of parts that are not parsed. Defaults to none.
+
+    Returns:
+        The attachment part.
+        None if the part is no attachment, its content type is ignored or it has no payload.
+    """
+    # first part of the condition checks whether the part qualifies as attachment in general,
+    # the second one whether the parts contenttype is blacklisted
+    if not (
+        content_disposition
+        or (content_maintype != "text" or content_subtype not in ["plain", "html"])
+    ) or (content_maintype in ignore_maintypes or content_subtype in ignore_subtypes):
+        return None
+    part_payload = part.get_payload(decode=True)
+    if not isinstance(part_payload, bytes):
+        return None
+    return ParsedAttachment(
+        file_name=(
+            part.get_filename()
+            or md5(part_payload).hexdigest()  # noqa: S324  # no safe hash required here
+            + f".{content_subtype}"
+        ),
+        content_disposition=content_disposition or "",
+        content_id=part.get(HeaderFields.CONTENT_ID, ""),
+        content_maintype=content_maintype,
+        content_subtype=content_subtype,
+        payload=part_payload,
+    )
+
+
+def get_attachment_parts(
+    email_message: EmailMessage,
+    ignore_maintypes: Container[str] = (),
+    ignore_subtypes: Container[str] = (),
+) -> list[ParsedAttachment]:
+    """Parses the attachments from a :class:`email.message.EmailMessage`.
+
+    Args:
+        email_message: The message to parse the attachments from.
+        ignore_maintypes: Content maintypes of parts that are not parsed. Defaults to none.
+        ignore_subtypes: Content subtypes of parts that are not parsed. Defaults to none.
+
+    Returns:
+        The attachment parts in the order they appear in the message.
+    """
+    _, attachments = get_bodytexts_and_attachment_parts(
+        email_message, ignore_maintypes, ignore_subtypes
+    )
+    return attachments
+
+
+def get_bodytexts_and_attachment_parts(
+    email_message: EmailMessage,
+    ignore_maintypes: Container[str] = (),
+    ignore_subtypes: Container[str] = (),
+) -> tuple[dict[str, str], list[ParsedAttachment]]:
+    """Parses the bodytexts and the attachments from a :class:`email.message.EmailMessage`.
+
+    Walks the MIME tree only once, reading the content type of every part a single time.
+
+    Args:
+        email_message: The message to parse the bodytexts and attachments from.
+        ignore_maintypes: Content maintypes of parts that are not parsed as attachments.
+            Defaults to none.
+        ignore_subtypes: Content subtypes of parts that are not parsed as attachments.
+            Defaults to none.
+
+    Returns:
+        A dict containing the bodytexts with their contenttypes as keys
+        and the attachment parts in the order they appear in the message.
+    """
     bodytexts = {}
+    attachments = []
     for part in email_message.walk():
+        if part.is_multipart():
+            # for safe get_payload
+            continue
+        content_disposition = part.get_content_disposition()
         content_maintype = part.get_content_maintype()
         content_subtype = part.get_content_subtype()
-        if content_maintype == "text" and not part.get_content_disposition():
+        if content_maintype == "text" and not content_disposition:
             bodytexts[content_subtype] = part.get_content()
-    return bodytexts
+        attachment = parse_attachment_part(
+            part,
+            content_disposition,
+            content_maintype,
+            content_subtype,
+            ignore_maintypes,
+            ignore_subtypes,
+        )
+        if attachment is not None:
+            attachments.append(attachment)
+    return bodytexts, attachments
+
+
+def get_correspondent_tuples(
+    headers: dict[str, str],
+) -> dict[str, list[tuple[str, str]]]:
+    """Parses the correspondents from the headers of an email.
+
+    Args:
+        headers: The decoded headers by their lowercase names.
+
+    Returns:
+        The name and address tuples of the correspondents by their mention types.
+        Mentions without a header are left out.
+    """
+    correspondents = {}
+    for mention in HeaderFields.Correspondents.values:
+        correspondent_header = headers.get(mention)
+        if correspondent_header:
+            correspondents[mention] = email.utils.getaddresses([correspondent_header])
+    return correspondents
+
+
+def get_referenced_message_ids(references_header: str | None) -> list[str]:
+    """Parses the Message-IDs from a References header.
+
+    Args:
+        references_header: The References header.
+
+    Returns:
+        The referenced Message-IDs in the order of the header.
+    """
+    if not references_header:
+        return []
+    return [
+        message_id.strip()
+        for message_id in re.split(r"[ ,]", references_header)
+        if message_id.strip()  # re.split may produce empty strings
+    ]
+
+
+def message_from_data(
+    email_data: bytes | BinaryIO, *, headersonly: bool = False
+) -> EmailMessage:
+    """Parses an email in bytes form or spooled to a binary file.
+
+    Files are parsed from their start without reading them into memory as a whole.
+
+    Args:
+        email_data: The email bytes or file.
+        headersonly: Whether to parse only the headers and keep the body as unparsed payload.
+            Defaults to `False`.
+
+    Returns:
+        The parsed email message.
+    """
+    parser = email.parser.BytesParser(policy=policy.default)
+    if isinstance(email_data, bytes):
+        return parser.parsebytes(email_data, headersonly=headersonly)
+    email_data.seek(0)
+    return parser.parse(email_data, headersonly=headersonly)
+
+
+def parse_email_message(
+    email_message: EmailMessage,
+    datasize: int,
+    ignore_maintypes: Container[str] = (),
+    ignore_subtypes: Container[str] = (),
+) -> ParsedEmail:
+    """Parses the data of an email from a :class:`email.message.EmailMessage`.
+
+    Args:
+        email_message: The message to parse.
+        datasize: The size of the email data in bytes.
+        ignore_maintypes: Content maintypes of parts that are not parsed as attachments.
+            Defaults to none.
+        ignore_subtypes: Content subtypes of parts that are not parsed as attachments.
+            Defaults to none.
+
+    Returns:
+        The parsed email data.
+    """
+    headers = get_headers(email_message)
+    bodytexts, attachments = get_bodytexts_and_attachment_parts(
+        email_message, ignore_maintypes, ignore_subtypes
+    )
+    return ParsedEmail(
+        message_id=headers.get(HeaderFields.MESSAGE_ID, ""),
+        headers=headers,
+        bodytexts=bodytexts,
+        datasize=datasize,
+        attachments=attachments,
+        correspondents=get_correspondent_tuples(headers),
+        references=get_referenced_message_ids(headers.get(HeaderFields.REFERENCES)),
+    )
+
+
+def parse_email(
+    email_data: bytes | BinaryIO,
+    ignore_maintypes: Container[str] = (),
+    ignore_subtypes: Container[str] = (),
+) -> ParsedEmail:
+    """Parses the data of an email in bytes form or spooled to a binary file.
+
+    Doesn't touch the database or the settings,
+    so it can run in worker processes that don't set up Django.
+
+    Args:
+        email_data: The email bytes or file.
+        ignore_maintypes: Content maintypes of parts that are not parsed as attachments.
+            Defaults to none.
+        ignore_subtypes: Content subtypes of parts that are not parsed as attachments.
+            Defaults to none.
+
+    Returns:
+        The parsed email data.
+    """
+    datasize = (
+        len(email_data)
+        if isinstance(email_data, bytes)
+        else email_data.seek(0, os.SEEK_END)
+    )
+    return parse_email_message(
+        message_from_data(email_data), datasize, ignore_maintypes, ignore_subtypes
+    )
 
 
 def parse_mailbox_name(mailbox_data: bytes | str) -> str:
@@ -56,6 +56,7 @@ class BaseAccountForm(RequiredMarkerModelForm):
             "protocol",
             "mail_host_port",
             "timeout",
+            "use_compression",
         ]
         """Exposes all fields that the user should be able to change."""
 
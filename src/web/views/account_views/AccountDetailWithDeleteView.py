@@ -29,7 +29,7 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic.edit import DeletionMixin
 
 from core.models import Account, Email
-from core.utils.fetchers.exceptions import MailAccountError
+from core.utils.fetchers.exceptions import FetcherError
 from web.mixins.CustomActionMixin import CustomActionMixin
 from web.mixins.TestActionMixin import TestActionMixin
 from web.views.base import DetailWithDeleteView
@@ -94,7 +94,7 @@ class AccountDetailWithDeleteView(
         self.object = self.get_object()
         try:
             self.object.update_mailboxes()
-        except MailAccountError as error:
+        except FetcherError as error:
             messages.error(
                 request,
                 _("Updating mailboxes failed: %(error)s") % {"error": str(error)},
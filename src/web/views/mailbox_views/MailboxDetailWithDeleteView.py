@@ -30,6 +30,7 @@ from django.views.generic.edit import DeletionMixin
 
 from core.constants import EmailFetchingCriterionChoices
 from core.models import Email, Mailbox
+from core.tasks import restore_emails
 from core.utils.fetchers.exceptions import FetcherError
 from web.mixins.CustomActionMixin import CustomActionMixin
 from web.mixins.TestActionMixin import TestActionMixin
@@ -114,3 +115,34 @@ class MailboxDetailWithDeleteView(
             messages.success(request, _("Fetching successful"))
         self.object.refresh_from_db()
         return self.get(request)
+
+    def handle_restore(self, request: HttpRequest) -> HttpResponse:
+        """Handler function for the `restore` action.
+
+        Queues the restoring of all emails of the mailbox that have an eml file.
+
+        Args:
+            request: The action request to handle.
+
+        Returns:
+            A template response with the updated view after the action.
+        """
+        self.object = self.get_object()
+        if not self.object.can_restore_emails:
+            messages.warning(request, _("Emails can not be restored to this mailbox."))
+            return self.get(request)
+        email_ids = list(
+            self.object.emails.filter(file_path__isnull=False).values_list(
+                "pk", flat=True
+            )
+        )
+        if not email_ids:
+            messages.warning(request, _("There are no emails to restore."))
+            return self.get(request)
+        restore_emails.delay(email_ids)
+        messages.success(
+            request,
+            _("Restoring of %(count)d emails to the mailbox started.")
+            % {"count": len(email_ids)},
+        )
+        return self.get(request)
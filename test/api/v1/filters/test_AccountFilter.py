@@ -182,6 +182,26 @@ def test_last_error_occurred_at_filter(
         assert data.id - 1 in expected_indices
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "lookup_expr, filterquery, expected_indices", BOOL_TEST_PARAMETERS
+)
+def test_use_compression_filter(
+    account_queryset, lookup_expr, filterquery, expected_indices
+):
+    """Tests :class:`api.v1.filters.AccountFilterSet`'s filtering
+    for the :attr:`core.models.Account.Account.use_compression` field.
+    """
+    query = {"use_compression" + lookup_expr: filterquery}
+
+    filtered_data = AccountFilterSet(query, queryset=account_queryset).qs
+
+    assert filtered_data.distinct().count() == filtered_data.count()
+    assert filtered_data.count() == len(expected_indices)
+    for data in filtered_data:
+        assert data.id - 1 in expected_indices
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     "lookup_expr, filterquery, expected_indices", BOOL_TEST_PARAMETERS
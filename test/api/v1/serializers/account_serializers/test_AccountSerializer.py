@@ -56,6 +56,8 @@ def test_output(fake_account, request_context):
     assert serializer_data["protocol"] == fake_account.protocol
     assert "timeout" in serializer_data
     assert serializer_data["timeout"] == fake_account.timeout
+    assert "use_compression" in serializer_data
+    assert serializer_data["use_compression"] == fake_account.use_compression
     assert "is_healthy" in serializer_data
     assert serializer_data["is_healthy"] == fake_account.is_healthy
     assert "last_error" in serializer_data
@@ -71,7 +73,7 @@ def test_output(fake_account, request_context):
     assert "updated" in serializer_data
     assert datetime.fromisoformat(serializer_data["updated"]) == fake_account.updated
     assert "user" not in serializer_data
-    assert len(serializer_data) == 13
+    assert len(serializer_data) == 14
 
 
 @pytest.mark.django_db
@@ -97,6 +99,8 @@ def test_input(account_payload, request_context):
     assert serializer_data["protocol"] == account_payload["protocol"]
     assert "timeout" in serializer_data
     assert serializer_data["timeout"] == account_payload["timeout"]
+    assert "use_compression" in serializer_data
+    assert serializer_data["use_compression"] == account_payload["use_compression"]
     assert "is_healthy" not in serializer_data
     assert "last_error" not in serializer_data
     assert "last_error_occurred_at" not in serializer_data
@@ -107,7 +111,7 @@ def test_input(account_payload, request_context):
     assert "user" in serializer_data
     assert serializer_data["user"] == request_context["request"].user
 
-    assert len(serializer_data) == 8
+    assert len(serializer_data) == 9
 
 
 @pytest.mark.django_db
@@ -81,7 +81,21 @@ def test_output(fake_daemon, request_context):
     assert datetime.fromisoformat(serializer_data["created"]) == fake_daemon.created
     assert "updated" in serializer_data
     assert datetime.fromisoformat(serializer_data["updated"]) == fake_daemon.updated
-    assert len(serializer_data) == 11
+    assert "fetch_progress" in serializer_data
+    assert (
+        serializer_data["fetch_progress"]["fetch_progress"]
+        == fake_daemon.mailbox.fetch_progress
+    )
+    assert (
+        serializer_data["fetch_progress"]["is_fetch_complete"]
+        == fake_daemon.mailbox.is_fetch_complete
+    )
+    assert len(serializer_data["fetch_progress"]) == 6
+    assert "fetching_filter" in serializer_data
+    assert serializer_data["fetching_filter"] == fake_daemon.fetching_filter
+    assert "is_fetch_pending" in serializer_data
+    assert serializer_data["is_fetch_pending"] == fake_daemon.is_fetch_pending
+    assert len(serializer_data) == 14
 
 
 @pytest.mark.django_db
@@ -116,6 +130,7 @@ def test_input(daemon_with_interval_payload, request_context):
         == daemon_with_interval_payload["interval"]["period"]
     )
     assert "celery_task" not in serializer_data
+    assert "fetch_progress" not in serializer_data
     assert "last_error" not in serializer_data
     assert "is_healthy" not in serializer_data
     assert "last_error" not in serializer_data
@@ -176,6 +191,25 @@ def test_post_bad_fetching_criterion(
     assert serializer["fetching_criterion"].errors
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "bad_fetching_filter",
+    [{"unknown": "x"}, {"and": []}, {"larger": "big"}, {"since": "yesterday"}],
+)
+def test_post_bad_fetching_filter(
+    fake_daemon, daemon_with_interval_payload, request_context, bad_fetching_filter
+):
+    """Tests post direction of :class:`api.v1.serializers.BaseDaemonSerializer`."""
+    daemon_with_interval_payload["fetching_filter"] = bad_fetching_filter
+
+    serializer = BaseDaemonSerializer(
+        instance=fake_daemon, data=daemon_with_interval_payload, context=request_context
+    )
+
+    assert not serializer.is_valid()
+    assert serializer["fetching_filter"].errors
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     "unavailable_fetching_criterion",
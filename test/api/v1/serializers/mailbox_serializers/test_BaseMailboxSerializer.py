@@ -54,11 +54,30 @@ def test_output(fake_mailbox, request_context):
     assert (
         serializer_data["last_error_occurred_at"] == fake_mailbox.last_error_occurred_at
     )
+    assert "uid_validity" in serializer_data
+    assert serializer_data["uid_validity"] == fake_mailbox.uid_validity
+    assert "highest_uid" in serializer_data
+    assert serializer_data["highest_uid"] == fake_mailbox.highest_uid
+    assert "fetch_run_id" in serializer_data
+    assert serializer_data["fetch_run_id"] == fake_mailbox.fetch_run_id
+    assert "fetch_run_key" in serializer_data
+    assert serializer_data["fetch_run_key"] == fake_mailbox.fetch_run_key
+    assert "fetch_checkpoint" in serializer_data
+    assert serializer_data["fetch_checkpoint"] == fake_mailbox.fetch_checkpoint
+    assert "fetch_progress" in serializer_data
+    assert serializer_data["fetch_progress"] == fake_mailbox.fetch_progress
+    assert "fetch_checkpoint_at" in serializer_data
+    assert serializer_data["fetch_checkpoint_at"] == fake_mailbox.fetch_checkpoint_at
+    assert "is_fetch_complete" in serializer_data
+    assert serializer_data["is_fetch_complete"] == fake_mailbox.is_fetch_complete
+    assert "fetched_uidls" not in serializer_data
+    assert "sync_state" not in serializer_data
+    assert "interrupted_fetch_runs" not in serializer_data
     assert "created" in serializer_data
     assert datetime.fromisoformat(serializer_data["created"]) == fake_mailbox.created
     assert "updated" in serializer_data
     assert datetime.fromisoformat(serializer_data["updated"]) == fake_mailbox.updated
-    assert len(serializer_data) == 11
+    assert len(serializer_data) == 19
 
 
 @pytest.mark.django_db
@@ -80,6 +99,16 @@ def test_input(mailbox_payload, request_context):
     assert "is_healthy" not in serializer_data
     assert "last_error" not in serializer_data
     assert "last_error_occurred_at" not in serializer_data
+    assert "uid_validity" not in serializer_data
+    assert "highest_uid" not in serializer_data
+    assert "fetch_run_id" not in serializer_data
+    assert "fetch_run_key" not in serializer_data
+    assert "fetch_checkpoint" not in serializer_data
+    assert "fetch_progress" not in serializer_data
+    assert "is_fetch_complete" not in serializer_data
+    assert "fetched_uidls" not in serializer_data
+    assert "sync_state" not in serializer_data
+    assert "interrupted_fetch_runs" not in serializer_data
     assert "created" not in serializer_data
     assert "updated" not in serializer_data
     assert len(serializer_data) == 3
@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for :mod:`api.v1.serializers.MailboxFetchProgressSerializer`."""
+
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from django.utils import timezone
+
+from api.v1.serializers.mailbox_serializers.MailboxFetchProgressSerializer import (
+    MailboxFetchProgressSerializer,
+)
+
+
+@pytest.mark.django_db
+def test_output(fake_mailbox, request_context):
+    """Tests for the expected output of the serializer."""
+    fake_mailbox.fetch_run_id = uuid4()
+    fake_mailbox.fetch_run_key = "ALL"
+    fake_mailbox.fetch_checkpoint = "42"
+    fake_mailbox.fetch_progress = 7
+    fake_mailbox.fetch_checkpoint_at = timezone.now()
+    fake_mailbox.is_fetch_complete = False
+    fake_mailbox.save()
+
+    serializer_data = MailboxFetchProgressSerializer(
+        instance=fake_mailbox, context=request_context
+    ).data
+
+    assert "fetch_run_id" in serializer_data
+    assert serializer_data["fetch_run_id"] == str(fake_mailbox.fetch_run_id)
+    assert "fetch_run_key" in serializer_data
+    assert serializer_data["fetch_run_key"] == "ALL"
+    assert "fetch_checkpoint" in serializer_data
+    assert serializer_data["fetch_checkpoint"] == "42"
+    assert "fetch_progress" in serializer_data
+    assert serializer_data["fetch_progress"] == 7
+    assert "fetch_checkpoint_at" in serializer_data
+    assert (
+        datetime.fromisoformat(serializer_data["fetch_checkpoint_at"])
+        == fake_mailbox.fetch_checkpoint_at
+    )
+    assert "is_fetch_complete" in serializer_data
+    assert serializer_data["is_fetch_complete"] is False
+    assert len(serializer_data) == 6
+
+
+@pytest.mark.django_db
+def test_input(fake_mailbox, request_context):
+    """Tests for the expected input of the serializer."""
+    serializer = MailboxFetchProgressSerializer(
+        instance=fake_mailbox,
+        data={"fetch_progress": 100, "is_fetch_complete": False},
+        context=request_context,
+    )
+    assert serializer.is_valid()
+    serializer_data = serializer.validated_data
+
+    assert "fetch_progress" not in serializer_data
+    assert "is_fetch_complete" not in serializer_data
+    assert len(serializer_data) == 0
@@ -24,6 +24,7 @@ import pytest
 from rest_framework import status
 
 from api.v1.views.AccountViewSet import AccountViewSet
+from core.constants import EmailFetchingCriterionChoices
 from core.utils.fetchers.exceptions import MailAccountError
 
 
@@ -41,6 +42,14 @@ def mock_Account_test(mocker):
     return mocker.patch("api.v1.views.AccountViewSet.Account.test", autospec=True)
 
 
+@pytest.fixture
+def mock_fetch_account_emails_delay(mocker):
+    """Patches `core.tasks.fetch_account_emails.delay`."""
+    mock_delay = mocker.patch("api.v1.views.AccountViewSet.fetch_account_emails.delay")
+    mock_delay.return_value.id = "fake-task-id"
+    return mock_delay
+
+
 @pytest.mark.django_db
 def test_update_mailboxes_noauth(
     fake_account,
@@ -290,6 +299,144 @@ def test_test_auth_admin(
     assert "mail_address" not in response.data
 
 
+@pytest.mark.django_db
+def test_fetch_noauth(
+    fake_account,
+    noauth_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with an unauthenticated user client.
+    """
+    response = noauth_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        ),
+        data={"criterion": EmailFetchingCriterionChoices.ALL},
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    mock_fetch_account_emails_delay.assert_not_called()
+    assert "mail_address" not in response.data
+
+
+@pytest.mark.django_db
+def test_fetch_auth_other(
+    fake_account,
+    other_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with the authenticated other user client.
+    """
+    response = other_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        ),
+        data={"criterion": EmailFetchingCriterionChoices.ALL},
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    mock_fetch_account_emails_delay.assert_not_called()
+    assert "mail_address" not in response.data
+
+
+@pytest.mark.django_db
+def test_fetch_success_auth_owner(
+    fake_account,
+    owner_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with the authenticated owner user client
+    in case of success.
+    """
+    response = owner_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        ),
+        data={"criterion": EmailFetchingCriterionChoices.ALL},
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert "detail" in response.data
+    assert response.data["task_id"] == mock_fetch_account_emails_delay.return_value.id
+    assert response.data["data"] == AccountViewSet.serializer_class(fake_account).data
+    mock_fetch_account_emails_delay.assert_called_once_with(
+        fake_account.id, EmailFetchingCriterionChoices.ALL
+    )
+
+
+@pytest.mark.django_db
+def test_fetch_no_criterion_auth_owner(
+    fake_account,
+    owner_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with the authenticated owner user client
+    in case no criterion is given.
+    """
+    response = owner_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        )
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "criterion" in response.data
+    mock_fetch_account_emails_delay.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_fetch_bad_criterion_auth_owner(
+    fake_account,
+    owner_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with the authenticated owner user client
+    in case the criterion is not available for the account.
+    """
+    response = owner_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        ),
+        data={"criterion": "NOCRITERION"},
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "NOCRITERION" in response.data["criterion"]
+    mock_fetch_account_emails_delay.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_fetch_auth_admin(
+    fake_account,
+    admin_api_client,
+    custom_detail_action_url,
+    mock_fetch_account_emails_delay,
+):
+    """Tests the post method :func:`api.v1.views.AccountViewSet.AccountViewSet.fetch`
+    action with the authenticated admin user client.
+    """
+    response = admin_api_client.post(
+        custom_detail_action_url(
+            AccountViewSet, AccountViewSet.URL_NAME_FETCH, fake_account
+        ),
+        data={"criterion": EmailFetchingCriterionChoices.ALL},
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    mock_fetch_account_emails_delay.assert_not_called()
+    assert "mail_address" not in response.data
+
+
 @pytest.mark.django_db
 def test_toggle_favorite_noauth(
     faker, fake_account, noauth_api_client, custom_detail_action_url
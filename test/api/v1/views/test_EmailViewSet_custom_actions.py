@@ -46,6 +46,14 @@ def mock_Email_restore_to_mailbox(mocker):
     return mocker.patch("api.v1.views.EmailViewSet.Email.restore_to_mailbox")
 
 
+@pytest.fixture
+def mock_restore_emails_delay(mocker):
+    """Patches `core.tasks.restore_emails.delay`."""
+    mock_delay = mocker.patch("api.v1.views.EmailViewSet.restore_emails.delay")
+    mock_delay.return_value.id = "fake-task-id"
+    return mock_delay
+
+
 @pytest.fixture
 def mock_Email_reprocess(mocker):
     """Patches `core.models.Email.reprocess`."""
@@ -600,6 +608,73 @@ def test_restore_auth_admin(
     mock_Email_restore_to_mailbox.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_batch_restore_noauth(
+    fake_email, noauth_api_client, custom_list_action_url, mock_restore_emails_delay
+):
+    """Tests the post method :func:`api.v1.views.EmailViewSet.EmailViewSet.restore_batch` action
+    with an unauthenticated user client.
+    """
+    response = noauth_api_client.post(
+        custom_list_action_url(EmailViewSet, EmailViewSet.URL_NAME_RESTORE_BATCH)
+        + f"?id={fake_email.id}"
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    mock_restore_emails_delay.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_batch_restore_auth_other(
+    fake_email, other_api_client, custom_list_action_url, mock_restore_emails_delay
+):
+    """Tests the post method :func:`api.v1.views.EmailViewSet.EmailViewSet.restore_batch` action
+    with the authenticated other user client.
+    """
+    response = other_api_client.post(
+        custom_list_action_url(EmailViewSet, EmailViewSet.URL_NAME_RESTORE_BATCH)
+        + f"?id={fake_email.id}"
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    mock_restore_emails_delay.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_batch_restore_auth_owner_success(
+    fake_email, owner_api_client, custom_list_action_url, mock_restore_emails_delay
+):
+    """Tests the post method :func:`api.v1.views.EmailViewSet.EmailViewSet.restore_batch` action
+    with the authenticated owner user client.
+    """
+    response = owner_api_client.post(
+        custom_list_action_url(EmailViewSet, EmailViewSet.URL_NAME_RESTORE_BATCH)
+        + f"?id={fake_email.id},{fake_email.id + 100}"
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert "detail" in response.data
+    assert response.data["task_id"] == mock_restore_emails_delay.return_value.id
+    assert response.data["count"] == 1
+    mock_restore_emails_delay.assert_called_once_with([fake_email.id])
+
+
+@pytest.mark.django_db
+def test_batch_restore_no_ids_auth_owner(
+    owner_api_client, custom_list_action_url, mock_restore_emails_delay
+):
+    """Tests the post method :func:`api.v1.views.EmailViewSet.EmailViewSet.restore_batch` action
+    with the authenticated owner user client.
+    """
+    response = owner_api_client.post(
+        custom_list_action_url(EmailViewSet, EmailViewSet.URL_NAME_RESTORE_BATCH)
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data["id"]
+    mock_restore_emails_delay.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_reprocess_noauth(
     fake_email,
@@ -0,0 +1,214 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Benchmarks for the :class:`core.utils.fetchers.IMAP4Fetcher` class."""
+
+from __future__ import annotations
+
+import time
+from email import message_from_bytes
+
+import pytest
+from constance.test import override_config
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices
+from core.models import Email, Mailbox
+from core.utils.fetchers import IMAP4Fetcher
+from test.benchmarks.throughput import measure_throughput
+from test.fake_servers import FakeIMAP4Server, generate_corpus
+
+
+def measure_fetch_emails(mailbox):
+    """Fetches all emails from the mailbox.
+
+    Returns:
+        The fetched emails and the time it took in seconds.
+    """
+    start = time.perf_counter()
+    with IMAP4Fetcher(mailbox.account) as fetcher:
+        result = fetcher.fetch_emails(mailbox)
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_benchmark_throughput(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    with emails with attachments.
+    """
+    corpus = generate_corpus(200, attachment_count=2, attachment_size=20000)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        (result, _), throughput = measure_throughput(
+            lambda: measure_fetch_emails(mailbox),
+            len(corpus),
+            sum(len(message) for message in corpus),
+        )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nIMAP4Fetcher, {throughput}"
+    )
+    assert result == corpus
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_benchmark_chunks(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of a slow link, comparing single-message to chunked requests.
+    """
+    corpus = generate_corpus(200)
+
+    with FakeIMAP4Server(corpus, latency=0.002) as server:
+        mailbox = server_mailbox_factory(server)
+        with override_config(IMAP_FETCH_CHUNK_SIZE=1):
+            single_result, single_duration = measure_fetch_emails(mailbox)
+        mailbox.sync_state = ""
+        with override_config(IMAP_FETCH_CHUNK_SIZE=50):
+            chunked_result, chunked_duration = measure_fetch_emails(mailbox)
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nIMAP4Fetcher, {len(corpus)} messages, 2ms latency: "
+        f"single {len(corpus) / single_duration:.0f} msgs/s, "
+        f"chunked {len(corpus) / chunked_duration:.0f} msgs/s"
+    )
+    assert single_result == corpus
+    assert chunked_result == corpus
+    assert chunked_duration < single_duration
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_failing_message(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    against the stand-in server in case of a message that fails to be fetched.
+    """
+    corpus = generate_corpus(10)
+
+    with FakeIMAP4Server(corpus, failing_uids={5}) as server:
+        mailbox = server_mailbox_factory(server)
+        with override_config(IMAP_FETCH_CHUNK_SIZE=4):
+            result, _ = measure_fetch_emails(mailbox)
+
+    assert result == corpus[:4] + corpus[5:]
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_benchmark_refetch(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of refetching a mailbox that is already archived.
+    """
+    corpus = generate_corpus(200, body_size=10000)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        first_result, _ = measure_fetch_emails(mailbox)
+        first_bytes_sent = server.bytes_sent
+        for message in first_result:
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                message_id=message_from_bytes(message)["Message-ID"],
+            )
+        second_result, _ = measure_fetch_emails(mailbox)
+        second_bytes_sent = server.bytes_sent - first_bytes_sent
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nIMAP4Fetcher, {len(corpus)} messages: "
+        f"first fetch {first_bytes_sent} bytes, refetch {second_bytes_sent} bytes"
+    )
+    assert first_result == corpus
+    assert second_result == []
+    assert second_bytes_sent * 10 < first_bytes_sent
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_benchmark_compression(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of a slow link, comparing an uncompressed to a compressed connection.
+    """
+    corpus = generate_corpus(200, body_size=10000)
+
+    with FakeIMAP4Server(corpus, latency=0.002) as server:
+        mailbox = server_mailbox_factory(server)
+        plain_result, plain_duration = measure_fetch_emails(mailbox)
+        plain_bytes_sent = server.bytes_sent
+        mailbox.sync_state = ""
+        mailbox.account.use_compression = True
+        compressed_result, compressed_duration = measure_fetch_emails(mailbox)
+        compressed_bytes_sent = server.bytes_sent - plain_bytes_sent
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nIMAP4Fetcher, {len(corpus)} messages, 2ms latency: "
+        f"uncompressed {plain_bytes_sent} bytes in {plain_duration:.2f}s, "
+        f"compressed {compressed_bytes_sent} bytes in {compressed_duration:.2f}s"
+    )
+    assert plain_result == corpus
+    assert compressed_result == corpus
+    assert compressed_bytes_sent * 5 < plain_bytes_sent
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_unchanged_stand_in_server(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    against the stand-in server in case the mailbox is fetched again.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeIMAP4Server(corpus[:3]) as server:
+        mailbox = server_mailbox_factory(server)
+        with IMAP4Fetcher(mailbox.account) as fetcher:
+            first_result = fetcher.fetch_emails(mailbox)
+            server.commands.clear()
+            second_result = fetcher.fetch_emails(mailbox)
+            second_commands = list(server.commands)
+            server.add_message(corpus[3])
+            third_result = fetcher.fetch_emails(mailbox)
+
+    assert first_result == corpus[:3]
+    assert second_result == []
+    assert second_commands == ["STATUS INBOX (MESSAGES UIDNEXT UIDVALIDITY)"]
+    assert third_result == corpus
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_find_unchanged_mailboxes_stand_in_server(
+    server_mailbox_factory,
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.find_unchanged_mailboxes`
+    against the stand-in server with several mailboxes.
+    """
+    with FakeIMAP4Server(generate_corpus(2)) as server:
+        server.mailboxes["Old Mail"] = {}
+        inbox = server_mailbox_factory(server)
+        other_mailbox = baker.make(Mailbox, account=inbox.account, name="Old Mail")
+        with IMAP4Fetcher(inbox.account) as fetcher:
+            fetcher.fetch_emails(inbox)
+            fetcher.fetch_emails(other_mailbox)
+            server.add_message(generate_corpus(3)[2], "Old Mail")
+            server.commands.clear()
+            result = fetcher.find_unchanged_mailboxes(
+                [inbox, other_mailbox], EmailFetchingCriterionChoices.ALL
+            )
+            commands = list(server.commands)
+
+    assert result == [inbox]
+    assert commands == [
+        'STATUS "INBOX" (MESSAGES UIDNEXT UIDVALIDITY)',
+        'STATUS "Old Mail" (MESSAGES UIDNEXT UIDVALIDITY)',
+    ]
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""Benchmarks for the :class:`core.utils.IngestionPipeline` class."""
+
+from __future__ import annotations
+
+import pytest
+from constance.test import override_config
+
+from core.utils.IngestionPipeline import IngestionPipeline
+from test.benchmarks.throughput import measure_throughput
+from test.fake_servers import generate_corpus
+
+
+@pytest.fixture(autouse=True)
+def inline_ingestion_parsing():
+    """Lets the benchmarks in this module start process pools."""
+
+
+def ingest_emails(mailbox, corpus):
+    """Ingests all emails of the corpus into the mailbox."""
+    with IngestionPipeline(mailbox) as pipeline:
+        return sum(1 for email in pipeline.ingest(corpus) if email is not None)
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_benchmark_workers(fake_mailbox):
+    """Benchmarks :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    comparing inline parsing to parsing in a process pool.
+    """
+    corpus = generate_corpus(
+        200, body_size=20000, attachment_count=2, attachment_size=20000
+    )
+    corpus_size = sum(len(message) for message in corpus)
+
+    with override_config(INGESTION_PARSE_WORKERS=1):
+        inline_count, inline_throughput = measure_throughput(
+            lambda: ingest_emails(fake_mailbox, corpus), len(corpus), corpus_size
+        )
+    fake_mailbox.emails.all().delete()
+    with override_config(INGESTION_PARSE_WORKERS=4):
+        pool_count, pool_throughput = measure_throughput(
+            lambda: ingest_emails(fake_mailbox, corpus), len(corpus), corpus_size
+        )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nIngestionPipeline, inline parsing: {inline_throughput}"
+        f"\nIngestionPipeline, 4 parsing workers: {pool_throughput}"
+    )
+    assert inline_count == len(corpus)
+    assert pool_count == len(corpus)
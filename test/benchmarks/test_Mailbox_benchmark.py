@@ -0,0 +1,67 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Benchmarks for the fetching of the :class:`core.models.Mailbox` model."""
+
+from __future__ import annotations
+
+import pytest
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from test.benchmarks.throughput import measure_throughput
+from test.fake_servers import (
+    FakeIMAP4Server,
+    FakeJMAPServer,
+    FakePOP3Server,
+    generate_corpus,
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "server_class, protocol",
+    [
+        (FakeIMAP4Server, EmailProtocolChoices.IMAP),
+        (FakePOP3Server, EmailProtocolChoices.POP3),
+        (FakeJMAPServer, EmailProtocolChoices.JMAP),
+    ],
+)
+def test_Mailbox_fetch_benchmark_throughput(
+    fake_fs, server_mailbox_factory, server_class, protocol
+):
+    """Benchmarks :func:`core.models.Mailbox.Mailbox.fetch`
+    from fetching to saving the emails and their attachments.
+    """
+    corpus = generate_corpus(50, attachment_count=2, attachment_size=20000)
+
+    with server_class(corpus) as server:
+        mailbox = server_mailbox_factory(server, protocol)
+        _, throughput = measure_throughput(
+            lambda: mailbox.fetch(EmailFetchingCriterionChoices.ALL),
+            len(corpus),
+            sum(len(message) for message in corpus),
+        )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nMailbox.fetch with {protocol}, {throughput}"
+    )
+    assert mailbox.emails.count() == len(corpus)
+    assert mailbox.emails.filter(attachments__isnull=False).distinct().count() == len(
+        corpus
+    )
@@ -0,0 +1,126 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Benchmarks for the :class:`core.utils.fetchers.POP3Fetcher` class."""
+
+from __future__ import annotations
+
+from email import message_from_bytes
+
+import pytest
+from constance.test import override_config
+from model_bakery import baker
+
+from core.constants import EmailProtocolChoices
+from core.models import Email
+from core.utils.fetchers import POP3Fetcher
+from test.benchmarks.throughput import measure_throughput
+from test.fake_servers import FakePOP3Server, generate_corpus
+
+
+def fetch_emails(mailbox):
+    """Fetches all emails from the mailbox."""
+    with POP3Fetcher(mailbox.account) as fetcher:
+        return fetcher.fetch_emails(mailbox)
+
+
+def count_streamed_emails(mailbox):
+    """Streams all emails from the mailbox without keeping them."""
+    with POP3Fetcher(mailbox.account) as fetcher:
+        return sum(1 for _ in fetcher.stream_emails(mailbox))
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_benchmark_throughput(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    with emails with attachments.
+    """
+    corpus = generate_corpus(200, attachment_count=2, attachment_size=20000)
+
+    with FakePOP3Server(corpus) as server:
+        mailbox = server_mailbox_factory(server, EmailProtocolChoices.POP3)
+        result, throughput = measure_throughput(
+            lambda: fetch_emails(mailbox),
+            len(corpus),
+            sum(len(message) for message in corpus),
+        )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nPOP3Fetcher, {throughput}"
+    )
+    assert [message_from_bytes(message)["Message-ID"] for message in result] == [
+        message_from_bytes(message)["Message-ID"] for message in corpus
+    ]
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_stream_emails_benchmark_spooling(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.POP3Fetcher.stream_emails`
+    in case of large emails, comparing in-memory to spooled retrieval.
+    """
+    corpus = generate_corpus(20, attachment_count=1, attachment_size=1024**2)
+    corpus_size = sum(len(message) for message in corpus)
+
+    with FakePOP3Server(corpus) as server:
+        mailbox = server_mailbox_factory(server, EmailProtocolChoices.POP3)
+        with override_config(FETCH_SPOOL_EMAIL_DATASIZE=0):
+            plain_count, plain_throughput = measure_throughput(
+                lambda: count_streamed_emails(mailbox), len(corpus), corpus_size
+            )
+        with override_config(FETCH_SPOOL_EMAIL_DATASIZE=1024):
+            spooled_count, spooled_throughput = measure_throughput(
+                lambda: count_streamed_emails(mailbox), len(corpus), corpus_size
+            )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nPOP3Fetcher, in memory: {plain_throughput}"
+        f"\nPOP3Fetcher, spooled: {spooled_throughput}"
+    )
+    assert plain_count == len(corpus)
+    assert spooled_count == len(corpus)
+    assert spooled_throughput.peak_memory * 2 < plain_throughput.peak_memory
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_benchmark_refetch(server_mailbox_factory):
+    """Benchmarks :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of refetching a maildrop that is already archived.
+    """
+    corpus = generate_corpus(200, body_size=10000)
+
+    with FakePOP3Server(corpus) as server:
+        mailbox = server_mailbox_factory(server, EmailProtocolChoices.POP3)
+        first_result = fetch_emails(mailbox)
+        first_bytes_sent = server.bytes_sent
+        for message in first_result:
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                message_id=message_from_bytes(message)["Message-ID"],
+            )
+        second_result = fetch_emails(mailbox)
+        second_bytes_sent = server.bytes_sent - first_bytes_sent
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nPOP3Fetcher, {len(corpus)} messages: "
+        f"first fetch {first_bytes_sent} bytes, refetch {second_bytes_sent} bytes"
+    )
+    assert len(first_result) == len(corpus)
+    assert second_result == []
+    assert second_bytes_sent * 10 < first_bytes_sent
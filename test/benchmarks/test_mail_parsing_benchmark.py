@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""Benchmarks for the :mod:`core.utils.mail_parsing` module."""
+
+from __future__ import annotations
+
+import email
+import time
+from email import policy
+
+from core.constants import HeaderFields
+from core.utils import mail_parsing
+from test.conftest import TEST_EMAIL_PARAMETERS
+from test.fake_servers import generate_corpus
+
+
+def parse_email_twice(email_bytes):
+    """Parses an email like :func:`core.models.Email.Email.create_from_email_bytes`
+    did before the single-pass parser, with two parses and two walks.
+    """
+    email_message = email.message_from_bytes(email_bytes, policy=policy.default)
+    mail_parsing.get_header(email_message, HeaderFields.MESSAGE_ID)
+    mail_parsing.get_header(email_message, HeaderFields.X_SPAM)
+    email_message = email.message_from_bytes(email_bytes, policy=policy.default)
+    headers = {
+        header_name.lower(): mail_parsing.get_header(email_message, header_name)
+        for header_name in email_message
+    }
+    mail_parsing.get_bodytexts(email_message)
+    mail_parsing.get_attachment_parts(email_message)
+    mail_parsing.get_correspondent_tuples(headers)
+
+
+def measure_cpu_time_per_message(function, corpus, rounds=3):
+    """Measures the least CPU time of a function per message over several rounds."""
+    cpu_times = []
+    for _ in range(rounds):
+        start = time.process_time()
+        for message in corpus:
+            function(message)
+        cpu_times.append(time.process_time() - start)
+    return min(cpu_times) / len(corpus)
+
+
+def test_parse_email_benchmark_cpu_time():
+    """Benchmarks :func:`core.utils.mail_parsing.parse_email`
+    comparing it to parsing the email twice and walking it once per feature.
+    """
+    corpus = generate_corpus(
+        200, body_size=4096, attachment_count=2, attachment_size=20000
+    )
+    for test_email_path, *_ in TEST_EMAIL_PARAMETERS:
+        with open(test_email_path, "br") as test_email_file:
+            corpus.append(test_email_file.read())
+
+    legacy_cpu_time = measure_cpu_time_per_message(parse_email_twice, corpus)
+    single_pass_cpu_time = measure_cpu_time_per_message(
+        mail_parsing.parse_email, corpus
+    )
+
+    print(  # noqa: T201 ; the results are meant for the console
+        f"\nparse_email, {len(corpus)} messages: "
+        f"two passes {legacy_cpu_time * 1000:.2f} ms CPU per message, "
+        f"single pass {single_pass_cpu_time * 1000:.2f} ms CPU per message, "
+        f"saved {(legacy_cpu_time - single_pass_cpu_time) * 1000:.2f} ms"
+    )
+    assert single_pass_cpu_time < legacy_cpu_time
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with utility to measure the throughput of the fetching in the benchmarks."""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@dataclass
+class Throughput:
+    """The throughput of a benchmarked run.
+
+    Attributes:
+        message_count: The number of processed messages.
+        byte_count: The number of processed bytes.
+        duration: The duration of the run in seconds.
+        peak_memory: The peak of memory allocated by Python during the run in bytes.
+    """
+
+    message_count: int
+    byte_count: int
+    duration: float
+    peak_memory: int
+
+    @property
+    def messages_per_second(self) -> float:
+        """The number of messages processed per second."""
+        return self.message_count / self.duration
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The number of bytes processed per second."""
+        return self.byte_count / self.duration
+
+    def __str__(self) -> str:
+        """Formats the throughput for the console."""
+        return (
+            f"{self.message_count} messages in {self.duration:.2f}s: "
+            f"{self.messages_per_second:.0f} msgs/s, "
+            f"{self.bytes_per_second / 1024**2:.2f} MiB/s, "
+            f"peak memory {self.peak_memory / 1024**2:.2f} MiB"
+        )
+
+
+def measure_throughput[T](
+    function: Callable[[], T], message_count: int, byte_count: int
+) -> tuple[T, Throughput]:
+    """Runs a function and measures its throughput.
+
+    The peak memory is traced with :mod:`tracemalloc`.
+    Unlike the peak RSS of the process, it can be reset between runs,
+    but it misses memory allocated outside of Python, e.g. by the database driver.
+    The stand-in servers run in the same process, so their allocations are included.
+
+    Args:
+        function: The function to benchmark.
+        message_count: The number of messages the function processes.
+        byte_count: The number of bytes the function processes.
+
+    Returns:
+        The result of the function and its throughput.
+    """
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, Throughput(message_count, byte_count, duration, peak_memory)
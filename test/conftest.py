@@ -70,6 +70,7 @@ from core.models import (
     EmailCorrespondent,
     Mailbox,
 )
+from core.utils.fetchers import FetcherPool
 from eonvelope.middleware.TimezoneMiddleware import TimezoneMiddleware
 from eonvelope.models import UserProfile
 
@@ -292,6 +293,25 @@ TEST_EMAIL_PARAMETERS = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def fresh_fetcher_pool(mocker):
+    """Replaces the worker's fetcher pool with an empty one, so no connections are shared between tests."""
+    return mocker.patch("core.models.Account.fetcher_pool", FetcherPool())
+
+
+@pytest.fixture(autouse=True)
+def inline_ingestion_parsing(mocker):
+    """Parses ingested emails inline, so no process pools are started.
+
+    Override this fixture in test modules that test the process pool.
+    """
+    return mocker.patch(
+        "core.utils.IngestionPipeline.IngestionPipeline.is_parallel",
+        new_callable=mocker.PropertyMock,
+        return_value=False,
+    )
+
+
 @pytest.fixture
 def fake_file_bytes(faker):
     """Random bytes to act as file content."""
@@ -403,6 +423,25 @@ def fake_daemon(fake_mailbox):
     )
 
 
+@pytest.fixture
+def server_mailbox_factory(owner_user):
+    """Factory for an INBOX :class:`core.models.Mailbox` in an account on a stand-in server from :mod:`test.fake_servers`."""
+
+    def make_server_mailbox(server, protocol=EmailProtocolChoices.IMAP):
+        is_jmap = protocol == EmailProtocolChoices.JMAP
+        account = baker.make(
+            Account,
+            user=owner_user,
+            protocol=protocol,
+            mail_host=server.session_url if is_jmap else "127.0.0.1",
+            mail_host_port=None if is_jmap else server.port,
+            timeout=10,
+        )
+        return baker.make(Mailbox, account=account, name="INBOX")
+
+    return make_server_mailbox
+
+
 @pytest.fixture
 def fake_email(fake_mailbox):
     """An :class:`core.models.Email` owned by :attr:`owner_user`."""
@@ -593,6 +632,7 @@ def account_payload(faker, owner_user):
         mail_host_port=faker.random.randint(0, 65535),
         protocol=faker.random.choice(EmailProtocolChoices.values),
         timeout=faker.random.randint(1, 1000),
+        use_compression=not Account.use_compression.field.default,
         is_favorite=not Account.is_favorite.field.default,
     )
     payload = model_to_dict(account_data)
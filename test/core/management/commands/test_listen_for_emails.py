@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for the `listen_for_emails` management command."""
+
+import pytest
+from django.core.management import call_command
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.management.commands.listen_for_emails import Command
+from core.models import Daemon, Mailbox
+
+
+@pytest.fixture
+def mock_IdleListener(mocker):
+    """Patches the :class:`core.utils.IdleListener` started by the command."""
+    return mocker.patch(
+        "core.management.commands.listen_for_emails.IdleListener", autospec=True
+    )
+
+
+@pytest.fixture
+def incremental_daemon(fake_daemon):
+    """Extends :func:`test.conftest.fake_daemon` to fetch incrementally."""
+    fake_daemon.fetching_criterion = EmailFetchingCriterionChoices.INCREMENTAL
+    fake_daemon.save()
+    return fake_daemon
+
+
+@pytest.mark.django_db
+def test_Command_refresh_listeners_start(
+    fake_mailbox, incremental_daemon, mock_IdleListener
+):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.refresh_listeners`
+    in case of new daemons, only incremental ones on IMAP accounts are watched.
+    """
+    baker.make(
+        Daemon,
+        mailbox=fake_mailbox,
+        fetching_criterion=EmailFetchingCriterionChoices.ALL,
+    )
+    stopped_daemon = baker.make(
+        Daemon,
+        mailbox=baker.make(Mailbox, account=fake_mailbox.account),
+        fetching_criterion=EmailFetchingCriterionChoices.INCREMENTAL,
+    )
+    stopped_daemon.stop()
+    listeners = {}
+
+    Command().refresh_listeners(listeners)
+
+    assert list(listeners) == [incremental_daemon.uuid]
+    mock_IdleListener.assert_called_once_with(incremental_daemon)
+    mock_IdleListener.return_value.start.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_Command_refresh_listeners_other_protocol(
+    incremental_daemon, mock_IdleListener
+):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.refresh_listeners`
+    in case the daemon is on an account without IMAP.
+    """
+    incremental_daemon.mailbox.account.protocol = EmailProtocolChoices.POP3
+    incremental_daemon.mailbox.account.save(update_fields=["protocol"])
+    listeners = {}
+
+    Command().refresh_listeners(listeners)
+
+    assert listeners == {}
+    mock_IdleListener.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_Command_refresh_listeners_unchanged(incremental_daemon, mock_IdleListener):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.refresh_listeners`
+    in case the watched daemons have not changed.
+    """
+    listeners = {}
+    Command().refresh_listeners(listeners)
+    mock_IdleListener.return_value.email_daemon = incremental_daemon
+    mock_IdleListener.return_value.is_alive.return_value = True
+
+    Command().refresh_listeners(listeners)
+
+    assert list(listeners) == [incremental_daemon.uuid]
+    mock_IdleListener.assert_called_once()
+    mock_IdleListener.return_value.stop.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_Command_refresh_listeners_changed(incremental_daemon, mock_IdleListener):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.refresh_listeners`
+    in case a watched daemon has changed.
+    """
+    listeners = {}
+    Command().refresh_listeners(listeners)
+    mock_IdleListener.return_value.email_daemon = incremental_daemon
+    mock_IdleListener.return_value.is_alive.return_value = True
+    Daemon.objects.get(uuid=incremental_daemon.uuid).save()
+
+    Command().refresh_listeners(listeners)
+
+    assert list(listeners) == [incremental_daemon.uuid]
+    assert mock_IdleListener.call_count == 2
+    mock_IdleListener.return_value.stop.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_Command_refresh_listeners_removed(incremental_daemon, mock_IdleListener):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.refresh_listeners`
+    in case a watched daemon was removed.
+    """
+    listeners = {}
+    Command().refresh_listeners(listeners)
+    incremental_daemon.delete()
+
+    Command().refresh_listeners(listeners)
+
+    assert listeners == {}
+    mock_IdleListener.return_value.stop.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_Command_handle_interrupted(mocker, incremental_daemon, mock_IdleListener):
+    """Tests :func:`core.management.commands.listen_for_emails.Command.handle`
+    in case it is interrupted.
+    """
+    mocker.patch(
+        "core.management.commands.listen_for_emails.time.sleep",
+        side_effect=KeyboardInterrupt,
+    )
+
+    call_command("listen_for_emails", refresh_interval=1)
+
+    mock_IdleListener.return_value.start.assert_called_once()
+    mock_IdleListener.return_value.stop.assert_called_once()
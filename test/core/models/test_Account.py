@@ -21,23 +21,27 @@
 from __future__ import annotations
 
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from constance.test import override_config
 from django.db import IntegrityError
 from django.urls import reverse
 from model_bakery import baker
 
-from core.constants import EmailProtocolChoices
-from core.models import Account, Mailbox
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Account, Mailbox, MailHostThrottle
+from core.models.MailHostThrottle import _is_waiting_allowed
 from core.utils.fetchers import (
     BaseFetcher,
     ExchangeFetcher,
     IMAP4_SSL_Fetcher,
     IMAP4Fetcher,
+    JMAPFetcher,
     POP3_SSL_Fetcher,
     POP3Fetcher,
 )
-from core.utils.fetchers.exceptions import MailAccountError
+from core.utils.fetchers.exceptions import MailAccountError, MailboxError
 
 
 @pytest.fixture(autouse=True)
@@ -51,10 +55,11 @@ def mock_fetcher(mocker, faker):
     """A mock :class:`core.utils.fetchers.BaseFetcher.BaseFetcher` instance."""
     mock_fetcher = mocker.MagicMock(spec=BaseFetcher)
     mock_fetcher.__enter__.return_value = mock_fetcher
-    mock_fetcher.fetch_emails.return_value = [text.encode() for text in faker.texts()]
+    mock_fetcher.stream_emails.return_value = [text.encode() for text in faker.texts()]
     mock_fetcher.fetch_mailboxes.return_value = [
         word.encode() for word in faker.words()
     ]
+    mock_fetcher.find_unchanged_mailboxes.return_value = []
     return mock_fetcher
 
 
@@ -241,6 +246,7 @@ def test_Account_get_fetcher_init_failure(
         (EmailProtocolChoices.POP3, POP3Fetcher),
         (EmailProtocolChoices.POP3_SSL, POP3_SSL_Fetcher),
         (EmailProtocolChoices.EXCHANGE, ExchangeFetcher),
+        (EmailProtocolChoices.JMAP, JMAPFetcher),
     ],
 )
 def test_Account_get_fetcher_class_success(
@@ -358,6 +364,234 @@ def test_Account_test_get_fetcher_error(
     mock_logger.info.assert_called()
 
 
+@pytest.fixture
+def mock_Mailbox_fetch(mocker):
+    """Mocked :func:`core.models.Account.Mailbox.fetch` method."""
+    return mocker.patch("core.models.Account.Mailbox.fetch", autospec=True)
+
+
+@pytest.fixture
+def spy_ThreadPoolExecutor(mocker):
+    """Spy for the :class:`concurrent.futures.ThreadPoolExecutor` used in :mod:`core.models.Account`."""
+    return mocker.patch(
+        "core.models.Account.ThreadPoolExecutor", wraps=ThreadPoolExecutor
+    )
+
+
+@pytest.mark.django_db
+def test_Account_fetch_success(
+    fake_account,
+    mock_logger,
+    mock_Mailbox_fetch,
+    spy_ThreadPoolExecutor,
+    mock_Account_get_fetcher,
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case of success.
+    """
+    healthy_mailboxes = baker.make(
+        Mailbox, account=fake_account, is_healthy=True, _quantity=3
+    )
+    untested_mailbox = baker.make(Mailbox, account=fake_account, is_healthy=None)
+    baker.make(Mailbox, account=fake_account, is_healthy=False)
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    assert mock_Mailbox_fetch.call_count == 4
+    fetched_mailboxes = [call.args[0] for call in mock_Mailbox_fetch.call_args_list]
+    for mailbox in [*healthy_mailboxes, untested_mailbox]:
+        assert mailbox in fetched_mailboxes
+    for call in mock_Mailbox_fetch.call_args_list:
+        assert call.args[1] == EmailFetchingCriterionChoices.ALL
+    assert spy_ThreadPoolExecutor.call_args.kwargs["max_workers"] == 4
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+@override_config(ACCOUNT_FETCH_CONCURRENCY=2, FETCHER_POOL_MAX_CONNECTIONS=5)
+def test_Account_fetch_concurrency(
+    fake_account, mock_Mailbox_fetch, spy_ThreadPoolExecutor, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case the concurrency is limited by `ACCOUNT_FETCH_CONCURRENCY`.
+    """
+    baker.make(Mailbox, account=fake_account, _quantity=5)
+
+    fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert mock_Mailbox_fetch.call_count == 5
+    assert spy_ThreadPoolExecutor.call_args.kwargs["max_workers"] == 2
+
+
+@pytest.mark.django_db
+@override_config(ACCOUNT_FETCH_CONCURRENCY=4, FETCHER_POOL_MAX_CONNECTIONS=1)
+def test_Account_fetch_connection_limit(
+    fake_account, mock_Mailbox_fetch, spy_ThreadPoolExecutor, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case the concurrency is limited by `FETCHER_POOL_MAX_CONNECTIONS`.
+    """
+    baker.make(Mailbox, account=fake_account, _quantity=5)
+
+    fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert mock_Mailbox_fetch.call_count == 5
+    assert spy_ThreadPoolExecutor.call_args.kwargs["max_workers"] == 1
+
+
+@pytest.mark.django_db
+def test_Account_fetch_waiting(
+    fake_account, mock_Mailbox_fetch, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case it is called within :func:`core.models.MailHostThrottle.MailHostThrottle.waiting`.
+    """
+    baker.make(Mailbox, account=fake_account, _quantity=3)
+    is_waiting_allowed = []
+    mock_Mailbox_fetch.side_effect = lambda *_args: is_waiting_allowed.append(
+        _is_waiting_allowed.get()
+    )
+
+    with MailHostThrottle.waiting():
+        fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert is_waiting_allowed == [True, True, True]
+
+
+@pytest.mark.django_db
+def test_Account_fetch_partial_failure(
+    fake_account, mock_Mailbox_fetch, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case fetching one of the mailboxes fails.
+    """
+    failing_mailbox, *_other_mailboxes = baker.make(
+        Mailbox, account=fake_account, _quantity=3
+    )
+    fake_error = MailboxError(Exception())
+
+    def fake_fetch(mailbox, criterion):
+        if mailbox == failing_mailbox:
+            raise fake_error
+
+    mock_Mailbox_fetch.side_effect = fake_fetch
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {failing_mailbox: fake_error}
+    assert mock_Mailbox_fetch.call_count == 3
+
+
+@pytest.mark.django_db
+def test_Account_fetch_unexpected_error(
+    fake_error_message, fake_account, mock_Mailbox_fetch, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case fetching one of the mailboxes fails with an unexpected error.
+    """
+    baker.make(Mailbox, account=fake_account)
+    mock_Mailbox_fetch.side_effect = AssertionError(fake_error_message)
+
+    with pytest.raises(AssertionError, match=fake_error_message):
+        fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+
+@pytest.mark.django_db
+def test_Account_fetch_no_mailboxes(
+    fake_account, mock_Mailbox_fetch, spy_ThreadPoolExecutor, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case the account has no healthy mailboxes.
+    """
+    baker.make(Mailbox, account=fake_account, is_healthy=False)
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    mock_Mailbox_fetch.assert_not_called()
+    mock_Account_get_fetcher.assert_not_called()
+    spy_ThreadPoolExecutor.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_Account_fetch_skips_unchanged(
+    fake_account, mock_logger, mock_Mailbox_fetch, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case some mailboxes are unchanged since their last fetch.
+    """
+    unchanged_mailbox, *changed_mailboxes = baker.make(
+        Mailbox, account=fake_account, _quantity=3
+    )
+    mock_Account_get_fetcher.return_value.find_unchanged_mailboxes.return_value = [
+        unchanged_mailbox
+    ]
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    mock_Account_get_fetcher.return_value.find_unchanged_mailboxes.assert_called_once()
+    assert (
+        mock_Account_get_fetcher.return_value.find_unchanged_mailboxes.call_args.args[1]
+        == EmailFetchingCriterionChoices.ALL
+    )
+    fetched_mailboxes = [call.args[0] for call in mock_Mailbox_fetch.call_args_list]
+    assert sorted(fetched_mailboxes, key=lambda mailbox: mailbox.pk) == sorted(
+        changed_mailboxes, key=lambda mailbox: mailbox.pk
+    )
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_Account_fetch_all_unchanged(
+    fake_account, mock_Mailbox_fetch, mock_Account_get_fetcher, spy_ThreadPoolExecutor
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case all mailboxes are unchanged since their last fetch.
+    """
+    mailboxes = baker.make(Mailbox, account=fake_account, _quantity=2)
+    mock_Account_get_fetcher.return_value.find_unchanged_mailboxes.return_value = (
+        mailboxes
+    )
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    mock_Mailbox_fetch.assert_not_called()
+    spy_ThreadPoolExecutor.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_Account_fetch_change_check_error(
+    fake_account, mock_logger, mock_Mailbox_fetch, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case checking the mailboxes for changes fails.
+    """
+    baker.make(Mailbox, account=fake_account, _quantity=2)
+    mock_Account_get_fetcher.side_effect = MailAccountError(Exception())
+
+    result = fake_account.fetch(EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    assert mock_Mailbox_fetch.call_count == 2
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_Account_fetch_unavailable_criterion(fake_account, mock_Mailbox_fetch):
+    """Tests :func:`core.models.Account.Account.fetch`
+    in case the criterion is not available for the account.
+    """
+    baker.make(Mailbox, account=fake_account)
+
+    with pytest.raises(ValueError, match="not available"):
+        fake_account.fetch("NOCRITERION")
+
+    mock_Mailbox_fetch.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_Account_update_mailboxes_success(
     fake_account,
@@ -20,6 +20,7 @@
 
 import datetime
 import email
+import email.policy
 import os
 from tempfile import gettempdir
 from zipfile import ZipFile
@@ -670,7 +671,9 @@ def test_Attachment_from_data(
     """
     with Pause(fake_fs), open(test_email_path, "br") as test_email_file:
         test_email_bytes = test_email_file.read()
-    test_email_message = email.message_from_bytes(test_email_bytes)
+    test_email_message = email.message_from_bytes(
+        test_email_bytes, policy=email.policy.default
+    )
 
     result = Attachment.create_from_email_message(test_email_message, fake_email)
 
@@ -383,6 +383,141 @@ def test_Correspondent_create_from_correspondent_tuple_no_address(
     mock_logger.debug.assert_called()
 
 
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_create(faker, owner_user):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case the correspondents are not in the database.
+    """
+    fake_addresses = [faker.unique.email() for _ in range(3)]
+    fake_list_id = faker.word()
+
+    result = Correspondent.bulk_upsert(
+        {
+            fake_addresses[0]: {"email_name": "first", "list_id": fake_list_id},
+            fake_addresses[1]: {"email_name": "second"},
+            fake_addresses[2]: {"email_name": ""},
+        },
+        owner_user,
+    )
+
+    assert Correspondent.objects.count() == 3
+    assert set(result) == set(fake_addresses)
+    for address, correspondent_id in result.items():
+        correspondent = Correspondent.objects.get(id=correspondent_id)
+        assert correspondent.email_address == address
+        assert correspondent.user == owner_user
+    assert Correspondent.objects.get(id=result[fake_addresses[0]]).list_id == (
+        fake_list_id
+    )
+    assert Correspondent.objects.get(id=result[fake_addresses[1]]).list_id == ""
+    assert Correspondent.objects.get(id=result[fake_addresses[1]]).email_name == (
+        "second"
+    )
+
+
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_update(faker, fake_correspondent):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case the correspondent is already in the database.
+    """
+    fake_correspondent.real_name = faker.name()
+    fake_correspondent.list_id = faker.word()
+    fake_correspondent.save()
+    fake_email_name = faker.name()
+
+    result = Correspondent.bulk_upsert(
+        {fake_correspondent.email_address: {"email_name": fake_email_name}},
+        fake_correspondent.user,
+    )
+
+    assert result == {fake_correspondent.email_address: fake_correspondent.id}
+    assert Correspondent.objects.count() == 1
+    updated_correspondent = Correspondent.objects.get(id=fake_correspondent.id)
+    assert updated_correspondent.email_name == fake_email_name
+    assert updated_correspondent.real_name == fake_correspondent.real_name
+    assert updated_correspondent.list_id == fake_correspondent.list_id
+    assert updated_correspondent.created == fake_correspondent.created
+    assert updated_correspondent.updated > fake_correspondent.updated
+
+
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_other_user(fake_correspondent, other_user):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case the address belongs to a correspondent of another user.
+    """
+    result = Correspondent.bulk_upsert(
+        {fake_correspondent.email_address: {"email_name": "other"}}, other_user
+    )
+
+    assert Correspondent.objects.count() == 2
+    assert result[fake_correspondent.email_address] != fake_correspondent.id
+    fake_correspondent.refresh_from_db()
+    assert fake_correspondent.email_name != "other"
+
+
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_unchanged(
+    fake_correspondent, django_assert_num_queries
+):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case the correspondent data is unchanged.
+    """
+    correspondents_fields = {
+        fake_correspondent.email_address: {
+            "email_name": fake_correspondent.email_name,
+            "list_id": fake_correspondent.list_id,
+        }
+    }
+
+    with django_assert_num_queries(1):
+        result = Correspondent.bulk_upsert(
+            correspondents_fields, fake_correspondent.user
+        )
+
+    assert result == {fake_correspondent.email_address: fake_correspondent.id}
+    assert Correspondent.objects.get(id=fake_correspondent.id).updated == (
+        fake_correspondent.updated
+    )
+
+
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_cache(faker, owner_user, django_assert_num_queries):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case of a cache that is shared between calls.
+    """
+    fake_address = faker.email()
+    cache = {}
+
+    first_result = Correspondent.bulk_upsert(
+        {fake_address: {"email_name": "first"}}, owner_user, cache
+    )
+    with django_assert_num_queries(0):
+        second_result = Correspondent.bulk_upsert(
+            {fake_address: {"email_name": "first"}}, owner_user, cache
+        )
+    with django_assert_num_queries(1):
+        third_result = Correspondent.bulk_upsert(
+            {fake_address: {"email_name": "changed"}}, owner_user, cache
+        )
+
+    assert first_result == second_result == third_result
+    assert cache[(owner_user.pk, fake_address)]["email_name"] == "changed"
+    assert Correspondent.objects.get(email_address=fake_address).email_name == (
+        "changed"
+    )
+
+
+@pytest.mark.django_db
+def test_Correspondent_bulk_upsert_empty(owner_user, django_assert_num_queries):
+    """Tests :func:`core.models.Correspondent.Correspondent.bulk_upsert`
+    in case there are no correspondents.
+    """
+    with django_assert_num_queries(0):
+        result = Correspondent.bulk_upsert({}, owner_user)
+
+    assert result == {}
+
+
 @pytest.mark.django_db
 def test_Correspondent_get_absolute_url(fake_correspondent):
     """Tests :func:`core.models.Correspondent.Correspondent.get_absolute_url`."""
@@ -206,6 +206,20 @@ def test_Daemon_test_failure(mock_celery_app, fake_daemon, error):
     mock_celery_app.send_task.return_value.get.assert_called_once_with()
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("fetching_filter", [None, {"from": "example.org"}])
+def test_Daemon_fetch_run_key(fake_daemon, fetching_filter):
+    """Tests :attr:`core.models.Daemon.Daemon.fetch_run_key`."""
+    fake_daemon.fetching_filter = fetching_filter
+
+    result = fake_daemon.fetch_run_key
+
+    assert result == Mailbox.make_fetch_run_key(
+        fake_daemon.fetching_criterion, fake_daemon.get_fetching_filter()
+    )
+    assert (result == fake_daemon.fetching_criterion) is (fetching_filter is None)
+
+
 @pytest.mark.django_db
 def test_Daemon_get_absolute_url(fake_daemon):
     """Tests :func:`core.models.Daemon.Daemon.get_absolute_url`."""
@@ -22,6 +22,7 @@ from __future__ import annotations
 
 import datetime
 import os
+from io import BytesIO
 from tempfile import TemporaryDirectory, gettempdir
 from zipfile import ZipFile
 
@@ -39,6 +40,7 @@ from core.constants import (
 )
 from core.models import Correspondent, Email, Mailbox
 from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from core.utils.mail_parsing import parse_email
 from eonvelope.utils.workarounds import get_config
 from test.conftest import TEST_EMAIL_PARAMETERS
 
@@ -437,6 +439,87 @@ def test_Email_restore_to_mailbox_get_fetcher_error(
     mock_logger.debug.assert_called()
 
 
+@pytest.mark.django_db
+def test_Email_restore_queryset_to_mailboxes_success(
+    mocker, fake_email, mock_logger, mock_fetcher, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Email.Email.restore_queryset_to_mailboxes`
+    in case some emails fail to restore.
+    """
+    other_email = baker.make(Email, mailbox=fake_email.mailbox)
+    fake_error = MailboxError(Exception())
+    mock_fetcher.restore_batch.side_effect = lambda emails: iter(
+        [(emails[0], None), (emails[1], fake_error)]
+    )
+    mock_progress_callback = mocker.Mock()
+
+    result = Email.restore_queryset_to_mailboxes(
+        Email.objects.filter(id__in=[fake_email.id, other_email.id]),
+        mock_progress_callback,
+    )
+
+    assert result == {other_email: fake_error}
+    mock_Account_get_fetcher.assert_called_once_with(fake_email.mailbox.account)
+    mock_fetcher.restore_batch.assert_called_once_with([fake_email, other_email])
+    assert mock_progress_callback.call_args_list == [
+        mocker.call(1, 2),
+        mocker.call(2, 2),
+    ]
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_Email_restore_queryset_to_mailboxes_get_fetcher_error(
+    mocker,
+    fake_email,
+    fake_other_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+):
+    """Tests :func:`core.models.Email.Email.restore_queryset_to_mailboxes`
+    in case the :func:`core.models.Account.Account.get_fetcher` of one account
+    raises a :class:`core.utils.fetchers.exceptions.MailAccountError`.
+    """
+    other_email = baker.make(Email, mailbox=fake_other_mailbox)
+    fake_error = MailAccountError(Exception())
+
+    def fake_get_fetcher(account):
+        if account != fake_email.mailbox.account:
+            raise fake_error
+        return mock_fetcher
+
+    mock_Account_get_fetcher.side_effect = fake_get_fetcher
+    mock_fetcher.restore_batch.side_effect = lambda emails: iter(
+        [(email, None) for email in emails]
+    )
+    mock_progress_callback = mocker.Mock()
+
+    result = Email.restore_queryset_to_mailboxes(
+        Email.objects.filter(id__in=[fake_email.id, other_email.id]),
+        mock_progress_callback,
+    )
+
+    assert result == {other_email: fake_error}
+    assert mock_Account_get_fetcher.call_count == 2
+    mock_fetcher.restore_batch.assert_called_once_with([fake_email])
+    mock_progress_callback.assert_called_with(2, 2)
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_Email_restore_queryset_to_mailboxes_empty(
+    mock_logger, mock_fetcher, mock_Account_get_fetcher
+):
+    """Tests :func:`core.models.Email.Email.restore_queryset_to_mailboxes`
+    in case the queryset is empty.
+    """
+    result = Email.restore_queryset_to_mailboxes(Email.objects.none())
+
+    assert result == {}
+    mock_Account_get_fetcher.assert_not_called()
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize("start_id", [1, 2, 3, 4, 5, 6, 7, 8])
 def test_Email_conversation_missing_connection_leaf(fake_email_conversation, start_id):
@@ -924,6 +1007,49 @@ def test_Email_add_correspondents_multi(faker, fake_email):
     assert fake_mentioned_correspondent_2 in fake_email.correspondents.all()
 
 
+@pytest.mark.django_db
+def test_Email_add_correspondents_mailinglist(faker, fake_email):
+    """Tests :func:`core.models.Email.Email.add_correspondents`
+    in case the email is from a mailinglist.
+    """
+    fake_email_address = faker.email()
+    fake_list_id = faker.word()
+    fake_email.headers = {
+        HeaderFields.Correspondents.FROM: f"Sender <{fake_email_address}>",
+        HeaderFields.Correspondents.TO: f"Recipient <{fake_email_address}>",
+        HeaderFields.MailingList.ID: fake_list_id,
+    }
+
+    fake_email.add_correspondents()
+
+    assert Correspondent.objects.count() == 1
+    assert fake_email.emailcorrespondents.count() == 2
+    correspondent = fake_email.correspondents.first()
+    assert correspondent.email_address == fake_email_address
+    assert correspondent.email_name == "Recipient"
+    assert correspondent.list_id == fake_list_id
+    assert correspondent.list_help == ""
+
+
+@pytest.mark.django_db
+def test_Email_add_correspondents_cache(faker, fake_email, django_assert_num_queries):
+    """Tests :func:`core.models.Email.Email.add_correspondents`
+    in case the correspondents are in the cache already.
+    """
+    fake_email.headers = {
+        HeaderFields.Correspondents.FROM: faker.email(),
+        HeaderFields.Correspondents.TO: f"{faker.email()}, {faker.email()}",
+    }
+    correspondent_cache = {}
+    fake_email.add_correspondents(correspondent_cache=correspondent_cache)
+    fake_email.emailcorrespondents.all().delete()
+
+    with django_assert_num_queries(1):
+        fake_email.add_correspondents(correspondent_cache=correspondent_cache)
+
+    assert fake_email.correspondents.count() == 3
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     "test_email_path, expected_email_features, expected_correspondents_features,expected_attachments_features",
@@ -1002,6 +1128,39 @@ def test_Email_create_from_email_bytes_success(
     mock_logger.critical.assert_not_called()
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "test_email_path, expected_email_features, expected_correspondents_features,expected_attachments_features",
+    TEST_EMAIL_PARAMETERS,
+)
+def test_Email_create_from_email_bytes_spooled_file(
+    override_config,
+    fake_fs,
+    fake_mailbox,
+    test_email_path,
+    expected_email_features,
+    expected_correspondents_features,
+    expected_attachments_features,
+):
+    """Tests :func:`core.models.Email.Email.create_from_email_bytes`
+    in case the email is spooled to a file.
+    """
+    with Pause(fake_fs), open(test_email_path, "br") as test_email_file:
+        test_email_bytes = test_email_file.read()
+
+    with BytesIO(test_email_bytes) as spool_file, override_config(THROW_OUT_SPAM=False):
+        spool_file.seek(0, os.SEEK_END)
+        result = Email.create_from_email_bytes(spool_file, mailbox=fake_mailbox)
+
+    assert isinstance(result, Email)
+    assert result.message_id == expected_email_features["message_id"]
+    assert result.subject == expected_email_features["subject"]
+    assert result.datasize == len(test_email_bytes)
+    assert result.attachments.count() == len(expected_attachments_features)
+    with default_storage.open(result.file_path) as email_file:
+        assert email_file.read() == test_email_bytes
+
+
 @pytest.mark.django_db
 def test_Email_create_from_email_bytes_duplicate(
     override_config,
@@ -1100,6 +1259,75 @@ def test_Email_create_from_email_bytes_dberror(
     mock_logger.critical.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_Email_save_parsed_email_error_clears_cache(mocker, fake_mailbox, mock_logger):
+    """Tests :func:`core.models.Email.Email.save_parsed_email`
+    in case saving fails after the correspondents have been upserted.
+    """
+    mocker.patch(
+        "core.models.Email.Attachment.create_from_parsed_attachments",
+        autospec=True,
+        side_effect=IntegrityError,
+    )
+    email_bytes = b"Message-ID: <id@eonvelope.test>\nFrom: sender@eonvelope.test"
+    correspondent_cache = {}
+
+    result = Email.save_parsed_email(
+        parse_email(email_bytes), email_bytes, fake_mailbox, correspondent_cache
+    )
+
+    assert result is None
+    assert correspondent_cache == {}
+    assert Correspondent.objects.count() == 0
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_Email_is_skipped_batch(override_config, fake_email, mock_logger):
+    """Tests :func:`core.models.Email.Email.is_skipped_batch`
+    with new, known, repeated and spam emails.
+    """
+    email_data_batch = [
+        b"Message-ID: <new@eonvelope.test>",
+        f"Message-ID: {fake_email.message_id}".encode(),
+        b"Message-ID: <new@eonvelope.test>",
+        b"Message-ID: <spam@eonvelope.test>\nX-Spam-Flag: YES",
+        b"Subject: no id",
+        b"Subject: no id",
+    ]
+
+    with override_config(THROW_OUT_SPAM=True):
+        result = Email.is_skipped_batch(email_data_batch, fake_email.mailbox)
+
+    assert result == [False, True, True, True, False, True]
+    mock_logger.debug.assert_called()
+
+
+@pytest.mark.django_db
+def test_Email_is_skipped_batch_spooled_file(override_config, fake_email):
+    """Tests :func:`core.models.Email.Email.is_skipped_batch`
+    in case of an email spooled to a file.
+    """
+    with (
+        BytesIO(f"Message-ID: {fake_email.message_id}".encode()) as spool_file,
+        override_config(THROW_OUT_SPAM=False),
+    ):
+        spool_file.seek(0, os.SEEK_END)
+        result = Email.is_skipped_batch([spool_file], fake_email.mailbox)
+
+    assert result == [True]
+
+
+@pytest.mark.django_db
+def test_Email_is_skipped_batch_empty(fake_mailbox):
+    """Tests :func:`core.models.Email.Email.is_skipped_batch`
+    in case of an empty batch.
+    """
+    result = Email.is_skipped_batch([], fake_mailbox)
+
+    assert result == []
+
+
 @pytest.mark.django_db
 def test_Email_html_version(fake_email, fake_attachment, fake_correspondent):
     """Tests :func:`core.models.Email.Email.html_version`."""
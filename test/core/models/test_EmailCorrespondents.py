@@ -21,6 +21,7 @@
 
 import pytest
 from django.db import IntegrityError
+from django.db.models.signals import post_save
 from model_bakery import baker
 
 from core.constants import HeaderFields
@@ -171,10 +172,102 @@ def test_EmailCorrespondent_create_from_header_no_email(fake_header_name, faker)
     assert EmailCorrespondent.objects.count() == 0
     assert Correspondent.objects.count() == 0
 
-    with pytest.raises(ValueError):
+    with pytest.raises(ValueError, match="Email is not in the db"):
         EmailCorrespondent.create_from_header(
             faker.sentence(), fake_header_name, Email()
         )
 
     assert EmailCorrespondent.objects.count() == 0
     assert Correspondent.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_EmailCorrespondent_create_from_header_duplicate_address(
+    fake_email, fake_header_name, faker
+):
+    """Tests :func:`core.models.EmailCorrespondent.EmailCorrespondent.create_from_header`
+    in case the same address is mentioned more than once in the header.
+    """
+    fake_address = faker.email()
+
+    result = EmailCorrespondent.create_from_header(
+        f"{fake_address}, {faker.email()}, {fake_address}",
+        fake_header_name,
+        fake_email,
+    )
+
+    assert len(result) == 2
+    assert EmailCorrespondent.objects.count() == 2
+    assert Correspondent.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_EmailCorrespondent_bulk_save_success(
+    fake_email, fake_header_name, django_assert_num_queries, mocker
+):
+    """Tests :func:`core.models.EmailCorrespondent.EmailCorrespondent.bulk_save`
+    in case of success.
+    """
+    fake_correspondents = baker.make(
+        Correspondent, user=fake_email.mailbox.account.user, _quantity=3
+    )
+    mock_post_save_receiver = mocker.Mock()
+    post_save.connect(mock_post_save_receiver, sender=EmailCorrespondent)
+    new_email_correspondents = [
+        EmailCorrespondent(
+            email=fake_email, correspondent=correspondent, mention=fake_header_name
+        )
+        for correspondent in fake_correspondents
+    ]
+
+    try:
+        with django_assert_num_queries(1):
+            result = EmailCorrespondent.bulk_save(new_email_correspondents)
+    finally:
+        post_save.disconnect(mock_post_save_receiver, sender=EmailCorrespondent)
+
+    assert result == new_email_correspondents
+    assert EmailCorrespondent.objects.count() == 3
+    for item in result:
+        assert item.pk is not None
+        assert item._state.adding is False
+        mock_post_save_receiver.assert_any_call(
+            signal=post_save,
+            sender=EmailCorrespondent,
+            instance=item,
+            created=True,
+            update_fields=None,
+            raw=False,
+            using=mocker.ANY,
+        )
+    assert mock_post_save_receiver.call_count == 3
+
+
+@pytest.mark.django_db
+def test_EmailCorrespondent_bulk_save_empty(django_assert_num_queries):
+    """Tests :func:`core.models.EmailCorrespondent.EmailCorrespondent.bulk_save`
+    in case there are no emailcorrespondents to save.
+    """
+    with django_assert_num_queries(0):
+        result = EmailCorrespondent.bulk_save([])
+
+    assert result == []
+
+
+@pytest.mark.django_db
+def test_EmailCorrespondent_bulk_save_no_email(fake_correspondent, fake_header_name):
+    """Tests :func:`core.models.EmailCorrespondent.EmailCorrespondent.bulk_save`
+    in case the email of an emailcorrespondent is not in the database.
+    """
+    with pytest.raises(ValueError, match="Email is not in the db"):
+        EmailCorrespondent.bulk_save(
+            [
+                EmailCorrespondent(
+                    email=Email(),
+                    correspondent=fake_correspondent,
+                    mention=fake_header_name,
+                )
+            ]
+        )
+
+    assert EmailCorrespondent.objects.count() == 0
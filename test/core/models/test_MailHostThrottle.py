@@ -0,0 +1,190 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Test module for :mod:`core.models.MailHostThrottle`."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+from constance.test import override_config
+from django.utils import timezone
+from freezegun import freeze_time
+
+from core.models import MailHostThrottle
+from core.utils.fetchers.exceptions import MailHostThrottledError
+
+
+@pytest.fixture(autouse=True)
+def mock_logger(mocker):
+    """The mocked :attr:`core.models.MailHostThrottle.logger`."""
+    return mocker.patch("core.models.MailHostThrottle.logger", autospec=True)
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    """The mocked :func:`time.sleep` in :mod:`core.models.MailHostThrottle`."""
+    mock_time = mocker.patch("core.models.MailHostThrottle.time", autospec=True)
+    mock_time.monotonic.return_value = 0.0
+    return mock_time.sleep
+
+
+@pytest.mark.django_db
+def test___str__(faker):
+    """Tests :class:`core.models.MailHostThrottle.__str__`."""
+    fake_mail_host = faker.hostname()
+
+    result = str(MailHostThrottle(mail_host=fake_mail_host))
+
+    assert fake_mail_host in result
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_RATE_LIMIT=3)
+def test_MailHostThrottle_acquire_success(faker, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.acquire`
+    in case there are tokens left.
+    """
+    fake_mail_host = faker.hostname()
+
+    MailHostThrottle.acquire(fake_mail_host.upper())
+
+    throttle = MailHostThrottle.objects.get(mail_host=fake_mail_host.lower())
+    assert throttle.tokens == pytest.approx(2, abs=0.1)
+    mock_sleep.assert_not_called()
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_RATE_LIMIT=3)
+def test_MailHostThrottle_acquire_wait(faker, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.acquire`
+    in case the bucket is empty.
+    """
+    fake_mail_host = faker.hostname()
+    with freeze_time() as frozen_time, MailHostThrottle.waiting():
+        mock_sleep.side_effect = frozen_time.tick
+        for _ in range(4):
+            MailHostThrottle.acquire(fake_mail_host)
+
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(20)
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_RATE_LIMIT=3)
+def test_MailHostThrottle_acquire_no_waiting(faker, mock_logger, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.acquire`
+    in case the bucket is empty outside of :func:`core.models.MailHostThrottle.MailHostThrottle.waiting`.
+    """
+    fake_mail_host = faker.hostname()
+    with freeze_time():
+        for _ in range(3):
+            MailHostThrottle.acquire(fake_mail_host)
+
+        with pytest.raises(MailHostThrottledError):
+            MailHostThrottle.acquire(fake_mail_host)
+
+    mock_sleep.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_RATE_LIMIT=3)
+def test_MailHostThrottle_waiting_reset(faker, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.waiting`
+    allowing to wait only within its block.
+    """
+    fake_mail_host = faker.hostname()
+    with freeze_time() as frozen_time:
+        mock_sleep.side_effect = frozen_time.tick
+        with MailHostThrottle.waiting():
+            for _ in range(4):
+                MailHostThrottle.acquire(fake_mail_host)
+
+        with pytest.raises(MailHostThrottledError):
+            MailHostThrottle.acquire(fake_mail_host)
+
+    mock_sleep.assert_called_once()
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_RATE_LIMIT=0)
+def test_MailHostThrottle_acquire_no_rate_limit(faker, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.acquire`
+    in case the rate limit is disabled.
+    """
+    fake_mail_host = faker.hostname()
+
+    for _ in range(10):
+        MailHostThrottle.acquire(fake_mail_host)
+
+    mock_sleep.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_MailHostThrottle_acquire_timeout(faker, mock_logger, mock_sleep):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.acquire`
+    in case the mailserver is paused for longer than the timeout.
+    """
+    fake_mail_host = faker.hostname()
+    MailHostThrottle.objects.create(
+        mail_host=fake_mail_host,
+        backoff_until=timezone.now()
+        + timedelta(seconds=MailHostThrottle.ACQUIRE_TIMEOUT + 60),
+    )
+
+    with pytest.raises(MailHostThrottledError), MailHostThrottle.waiting():
+        MailHostThrottle.acquire(fake_mail_host)
+
+    mock_sleep.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+@override_config(MAIL_HOST_MAX_BACKOFF=100)
+def test_MailHostThrottle_back_off(faker, mock_logger):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.back_off`
+    doubling the backoff up to the maximum.
+    """
+    fake_mail_host = faker.hostname()
+
+    results = [MailHostThrottle.back_off(fake_mail_host) for _ in range(4)]
+
+    assert results == [MailHostThrottle.MIN_BACKOFF, 60, 100, 100]
+    assert MailHostThrottle.get_pause(fake_mail_host) == pytest.approx(100, abs=1)
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_MailHostThrottle_recover(faker):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.recover`."""
+    fake_mail_host = faker.hostname()
+    MailHostThrottle.objects.create(mail_host=fake_mail_host, backoff=120)
+
+    MailHostThrottle.recover(fake_mail_host)
+
+    assert MailHostThrottle.objects.get(mail_host=fake_mail_host).backoff == 60
+
+
+@pytest.mark.django_db
+def test_MailHostThrottle_get_pause_unknown_host(faker):
+    """Tests :func:`core.models.MailHostThrottle.MailHostThrottle.get_pause`
+    in case of a mailserver that was never throttled.
+    """
+    assert MailHostThrottle.get_pause(faker.hostname()) == 0
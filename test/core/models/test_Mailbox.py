@@ -30,7 +30,7 @@ from tempfile import NamedTemporaryFile, TemporaryDirectory, gettempdir
 from zipfile import ZipFile
 
 import pytest
-from django.db import IntegrityError
+from django.db import DatabaseError, IntegrityError
 from django.urls import reverse
 from model_bakery import baker
 from pyfakefs.fake_filesystem_unittest import Pause
@@ -43,6 +43,7 @@ from core.constants import (
 from core.models import Account, Mailbox
 from core.utils.fetchers import (
     ExchangeFetcher,
+    FetchingFilter,
     IMAP4_SSL_Fetcher,
     IMAP4Fetcher,
     POP3_SSL_Fetcher,
@@ -73,11 +74,9 @@ def mock_parse_mailbox_name(mocker, faker):
 
 
 @pytest.fixture
-def mock_Email_create_from_email_bytes(mocker):
-    """Patches `core.models.Email.create_from_email_bytes`."""
-    return mocker.patch(
-        "core.models.Email.Email.create_from_email_bytes", autospec=True
-    )
+def mock_Email_save_parsed_email(mocker):
+    """Patches `core.models.Email.save_parsed_email`."""
+    return mocker.patch("core.models.Email.Email.save_parsed_email", autospec=True)
 
 
 @pytest.mark.django_db
@@ -275,6 +274,139 @@ def test_Mailbox_test_get_fetcher_error(
     mock_logger.info.assert_called()
 
 
+@pytest.mark.django_db
+def test_Mailbox_start_fetch_run_new(faker, fake_mailbox):
+    """Tests :func:`core.models.Mailbox.Mailbox.start_fetch_run`
+    in case the previous run is complete.
+    """
+    fake_run_id = faker.uuid4(cast_to=None)
+    fake_mailbox.fetch_run_id = faker.uuid4(cast_to=None)
+    fake_mailbox.fetch_checkpoint = faker.word()
+    fake_mailbox.fetch_progress = faker.random_int(min=1)
+    fake_mailbox.is_fetch_complete = True
+    fake_mailbox.save()
+
+    fake_mailbox.start_fetch_run(fake_run_id)
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_checkpoint == ""
+    assert fake_mailbox.fetch_progress == 0
+    assert fake_mailbox.fetch_checkpoint_at is not None
+    assert fake_mailbox.is_fetch_complete is False
+
+
+@pytest.mark.django_db
+def test_Mailbox_start_fetch_run_no_run_id(fake_mailbox):
+    """Tests :func:`core.models.Mailbox.Mailbox.start_fetch_run`
+    in case no run id is given.
+    """
+    fake_mailbox.start_fetch_run()
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id is not None
+    assert fake_mailbox.is_fetch_complete is False
+
+
+@pytest.mark.django_db
+def test_Mailbox_start_fetch_run_resume(faker, fake_mailbox, mock_logger):
+    """Tests :func:`core.models.Mailbox.Mailbox.start_fetch_run`
+    in case the previous run was interrupted.
+    """
+    fake_previous_run_id = faker.uuid4(cast_to=None)
+    fake_checkpoint = faker.word()
+    fake_progress = faker.random_int(min=1)
+    fake_mailbox.fetch_run_id = fake_previous_run_id
+    fake_mailbox.fetch_checkpoint = fake_checkpoint
+    fake_mailbox.fetch_progress = fake_progress
+    fake_mailbox.is_fetch_complete = False
+    fake_mailbox.save()
+
+    fake_mailbox.start_fetch_run(faker.uuid4(cast_to=None))
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_previous_run_id
+    assert fake_mailbox.fetch_checkpoint == fake_checkpoint
+    assert fake_mailbox.fetch_progress == fake_progress
+    assert fake_mailbox.is_fetch_complete is False
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_Mailbox_start_fetch_run_other_key(faker, fake_mailbox):
+    """Tests :func:`core.models.Mailbox.Mailbox.start_fetch_run`
+    in case the previous run with another key was interrupted.
+    """
+    fake_previous_run_id = faker.uuid4(cast_to=None)
+    fake_run_id = faker.uuid4(cast_to=None)
+    fake_checkpoint = faker.word()
+    fake_progress = faker.random_int(min=1)
+    fake_mailbox.fetch_run_id = fake_previous_run_id
+    fake_mailbox.fetch_run_key = "ALL"
+    fake_mailbox.fetch_checkpoint = fake_checkpoint
+    fake_mailbox.fetch_progress = fake_progress
+    fake_mailbox.is_fetch_complete = False
+    fake_mailbox.save()
+
+    fake_mailbox.start_fetch_run(fake_run_id, "UNSEEN")
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_run_key == "UNSEEN"
+    assert fake_mailbox.fetch_checkpoint == ""
+    assert fake_mailbox.fetch_progress == 0
+    assert fake_mailbox.interrupted_fetch_runs == {
+        "ALL": {
+            "run_id": str(fake_previous_run_id),
+            "checkpoint": fake_checkpoint,
+            "progress": fake_progress,
+        }
+    }
+
+    fake_mailbox.save_fetch_checkpoint(is_complete=True)
+    fake_mailbox.start_fetch_run(faker.uuid4(cast_to=None), "ALL")
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_previous_run_id
+    assert fake_mailbox.fetch_run_key == "ALL"
+    assert fake_mailbox.fetch_checkpoint == fake_checkpoint
+    assert fake_mailbox.fetch_progress == fake_progress
+    assert fake_mailbox.is_fetch_complete is False
+    assert fake_mailbox.interrupted_fetch_runs == {}
+
+
+@pytest.mark.django_db
+def test_Mailbox_start_fetch_run_legacy_key(faker, fake_mailbox):
+    """Tests :func:`core.models.Mailbox.Mailbox.start_fetch_run`
+    in case the interrupted previous run has no key.
+    """
+    fake_run_id = faker.uuid4(cast_to=None)
+    fake_mailbox.fetch_run_id = faker.uuid4(cast_to=None)
+    fake_mailbox.fetch_checkpoint = faker.word()
+    fake_mailbox.is_fetch_complete = False
+    fake_mailbox.save()
+
+    fake_mailbox.start_fetch_run(fake_run_id, "ALL")
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_checkpoint == ""
+    assert fake_mailbox.interrupted_fetch_runs == {}
+
+
+def test_Mailbox_make_fetch_run_key():
+    """Tests :func:`core.models.Mailbox.Mailbox.make_fetch_run_key`."""
+    fetching_filter = FetchingFilter({"subject": "invoice"})
+
+    assert Mailbox.make_fetch_run_key("ALL") == "ALL"
+    assert Mailbox.make_fetch_run_key("ALL", fetching_filter) == (
+        f"ALL {fetching_filter.make_digest()}"
+    )
+    assert Mailbox.make_fetch_run_key("ALL", fetching_filter) != (
+        Mailbox.make_fetch_run_key("ALL", FetchingFilter({"subject": "receipt"}))
+    )
+
+
 @pytest.mark.django_db
 def test_Mailbox_fetch_success(
     faker,
@@ -282,7 +414,7 @@ def test_Mailbox_fetch_success(
     mock_logger,
     mock_Account_get_fetcher,
     mock_fetcher,
-    mock_Email_create_from_email_bytes,
+    mock_Email_save_parsed_email,
 ):
     """Tests :func:`core.models.Mailbox.Mailbox.fetch`
     in case of success.
@@ -296,9 +428,11 @@ def test_Mailbox_fetch_success(
     fake_mailbox.refresh_from_db()
     assert fake_mailbox.is_healthy is True
     mock_Account_get_fetcher.assert_called_once_with(fake_mailbox.account)
-    mock_fetcher.fetch_emails.assert_called_once_with(fake_mailbox, fake_criterion)
-    assert mock_Email_create_from_email_bytes.call_count == len(
-        mock_fetcher.fetch_emails.return_value
+    mock_fetcher.stream_emails.assert_called_once_with(
+        fake_mailbox, fake_criterion, None
+    )
+    assert mock_Email_save_parsed_email.call_count == len(
+        mock_fetcher.stream_emails.return_value
     )
     mock_logger.info.assert_called()
     mock_logger.error.assert_not_called()
@@ -311,13 +445,13 @@ def test_Mailbox_fetch_failure(
     mock_logger,
     mock_fetcher,
     mock_Account_get_fetcher,
-    mock_Email_create_from_email_bytes,
+    mock_Email_save_parsed_email,
 ):
     """Tests :func:`core.models.Mailbox.Mailbox.fetch`
     in case fetching fails with a :class:`core.utils.fetchers.exceptions.MailboxError`.
     """
     fake_criterion = faker.word()
-    mock_fetcher.fetch_emails.side_effect = MailboxError(Exception())
+    mock_fetcher.stream_emails.side_effect = MailboxError(Exception())
     fake_mailbox.is_healthy = True
     fake_mailbox.save(update_fields=["is_healthy"])
 
@@ -327,19 +461,223 @@ def test_Mailbox_fetch_failure(
     fake_mailbox.refresh_from_db()
     assert fake_mailbox.is_healthy is False
     mock_Account_get_fetcher.assert_called_once_with(fake_mailbox.account)
-    mock_fetcher.fetch_emails.assert_called_once_with(fake_mailbox, fake_criterion)
-    mock_Email_create_from_email_bytes.assert_not_called()
+    mock_fetcher.stream_emails.assert_called_once_with(
+        fake_mailbox, fake_criterion, None
+    )
+    mock_Email_save_parsed_email.assert_not_called()
     mock_logger.info.assert_called()
     mock_logger.error.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_Mailbox_fetch_saves_while_streaming(
+    mocker,
+    faker,
+    fake_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+    mock_Email_save_parsed_email,
+):
+    """Tests :func:`core.models.Mailbox.Mailbox.fetch`
+    in case fetching fails after some emails have already been streamed.
+    """
+    fake_criterion = faker.word()
+    fake_emails = [text.encode() for text in faker.texts(nb_texts=3)]
+
+    def fake_stream(*args):
+        yield from fake_emails
+        raise MailboxError(Exception())
+
+    mock_fetcher.stream_emails.side_effect = fake_stream
+    fake_mailbox.is_healthy = True
+    fake_mailbox.save(update_fields=["is_healthy"])
+
+    with pytest.raises(MailboxError):
+        fake_mailbox.fetch(fake_criterion)
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.is_healthy is False
+    mock_fetcher.stream_emails.assert_called_once_with(
+        fake_mailbox, fake_criterion, None
+    )
+    mock_Email_save_parsed_email.assert_has_calls(
+        [
+            mocker.call(mocker.ANY, fake_email, fake_mailbox, mocker.ANY)
+            for fake_email in fake_emails
+        ]
+    )
+    assert mock_Email_save_parsed_email.call_count == len(fake_emails)
+
+
+@pytest.mark.django_db
+def test_Mailbox_fetch_saves_sync_state(
+    faker,
+    fake_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+    mock_Email_save_parsed_email,
+):
+    """Tests :func:`core.models.Mailbox.Mailbox.fetch`
+    in case the fetcher updates the sync state before failing.
+    """
+    fake_uid_validity = faker.random_int()
+    fake_highest_uid = faker.random_int()
+    fake_uidls = faker.words()
+    fake_sync_state = faker.sha256()
+
+    def fake_stream(mailbox, criterion, fetching_filter):
+        mailbox.uid_validity = fake_uid_validity
+        yield faker.text().encode()
+        mailbox.highest_uid = fake_highest_uid
+        mailbox.fetched_uidls = fake_uidls
+        mailbox.sync_state = fake_sync_state
+        raise MailboxError(Exception())
+
+    mock_fetcher.stream_emails.side_effect = fake_stream
+
+    with pytest.raises(MailboxError):
+        fake_mailbox.fetch(EmailFetchingCriterionChoices.INCREMENTAL)
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.uid_validity == fake_uid_validity
+    assert fake_mailbox.highest_uid == fake_highest_uid
+    assert fake_mailbox.fetched_uidls == fake_uidls
+    assert fake_mailbox.sync_state == fake_sync_state
+
+
+@pytest.mark.django_db
+def test_Mailbox_fetch_checkpoints_progress(
+    mocker,
+    faker,
+    override_config,
+    fake_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+    mock_Email_save_parsed_email,
+):
+    """Tests :func:`core.models.Mailbox.Mailbox.fetch`
+    in case of success with more emails than the checkpoint interval.
+    """
+    fake_run_id = faker.uuid4(cast_to=None)
+    fake_emails = [text.encode() for text in faker.texts(nb_texts=5)]
+
+    def fake_stream(mailbox, criterion, fetching_filter):
+        for number, fake_email in enumerate(fake_emails):
+            yield fake_email
+            mailbox.fetch_checkpoint = str(number)
+
+    mock_fetcher.stream_emails.side_effect = fake_stream
+    spy_save_fetch_checkpoint = mocker.spy(fake_mailbox, "save_fetch_checkpoint")
+
+    with override_config(FETCH_CHECKPOINT_INTERVAL=2):
+        fake_mailbox.fetch(faker.word(), run_id=fake_run_id)
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_checkpoint == "4"
+    assert fake_mailbox.fetch_progress == len(fake_emails)
+    assert fake_mailbox.fetch_checkpoint_at is not None
+    assert fake_mailbox.is_fetch_complete is True
+    # start, after the 2nd and 4th email and at the end
+    assert spy_save_fetch_checkpoint.call_count == 4
+
+
+@pytest.mark.django_db
+def test_Mailbox_fetch_save_error_keeps_saved_checkpoint(
+    mocker,
+    faker,
+    override_config,
+    fake_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+):
+    """Tests :func:`core.models.Mailbox.Mailbox.fetch`
+    in case saving a batch fails after the fetcher moved its checkpoint past it.
+    """
+    fake_emails = [text.encode() for text in faker.texts(nb_texts=4)]
+
+    def fake_stream(mailbox, criterion, fetching_filter):
+        for number, fake_email in enumerate(fake_emails):
+            yield fake_email
+            mailbox.fetch_checkpoint = str(number)
+            mailbox.highest_uid = number
+
+    mock_fetcher.stream_emails.side_effect = fake_stream
+    mocker.patch(
+        "core.models.Mailbox.IngestionPipeline.save_batch",
+        autospec=True,
+        side_effect=[[None, None], DatabaseError()],
+    )
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=2),
+        pytest.raises(DatabaseError),
+    ):
+        fake_mailbox.fetch(faker.word())
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_checkpoint == "0"
+    assert fake_mailbox.highest_uid == 0
+    assert fake_mailbox.fetch_progress == 2
+    assert fake_mailbox.is_fetch_complete is False
+
+
+@pytest.mark.django_db
+def test_Mailbox_fetch_resumes_interrupted_run(
+    faker,
+    fake_mailbox,
+    mock_logger,
+    mock_fetcher,
+    mock_Account_get_fetcher,
+    mock_Email_save_parsed_email,
+):
+    """Tests :func:`core.models.Mailbox.Mailbox.fetch`
+    in case it is retried after an interrupted fetch.
+    """
+    fake_run_id = faker.uuid4(cast_to=None)
+    fake_criterion = faker.word()
+    seen_checkpoints = []
+
+    def fake_stream(mailbox, criterion, fetching_filter):
+        seen_checkpoints.append(mailbox.fetch_checkpoint)
+        for number in range(int(mailbox.fetch_checkpoint or -1) + 1, 4):
+            yield faker.text().encode()
+            mailbox.fetch_checkpoint = str(number)
+            if number == 1 and len(seen_checkpoints) == 1:
+                raise MailboxError(Exception())
+
+    mock_fetcher.stream_emails.side_effect = fake_stream
+
+    with pytest.raises(MailboxError):
+        fake_mailbox.fetch(fake_criterion, run_id=fake_run_id)
+
+    fake_mailbox.refresh_from_db()
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_checkpoint == "1"
+    assert fake_mailbox.fetch_progress == 2
+    assert fake_mailbox.is_fetch_complete is False
+
+    fake_mailbox.fetch(fake_criterion, run_id=faker.uuid4(cast_to=None))
+
+    fake_mailbox.refresh_from_db()
+    assert seen_checkpoints == ["", "1"]
+    assert fake_mailbox.fetch_run_id == fake_run_id
+    assert fake_mailbox.fetch_checkpoint == "3"
+    assert fake_mailbox.fetch_progress == 4
+    assert fake_mailbox.is_fetch_complete is True
+
+
 @pytest.mark.django_db
 def test_Mailbox_fetch_get_fetcher_error(
     fake_mailbox,
     mock_logger,
     mock_Account_get_fetcher,
     mock_fetcher,
-    mock_Email_create_from_email_bytes,
+    mock_Email_save_parsed_email,
 ):
     """Tests :func:`core.models.Mailbox.Mailbox.fetch`
     in case :func:`core.models.Account.Account.get_fetcher`
@@ -355,8 +693,8 @@ def test_Mailbox_fetch_get_fetcher_error(
     fake_mailbox.refresh_from_db()
     assert fake_mailbox.is_healthy is True
     mock_Account_get_fetcher.assert_called_once_with(fake_mailbox.account)
-    mock_fetcher.fetch_emails.assert_not_called()
-    mock_Email_create_from_email_bytes.assert_not_called()
+    mock_fetcher.stream_emails.assert_not_called()
+    mock_Email_save_parsed_email.assert_not_called()
     mock_logger.info.assert_called()
     mock_logger.error.assert_not_called()
 
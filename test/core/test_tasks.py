@@ -19,9 +19,23 @@
 """Test file for :mod:`core.tasks`."""
 
 import pytest
-
-from core.tasks import fetch_emails
-from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from constance.test import override_config
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Daemon, Email, MailHostThrottle
+from core.tasks import (
+    dispatch_pending_fetches,
+    fetch_account_emails,
+    fetch_emails,
+    fetch_emails_concurrently,
+    restore_emails,
+)
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
 from test.conftest import TEST_EMAIL_PARAMETERS
 
 from .models.test_Account import mock_Account_get_fetcher, mock_fetcher
@@ -29,10 +43,10 @@ from .models.test_Account import mock_Account_get_fetcher, mock_fetcher
 
 @pytest.fixture
 def mock_test_email_fetcher(mock_fetcher):
-    """Extends :func:`test.models.test_Account.mock_fetcher` to return a test-email from `fetch_emails`."""
+    """Extends :func:`test.models.test_Account.mock_fetcher` to return a test-email from `stream_emails`."""
     with open(TEST_EMAIL_PARAMETERS[0][0], "br") as test_email_file:
         test_email = test_email_file.read()
-    mock_fetcher.fetch_emails.return_value = [test_email]
+    mock_fetcher.stream_emails.return_value = [test_email]
     return mock_fetcher
 
 
@@ -63,6 +77,21 @@ def test_fetch_emails_task_success(
     assert fake_daemon.mailbox.emails.count() == 1
 
 
+@pytest.mark.django_db
+def test_fetch_emails_task_run_id(faker, fake_fs, fake_daemon):
+    """Tests :func:`core.tasks.fetch_emails`
+    in case it runs as a task with an id.
+    """
+    fake_task_id = faker.uuid4()
+
+    fetch_emails.apply(args=(str(fake_daemon.uuid),), task_id=fake_task_id)
+
+    fake_daemon.mailbox.refresh_from_db()
+    assert str(fake_daemon.mailbox.fetch_run_id) == fake_task_id
+    assert fake_daemon.mailbox.fetch_progress == 1
+    assert fake_daemon.mailbox.is_fetch_complete is True
+
+
 @pytest.mark.django_db
 def test_fetch_emails_task_bad_daemon_uuid(faker, fake_daemon):
     """Tests :func:`core.tasks.fetch_emails`
@@ -82,7 +111,7 @@ def test_fetch_emails_task_MailboxError(
     """Tests :func:`core.tasks.fetch_emails`
     in case of an MailboxError.
     """
-    mock_test_email_fetcher.fetch_emails.side_effect = MailboxError(
+    mock_test_email_fetcher.stream_emails.side_effect = MailboxError(
         Exception(fake_error_message)
     )
 
@@ -104,7 +133,7 @@ def test_fetch_emails_task_MailAccountError(
     """Tests :func:`core.tasks.fetch_emails`
     in case of an MailAccountError.
     """
-    mock_test_email_fetcher.fetch_emails.side_effect = MailAccountError(
+    mock_test_email_fetcher.stream_emails.side_effect = MailAccountError(
         Exception(fake_error_message)
     )
 
@@ -120,6 +149,27 @@ def test_fetch_emails_task_MailAccountError(
     assert fake_error_message in fake_daemon.last_error
 
 
+@pytest.mark.django_db
+def test_fetch_emails_task_MailHostThrottledError(
+    fake_error_message, fake_daemon, mock_test_email_fetcher
+):
+    """Tests :func:`core.tasks.fetch_emails`
+    in case the mailserver throttles the requests.
+    """
+    mock_test_email_fetcher.stream_emails.side_effect = MailHostThrottledError(
+        Exception(fake_error_message), "fetching"
+    )
+
+    with pytest.raises(MailHostThrottledError, match=fake_error_message):
+        fetch_emails(str(fake_daemon.uuid))
+
+    fake_daemon.refresh_from_db()
+    assert fake_daemon.is_healthy is not False
+    assert fake_daemon.mailbox.is_healthy is not False
+    assert fake_daemon.mailbox.account.is_healthy is not False
+    assert MailHostThrottle.get_pause(fake_daemon.mailbox.account.mail_host) > 0
+
+
 @pytest.mark.django_db
 def test_fetch_emails_task_unexpected_error(
     fake_error_message, fake_daemon, mock_test_email_fetcher
@@ -127,7 +177,7 @@ def test_fetch_emails_task_unexpected_error(
     """Tests :func:`core.tasks.fetch_emails`
     in case of an unexpected error.
     """
-    mock_test_email_fetcher.fetch_emails.side_effect = AssertionError(
+    mock_test_email_fetcher.stream_emails.side_effect = AssertionError(
         fake_error_message
     )
 
@@ -150,7 +200,7 @@ def test_fetch_emails_task_ValueError(
     """Tests :func:`core.tasks.fetch_emails`
     in case of a ValueError.
     """
-    mock_test_email_fetcher.fetch_emails.side_effect = ValueError(fake_error_message)
+    mock_test_email_fetcher.stream_emails.side_effect = ValueError(fake_error_message)
 
     assert fake_daemon.mailbox.emails.count() == 0
     assert fake_daemon.is_healthy is not True
@@ -162,3 +212,236 @@ def test_fetch_emails_task_ValueError(
     assert fake_daemon.mailbox.emails.count() == 0
     assert fake_daemon.is_healthy is False
     assert fake_error_message in fake_daemon.last_error
+
+
+@pytest.mark.django_db
+def test_fetch_account_emails_task_success(mocker, fake_account):
+    """Tests :func:`core.tasks.fetch_account_emails`
+    in case of success.
+    """
+    mock_Account_fetch = mocker.patch(
+        "core.tasks.Account.fetch", autospec=True, return_value={}
+    )
+
+    result = fetch_account_emails(fake_account.id, EmailFetchingCriterionChoices.ALL)
+
+    assert result == {}
+    mock_Account_fetch.assert_called_once_with(
+        fake_account, EmailFetchingCriterionChoices.ALL
+    )
+
+
+@pytest.mark.django_db
+def test_fetch_account_emails_task_failure(
+    mocker, fake_error_message, fake_account, fake_mailbox
+):
+    """Tests :func:`core.tasks.fetch_account_emails`
+    in case fetching a mailbox fails.
+    """
+    mocker.patch(
+        "core.tasks.Account.fetch",
+        autospec=True,
+        return_value={fake_mailbox: MailboxError(Exception(fake_error_message))},
+    )
+
+    result = fetch_account_emails(fake_account.id, EmailFetchingCriterionChoices.ALL)
+
+    assert list(result) == [fake_mailbox.name]
+    assert fake_error_message in result[fake_mailbox.name]
+
+
+@pytest.mark.django_db
+def test_fetch_account_emails_task_bad_account_id(mocker, fake_account):
+    """Tests :func:`core.tasks.fetch_account_emails`
+    in case the given id doesn't match any account entry.
+    """
+    mock_Account_fetch = mocker.patch("core.tasks.Account.fetch", autospec=True)
+
+    result = fetch_account_emails(
+        fake_account.id + 1, EmailFetchingCriterionChoices.ALL
+    )
+
+    assert result == {}
+    mock_Account_fetch.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_fetch_emails_concurrently_task_success(mocker, fake_daemon):
+    """Tests :func:`core.tasks.fetch_emails_concurrently`
+    in case of success.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.IMAP
+    fake_daemon.mailbox.account.save()
+    fake_daemon.set_unhealthy("error")
+    mock_AsyncFetchEngine_run = mocker.patch(
+        "core.tasks.AsyncFetchEngine.run", autospec=True, return_value=[None]
+    )
+
+    result = fetch_emails_concurrently([str(fake_daemon.uuid)])
+
+    assert result == {}
+    mock_AsyncFetchEngine_run.assert_called_once()
+    assert mock_AsyncFetchEngine_run.call_args.args[1] == [
+        (fake_daemon.mailbox, fake_daemon.fetching_criterion)
+    ]
+    fake_daemon.refresh_from_db()
+    assert fake_daemon.is_healthy is True
+
+
+@pytest.mark.django_db
+def test_fetch_emails_concurrently_task_failure(
+    mocker, fake_error_message, fake_daemon
+):
+    """Tests :func:`core.tasks.fetch_emails_concurrently`
+    in case fetching the mailbox of a daemon fails.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.IMAP4_SSL
+    fake_daemon.mailbox.account.save()
+    mocker.patch(
+        "core.tasks.AsyncFetchEngine.run",
+        autospec=True,
+        return_value=[MailboxError(Exception(fake_error_message))],
+    )
+
+    result = fetch_emails_concurrently([str(fake_daemon.uuid)])
+
+    assert list(result) == [str(fake_daemon.uuid)]
+    assert fake_error_message in result[str(fake_daemon.uuid)]
+    fake_daemon.refresh_from_db()
+    assert fake_daemon.is_healthy is False
+    assert fake_error_message in fake_daemon.last_error
+
+
+@pytest.mark.django_db
+def test_fetch_emails_concurrently_task_unsupported_protocol(mocker, fake_daemon):
+    """Tests :func:`core.tasks.fetch_emails_concurrently`
+    in case of a daemon whose mailbox is not supported by the async fetch engine.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.POP3
+    fake_daemon.mailbox.account.save()
+    mock_fetch_emails_delay = mocker.patch(
+        "core.tasks.fetch_emails.delay", autospec=True
+    )
+    mock_AsyncFetchEngine_run = mocker.patch(
+        "core.tasks.AsyncFetchEngine.run", autospec=True, return_value=[]
+    )
+
+    result = fetch_emails_concurrently([str(fake_daemon.uuid)])
+
+    assert result == {}
+    mock_fetch_emails_delay.assert_called_once_with(str(fake_daemon.uuid))
+    assert mock_AsyncFetchEngine_run.call_args.args[1] == []
+
+
+@pytest.mark.django_db
+def test_fetch_emails_task_scheduled_pending(
+    mock_Account_get_test_email_fetcher, fake_daemon
+):
+    """Tests :func:`core.tasks.fetch_emails`
+    in case a scheduled run of a daemon is grouped with other daemons.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.IMAP
+    fake_daemon.mailbox.account.save()
+
+    fetch_emails.push_request(periodic_task_name=str(fake_daemon.uuid))
+    try:
+        with override_config(ASYNC_FETCH_GROUP_SIZE=10):
+            fetch_emails.run(str(fake_daemon.uuid))
+    finally:
+        fetch_emails.pop_request()
+
+    fake_daemon.refresh_from_db()
+    assert fake_daemon.is_fetch_pending is True
+    assert fake_daemon.mailbox.emails.count() == 0
+    mock_Account_get_test_email_fetcher.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "protocol, group_size",
+    [
+        (EmailProtocolChoices.IMAP, 0),
+        (EmailProtocolChoices.POP3, 10),
+    ],
+)
+def test_fetch_emails_task_scheduled_not_grouped(
+    fake_fs, fake_daemon, protocol, group_size
+):
+    """Tests :func:`core.tasks.fetch_emails`
+    in case a scheduled run of a daemon is not grouped with other daemons.
+    """
+    fake_daemon.mailbox.account.protocol = protocol
+    fake_daemon.mailbox.account.save()
+
+    fetch_emails.push_request(periodic_task_name=str(fake_daemon.uuid))
+    try:
+        with override_config(ASYNC_FETCH_GROUP_SIZE=group_size):
+            fetch_emails.run(str(fake_daemon.uuid))
+    finally:
+        fetch_emails.pop_request()
+
+    fake_daemon.refresh_from_db()
+    assert fake_daemon.is_fetch_pending is False
+    assert fake_daemon.mailbox.emails.count() == 1
+
+
+@pytest.mark.django_db
+def test_dispatch_pending_fetches_task(mocker):
+    """Tests :func:`core.tasks.dispatch_pending_fetches`
+    in case some daemons are pending.
+    """
+    pending_daemons = baker.make(Daemon, is_fetch_pending=True, _quantity=3)
+    other_daemon = baker.make(Daemon)
+    mock_fetch_emails_concurrently_delay = mocker.patch(
+        "core.tasks.fetch_emails_concurrently.delay", autospec=True
+    )
+
+    with override_config(ASYNC_FETCH_GROUP_SIZE=2):
+        result = dispatch_pending_fetches()
+
+    assert result == len(pending_daemons)
+    assert mock_fetch_emails_concurrently_delay.call_count == 2
+    assert sorted(
+        daemon_uuid_string
+        for call in mock_fetch_emails_concurrently_delay.call_args_list
+        for daemon_uuid_string in call.args[0]
+    ) == sorted(str(daemon.uuid) for daemon in pending_daemons)
+    assert str(other_daemon.uuid) not in str(
+        mock_fetch_emails_concurrently_delay.call_args_list
+    )
+    assert not Daemon.objects.filter(is_fetch_pending=True).exists()
+
+
+@pytest.mark.django_db
+def test_restore_emails_task_success(fake_email, mock_fetcher):
+    """Tests :func:`core.tasks.restore_emails`
+    in case some emails fail to restore.
+    """
+    other_email = baker.make(Email, mailbox=fake_email.mailbox)
+    mock_fetcher.restore_batch.side_effect = lambda emails: iter(
+        [(emails[0], None), (emails[1], MailboxError(Exception("failed")))]
+    )
+
+    result = restore_emails([fake_email.id, other_email.id])
+
+    assert list(result) == [str(other_email.id)]
+    assert "failed" in result[str(other_email.id)]
+    mock_fetcher.restore_batch.assert_called_once_with([fake_email, other_email])
+
+
+@pytest.mark.django_db
+def test_restore_emails_task_progress(mocker, fake_email, mock_fetcher):
+    """Tests :func:`core.tasks.restore_emails`
+    in case it runs as a task with an id and reports its progress.
+    """
+    mock_fetcher.restore_batch.side_effect = lambda emails: iter(
+        [(email, None) for email in emails]
+    )
+    mock_update_state = mocker.patch.object(restore_emails, "update_state")
+
+    result = restore_emails.apply(args=([fake_email.id],)).get()
+
+    assert result == {}
+    mock_update_state.assert_called_once_with(
+        state="PROGRESS", meta={"done": 1, "total": 1}
+    )
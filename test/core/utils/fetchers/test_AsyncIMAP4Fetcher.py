@@ -0,0 +1,446 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for :mod:`core.utils.fetchers.AsyncIMAP4Fetcher`.
+
+The fetcher is tested against the stand-in server from :mod:`test.fake_servers`.
+"""
+
+import asyncio
+import socket
+from email import message_from_bytes
+from io import BytesIO
+
+import pytest
+from constance.test import override_config
+from django.core.files.storage import default_storage
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices
+from core.models import Email, Mailbox
+from core.utils.fetchers import AsyncIMAP4Fetcher, IMAP4Fetcher
+from core.utils.fetchers.AsyncIMAP4Fetcher import AsyncIMAP4Client
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+from test.fake_servers import FakeIMAP4Server, generate_corpus
+from test.fake_servers.FakeIMAP4Server import FakeIMAP4Handler
+
+
+@pytest.fixture
+def unused_port():
+    """A port on localhost that nothing listens on."""
+    with socket.socket() as probe_socket:
+        probe_socket.bind(("127.0.0.1", 0))
+        return probe_socket.getsockname()[1]
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_success(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case of success.
+    """
+    corpus = generate_corpus(10)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with (
+            override_config(IMAP_FETCH_CHUNK_SIZE=3),
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+        ):
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus
+    assert "LOGOUT" in server.commands
+    assert "UNSELECT" in server.commands
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_known_messages(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case some messages are already in the mailbox.
+
+    These are skipped when the emails are saved, not by the fetcher.
+    """
+    corpus = generate_corpus(5)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        for message in corpus[:3]:
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                message_id=message_from_bytes(message)["Message-ID"],
+            )
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_incremental(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case of consecutive incremental fetches.
+    """
+    corpus = generate_corpus(5)
+
+    with FakeIMAP4Server(corpus[:3], uid_validity=7) as server:
+        mailbox = server_mailbox_factory(server)
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            first_result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+            server.add_message(corpus[3])
+            server.add_message(corpus[4])
+            second_result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert first_result == corpus[:3]
+    assert second_result == corpus[3:]
+    assert mailbox.uid_validity == 7
+    assert mailbox.highest_uid == 5
+    assert "UID SEARCH UID 4:*" in server.commands
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_unchanged(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case the mailbox is unchanged since the last fetch.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            first_result = fetcher.fetch_emails(mailbox)
+            second_result = fetcher.fetch_emails(mailbox)
+
+    assert first_result == corpus
+    assert second_result == []
+    assert mailbox.sync_state.startswith("ALL - MESSAGES 3")
+    assert sum(command.startswith("EXAMINE") for command in server.commands) == 1
+    assert sum(command.startswith("STATUS") for command in server.commands) == 2
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_incremental_uidvalidity_changed(
+    server_mailbox_factory,
+):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case the UIDVALIDITY of the mailbox has changed since the last fetch.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeIMAP4Server(corpus, uid_validity=2) as server:
+        mailbox = server_mailbox_factory(server)
+        mailbox.uid_validity = 1
+        mailbox.highest_uid = 3
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert result == corpus
+    assert mailbox.uid_validity == 2
+    assert mailbox.highest_uid == 3
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_failing_message(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case of a message that fails to be fetched.
+    """
+    corpus = generate_corpus(5)
+
+    with FakeIMAP4Server(corpus, failing_uids={3}) as server:
+        mailbox = server_mailbox_factory(server)
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert result == corpus[:2] + corpus[3:]
+    assert mailbox.highest_uid == 2
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_throttled(mocker, server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case the mailserver reports throttling in response to a FETCH of messages.
+    """
+    corpus = generate_corpus(3)
+    uid_fetch = FakeIMAP4Handler.uid_fetch
+
+    def uid_fetch_throttled(handler, arguments):
+        if arguments.upper().endswith("(BODY.PEEK[])"):
+            return "NO [THROTTLED] Too many commands"
+        return uid_fetch(handler, arguments)
+
+    mocker.patch.object(FakeIMAP4Handler, "uid_fetch", uid_fetch_throttled)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with (
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+            pytest.raises(MailHostThrottledError, match="THROTTLED"),
+        ):
+            fetcher.fetch_emails(mailbox)
+
+    assert sum("BODY.PEEK[])" in command for command in server.commands) == 1
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_skips_oversized(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case the messages are larger than the maximum datasize.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with (
+            override_config(FETCH_MAX_EMAIL_DATASIZE=1),
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+        ):
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == []
+    assert not any("BODY.PEEK[]" in command for command in server.commands)
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_stream_emails_spools_large(mocker, server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.stream_emails`
+    in case the messages are larger than the spooling datasize.
+    """
+    mocker.patch.object(AsyncIMAP4Fetcher, "SPOOL_PIECE_SIZE", 100)
+    corpus = generate_corpus(3)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with (
+            override_config(FETCH_SPOOL_EMAIL_DATASIZE=1),
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+        ):
+            result = [mail.read() for mail in fetcher.stream_emails(mailbox)]
+
+    assert result == corpus
+    assert any("BODY.PEEK[]<100.100>" in command for command in server.commands)
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_bad_criterion(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case of a criterion that is not available.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+        with (
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+            pytest.raises(ValueError, match="not available"),
+        ):
+            fetcher.fetch_emails(mailbox, "NOT A CRITERION")
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_emails_missing_mailbox(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_emails`
+    in case the mailbox does not exist on the server.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+        missing_mailbox = baker.make(Mailbox, account=mailbox.account, name="Missing")
+        with (
+            AsyncIMAP4Fetcher(mailbox.account) as fetcher,
+            pytest.raises(MailboxError, match="BadServerResponseError"),
+        ):
+            fetcher.fetch_emails(missing_mailbox)
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_test_success(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.test`
+    in case of success.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            fetcher.test(mailbox)
+
+    assert server.commands[-4:] == ['EXAMINE "INBOX"', "CHECK", "UNSELECT", "LOGOUT"]
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_connect_failure(server_mailbox_factory, unused_port):
+    """Tests :class:`core.utils.fetchers.AsyncIMAP4Fetcher`
+    in case the connection to the server fails.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+    mailbox.account.mail_host_port = unused_port
+
+    with pytest.raises(MailAccountError, match="ConnectionRefusedError"):
+        AsyncIMAP4Fetcher(mailbox.account)
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_fetch_mailboxes(server_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.fetch_mailboxes`
+    in case of success.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_mailboxes()
+
+    assert result == [b'() "/" INBOX']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fetcher_class", [AsyncIMAP4Fetcher, IMAP4Fetcher])
+@pytest.mark.parametrize(
+    "capabilities, expected_append_count",
+    [
+        ([], 3),
+        (["MULTIAPPEND"], 1),
+    ],
+)
+def test_AsyncIMAP4Fetcher_restore_batch(
+    fake_fs,
+    server_mailbox_factory,
+    fetcher_class,
+    capabilities,
+    expected_append_count,
+):
+    """Tests :func:`core.utils.fetchers.BaseFetcher.restore_batch`
+    of the asynchronous and the synchronous IMAP fetcher
+    in case the server does or does not support MULTIAPPEND.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeIMAP4Server([]) as server:
+        server.capabilities.extend(capabilities)
+        mailbox = server_mailbox_factory(server)
+        emails = [
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                file_path=default_storage.save(f"{number}.eml", BytesIO(message)),
+            )
+            for number, message in enumerate(corpus)
+        ]
+        with fetcher_class(mailbox.account) as fetcher:
+            result = list(fetcher.restore_batch(emails))
+
+    assert result == [(email, None) for email in emails]
+    assert list(server.mailboxes["INBOX"].values()) == corpus
+    assert [command.startswith("APPEND") for command in server.commands].count(
+        True
+    ) == expected_append_count
+
+
+@pytest.mark.django_db
+def test_AsyncIMAP4Fetcher_restore_batch_missing_mailbox(
+    fake_fs, server_mailbox_factory
+):
+    """Tests :func:`core.utils.fetchers.BaseFetcher.restore_batch`
+    in case the mailbox does not exist on the server.
+    """
+    corpus = generate_corpus(2)
+
+    with FakeIMAP4Server([]) as server:
+        server.capabilities.append("MULTIAPPEND")
+        mailbox = server_mailbox_factory(server)
+        mailbox.name = "Archive"
+        mailbox.save()
+        emails = [
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                file_path=default_storage.save(f"{number}.eml", BytesIO(message)),
+            )
+            for number, message in enumerate(corpus)
+        ]
+        with AsyncIMAP4Fetcher(mailbox.account) as fetcher:
+            result = list(fetcher.restore_batch(emails))
+
+    assert [email for email, _ in result] == emails
+    assert all(isinstance(error, MailboxError) for _, error in result)
+    assert server.mailboxes["INBOX"] == {}
+
+
+@pytest.mark.parametrize(
+    "value, expected_argument",
+    [
+        ("user@example.org", '"user@example.org"'),
+        ('pass"word\\', '"pass\\"word\\\\"'),
+        ("pässword", "pässword".encode()),
+        ("pass\r\nword", b"pass\r\nword"),
+    ],
+)
+def test_AsyncIMAP4Fetcher_quote(value, expected_argument):
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.quote`."""
+    assert AsyncIMAP4Fetcher.quote(value) == expected_argument
+
+
+def test_AsyncIMAP4Client_command_literal():
+    """Tests :func:`core.utils.fetchers.AsyncIMAP4Fetcher.AsyncIMAP4Client.command`
+    in case of a literal argument and a response with several literals.
+    """
+    received_lines = []
+
+    async def handle_session(reader, writer):
+        writer.write(b"* OK ready\r\n")
+        received_lines.append(await reader.readline())
+        writer.write(b"+ send literal\r\n")
+        received_lines.append(await reader.readexactly(5))
+        received_lines.append(await reader.readline())
+        writer.write(
+            b"* 1 FETCH (BODY[HEADER] {3}\r\nabc BODY[TEXT] {2}\r\nde UID 1)\r\n"
+            b"A0001 OK done\r\n"
+        )
+        await writer.drain()
+
+    async def run_command():
+        server = await asyncio.start_server(handle_session, "127.0.0.1", 0)
+        async with server:
+            client = await AsyncIMAP4Client.connect(
+                "127.0.0.1", server.sockets[0].getsockname()[1], read_timeout=5
+            )
+            response = await client.command("APPEND", '"INBOX"', b"hello", "x")
+            await client.close()
+        return response
+
+    status, data = asyncio.run(run_command())
+
+    assert status == "OK"
+    assert data == [
+        (b"1 FETCH (BODY[HEADER] {3}", b"abc"),
+        (b" BODY[TEXT] {2}", b"de"),
+        b" UID 1)",
+    ]
+    assert received_lines == [
+        b'A0001 APPEND "INBOX" {5}\r\n',
+        b"hello",
+        b" x\r\n",
+    ]
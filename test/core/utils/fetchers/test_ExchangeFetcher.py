@@ -27,12 +27,13 @@ import exchangelib.folders
 import exchangelib.folders.known_folders
 import exchangelib.queryset
 import pytest
+from constance.test import override_config
 from freezegun import freeze_time
 from model_bakery import baker
 
 from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
-from core.models import Mailbox
-from core.utils.fetchers import ExchangeFetcher
+from core.models import Email, Mailbox
+from core.utils.fetchers import ExchangeFetcher, FetchingFilter
 from core.utils.fetchers.exceptions import MailAccountError, MailboxError
 
 
@@ -67,15 +68,57 @@ def mock_QuerySet(mocker, mock_message):
     mock_QuerySet.order_by.return_value = mock_QuerySet
     mock_QuerySet.all.return_value.__iter__.return_value = queryset_content
     mock_QuerySet.filter.return_value.__iter__.return_value = queryset_content[:1]
+    queryset_ids = [
+        (f"id{index}", f"changekey{index}", 100, f"<message{index}@test>")
+        for index in range(2)
+    ]
+    mock_QuerySet.values_list.return_value = queryset_ids
+    mock_QuerySet.filter.return_value.values_list.return_value = queryset_ids[:1]
     return mock_QuerySet
 
 
 @pytest.fixture
-def mock_Folder(mocker, mock_QuerySet):
+def mock_Folder(mocker, mock_QuerySet, mock_message):
     """Mocks an :class:`exchangelib.Folder` with mocked :class:`exchangelib.queryset.QuerySet` as content."""
     mock_Folder = mocker.MagicMock(spec=exchangelib.Folder)
     mock_Folder.all.return_value = mock_QuerySet
     mock_Folder.folder_class.return_value = "IPF.Note"
+    mock_Folder.account.fetch.side_effect = lambda **kwargs: [
+        mock_message for _id in kwargs["ids"]
+    ]
+    mock_Folder.item_sync_state = "new-sync-state"
+    mock_Folder.sync_items.side_effect = lambda **_kwargs: iter(
+        [
+            (
+                "create",
+                mocker.Mock(
+                    id="id0",
+                    changekey="changekey0",
+                    size=100,
+                    message_id="<message0@test>",
+                ),
+            ),
+            (
+                "update",
+                mocker.Mock(
+                    id="id1",
+                    changekey="changekey1",
+                    size=100,
+                    message_id="<message1@test>",
+                ),
+            ),
+            ("delete", "id2"),
+            (
+                "create",
+                mocker.Mock(
+                    id="id3",
+                    changekey="changekey3",
+                    size=100,
+                    message_id="<message3@test>",
+                ),
+            ),
+        ]
+    )
     return mock_Folder
 
 
@@ -262,6 +305,7 @@ def test_ExchangeFetcher_connect_to_host_hostURL_success(
         mock_ExchangeAccount.call_args.kwargs["config"].service_endpoint
         == exchange_mailbox.account.mail_host
     )
+    assert mock_ExchangeAccount.call_args.kwargs["config"].max_connections == 4
     assert isinstance(
         mock_ExchangeAccount.call_args.kwargs["config"].credentials,
         exchangelib.Credentials,
@@ -536,6 +580,285 @@ def test_ExchangeFetcher_fetch_emails_all_success(
     mock_logger.error.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_ExchangeFetcher_stream_emails_lazy(
+    exchange_mailbox, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.stream_emails`
+    in case the emails are consumed one by one.
+    """
+    stream = ExchangeFetcher(exchange_mailbox.account).stream_emails(exchange_mailbox)
+
+    mock_Folder.all.assert_not_called()
+
+    result = next(stream)
+
+    assert result == mock_QuerySet.__iter__.return_value[0].mime_content
+    mock_Folder.all.assert_called_once_with()
+
+
+@pytest.mark.django_db
+@override_config(EXCHANGE_FETCH_CHUNK_SIZE=1)
+def test_ExchangeFetcher_fetch_emails_chunked(
+    exchange_mailbox, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the contents are fetched in multiple chunks.
+    """
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    assert len(result) == 2
+    mock_QuerySet.values_list.assert_called_once_with(
+        "id", "changekey", "size", "message_id"
+    )
+    assert mock_Folder.account.fetch.call_count == 2
+    mock_Folder.account.fetch.assert_any_call(
+        ids=(("id0", "changekey0"),), folder=mock_Folder, only_fields=["mime_content"]
+    )
+    mock_Folder.account.fetch.assert_any_call(
+        ids=(("id1", "changekey1"),), folder=mock_Folder, only_fields=["mime_content"]
+    )
+
+
+@pytest.mark.django_db
+@override_config(EXCHANGE_FETCH_CHUNK_SIZE=1, EXCHANGE_FETCH_WORKERS=2)
+def test_ExchangeFetcher_fetch_emails_parallel_chunks(
+    mocker, exchange_mailbox, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the chunks are downloaded by several workers, keeping the order of the items.
+    """
+    mock_QuerySet.values_list.return_value = [
+        (f"id{index}", f"changekey{index}", 100, None) for index in range(5)
+    ]
+    mock_Folder.account.fetch.side_effect = lambda **kwargs: [
+        mocker.Mock(id=item_id, mime_content=item_id.encode())
+        for item_id, _changekey in kwargs["ids"]
+    ]
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    assert result == [f"id{index}".encode() for index in range(5)]
+    assert mock_Folder.account.fetch.call_count == 5
+    assert exchange_mailbox.fetch_checkpoint == "id4"
+
+
+@pytest.mark.django_db
+@override_config(EXCHANGE_FETCH_CHUNK_SIZE=1, EXCHANGE_FETCH_WORKERS=2)
+def test_ExchangeFetcher_stream_emails_parallel_chunks_bounded(
+    exchange_mailbox, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.stream_emails`
+    in case the emails are consumed one by one, no more chunks than workers are requested ahead.
+    """
+    mock_QuerySet.values_list.return_value = [
+        (f"id{index}", f"changekey{index}", 100, None) for index in range(5)
+    ]
+
+    stream = ExchangeFetcher(exchange_mailbox.account).stream_emails(exchange_mailbox)
+    next(stream)
+    stream.close()
+
+    assert mock_Folder.account.fetch.call_count <= 3
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_skips_known(
+    exchange_mailbox, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case an item is already in the mailbox, its content is not downloaded.
+    """
+    baker.make(Email, mailbox=exchange_mailbox, message_id="<message0@test>")
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    assert len(result) == 1
+    mock_Folder.account.fetch.assert_called_once_with(
+        ids=(("id1", "changekey1"),), folder=mock_Folder, only_fields=["mime_content"]
+    )
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_chunk_error(
+    fake_error_message, exchange_mailbox, mock_logger, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the request of a chunk fails in a worker.
+    """
+    mock_Folder.account.fetch.side_effect = exchangelib.errors.EWSError(
+        fake_error_message
+    )
+
+    with pytest.raises(MailboxError, match=f"EWSError.*?{fake_error_message}"):
+        ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_skips_oversized(
+    exchange_mailbox, mock_logger, mock_QuerySet, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case an item is larger than the maximum datasize.
+    """
+    mock_QuerySet.values_list.return_value = [
+        ("id0", "changekey0", 1000, "<message0@test>"),
+        ("id1", "changekey1", None, None),
+    ]
+
+    with override_config(FETCH_MAX_EMAIL_DATASIZE=500):
+        result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(
+            exchange_mailbox
+        )
+
+    assert len(result) == 1
+    mock_Folder.account.fetch.assert_called_once_with(
+        ids=(("id1", "changekey1"),), folder=mock_Folder, only_fields=["mime_content"]
+    )
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_resume_checkpoint(
+    exchange_mailbox, mock_logger, mock_message, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case an interrupted run is resumed.
+    """
+    exchange_mailbox.is_fetch_complete = False
+    exchange_mailbox.fetch_checkpoint = "id0"
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    assert result == [mock_message.mime_content]
+    mock_Folder.account.fetch.assert_called_once_with(
+        ids=(("id1", "changekey1"),), folder=mock_Folder, only_fields=["mime_content"]
+    )
+    assert exchange_mailbox.fetch_checkpoint == mock_message.id
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_failed_item(
+    fake_error_message, exchange_mailbox, mock_logger, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the content of an item can not be fetched.
+    """
+    mock_Folder.account.fetch.side_effect = lambda **_kwargs: [
+        exchangelib.errors.ErrorItemNotFound(fake_error_message)
+    ]
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(exchange_mailbox)
+
+    assert result == []
+    mock_logger.warning.assert_called()
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_incremental_success(
+    exchange_mailbox, mock_logger, mock_message, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case of success with the incremental criterion.
+    """
+    exchange_mailbox.sync_state = "old-sync-state"
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(
+        exchange_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert result == [mock_message.mime_content] * 2
+    mock_Folder.sync_items.assert_called_once_with(
+        sync_state="old-sync-state",
+        only_fields=["datetime_received", "size", "message_id"],
+    )
+    mock_Folder.all.assert_not_called()
+    mock_Folder.account.fetch.assert_called_once_with(
+        ids=(("id0", "changekey0"), ("id3", "changekey3")),
+        folder=mock_Folder,
+        only_fields=["mime_content"],
+    )
+    assert exchange_mailbox.sync_state == "new-sync-state"
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_incremental_filter(
+    exchange_mailbox, mock_logger, mock_message, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case of the incremental criterion with a fetching filter,
+    which must not move the sync state of the mailbox.
+    """
+    exchange_mailbox.sync_state = "old-sync-state"
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(
+        exchange_mailbox,
+        EmailFetchingCriterionChoices.INCREMENTAL,
+        FetchingFilter({"from": "nobody"}),
+    )
+
+    assert result == []
+    mock_Folder.account.fetch.assert_called_once()
+    assert exchange_mailbox.sync_state == "old-sync-state"
+    assert exchange_mailbox.fetch_checkpoint == ""
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_incremental_failed_item(
+    fake_error_message, exchange_mailbox, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the content of an item can not be fetched with the incremental criterion.
+    """
+    exchange_mailbox.sync_state = "old-sync-state"
+    mock_Folder.account.fetch.side_effect = lambda **_kwargs: [
+        exchangelib.errors.ErrorItemNotFound(fake_error_message)
+    ]
+
+    ExchangeFetcher(exchange_mailbox.account).fetch_emails(
+        exchange_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert exchange_mailbox.sync_state == "old-sync-state"
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_fetch_emails_incremental_invalid_sync_state(
+    fake_error_message, mocker, exchange_mailbox, mock_logger, mock_Folder
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.fetch_emails`
+    in case the stored sync state is rejected by the server.
+    """
+    exchange_mailbox.sync_state = "invalid-sync-state"
+
+    def fake_sync_items(**kwargs):
+        if kwargs.get("sync_state"):
+            raise exchangelib.errors.ErrorInvalidSyncStateData(fake_error_message)
+        yield "create", mocker.Mock(
+            id="id0", changekey="changekey0", size=100, message_id=None
+        )
+        mock_Folder.item_sync_state = "new-sync-state"
+
+    mock_Folder.sync_items.side_effect = fake_sync_items
+
+    result = ExchangeFetcher(exchange_mailbox.account).fetch_emails(
+        exchange_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert len(result) == 1
+    assert mock_Folder.sync_items.call_count == 2
+    mock_Folder.sync_items.assert_called_with(
+        only_fields=["datetime_received", "size", "message_id"]
+    )
+    assert exchange_mailbox.sync_state == "new-sync-state"
+    mock_logger.info.assert_called()
+
+
 @pytest.mark.django_db
 def test_ExchangeFetcher_fetch_emails_subfolder_all_success(
     faker, exchange_mailbox, mock_logger, mock_QuerySet, mock_msg_folder_root
@@ -806,6 +1129,60 @@ def test_ExchangeFetcher_restore_ewserror(
     mock_logger.exception.assert_called()
 
 
+@pytest.mark.django_db
+def test_ExchangeFetcher_append_batch_success(
+    faker, exchange_mailbox, mock_logger, mock_Message, mock_msg_folder_root
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.append_batch`
+    in case one of the emails fails to upload.
+    """
+    fake_email_data = [text.encode() for text in faker.texts(nb_texts=2)]
+    mock_folder = mock_msg_folder_root.__truediv__.return_value
+    mock_folder.account.bulk_create.return_value = [
+        mock_Message.return_value,
+        exchangelib.errors.ErrorItemSave("failed"),
+    ]
+
+    result = ExchangeFetcher(exchange_mailbox.account).append_batch(
+        exchange_mailbox, fake_email_data
+    )
+
+    assert result[0] is None
+    assert isinstance(result[1], MailboxError)
+    mock_folder.account.bulk_create.assert_called_once_with(
+        mock_folder, [mock_Message.return_value] * 2, chunk_size=2
+    )
+    mock_Message.assert_any_call(folder=mock_folder, mime_content=fake_email_data[0])
+    mock_Message.return_value.save.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_ExchangeFetcher_append_batch_ewserror(
+    faker,
+    fake_error_message,
+    exchange_mailbox,
+    mock_logger,
+    mock_Message,
+    mock_msg_folder_root,
+):
+    """Tests :func:`core.utils.fetchers.ExchangeFetcher.append_batch`
+    in case the request fails.
+    """
+    fake_email_data = [text.encode() for text in faker.texts(nb_texts=2)]
+    mock_msg_folder_root.__truediv__.return_value.account.bulk_create.side_effect = (
+        exchangelib.errors.EWSError(fake_error_message)
+    )
+
+    result = ExchangeFetcher(exchange_mailbox.account).append_batch(
+        exchange_mailbox, fake_email_data
+    )
+
+    assert len(result) == 2
+    assert all(isinstance(error, MailboxError) for error in result)
+    mock_logger.exception.assert_called()
+
+
 @pytest.mark.django_db
 def test_ExchangeFetcher_restore_other_error(
     fake_email_with_file,
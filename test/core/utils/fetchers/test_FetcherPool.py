@@ -0,0 +1,317 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for :mod:`core.utils.fetchers.FetcherPool`."""
+
+import threading
+
+import pytest
+from constance.test import override_config
+
+from core.utils.fetchers import BaseFetcher, FetcherPool
+from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+
+
+@pytest.fixture
+def mock_fetcher_class(mocker):
+    """Patches :func:`core.models.Account.Account.get_fetcher_class` to return a mocked fetcher class."""
+    mock_fetcher_class = mocker.Mock(
+        IS_REUSABLE=True,
+        side_effect=lambda account: mocker.Mock(
+            spec=BaseFetcher, account=account, pool=None, logger=mocker.Mock()
+        ),
+    )
+    mocker.patch(
+        "core.models.Account.Account.get_fetcher_class",
+        return_value=mock_fetcher_class,
+    )
+    return mock_fetcher_class
+
+
+@pytest.fixture
+def mock_monotonic(mocker):
+    """Patches :func:`time.monotonic` used by the pool."""
+    return mocker.patch(
+        "core.utils.fetchers.FetcherPool.time.monotonic", return_value=1000.0
+    )
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_new(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case there is no idle fetcher.
+    """
+    pool = FetcherPool()
+
+    fetcher = pool.acquire(fake_account)
+
+    mock_fetcher_class.assert_called_once_with(fake_account)
+    assert fetcher.pool is pool
+    fetcher.test.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_reuse(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case there is an idle fetcher for the account.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+    pool.release(fetcher)
+
+    result = pool.acquire(fake_account)
+
+    assert result is fetcher
+    mock_fetcher_class.assert_called_once()
+    fetcher.test.assert_called_once_with()
+    fetcher.close.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_broken(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case the idle fetcher fails the health check.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+    pool.release(fetcher)
+    fetcher.test.side_effect = MailAccountError(Exception())
+
+    result = pool.acquire(fake_account)
+
+    assert result is not fetcher
+    assert mock_fetcher_class.call_count == 2
+    fetcher.close.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_changed_account(faker, fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case the connection data of the account changed since the idle fetcher was opened.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+    pool.release(fetcher)
+    fake_account.password = faker.password()
+
+    result = pool.acquire(fake_account)
+
+    assert result is not fetcher
+    fetcher.close.assert_called_once_with()
+    fetcher.test.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_not_reusable(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case the fetcher class cannot be reused.
+    """
+    mock_fetcher_class.IS_REUSABLE = False
+    pool = FetcherPool()
+
+    fetcher = pool.acquire(fake_account)
+
+    assert fetcher.pool is None
+
+
+@pytest.mark.django_db
+@override_config(FETCHER_POOL_MAX_CONNECTIONS=1)
+def test_FetcherPool_acquire_unpooled(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case an unpooled fetcher is requested while all connections to the account are in use.
+    """
+    pool = FetcherPool()
+    pool.ACQUIRE_TIMEOUT = 0
+    pooled_fetcher = pool.acquire(fake_account)
+
+    fetcher = pool.acquire(fake_account, pooled=False)
+
+    assert fetcher is not pooled_fetcher
+    assert fetcher.pool is None
+    with pytest.raises(MailAccountError):
+        pool.acquire(fake_account)
+    pool.release(pooled_fetcher)
+    assert pool.acquire(fake_account) is pooled_fetcher
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_unsaved_account(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case the account is not saved yet.
+    """
+    fake_account.pk = None
+    pool = FetcherPool()
+
+    fetcher = pool.acquire(fake_account)
+
+    assert fetcher.pool is None
+
+
+@pytest.mark.django_db
+def test_FetcherPool_acquire_init_failure(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case opening a new fetcher fails.
+    """
+    pool = FetcherPool()
+    mock_fetcher_class.side_effect = MailAccountError(Exception())
+
+    with override_config(FETCHER_POOL_MAX_CONNECTIONS=1):
+        with pytest.raises(MailAccountError):
+            pool.acquire(fake_account)
+        mock_fetcher_class.side_effect = None
+
+        pool.acquire(fake_account)
+
+
+@pytest.mark.django_db
+@override_config(FETCHER_POOL_MAX_CONNECTIONS=1)
+def test_FetcherPool_acquire_limit_timeout(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case all connections to the account stay in use.
+    """
+    pool = FetcherPool()
+    pool.ACQUIRE_TIMEOUT = 0
+    pool.acquire(fake_account)
+
+    with pytest.raises(MailAccountError, match="TimeoutError"):
+        pool.acquire(fake_account)
+
+    mock_fetcher_class.assert_called_once()
+
+
+@pytest.mark.django_db
+@override_config(FETCHER_POOL_MAX_CONNECTIONS=1)
+def test_FetcherPool_acquire_limit_wait(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.acquire`
+    in case a connection to the account is released while waiting.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+    releaser = threading.Timer(0.1, pool.release, args=(fetcher,))
+    releaser.start()
+
+    result = pool.acquire(fake_account)
+
+    releaser.join()
+    assert result is fetcher
+    mock_fetcher_class.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_release_discard(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.release`
+    in case the fetcher is discarded.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+
+    with override_config(FETCHER_POOL_MAX_CONNECTIONS=1):
+        pool.release(fetcher, discard=True)
+        result = pool.acquire(fake_account)
+
+    fetcher.close.assert_called_once_with()
+    assert result is not fetcher
+
+
+@pytest.mark.django_db
+@override_config(FETCHER_POOL_IDLE_TIMEOUT=0)
+def test_FetcherPool_release_no_idle_timeout(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.release`
+    in case keeping idle connections is disabled.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+
+    pool.release(fetcher)
+
+    fetcher.close.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_FetcherPool_release_close_error(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.release`
+    in case closing the discarded fetcher fails.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+    fetcher.close.side_effect = MailboxError(Exception())
+
+    pool.release(fetcher, discard=True)
+
+    fetcher.close.assert_called_once_with()
+
+
+@pytest.mark.django_db
+@override_config(FETCHER_POOL_IDLE_TIMEOUT=300)
+def test_FetcherPool_close_expired(fake_account, mock_fetcher_class, mock_monotonic):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.close_expired`."""
+    pool = FetcherPool()
+    expired_fetcher = pool.acquire(fake_account)
+    fresh_fetcher = pool.acquire(fake_account)
+    pool.release(expired_fetcher)
+    mock_monotonic.return_value += 200
+    pool.release(fresh_fetcher)
+    mock_monotonic.return_value += 200
+
+    pool.close_expired()
+
+    expired_fetcher.close.assert_called_once_with()
+    fresh_fetcher.close.assert_not_called()
+    assert pool.acquire(fake_account) is fresh_fetcher
+
+
+@pytest.mark.django_db
+def test_FetcherPool_close_all(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.FetcherPool.FetcherPool.close_all`."""
+    pool = FetcherPool()
+    idle_fetcher = pool.acquire(fake_account)
+    leased_fetcher = pool.acquire(fake_account)
+    pool.release(idle_fetcher)
+
+    pool.close_all()
+
+    idle_fetcher.close.assert_called_once_with()
+    leased_fetcher.close.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_BaseFetcher_exit_pooled(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.BaseFetcher.BaseFetcher.__exit__`
+    in case the fetcher belongs to a pool.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+
+    BaseFetcher.__exit__(fetcher, None, None, None)
+
+    fetcher.close.assert_not_called()
+    assert pool.acquire(fake_account) is fetcher
+
+
+@pytest.mark.django_db
+def test_BaseFetcher_exit_pooled_error(fake_account, mock_fetcher_class):
+    """Tests :func:`core.utils.fetchers.BaseFetcher.BaseFetcher.__exit__`
+    in case the pooled fetcher is left with an error.
+    """
+    pool = FetcherPool()
+    fetcher = pool.acquire(fake_account)
+
+    BaseFetcher.__exit__(fetcher, MailboxError, MailboxError(Exception()), None)
+
+    fetcher.close.assert_called_once_with()
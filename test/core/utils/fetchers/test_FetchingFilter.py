@@ -0,0 +1,229 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Test module for the :class:`core.utils.fetchers.FetchingFilter` class."""
+
+from io import BytesIO
+
+import exchangelib
+import pytest
+
+from core.utils.fetchers import FetchingFilter
+
+
+TEST_MAIL = (
+    b"From: Alice <alice@example.org>\r\n"
+    b"To: bob@example.com\r\n"
+    b"Subject: Weekly newsletter\r\n"
+    b"Date: Mon, 14 Oct 2024 10:00:00 +0000\r\n"
+    b"Message-ID: <1@example.org>\r\n"
+    b"\r\n"
+    b"Hello Bob!\r\n"
+)
+
+
+@pytest.mark.parametrize(
+    "filter_data",
+    [
+        {"from": "example.org"},
+        {"and": [{"to": "bob"}, {"not": {"subject": "spam"}}]},
+        {"or": [{"larger": 10}, {"smaller": 1000}, {"since": "2024-01-01"}]},
+        {"not": {"before": "2024-12-31"}},
+    ],
+)
+def test_FetchingFilter_validate_success(filter_data):
+    """Tests :func:`core.utils.fetchers.FetchingFilter.validate`
+    in case of a wellformed filter.
+    """
+    FetchingFilter.validate(filter_data)
+
+
+@pytest.mark.parametrize(
+    "filter_data, expected_message",
+    [
+        ([], "exactly one key"),
+        ({}, "exactly one key"),
+        ({"from": "x", "to": "y"}, "exactly one key"),
+        ({"unknown": "x"}, "Unknown filter unknown"),
+        ({"and": []}, "non-empty list"),
+        ({"or": {"from": "x"}}, "non-empty list"),
+        ({"not": "x"}, "exactly one key"),
+        ({"subject": ""}, "non-empty text"),
+        ({"larger": -1}, "size in bytes"),
+        ({"smaller": True}, "size in bytes"),
+        ({"since": "yesterday"}, "date like"),
+        ({"before": 20241231}, "date like"),
+    ],
+)
+def test_FetchingFilter_validate_failure(filter_data, expected_message):
+    """Tests :func:`core.utils.fetchers.FetchingFilter.validate`
+    in case of a malformed filter.
+    """
+    with pytest.raises(ValueError, match=expected_message):
+        FetchingFilter.validate(filter_data)
+
+
+@pytest.mark.parametrize(
+    "filter_data, expected_search, expected_is_exact",
+    [
+        ({"from": "example.org"}, 'FROM "example.org"', True),
+        ({"subject": 'say "hi"'}, 'SUBJECT "say \\"hi\\""', True),
+        ({"larger": 100}, "LARGER 100", True),
+        ({"since": "2024-03-05"}, "SENTSINCE 05-Mar-2024", True),
+        ({"before": "2024-12-31"}, "SENTBEFORE 31-Dec-2024", True),
+        ({"not": {"smaller": 5}}, "NOT SMALLER 5", True),
+        (
+            {"or": [{"from": "a"}, {"from": "b"}, {"to": "c"}]},
+            'OR OR FROM "a" FROM "b" TO "c"',
+            True,
+        ),
+        (
+            {"and": [{"from": "a"}, {"not": {"subject": "b"}}]},
+            '(FROM "a" NOT SUBJECT "b")',
+            True,
+        ),
+        (
+            {"and": [{"from": "a"}, {"subject": "Grüße"}]},
+            '(FROM "a")',
+            False,
+        ),
+        ({"or": [{"from": "a"}, {"subject": "Grüße"}]}, None, False),
+        ({"not": {"subject": "Grüße"}}, None, False),
+    ],
+)
+def test_FetchingFilter_make_imap_search(
+    filter_data, expected_search, expected_is_exact
+):
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_imap_search`."""
+    result = FetchingFilter(filter_data).make_imap_search()
+
+    assert result == (expected_search, expected_is_exact)
+
+
+def test_FetchingFilter_make_digest():
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_digest`."""
+    filter_data = {"and": [{"from": "example.org"}, {"larger": 1000}]}
+
+    result = FetchingFilter(filter_data).make_digest()
+
+    assert len(result) == 16
+    assert result == FetchingFilter(filter_data).make_digest()
+    assert result != FetchingFilter({"from": "example.org"}).make_digest()
+
+
+def test_FetchingFilter_make_exchange_query_exact():
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_exchange_query`
+    in case all conditions can be queried.
+    """
+    query, is_exact = FetchingFilter(
+        {"or": [{"subject": "report"}, {"not": {"larger": 100}}]}
+    ).make_exchange_query()
+
+    assert is_exact is True
+    assert query == exchangelib.Q(subject__icontains="report") | ~exchangelib.Q(
+        size__gt=100
+    )
+
+
+def test_FetchingFilter_make_exchange_query_partial():
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_exchange_query`
+    in case some conditions of an `and` can't be queried.
+    """
+    query, is_exact = FetchingFilter(
+        {"and": [{"from": "example.org"}, {"smaller": 100}]}
+    ).make_exchange_query()
+
+    assert is_exact is False
+    assert query == exchangelib.Q(size__lt=100)
+
+
+def test_FetchingFilter_make_exchange_query_none():
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_exchange_query`
+    in case nothing can be queried.
+    """
+    assert FetchingFilter({"to": "bob"}).make_exchange_query() == (None, False)
+
+
+@pytest.mark.parametrize(
+    "filter_data, expected_filter, expected_is_exact",
+    [
+        ({"larger": 100}, {"minSize": 101}, True),
+        (
+            {"or": [{"smaller": 100}, {"not": {"larger": 1000}}]},
+            {
+                "operator": "OR",
+                "conditions": [
+                    {"maxSize": 100},
+                    {"operator": "NOT", "conditions": [{"minSize": 1001}]},
+                ],
+            },
+            True,
+        ),
+        (
+            {"and": [{"subject": "report"}, {"smaller": 100}]},
+            {"operator": "AND", "conditions": [{"maxSize": 100}]},
+            False,
+        ),
+        ({"since": "2024-10-14"}, None, False),
+    ],
+)
+def test_FetchingFilter_make_jmap_filter(
+    filter_data, expected_filter, expected_is_exact
+):
+    """Tests :func:`core.utils.fetchers.FetchingFilter.make_jmap_filter`."""
+    result = FetchingFilter(filter_data).make_jmap_filter()
+
+    assert result == (expected_filter, expected_is_exact)
+
+
+@pytest.mark.parametrize(
+    "filter_data, expected_result",
+    [
+        ({"from": "EXAMPLE.org"}, True),
+        ({"from": "example.com"}, False),
+        ({"to": "bob@"}, True),
+        ({"subject": "newsletter"}, True),
+        ({"not": {"subject": "newsletter"}}, False),
+        ({"larger": 10}, True),
+        ({"smaller": 10}, False),
+        ({"since": "2024-10-14"}, True),
+        ({"since": "2024-10-15"}, False),
+        ({"before": "2024-10-14"}, False),
+        ({"before": "2024-10-15"}, True),
+        ({"and": [{"from": "alice"}, {"to": "alice"}]}, False),
+        ({"or": [{"from": "alice"}, {"to": "alice"}]}, True),
+    ],
+)
+def test_FetchingFilter_matches_mail(filter_data, expected_result):
+    """Tests :func:`core.utils.fetchers.FetchingFilter.matches_mail`
+    for all conditions.
+    """
+    assert FetchingFilter(filter_data).matches_mail(TEST_MAIL) is expected_result
+
+
+def test_FetchingFilter_matches_mail_spooled():
+    """Tests :func:`core.utils.fetchers.FetchingFilter.matches_mail`
+    in case of a mail spooled to a file.
+    """
+    with BytesIO(TEST_MAIL) as spool_file:
+        spool_file.seek(5)
+
+        result = FetchingFilter({"larger": len(TEST_MAIL) - 1}).matches_mail(spool_file)
+
+        assert result is True
+        assert spool_file.tell() == 0
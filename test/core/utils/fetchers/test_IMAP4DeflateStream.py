@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for the :class:`core.utils.fetchers.IMAP4DeflateStream` class."""
+
+import imaplib
+import socket
+import zlib
+
+import pytest
+
+from core.utils.fetchers.IMAP4DeflateStream import IMAP4DeflateStream
+
+
+@pytest.fixture
+def socket_pair():
+    """A connected pair of sockets, the first for the client and the second for the server."""
+    client_socket, server_socket = socket.socketpair()
+    client_socket.settimeout(5)
+    server_socket.settimeout(5)
+    yield client_socket, server_socket
+    client_socket.close()
+    server_socket.close()
+
+
+@pytest.fixture
+def mock_mail_client(mocker, socket_pair):
+    """A mocked :class:`imaplib.IMAP4` on the client socket of :func:`socket_pair`."""
+    mock_mail_client = mocker.Mock(spec=imaplib.IMAP4)
+    mock_mail_client.socket.return_value = socket_pair[0]
+    mock_mail_client.error = imaplib.IMAP4.error
+    return mock_mail_client
+
+
+def compress(data):
+    """Compresses data like a server with DEFLATE compression."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def test_IMAP4DeflateStream_install(mock_mail_client):
+    """Tests :func:`core.utils.fetchers.IMAP4DeflateStream.install`."""
+    result = IMAP4DeflateStream.install(mock_mail_client)
+
+    assert mock_mail_client.read == result.read
+    assert mock_mail_client.readline == result.readline
+    assert mock_mail_client.send == result.send
+
+
+def test_IMAP4DeflateStream_readline_read(mock_mail_client, socket_pair):
+    """Tests :func:`core.utils.fetchers.IMAP4DeflateStream.readline`
+    and :func:`core.utils.fetchers.IMAP4DeflateStream.read`
+    in case of a response with a literal.
+    """
+    response = b"* 1 FETCH (BODY[] {11}\r\nhello world)\r\nA001 OK done\r\n"
+    compressed_response = compress(response)
+    socket_pair[1].sendall(compressed_response)
+    stream = IMAP4DeflateStream.install(mock_mail_client)
+
+    assert stream.readline() == b"* 1 FETCH (BODY[] {11}\r\n"
+    assert stream.read(11) == b"hello world"
+    assert stream.readline() == b")\r\n"
+    assert stream.readline() == b"A001 OK done\r\n"
+    assert stream.bytes_received == len(compressed_response)
+
+
+def test_IMAP4DeflateStream_readline_closed(mock_mail_client, socket_pair):
+    """Tests :func:`core.utils.fetchers.IMAP4DeflateStream.readline`
+    in case the connection is closed.
+    """
+    socket_pair[1].sendall(compress(b"* BYE"))
+    socket_pair[1].close()
+    stream = IMAP4DeflateStream.install(mock_mail_client)
+
+    assert stream.readline() == b"* BYE"
+    assert stream.readline() == b""
+
+
+def test_IMAP4DeflateStream_readline_too_long(
+    monkeypatch, mock_mail_client, socket_pair
+):
+    """Tests :func:`core.utils.fetchers.IMAP4DeflateStream.readline`
+    in case of a line longer than imaplib allows.
+    """
+    monkeypatch.setattr(imaplib, "_MAXLINE", 10)
+    socket_pair[1].sendall(compress(b"* a very long line\r\n"))
+    stream = IMAP4DeflateStream.install(mock_mail_client)
+
+    with pytest.raises(imaplib.IMAP4.error):
+        stream.readline()
+
+
+def test_IMAP4DeflateStream_send(mock_mail_client, socket_pair):
+    """Tests :func:`core.utils.fetchers.IMAP4DeflateStream.send`."""
+    decompressor = zlib.decompressobj(-15)
+    stream = IMAP4DeflateStream.install(mock_mail_client)
+
+    stream.send(b"A001 NOOP\r\n")
+    stream.send(b"A002 LOGOUT\r\n")
+
+    received_data = socket_pair[1].recv(65536)
+    assert decompressor.decompress(received_data) == (b"A001 NOOP\r\nA002 LOGOUT\r\n")
+    assert stream.bytes_sent == len(received_data)
@@ -22,14 +22,24 @@ import datetime
 from imaplib import Time2Internaldate
 
 import pytest
+from constance.test import override_config
+from django.core.files.storage import default_storage
 from freezegun import freeze_time
 from imap_tools.imap_utf7 import utf7_encode
 from model_bakery import baker
 
 from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
-from core.models import Mailbox
-from core.utils.fetchers import IMAP4Fetcher
-from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from core.models import Email, Mailbox
+from core.utils.fetchers import FetchingFilter, IMAP4Fetcher
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+
+
+HEADER_PARTS = "(RFC822.SIZE BODY.PEEK[HEADER.FIELDS (message-id x-spam-flag)])"
+"""The message parts requested in the header pre-pass."""
 
 
 class FakeIMAP4Error(Exception):
@@ -44,6 +54,14 @@ def imap_mailbox(fake_mailbox):
     return fake_mailbox
 
 
+@pytest.fixture
+def other_email_with_file(faker, fake_email_with_file):
+    """Another email with an eml file in the mailbox of :func:`test.conftest.fake_email_with_file`."""
+    with fake_email_with_file.open_file() as email_file:
+        file_path = default_storage.save(faker.file_name(extension="eml"), email_file)
+    return baker.make(Email, mailbox=fake_email_with_file.mailbox, file_path=file_path)
+
+
 @pytest.fixture(autouse=True)
 def mock_IMAP4(mocker, faker):
     """Mocks an :class:`imaplib.IMAP4` with all positive method responses."""
@@ -62,6 +80,10 @@ def mock_IMAP4(mocker, faker):
     mock_IMAP4.return_value.unselect.return_value = ("OK", [fake_response])
     mock_IMAP4.return_value.append.return_value = ("OK", [fake_response])
     mock_IMAP4.return_value.uid.return_value = ("OK", [fake_response, b""])
+    mock_IMAP4.return_value.status.return_value = (
+        "OK",
+        [b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)'],
+    )
     mock_IMAP4.return_value.logout.return_value = ("BYE", [fake_response])
     return mock_IMAP4
 
@@ -158,6 +180,90 @@ def test_IMAP4Fetcher___init___connection_error(
     mock_logger.exception.assert_called()
 
 
+@pytest.mark.django_db
+def test_IMAP4Fetcher___init___compression(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.__init__`
+    in case compression is enabled and supported by the server.
+    """
+    mock_IMAP4DeflateStream_install = mocker.patch(
+        "core.utils.fetchers.IMAP4Fetcher.IMAP4DeflateStream.install", autospec=True
+    )
+    mock_IMAP4.return_value.capability.return_value = (
+        "OK",
+        [b"IMAP4rev1 IDLE COMPRESS=DEFLATE"],
+    )
+    mock_IMAP4.return_value.xatom.return_value = ("OK", [b"DEFLATE active"])
+    imap_mailbox.account.use_compression = True
+
+    result = IMAP4Fetcher(imap_mailbox.account)
+
+    assert result.compression == mock_IMAP4DeflateStream_install.return_value
+    mock_IMAP4.return_value.xatom.assert_called_once_with("COMPRESS", "DEFLATE")
+    mock_IMAP4DeflateStream_install.assert_called_once_with(mock_IMAP4.return_value)
+    mock_logger.warning.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher___init___compression_unsupported(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.__init__`
+    in case compression is enabled but not supported by the server.
+    """
+    mock_IMAP4DeflateStream_install = mocker.patch(
+        "core.utils.fetchers.IMAP4Fetcher.IMAP4DeflateStream.install", autospec=True
+    )
+    mock_IMAP4.return_value.capability.return_value = ("OK", [b"IMAP4rev1 IDLE"])
+    imap_mailbox.account.use_compression = True
+
+    result = IMAP4Fetcher(imap_mailbox.account)
+
+    assert result.compression is None
+    mock_IMAP4.return_value.xatom.assert_not_called()
+    mock_IMAP4DeflateStream_install.assert_not_called()
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher___init___compression_refused(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.__init__`
+    in case compression is enabled but refused by the server.
+    """
+    mock_IMAP4DeflateStream_install = mocker.patch(
+        "core.utils.fetchers.IMAP4Fetcher.IMAP4DeflateStream.install", autospec=True
+    )
+    mock_IMAP4.return_value.capability.return_value = (
+        "OK",
+        [b"IMAP4rev1 COMPRESS=DEFLATE"],
+    )
+    mock_IMAP4.return_value.xatom.return_value = ("NO", [b"not now"])
+    imap_mailbox.account.use_compression = True
+
+    result = IMAP4Fetcher(imap_mailbox.account)
+
+    assert result.compression is None
+    mock_IMAP4DeflateStream_install.assert_not_called()
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher___init___compression_disabled(imap_mailbox, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.__init__`
+    in case compression is disabled for the account.
+    """
+    imap_mailbox.account.use_compression = False
+
+    result = IMAP4Fetcher(imap_mailbox.account)
+
+    assert result.compression is None
+    mock_IMAP4.return_value.capability.assert_not_called()
+    mock_IMAP4.return_value.xatom.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_IMAP4Fetcher___init___bad_protocol(
     mocker, imap_mailbox, mock_logger, mock_IMAP4
@@ -334,6 +440,38 @@ def test_IMAP4Fetcher_test_account_bad_response(
     mock_logger.error.assert_called()
 
 
+@pytest.mark.django_db
+def test_IMAP4Fetcher_test_account_throttled(imap_mailbox, mock_logger, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.test`
+    in case the mailserver reports throttling.
+    """
+    mock_IMAP4.return_value.noop.return_value = (
+        "NO",
+        [b"[THROTTLED] Too many commands"],
+    )
+
+    with pytest.raises(MailHostThrottledError, match="THROTTLED"):
+        IMAP4Fetcher(imap_mailbox.account).test()
+
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_test_account_in_use(imap_mailbox, mock_logger, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.test`
+    in case the mailserver reports that the mailbox is in use.
+    """
+    mock_IMAP4.return_value.noop.return_value = (
+        "NO",
+        [b"[IN-USE] Mailbox is locked by another session"],
+    )
+
+    with pytest.raises(MailAccountError, match="IN-USE") as exc_info:
+        IMAP4Fetcher(imap_mailbox.account).test()
+
+    assert not isinstance(exc_info.value, MailHostThrottledError)
+
+
 @pytest.mark.django_db
 def test_IMAP4Fetcher_test_account_exception(
     fake_error_message, imap_mailbox, mock_logger, mock_IMAP4
@@ -499,32 +637,59 @@ def test_IMAP4Fetcher_test_mailbox_exception_ignored(
     mock_logger.exception.assert_called()
 
 
+@pytest.fixture
+def mock_IMAP4_uid(mock_IMAP4):
+    """Patches :func:`imaplib.IMAP4.uid` to find the UIDs 4 to 6 and return realistic FETCH responses.
+
+    Also reports UIDVALIDITY 42 for the selected mailbox.
+    """
+
+    def fake_uid(command, *args):
+        if command in ["SEARCH", "SORT"]:
+            return ("OK", [b"4 5 6"])
+        response_data = []
+        for number, uid in enumerate(args[0].split(b","), start=1):
+            if "HEADER.FIELDS" in args[1]:
+                message_data = b"Message-ID: <%s@eonvelope.test>\r\n\r\n" % uid
+                metadata = b"%d (UID %s RFC822.SIZE 6 BODY[HEADER.FIELDS (MESSAGE-ID X-SPAM-FLAG)] {%d}"
+            else:
+                message_data = b"mail " + uid
+                metadata = b"%d (UID %s BODY[] {%d}"
+            response_data.append(
+                (metadata % (number, uid, len(message_data)), message_data)
+            )
+            response_data.append(b")")
+        return ("OK", response_data)
+
+    mock_IMAP4.return_value.uid.side_effect = fake_uid
+    mock_IMAP4.return_value.response.return_value = ("UIDVALIDITY", [b"42"])
+    return mock_IMAP4
+
+
 @pytest.mark.django_db
 def test_IMAP4Fetcher_fetch_emails_success_sort(
-    mocker, imap_mailbox, mock_logger, mock_IMAP4
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
     in case of success using the SORT action.
     """
-    mock_IMAP4.return_value.capabilities = ["SORT"]
-    expected_uid_fetch_calls = [
-        mocker.call("FETCH", uID, "(RFC822)")
-        for uID in mock_IMAP4.return_value.uid.return_value[1][0].split()
-    ]
+    mock_IMAP4_uid.return_value.capabilities = ["SORT"]
 
     result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    assert result == [mock_IMAP4.return_value.uid.return_value[1][0][1]] * len(
-        expected_uid_fetch_calls
-    )
-    mock_IMAP4.return_value.select.assert_called_once_with(
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    mock_IMAP4_uid.return_value.select.assert_called_once_with(
         utf7_encode(imap_mailbox.name), readonly=True
     )
-    assert mock_IMAP4.return_value.uid.call_count == len(expected_uid_fetch_calls) + 1
-    mock_IMAP4.return_value.uid.assert_has_calls(
-        [mocker.call("SORT", "(DATE)", "UTF-8", "ALL"), *expected_uid_fetch_calls]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SORT", "(DATE)", "UTF-8", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5,6", "(BODY.PEEK[])"),
+        ]
     )
-    mock_IMAP4.return_value.unselect.assert_called_once_with()
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
     mock_logger.debug.assert_called()
     mock_logger.info.assert_called()
     mock_logger.exception.assert_not_called()
@@ -533,29 +698,26 @@ def test_IMAP4Fetcher_fetch_emails_success_sort(
 
 @pytest.mark.django_db
 def test_IMAP4Fetcher_fetch_emails_success_search(
-    mocker, imap_mailbox, mock_logger, mock_IMAP4
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
     in case of success using the SEARCH action.
     """
-    expected_uid_fetch_calls = [
-        mocker.call("FETCH", uID, "(RFC822)")
-        for uID in mock_IMAP4.return_value.uid.return_value[1][0].split()
-    ]
-
     result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    assert result == [mock_IMAP4.return_value.uid.return_value[1][0][1]] * len(
-        expected_uid_fetch_calls
-    )
-    mock_IMAP4.return_value.select.assert_called_once_with(
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    mock_IMAP4_uid.return_value.select.assert_called_once_with(
         utf7_encode(imap_mailbox.name), readonly=True
     )
-    assert mock_IMAP4.return_value.uid.call_count == len(expected_uid_fetch_calls) + 1
-    mock_IMAP4.return_value.uid.assert_has_calls(
-        [mocker.call("SEARCH", "ALL"), *expected_uid_fetch_calls]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5,6", "(BODY.PEEK[])"),
+        ]
     )
-    mock_IMAP4.return_value.unselect.assert_called_once_with()
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
     mock_logger.debug.assert_called()
     mock_logger.info.assert_called()
     mock_logger.exception.assert_not_called()
@@ -563,220 +725,1112 @@ def test_IMAP4Fetcher_fetch_emails_success_search(
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_emails_wrong_mailbox(imap_mailbox, mock_logger):
+@override_config(IMAP_FETCH_CHUNK_SIZE=2)
+def test_IMAP4Fetcher_fetch_emails_success_chunks(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case the given mailbox does not belong to the given account.
+    in case of success with more messages than fit in one chunk.
     """
-    wrong_mailbox = baker.make(Mailbox)
-
-    with pytest.raises(ValueError, match="is not in"):
-        IMAP4Fetcher(imap_mailbox.account).fetch_emails(wrong_mailbox)
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    mock_logger.error.assert_called()
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 4
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5", "(BODY.PEEK[])"),
+            mocker.call("FETCH", b"6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_logger.warning.assert_not_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_emails_bad_criterion(imap_mailbox, mock_logger):
+def test_IMAP4Fetcher_fetch_emails_chunk_bad_response(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case of an unavailable criterion.
+    in case of a bad response to a chunk request with one broken message.
     """
-    with pytest.raises(ValueError, match="not available via"):
-        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox, "NONE")
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
 
-    mock_logger.error.assert_called()
+    def fake_uid_failing(command, *args):
+        if command == "FETCH" and b"5" in args[0].split(b","):
+            return ("NO", [b""])
+        return fake_uid(command, *args)
+
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_failing
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 6"]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 6
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5,6", "(BODY.PEEK[])"),
+            mocker.call("FETCH", b"4", "(BODY.PEEK[])"),
+            mocker.call("FETCH", b"5", "(BODY.PEEK[])"),
+            mocker.call("FETCH", b"6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
+    mock_logger.warning.assert_called()
 
 
 @pytest.mark.django_db
-@pytest.mark.parametrize(
-    "raising_function, expected_calls", [("select", (1, 0)), ("uid", (1, 1))]
-)
-def test_IMAP4Fetcher_fetch_emails_bad_response(
-    fake_error_message,
-    imap_mailbox,
-    mock_logger,
-    mock_IMAP4,
-    raising_function,
-    expected_calls,
+def test_IMAP4Fetcher_fetch_emails_chunk_throttled(
+    imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case of a bad response.
+    in case the mailserver reports throttling in response to a chunk request.
     """
-    getattr(mock_IMAP4.return_value, raising_function).return_value = (
-        "NO",
-        [fake_error_message.encode()],
-    )
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
 
-    with pytest.raises(MailboxError, match=fake_error_message):
-        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+    def fake_uid_throttled(command, *args):
+        if command == "FETCH" and args[1] == "(BODY.PEEK[])":
+            return ("NO", [b"[THROTTLED] Too many commands"])
+        return fake_uid(command, *args)
 
-    assert mock_IMAP4.return_value.select.call_count == expected_calls[0]
-    if expected_calls[0]:
-        mock_IMAP4.return_value.select.assert_called_with(
-            utf7_encode(imap_mailbox.name), readonly=True
-        )
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_throttled
 
-    assert mock_IMAP4.return_value.uid.call_count == expected_calls[1]
-    if expected_calls[1]:
-        mock_IMAP4.return_value.uid.assert_called_with("SEARCH", "ALL")
-    mock_IMAP4.return_value.unselect.assert_not_called()
-    mock_logger.debug.assert_called()
-    mock_logger.error.assert_called()
+    with pytest.raises(MailHostThrottledError, match="THROTTLED"):
+        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    mock_IMAP4_uid.return_value.uid.assert_called_with(
+        "FETCH", b"4,5,6", "(BODY.PEEK[])"
+    )
 
 
 @pytest.mark.django_db
-@pytest.mark.parametrize(
-    "raising_function, expected_calls", [("select", (1, 0)), ("uid", (1, 1))]
-)
-def test_IMAP4Fetcher_fetch_emails_exception(
-    fake_error_message,
-    imap_mailbox,
-    mock_logger,
-    mock_IMAP4,
-    raising_function,
-    expected_calls,
+def test_IMAP4Fetcher_fetch_emails_chunk_incomplete_response(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case of an error.
+    in case a message is missing in the response to a chunk request.
     """
-    getattr(mock_IMAP4.return_value, raising_function).side_effect = AssertionError(
-        fake_error_message
-    )
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
 
-    with pytest.raises(MailboxError, match=f"AssertionError.*?{fake_error_message}"):
-        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+    def fake_uid_incomplete(command, *args):
+        if command == "FETCH":
+            status, response_data = fake_uid(command, *args)
+            return (status, response_data[2:])
+        return fake_uid(command, *args)
 
-    assert mock_IMAP4.return_value.select.call_count == expected_calls[0]
-    if expected_calls[0]:
-        mock_IMAP4.return_value.select.assert_called_with(
-            utf7_encode(imap_mailbox.name), readonly=True
-        )
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_incomplete
 
-    assert mock_IMAP4.return_value.uid.call_count == expected_calls[1]
-    if expected_calls[1]:
-        mock_IMAP4.return_value.uid.assert_called_with("SEARCH", "ALL")
-    mock_IMAP4.return_value.unselect.assert_not_called()
-    mock_logger.debug.assert_called()
-    mock_logger.exception.assert_called()
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 5", b"mail 6"]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 4
+    mock_IMAP4_uid.return_value.uid.assert_called_with("FETCH", b"4", "(BODY.PEEK[])")
+    mock_logger.warning.assert_not_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_emails_bad_response_ignored(
-    mocker, imap_mailbox, mock_logger, mock_IMAP4
+def test_IMAP4Fetcher_fetch_emails_skips_known(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case of an ignored bad response.
+    in case a message is already in the mailbox.
     """
-    expected_uid_fetch_calls = [
-        mocker.call("FETCH", uID, "(RFC822)")
-        for uID in mock_IMAP4.return_value.uid.return_value[1][0].split()
-    ]
-    mock_IMAP4.return_value.unselect.return_value = ("NO", [b""])
+    baker.make(Email, mailbox=imap_mailbox, message_id="<5@eonvelope.test>")
+    baker.make(Email, message_id="<6@eonvelope.test>")
 
     result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    assert result == [mock_IMAP4.return_value.uid.return_value[1][0][1]] * len(
-        expected_uid_fetch_calls
-    )
-    mock_IMAP4.return_value.select.assert_called_once_with(
-        utf7_encode(imap_mailbox.name), readonly=True
+    assert result == [b"mail 4", b"mail 6"]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,6", "(BODY.PEEK[])"),
+        ]
     )
-    assert mock_IMAP4.return_value.uid.call_count == len(expected_uid_fetch_calls) + 1
-    mock_IMAP4.return_value.uid.assert_has_calls(
-        [mocker.call("SEARCH", "ALL"), *expected_uid_fetch_calls]
-    )
-    mock_IMAP4.return_value.unselect.assert_called_once_with()
-    mock_logger.debug.assert_called()
-    mock_logger.info.assert_called()
-    mock_logger.error.assert_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_emails_exception_ignored(
-    mocker, imap_mailbox, mock_logger, mock_IMAP4
+@pytest.mark.parametrize(
+    "throw_out_spam, expected_result",
+    [
+        (True, [b"mail 4", b"mail 6"]),
+        (False, [b"mail 4", b"mail 5", b"mail 6"]),
+    ],
+)
+def test_IMAP4Fetcher_fetch_emails_skips_spam(
+    imap_mailbox, mock_logger, mock_IMAP4_uid, throw_out_spam, expected_result
 ):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
-    in case of an ignored error.
+    in case a message is flagged as spam.
     """
-    expected_uid_fetch_calls = [
-        mocker.call("FETCH", uID, "(RFC822)")
-        for uID in mock_IMAP4.return_value.uid.return_value[1][0].split()
-    ]
-    mock_IMAP4.return_value.unselect.side_effect = AssertionError
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
+
+    def fake_uid_spam(command, *args):
+        status, response_data = fake_uid(command, *args)
+        if command == "FETCH" and "HEADER.FIELDS" in args[1]:
+            response_data[2] = (response_data[2][0], b"X-Spam-Flag: YES\r\n\r\n")
+        return (status, response_data)
+
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_spam
+
+    with override_config(THROW_OUT_SPAM=throw_out_spam):
+        result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == expected_result
+
 
+@pytest.mark.django_db
+@override_config(FETCH_MAX_EMAIL_DATASIZE=5)
+def test_IMAP4Fetcher_fetch_emails_skips_oversized(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the messages are larger than the maximum datasize.
+    """
     result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    assert result == [mock_IMAP4.return_value.uid.return_value[1][0][1]] * len(
-        expected_uid_fetch_calls
+    assert result == []
+    assert mock_IMAP4_uid.return_value.uid.call_count == 2
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+        ]
     )
-    mock_IMAP4.return_value.select.assert_called_with(
-        utf7_encode(imap_mailbox.name), readonly=True
-    )
-    assert mock_IMAP4.return_value.uid.call_count == len(expected_uid_fetch_calls) + 1
-    mock_IMAP4.return_value.uid.assert_has_calls(
-        [mocker.call("SEARCH", "ALL"), *expected_uid_fetch_calls]
-    )
-    mock_IMAP4.return_value.unselect.assert_called_once_with()
-    mock_logger.debug.assert_called()
-    mock_logger.info.assert_called()
-    mock_logger.exception.assert_called()
+    mock_logger.warning.assert_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_mailboxes_success(imap_mailbox, mock_logger, mock_IMAP4):
-    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
-    in case of success.
+@override_config(FETCH_SPOOL_EMAIL_DATASIZE=5)
+def test_IMAP4Fetcher_stream_emails_spools_large(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.stream_emails`
+    in case the messages are larger than the spooling datasize.
     """
-    result = IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+    result = [
+        mail.read()
+        for mail in IMAP4Fetcher(imap_mailbox.account).stream_emails(imap_mailbox)
+    ]
 
-    assert result == mock_IMAP4.return_value.list.return_value[1]
-    mock_IMAP4.return_value.list.assert_called_once()
-    mock_logger.debug.assert_called()
-    mock_logger.exception.assert_not_called()
-    mock_logger.error.assert_not_called()
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert mock_IMAP4_uid.return_value.uid.call_count == 5
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4", "(BODY.PEEK[]<0.1048576>)"),
+            mocker.call("FETCH", b"5", "(BODY.PEEK[]<0.1048576>)"),
+            mocker.call("FETCH", b"6", "(BODY.PEEK[]<0.1048576>)"),
+        ]
+    )
+    mock_logger.warning.assert_not_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_mailboxes_bad_response(
-    fake_error_message, imap_mailbox, mock_logger, mock_IMAP4
+@override_config(FETCH_SPOOL_EMAIL_DATASIZE=5)
+def test_IMAP4Fetcher_fetch_emails_spools_in_pieces(
+    mocker, imap_mailbox, mock_IMAP4_uid
 ):
-    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
-    in case of a bad response.
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case a spooled message is larger than one piece.
     """
-    mock_IMAP4.return_value.list.return_value = ("NO", [fake_error_message.encode()])
+    mocker.patch.object(IMAP4Fetcher, "SPOOL_PIECE_SIZE", 4)
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
+
+    def fake_uid_partial(command, *args):
+        if command == "FETCH" and "<" in args[1]:
+            offset, length = map(int, args[1][13:-2].split("."))
+            piece = (b"mail " + args[0])[offset : offset + length]
+            return (
+                "OK",
+                [
+                    (
+                        b"1 (UID %s BODY[]<%d> {%d}" % (args[0], offset, len(piece)),
+                        piece,
+                    ),
+                    b")",
+                ],
+            )
+        return fake_uid(command, *args)
+
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_partial
 
-    with pytest.raises(MailAccountError, match=fake_error_message):
-        IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
 
-    mock_IMAP4.return_value.list.assert_called_once()
-    mock_logger.debug.assert_called()
-    mock_logger.error.assert_called()
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    mock_IMAP4_uid.return_value.uid.assert_any_call("FETCH", b"4", "(BODY.PEEK[]<4.4>)")
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_fetch_mailboxes_exception(
-    fake_error_message, imap_mailbox, mock_logger, mock_IMAP4
+@override_config(FETCH_SPOOL_EMAIL_DATASIZE=5)
+def test_IMAP4Fetcher_fetch_emails_spool_bad_response(
+    imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
-    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
-    in case of an error.
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case a spooled message can not be fetched.
     """
-    mock_IMAP4.return_value.list.side_effect = AssertionError(fake_error_message)
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
 
-    with pytest.raises(
-        MailAccountError, match=f"AssertionError.*?{fake_error_message}"
-    ):
-        IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+    def fake_uid_failing(command, *args):
+        if command == "FETCH" and args[0] == b"5":
+            return ("NO", [b""])
+        return fake_uid(command, *args)
 
-    mock_IMAP4.return_value.list.assert_called_once()
-    mock_logger.debug.assert_called()
-    mock_logger.exception.assert_called()
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_failing
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 6"]
+    mock_logger.warning.assert_called()
 
 
 @pytest.mark.django_db
-def test_IMAP4Fetcher_restore_success(
-    imap_mailbox, fake_email_with_file, mock_logger, mock_IMAP4
+def test_IMAP4Fetcher_fetch_emails_incremental_skips_known(
+    imap_mailbox, mock_logger, mock_IMAP4_uid
 ):
-    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore`
-    in case of success.
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of the incremental criterion and the last message being known.
+    """
+    baker.make(Email, mailbox=imap_mailbox, message_id="<6@eonvelope.test>")
+    imap_mailbox.uid_validity = 42
+    imap_mailbox.highest_uid = 4
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert result == [b"mail 5"]
+    assert imap_mailbox.highest_uid == 6
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_message_chunk_trailing_uid(imap_mailbox, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_message_chunk`
+    in case the server sends the UIDs after the message data.
+    """
+    mock_IMAP4.return_value.uid.return_value = (
+        "OK",
+        [
+            (b"1 (BODY[] {6}", b"mail 4"),
+            b" UID 4)",
+            (b"2 (BODY[] {6}", b"mail 5"),
+            b" UID 5)",
+        ],
+    )
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_message_chunk([b"4", b"5"])
+
+    assert result == {4: b"mail 4", 5: b"mail 5"}
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_stream_emails_lazy(mocker, imap_mailbox, mock_IMAP4_uid):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.stream_emails`
+    in case the emails are consumed one by one.
+    """
+    stream = IMAP4Fetcher(imap_mailbox.account).stream_emails(imap_mailbox)
+
+    mock_IMAP4_uid.return_value.select.assert_not_called()
+
+    result = next(stream)
+
+    assert result == b"mail 4"
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.unselect.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_stream_emails_closed_early(imap_mailbox, mock_IMAP4_uid):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.stream_emails`
+    in case the stream is closed before all emails are consumed.
+    """
+    stream = IMAP4Fetcher(imap_mailbox.account).stream_emails(imap_mailbox)
+    next(stream)
+
+    stream.close()
+
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_stream_emails_moves_checkpoint(imap_mailbox, mock_IMAP4_uid):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.stream_emails`
+    in case the emails are consumed one by one.
+    """
+    stream = IMAP4Fetcher(imap_mailbox.account).stream_emails(imap_mailbox)
+
+    next(stream)
+    assert imap_mailbox.fetch_checkpoint == ""
+    next(stream)
+    assert imap_mailbox.fetch_checkpoint == "4"
+    stream.close()
+    assert imap_mailbox.fetch_checkpoint == "4"
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_resume_checkpoint(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case an interrupted run is resumed.
+    """
+    imap_mailbox.is_fetch_complete = False
+    imap_mailbox.fetch_checkpoint = "4"
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 5", b"mail 6"]
+    assert imap_mailbox.fetch_checkpoint == "6"
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"5,6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_resume_unknown_checkpoint(
+    imap_mailbox, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the checkpoint of the interrupted run is not among the found messages.
+    """
+    imap_mailbox.is_fetch_complete = False
+    imap_mailbox.fetch_checkpoint = "9"
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert imap_mailbox.fetch_checkpoint == "6"
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_complete_run_checkpoint(
+    imap_mailbox, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the checkpoint belongs to a complete run.
+    """
+    imap_mailbox.is_fetch_complete = True
+    imap_mailbox.fetch_checkpoint = "4"
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+
+
+@pytest.mark.parametrize(
+    "criterion, status_data, expected_snapshot",
+    [
+        (
+            EmailFetchingCriterionChoices.ALL,
+            b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)',
+            "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42",
+        ),
+        (
+            EmailFetchingCriterionChoices.DAILY,
+            b"INBOX (MESSAGES 3  UIDNEXT 7 UIDVALIDITY 42) ",
+            "DAILY - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42",
+        ),
+        (
+            EmailFetchingCriterionChoices.UNSEEN,
+            b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)',
+            None,
+        ),
+        (
+            EmailFetchingCriterionChoices.UNSEEN,
+            b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42 HIGHESTMODSEQ 9)',
+            "UNSEEN - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42 HIGHESTMODSEQ 9",
+        ),
+        (
+            EmailFetchingCriterionChoices.RECENT,
+            b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42 HIGHESTMODSEQ 9)',
+            None,
+        ),
+        (EmailFetchingCriterionChoices.ALL, b"STATUS failed", None),
+    ],
+)
+def test_IMAP4Fetcher_make_status_snapshot(criterion, status_data, expected_snapshot):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.make_status_snapshot`."""
+    result = IMAP4Fetcher.make_status_snapshot(criterion, None, status_data)
+
+    assert result == expected_snapshot
+
+
+def test_IMAP4Fetcher_make_status_snapshot_filter():
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.make_status_snapshot`
+    in case of a fetching filter.
+    """
+    status_data = b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)'
+
+    result = IMAP4Fetcher.make_status_snapshot(
+        EmailFetchingCriterionChoices.ALL,
+        FetchingFilter({"and": [{"from": "a"}, {"larger": 10}]}),
+        status_data,
+    )
+
+    assert result != IMAP4Fetcher.make_status_snapshot(
+        EmailFetchingCriterionChoices.ALL, None, status_data
+    )
+    assert result != IMAP4Fetcher.make_status_snapshot(
+        EmailFetchingCriterionChoices.ALL,
+        FetchingFilter({"and": [{"from": "b"}, {"larger": 10}]}),
+        status_data,
+    )
+    assert result == IMAP4Fetcher.make_status_snapshot(
+        EmailFetchingCriterionChoices.ALL,
+        FetchingFilter({"and": [{"from": "a"}, {"larger": 10}]}),
+        status_data,
+    )
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_sets_sync_state(imap_mailbox, mock_IMAP4_uid):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of success, the status of the mailbox is kept for the next fetch.
+    """
+    IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert imap_mailbox.sync_state == "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+    mock_IMAP4_uid.return_value.status.assert_called_once_with(
+        utf7_encode(imap_mailbox.name), "(MESSAGES UIDNEXT UIDVALIDITY)"
+    )
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_sets_sync_state_condstore(
+    imap_mailbox, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the server supports CONDSTORE.
+    """
+    mock_IMAP4_uid.return_value.capabilities = ["CONDSTORE"]
+    mock_IMAP4_uid.return_value.status.return_value = (
+        "OK",
+        [b'"INBOX" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42 HIGHESTMODSEQ 9)'],
+    )
+
+    IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox, EmailFetchingCriterionChoices.UNSEEN
+    )
+
+    assert (
+        imap_mailbox.sync_state
+        == "UNSEEN - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42 HIGHESTMODSEQ 9"
+    )
+    mock_IMAP4_uid.return_value.status.assert_called_once_with(
+        utf7_encode(imap_mailbox.name), "(MESSAGES UIDNEXT UIDVALIDITY HIGHESTMODSEQ)"
+    )
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_unchanged(imap_mailbox, mock_logger, mock_IMAP4_uid):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the mailbox is unchanged since the last fetch.
+    """
+    imap_mailbox.sync_state = "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == []
+    mock_IMAP4_uid.return_value.select.assert_not_called()
+    mock_IMAP4_uid.return_value.uid.assert_not_called()
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_unchanged_other_criterion(
+    imap_mailbox, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the mailbox is unchanged since the last fetch with another criterion.
+    """
+    imap_mailbox.sync_state = "DAILY - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert imap_mailbox.sync_state == "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_status_bad_response(
+    imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the status of the mailbox can't be requested.
+    """
+    imap_mailbox.sync_state = "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+    mock_IMAP4_uid.return_value.status.return_value = ("NO", [b"STATUS failed"])
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert imap_mailbox.sync_state == ""
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_find_unchanged_mailboxes(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.find_unchanged_mailboxes`
+    in case of success with a mailbox name sent as literal.
+    """
+    imap_mailbox.sync_state = "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+    changed_mailbox = baker.make(
+        Mailbox,
+        account=imap_mailbox.account,
+        name="Box",
+        sync_state="ALL - MESSAGES 1 UIDNEXT 2 UIDVALIDITY 42",
+    )
+    mock_IMAP4.return_value.readline.side_effect = [
+        b'* STATUS "%s" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)\r\n'
+        % utf7_encode(imap_mailbox.name),
+        b"* STATUS {3}\r\n",
+        b" (MESSAGES 2 UIDNEXT 3 UIDVALIDITY 42)\r\n",
+        b"STATUS0 OK STATUS completed\r\n",
+        b"STATUS1 OK STATUS completed\r\n",
+    ]
+    mock_IMAP4.return_value.read.return_value = b"Box"
+
+    result = IMAP4Fetcher(imap_mailbox.account).find_unchanged_mailboxes(
+        [imap_mailbox, changed_mailbox], EmailFetchingCriterionChoices.ALL
+    )
+
+    assert result == [imap_mailbox]
+    mock_IMAP4.return_value.send.assert_called_once_with(
+        b'STATUS0 STATUS "%s" (MESSAGES UIDNEXT UIDVALIDITY)\r\n'
+        % utf7_encode(imap_mailbox.name)
+        + b'STATUS1 STATUS "Box" (MESSAGES UIDNEXT UIDVALIDITY)\r\n'
+    )
+    mock_IMAP4.return_value.read.assert_called_once_with(3)
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_find_unchanged_mailboxes_incomplete_run(imap_mailbox, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.find_unchanged_mailboxes`
+    in case the last fetching run of an unchanged mailbox did not finish.
+    """
+    imap_mailbox.sync_state = "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+    imap_mailbox.is_fetch_complete = False
+    mock_IMAP4.return_value.readline.side_effect = [
+        b'* STATUS "%s" (MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42)\r\n'
+        % utf7_encode(imap_mailbox.name),
+        b"STATUS0 OK STATUS completed\r\n",
+    ]
+
+    result = IMAP4Fetcher(imap_mailbox.account).find_unchanged_mailboxes(
+        [imap_mailbox], EmailFetchingCriterionChoices.ALL
+    )
+
+    assert result == []
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_find_unchanged_mailboxes_connection_closed(
+    imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.find_unchanged_mailboxes`
+    in case the connection is closed while waiting for the responses.
+    """
+    imap_mailbox.sync_state = "ALL - MESSAGES 3 UIDNEXT 7 UIDVALIDITY 42"
+    mock_IMAP4.return_value.readline.return_value = b""
+
+    result = IMAP4Fetcher(imap_mailbox.account).find_unchanged_mailboxes(
+        [imap_mailbox], EmailFetchingCriterionChoices.ALL
+    )
+
+    assert result == []
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_incremental_success(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of success with the incremental criterion and unchanged UIDVALIDITY.
+    """
+    imap_mailbox.uid_validity = 42
+    imap_mailbox.highest_uid = 4
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert result == [b"mail 5", b"mail 6"]
+    assert imap_mailbox.uid_validity == 42
+    assert imap_mailbox.highest_uid == 6
+    mock_IMAP4_uid.return_value.response.assert_called_once_with("UIDVALIDITY")
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "UID 5:*"),
+            mocker.call("FETCH", b"5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"5,6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_incremental_filter(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of the incremental criterion with a fetching filter,
+    which must not move the sync state of the mailbox.
+    """
+    imap_mailbox.uid_validity = 42
+    imap_mailbox.highest_uid = 4
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox,
+        EmailFetchingCriterionChoices.INCREMENTAL,
+        FetchingFilter({"from": "a"}),
+    )
+
+    assert result == [b"mail 5", b"mail 6"]
+    assert imap_mailbox.highest_uid == 4
+    assert imap_mailbox.fetch_checkpoint == ""
+    assert imap_mailbox.sync_state == ""
+    mock_IMAP4_uid.return_value.status.assert_not_called()
+    mock_IMAP4_uid.return_value.uid.assert_any_call("SEARCH", 'UID 5:* FROM "a"')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "uid_validity, highest_uid",
+    [
+        (None, None),
+        (41, 4),
+        (42, None),
+    ],
+)
+def test_IMAP4Fetcher_fetch_emails_incremental_resync(
+    imap_mailbox,
+    mock_logger,
+    mock_IMAP4_uid,
+    uid_validity,
+    highest_uid,
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of the incremental criterion without valid stored UIDs.
+    """
+    imap_mailbox.uid_validity = uid_validity
+    imap_mailbox.highest_uid = highest_uid
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    assert imap_mailbox.uid_validity == 42
+    assert imap_mailbox.highest_uid == 6
+    mock_IMAP4_uid.return_value.uid.assert_any_call("SEARCH", "ALL")
+    mock_logger.info.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_incremental_bad_response_ignored(
+    imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of the incremental criterion and an ignored bad response.
+    """
+    fake_uid = mock_IMAP4_uid.return_value.uid.side_effect
+
+    def fake_uid_failing(command, *args):
+        if command == "FETCH" and b"5" in args[0].split(b","):
+            return ("NO", [b""])
+        return fake_uid(command, *args)
+
+    mock_IMAP4_uid.return_value.uid.side_effect = fake_uid_failing
+    imap_mailbox.uid_validity = 42
+    imap_mailbox.highest_uid = 3
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(
+        imap_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert result == [b"mail 4", b"mail 6"]
+    assert imap_mailbox.highest_uid == 4
+    assert imap_mailbox.sync_state == ""
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_wrong_mailbox(imap_mailbox, mock_logger):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case the given mailbox does not belong to the given account.
+    """
+    wrong_mailbox = baker.make(Mailbox)
+
+    with pytest.raises(ValueError, match="is not in"):
+        IMAP4Fetcher(imap_mailbox.account).fetch_emails(wrong_mailbox)
+
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_bad_criterion(imap_mailbox, mock_logger):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of an unavailable criterion.
+    """
+    with pytest.raises(ValueError, match="not available via"):
+        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox, "NONE")
+
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "raising_function, expected_calls", [("select", (1, 0)), ("uid", (1, 1))]
+)
+def test_IMAP4Fetcher_fetch_emails_bad_response(
+    fake_error_message,
+    imap_mailbox,
+    mock_logger,
+    mock_IMAP4,
+    raising_function,
+    expected_calls,
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of a bad response.
+    """
+    getattr(mock_IMAP4.return_value, raising_function).return_value = (
+        "NO",
+        [fake_error_message.encode()],
+    )
+
+    with pytest.raises(MailboxError, match=fake_error_message):
+        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert mock_IMAP4.return_value.select.call_count == expected_calls[0]
+    if expected_calls[0]:
+        mock_IMAP4.return_value.select.assert_called_with(
+            utf7_encode(imap_mailbox.name), readonly=True
+        )
+
+    assert mock_IMAP4.return_value.uid.call_count == expected_calls[1]
+    if expected_calls[1]:
+        mock_IMAP4.return_value.uid.assert_called_with("SEARCH", "ALL")
+    mock_IMAP4.return_value.unselect.assert_not_called()
+    mock_logger.debug.assert_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "raising_function, expected_calls", [("select", (1, 0)), ("uid", (1, 1))]
+)
+def test_IMAP4Fetcher_fetch_emails_exception(
+    fake_error_message,
+    imap_mailbox,
+    mock_logger,
+    mock_IMAP4,
+    raising_function,
+    expected_calls,
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of an error.
+    """
+    getattr(mock_IMAP4.return_value, raising_function).side_effect = AssertionError(
+        fake_error_message
+    )
+
+    with pytest.raises(MailboxError, match=f"AssertionError.*?{fake_error_message}"):
+        IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert mock_IMAP4.return_value.select.call_count == expected_calls[0]
+    if expected_calls[0]:
+        mock_IMAP4.return_value.select.assert_called_with(
+            utf7_encode(imap_mailbox.name), readonly=True
+        )
+
+    assert mock_IMAP4.return_value.uid.call_count == expected_calls[1]
+    if expected_calls[1]:
+        mock_IMAP4.return_value.uid.assert_called_with("SEARCH", "ALL")
+    mock_IMAP4.return_value.unselect.assert_not_called()
+    mock_logger.debug.assert_called()
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_bad_response_ignored(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of an ignored bad response.
+    """
+    mock_IMAP4_uid.return_value.unselect.return_value = ("NO", [b""])
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    mock_IMAP4_uid.return_value.select.assert_called_once_with(
+        utf7_encode(imap_mailbox.name), readonly=True
+    )
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5,6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
+    mock_logger.debug.assert_called()
+    mock_logger.info.assert_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_emails_exception_ignored(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4_uid
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_emails`
+    in case of an ignored error.
+    """
+    mock_IMAP4_uid.return_value.unselect.side_effect = AssertionError
+
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_emails(imap_mailbox)
+
+    assert result == [b"mail 4", b"mail 5", b"mail 6"]
+    mock_IMAP4_uid.return_value.select.assert_called_with(
+        utf7_encode(imap_mailbox.name), readonly=True
+    )
+    assert mock_IMAP4_uid.return_value.uid.call_count == 3
+    mock_IMAP4_uid.return_value.uid.assert_has_calls(
+        [
+            mocker.call("SEARCH", "ALL"),
+            mocker.call("FETCH", b"4,5,6", HEADER_PARTS),
+            mocker.call("FETCH", b"4,5,6", "(BODY.PEEK[])"),
+        ]
+    )
+    mock_IMAP4_uid.return_value.unselect.assert_called_once_with()
+    mock_logger.debug.assert_called()
+    mock_logger.info.assert_called()
+    mock_logger.exception.assert_called()
+
+
+@pytest.fixture
+def mock_IMAP4_idle(mocker, mock_IMAP4):
+    """Extends :func:`mock_IMAP4` with an IDLE capable server that sends new messages during IDLE."""
+    mock_IMAP4.return_value.capabilities = ["IDLE"]
+    mock_IMAP4.return_value.readline.side_effect = [
+        b"+ idling\r\n",
+        b"* 5 EXISTS\r\n",
+        b"IDLE OK IDLE terminated\r\n",
+    ]
+    mock_select = mocker.patch(
+        "core.utils.fetchers.SafeIMAPMixin.select.select", autospec=True
+    )
+    mock_select.return_value = ([mock_IMAP4.return_value.socket.return_value], [], [])
+    return mock_select
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_new_messages(
+    mocker, imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case new messages arrive while idling.
+    """
+    result = IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(
+        imap_mailbox, timeout=10
+    )
+
+    assert result is True
+    mock_IMAP4.return_value.select.assert_called_once_with(
+        utf7_encode(imap_mailbox.name), readonly=True
+    )
+    mock_IMAP4.return_value.send.assert_has_calls(
+        [mocker.call(b"IDLE IDLE\r\n"), mocker.call(b"DONE\r\n")]
+    )
+    mock_IMAP4_idle.assert_called_once()
+    mock_IMAP4.return_value.unselect.assert_called_once()
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_other_change(
+    imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case the server reports a change other than new messages while idling.
+    """
+    mock_IMAP4.return_value.readline.side_effect = [
+        b"+ idling\r\n",
+        b"* 2 EXPUNGE\r\n",
+        b"IDLE OK IDLE terminated\r\n",
+    ]
+
+    result = IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(
+        imap_mailbox, timeout=10
+    )
+
+    assert result is False
+    mock_IMAP4.return_value.send.assert_called_with(b"DONE\r\n")
+    mock_IMAP4.return_value.unselect.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_timeout(
+    imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case nothing happens until the timeout.
+    """
+    mock_IMAP4_idle.return_value = ([], [], [])
+    mock_IMAP4.return_value.readline.side_effect = [
+        b"+ idling\r\n",
+        b"IDLE OK IDLE terminated\r\n",
+    ]
+
+    result = IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(
+        imap_mailbox, timeout=10
+    )
+
+    assert result is False
+    mock_IMAP4_idle.assert_called_once_with(
+        [mock_IMAP4.return_value.socket.return_value], [], [], 10
+    )
+    mock_IMAP4.return_value.send.assert_called_with(b"DONE\r\n")
+    mock_IMAP4.return_value.unselect.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_bad_response(
+    imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case the server rejects the IDLE command.
+    """
+    mock_IMAP4.return_value.readline.side_effect = [b"IDLE BAD not now\r\n"]
+
+    with pytest.raises(MailAccountError, match="safe_idle"):
+        IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(imap_mailbox)
+
+    mock_IMAP4_idle.assert_not_called()
+    mock_IMAP4.return_value.unselect.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_connection_closed(
+    imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case the server closes the connection while idling.
+    """
+    mock_IMAP4.return_value.readline.side_effect = [b"+ idling\r\n", b"", b""]
+
+    with pytest.raises(MailAccountError, match="EOFError"):
+        IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(imap_mailbox)
+
+    mock_IMAP4.return_value.unselect.assert_not_called()
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_not_supported(
+    imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case the server does not support IDLE.
+    """
+    with pytest.raises(MailAccountError, match="IDLE"):
+        IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(imap_mailbox)
+
+    mock_IMAP4.return_value.select.assert_not_called()
+    mock_IMAP4.return_value.send.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_wait_for_new_emails_wrong_mailbox(
+    imap_mailbox, mock_logger, mock_IMAP4, mock_IMAP4_idle
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.wait_for_new_emails`
+    in case the given mailbox doesn't belong to the given account.
+    """
+    wrong_mailbox = baker.make(Mailbox)
+
+    with pytest.raises(ValueError, match="is not in"):
+        IMAP4Fetcher(imap_mailbox.account).wait_for_new_emails(wrong_mailbox)
+
+    mock_IMAP4.return_value.select.assert_not_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_mailboxes_success(imap_mailbox, mock_logger, mock_IMAP4):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
+    in case of success.
+    """
+    result = IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+
+    assert result == mock_IMAP4.return_value.list.return_value[1]
+    mock_IMAP4.return_value.list.assert_called_once()
+    mock_logger.debug.assert_called()
+    mock_logger.exception.assert_not_called()
+    mock_logger.error.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_mailboxes_bad_response(
+    fake_error_message, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
+    in case of a bad response.
+    """
+    mock_IMAP4.return_value.list.return_value = ("NO", [fake_error_message.encode()])
+
+    with pytest.raises(MailAccountError, match=fake_error_message):
+        IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+
+    mock_IMAP4.return_value.list.assert_called_once()
+    mock_logger.debug.assert_called()
+    mock_logger.error.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_fetch_mailboxes_exception(
+    fake_error_message, imap_mailbox, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.fetch_mailboxes`
+    in case of an error.
+    """
+    mock_IMAP4.return_value.list.side_effect = AssertionError(fake_error_message)
+
+    with pytest.raises(
+        MailAccountError, match=f"AssertionError.*?{fake_error_message}"
+    ):
+        IMAP4Fetcher(imap_mailbox.account).fetch_mailboxes()
+
+    mock_IMAP4.return_value.list.assert_called_once()
+    mock_logger.debug.assert_called()
+    mock_logger.exception.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_restore_success(
+    imap_mailbox, fake_email_with_file, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore`
+    in case of success.
     """
     IMAP4Fetcher(imap_mailbox.account).restore(fake_email_with_file)
 
@@ -858,6 +1912,125 @@ def test_IMAP4Fetcher_restore_exception(
     mock_logger.exception.assert_called()
 
 
+@pytest.mark.django_db
+def test_IMAP4Fetcher_restore_batch_multiappend(
+    imap_mailbox, fake_email_with_file, other_email_with_file, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore_batch`
+    in case the server supports MULTIAPPEND.
+    """
+    mock_IMAP4.return_value.capability.return_value = (
+        "OK",
+        [b"IMAP4rev1 MULTIAPPEND"],
+    )
+    mock_IMAP4.return_value.readline.side_effect = [
+        b"+ Ready\r\n",
+        b"+ Ready\r\n",
+        b"MULTIAPPEND OK APPEND completed\r\n",
+    ]
+    with fake_email_with_file.open_file() as email_file:
+        email_data = email_file.read()
+
+    result = list(
+        IMAP4Fetcher(imap_mailbox.account).restore_batch(
+            [fake_email_with_file, other_email_with_file]
+        )
+    )
+
+    assert result == [(fake_email_with_file, None), (other_email_with_file, None)]
+    mock_IMAP4.return_value.append.assert_not_called()
+    assert mock_IMAP4.return_value.send.call_count == 3
+    mock_IMAP4.return_value.send.assert_any_call(
+        b"MULTIAPPEND APPEND "
+        + utf7_encode(imap_mailbox.name)
+        + b" {%d}\r\n" % len(email_data)
+    )
+    mock_IMAP4.return_value.send.assert_called_with(email_data + b"\r\n")
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_restore_batch_multiappend_failure(
+    fake_error_message,
+    imap_mailbox,
+    fake_email_with_file,
+    other_email_with_file,
+    mock_logger,
+    mock_IMAP4,
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore_batch`
+    in case MULTIAPPEND fails and the emails are uploaded one by one.
+    """
+    mock_IMAP4.return_value.capability.return_value = (
+        "OK",
+        [b"IMAP4rev1 MULTIAPPEND"],
+    )
+    mock_IMAP4.return_value.readline.side_effect = [
+        b"MULTIAPPEND NO " + fake_error_message.encode() + b"\r\n"
+    ]
+    mock_IMAP4.return_value.append.side_effect = [
+        ("OK", [b""]),
+        ("NO", [fake_error_message.encode()]),
+    ]
+
+    result = list(
+        IMAP4Fetcher(imap_mailbox.account).restore_batch(
+            [fake_email_with_file, other_email_with_file]
+        )
+    )
+
+    assert result[0] == (fake_email_with_file, None)
+    assert result[1][0] == other_email_with_file
+    assert isinstance(result[1][1], MailboxError)
+    assert mock_IMAP4.return_value.append.call_count == 2
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_IMAP4Fetcher_restore_batch_no_multiappend(
+    imap_mailbox, fake_email_with_file, fake_email, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore_batch`
+    in case the server does not support MULTIAPPEND and one email has no file.
+    """
+    mock_IMAP4.return_value.capability.return_value = ("OK", [b"IMAP4rev1"])
+
+    result = list(
+        IMAP4Fetcher(imap_mailbox.account).restore_batch(
+            [fake_email, fake_email_with_file]
+        )
+    )
+
+    assert result[0][0] == fake_email
+    assert isinstance(result[0][1], FileNotFoundError)
+    assert result[1] == (fake_email_with_file, None)
+    with fake_email_with_file.open_file() as email_file:
+        mock_IMAP4.return_value.append.assert_called_once_with(
+            utf7_encode(imap_mailbox.name), None, None, email_file.read()
+        )
+    mock_IMAP4.return_value.send.assert_not_called()
+
+
+@pytest.mark.django_db
+@override_config(RESTORE_BATCH_SIZE=1)
+def test_IMAP4Fetcher_restore_batch_batch_size(
+    imap_mailbox, fake_email_with_file, other_email_with_file, mock_logger, mock_IMAP4
+):
+    """Tests :func:`core.utils.fetchers.IMAP4Fetcher.restore_batch`
+    in case the batches contain a single email.
+    """
+
+    result = list(
+        IMAP4Fetcher(imap_mailbox.account).restore_batch(
+            [fake_email_with_file, other_email_with_file]
+        )
+    )
+
+    assert result == [(fake_email_with_file, None), (other_email_with_file, None)]
+    assert mock_IMAP4.return_value.append.call_count == 2
+    mock_IMAP4.return_value.capability.assert_not_called()
+
+
 @pytest.mark.django_db
 def test_IMAP4Fetcher_close_success(imap_mailbox, mock_logger, mock_IMAP4):
     """Tests :func:`core.utils.fetchers.IMAP4Fetcher.close`
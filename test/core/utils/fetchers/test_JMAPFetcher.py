@@ -0,0 +1,485 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for :mod:`core.utils.fetchers.JMAPFetcher`.
+
+The fetcher is tested against the stand-in server from :mod:`test.fake_servers`.
+"""
+
+import socket
+from email import message_from_bytes
+
+import httpx
+import pytest
+from constance.test import override_config
+from freezegun import freeze_time
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Email, Mailbox
+from core.utils.fetchers import FetchingFilter, JMAPFetcher
+from core.utils.fetchers.exceptions import (
+    MailAccountError,
+    MailboxError,
+    MailHostThrottledError,
+)
+from test.fake_servers import FakeJMAPServer, generate_corpus
+
+
+@pytest.fixture
+def jmap_mailbox_factory(server_mailbox_factory):
+    """Factory for an INBOX :class:`core.models.Mailbox` in a JMAP account on a :class:`test.fake_servers.FakeJMAPServer`."""
+
+    def make_jmap_mailbox(server):
+        return server_mailbox_factory(server, EmailProtocolChoices.JMAP)
+
+    return make_jmap_mailbox
+
+
+@pytest.mark.parametrize(
+    "criterion, expected_condition",
+    [
+        (EmailFetchingCriterionChoices.ALL, None),
+        (EmailFetchingCriterionChoices.UNSEEN, {"notKeyword": "$seen"}),
+        (EmailFetchingCriterionChoices.SEEN, {"hasKeyword": "$seen"}),
+        (EmailFetchingCriterionChoices.FLAGGED, {"hasKeyword": "$flagged"}),
+        (EmailFetchingCriterionChoices.DRAFT, {"hasKeyword": "$draft"}),
+        (EmailFetchingCriterionChoices.UNDRAFT, {"notKeyword": "$draft"}),
+        (EmailFetchingCriterionChoices.DAILY, {"after": "2024-10-24T12:00:00Z"}),
+        (EmailFetchingCriterionChoices.WEEKLY, {"after": "2024-10-18T12:00:00Z"}),
+    ],
+)
+def test_JMAPFetcher_make_fetching_condition(criterion, expected_condition):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.make_fetching_condition`."""
+    with freeze_time("2024-10-25 12:00:00"):
+        result = JMAPFetcher.make_fetching_condition(criterion)
+
+    assert result == expected_condition
+
+
+def test_JMAPFetcher_make_header_block():
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.make_header_block`."""
+    result = JMAPFetcher.make_header_block(
+        {"id": "email1", "header:Message-ID": " <abc@test>", "header:To": None}
+    )
+
+    assert result == b"Message-ID: <abc@test>\r\n\r\n"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("auth_scheme", ["Basic", "Bearer"])
+def test_JMAPFetcher_connect_success(jmap_mailbox_factory, auth_scheme):
+    """Tests :class:`core.utils.fetchers.JMAPFetcher`
+    in case of success with either authentication scheme.
+    """
+    with FakeJMAPServer([], auth_scheme=auth_scheme) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            fetcher.test(mailbox)
+
+    assert fetcher.account_id == FakeJMAPServer.ACCOUNT_ID
+    assert server.method_calls == ["Core/echo", "Mailbox/get"]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_connect_failure(jmap_mailbox_factory):
+    """Tests :class:`core.utils.fetchers.JMAPFetcher`
+    in case the connection to the server fails.
+    """
+    with socket.socket() as probe_socket:
+        probe_socket.bind(("127.0.0.1", 0))
+        unused_port = probe_socket.getsockname()[1]
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+    mailbox.account.mail_host = f"http://127.0.0.1:{unused_port}/.well-known/jmap"
+
+    with pytest.raises(MailAccountError, match="ConnectError"):
+        JMAPFetcher(mailbox.account)
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_success(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case of success, listing the emails with one request per chunk.
+    """
+    corpus = generate_corpus(25)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with (
+            override_config(JMAP_FETCH_CHUNK_SIZE=10),
+            JMAPFetcher(mailbox.account) as fetcher,
+        ):
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus
+    assert server.method_calls == ["Mailbox/get"] + ["Email/query", "Email/get"] * 3
+    assert [command.split(" ")[0] for command in server.commands].count("POST") == 4
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_chunk_size_capped(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case the chunk size is larger than the server allows.
+    """
+    corpus = generate_corpus(5)
+
+    with FakeJMAPServer(corpus, max_objects_in_get=2) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus
+    assert server.method_calls.count("Email/query") == 3
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_criterion(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case of a criterion that is queried on the server.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeJMAPServer(corpus[:2]) as server:
+        for message in corpus[2:]:
+            server.add_message(message, keywords={"$seen": True})
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(mailbox, EmailFetchingCriterionChoices.UNSEEN)
+
+    assert result == corpus[:2]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_skips_known(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case some emails are already archived, they are not downloaded.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        for message in corpus[:3]:
+            baker.make(
+                Email,
+                mailbox=mailbox,
+                message_id=message_from_bytes(message)["Message-ID"],
+            )
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus[3:]
+    assert [
+        command for command in server.commands if command.startswith("GET /download/")
+    ] == ["GET /download/account1/blob4/email.eml?accept=message%2Frfc822"]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_fetching_filter(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    with a fetching filter, partly queried on the server and partly checked on the headers.
+    """
+    corpus = generate_corpus(4) + generate_corpus(2, body_size=10000)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(
+                mailbox,
+                fetching_filter=FetchingFilter(
+                    {"and": [{"larger": 5000}, {"subject": "message 1"}]}
+                ),
+            )
+
+    assert result == corpus[5:]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_skips_oversized(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case some emails are larger than the maximum datasize.
+    """
+    corpus = generate_corpus(2) + generate_corpus(1, body_size=10000)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with (
+            override_config(FETCH_MAX_EMAIL_DATASIZE=5000),
+            JMAPFetcher(mailbox.account) as fetcher,
+        ):
+            result = fetcher.fetch_emails(mailbox)
+
+    assert result == corpus[:2]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_stream_emails_spools_large(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.stream_emails`
+    in case the emails are larger than the spooling datasize.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with (
+            override_config(FETCH_SPOOL_EMAIL_DATASIZE=1),
+            JMAPFetcher(mailbox.account) as fetcher,
+        ):
+            result = [mail.read() for mail in fetcher.stream_emails(mailbox)]
+
+    assert result == corpus
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_stream_emails_missing_blob(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.stream_emails`
+    in case an email is deleted before it is downloaded.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeJMAPServer(corpus) as server:
+        del server.blobs["blob2"]
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = list(fetcher.stream_emails(mailbox))
+
+    assert result == [corpus[0], corpus[2]]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_stream_emails_resumes_at_checkpoint(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.stream_emails`
+    in case of an interrupted run that is retried.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        mailbox.is_fetch_complete = False
+        mailbox.fetch_checkpoint = "email2"
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = list(fetcher.stream_emails(mailbox))
+
+    assert result == corpus[2:]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_incremental(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    with the incremental criterion, syncing via Email/changes after the first fetch.
+    """
+    corpus = generate_corpus(5)
+
+    with FakeJMAPServer(corpus[:3]) as server:
+        other_mailbox_id = server.add_mailbox("Other")
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            first_result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+            first_state = mailbox.sync_state
+            server.add_message(corpus[3])
+            server.add_email(server.add_blob(corpus[4]), [other_mailbox_id], {})
+            server.method_calls.clear()
+            second_result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert first_result == corpus[:3]
+    assert first_state == "3"
+    assert second_result == corpus[3:4]
+    assert mailbox.sync_state == "5"
+    assert server.method_calls == ["Email/changes", "Email/get"]
+
+
+@pytest.mark.django_db
+@override_config(JMAP_FETCH_CHUNK_SIZE=1)
+def test_JMAPFetcher_fetch_emails_incremental_pages(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    with the incremental criterion in case the changes are listed in several pages,
+    the state after the last page must be kept.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeJMAPServer(corpus[:1]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            fetcher.fetch_emails(mailbox, EmailFetchingCriterionChoices.INCREMENTAL)
+            for message in corpus[1:]:
+                server.add_message(message)
+            result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert result == corpus[1:]
+    assert mailbox.sync_state == "4"
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_incremental_fetching_filter(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    with the incremental criterion and a fetching filter,
+    which must not move the sync state of the mailbox.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeJMAPServer(corpus) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(
+                mailbox,
+                EmailFetchingCriterionChoices.INCREMENTAL,
+                FetchingFilter({"subject": "message 1"}),
+            )
+
+    assert result == corpus[1:2]
+    assert mailbox.sync_state == ""
+    assert mailbox.fetch_checkpoint == ""
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_incremental_invalid_state(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    with the incremental criterion in case the server can't calculate the changes since the sync state.
+    """
+    corpus = generate_corpus(3)
+
+    with FakeJMAPServer(corpus) as server:
+        server.min_changes_state = 2
+        mailbox = jmap_mailbox_factory(server)
+        mailbox.sync_state = "1"
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_emails(
+                mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+            )
+
+    assert result == corpus
+    assert mailbox.sync_state == "3"
+    assert server.method_calls == [
+        "Mailbox/get",
+        "Email/changes",
+        "Email/get",
+        "Email/query",
+        "Email/get",
+    ]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_bad_criterion(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case of a criterion that is not available.
+    """
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with (
+            JMAPFetcher(mailbox.account) as fetcher,
+            pytest.raises(ValueError, match="not available"),
+        ):
+            fetcher.fetch_emails(mailbox, EmailFetchingCriterionChoices.RECENT)
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_missing_mailbox(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case the mailbox does not exist on the server.
+    """
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        missing_mailbox = baker.make(Mailbox, account=mailbox.account, name="Missing")
+        with (
+            JMAPFetcher(mailbox.account) as fetcher,
+            pytest.raises(MailboxError, match="Missing"),
+        ):
+            fetcher.fetch_emails(missing_mailbox)
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_emails_throttled(mocker, jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_emails`
+    in case the server throttles the requests.
+    """
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            mocker.patch.object(
+                fetcher,
+                "call",
+                side_effect=httpx.HTTPStatusError(
+                    "Client error '429 Too Many Requests'",
+                    request=httpx.Request("POST", server.session_url),
+                    response=httpx.Response(429),
+                ),
+            )
+            with pytest.raises(MailHostThrottledError):
+                fetcher.fetch_emails(mailbox)
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_fetch_mailboxes(jmap_mailbox_factory):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.fetch_mailboxes`
+    in case of success.
+    """
+    with FakeJMAPServer([]) as server:
+        server.add_mailbox("Archive", server.add_mailbox("Projects"))
+        mailbox = jmap_mailbox_factory(server)
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = fetcher.fetch_mailboxes()
+
+    assert result == ["INBOX", "Projects", "Projects/Archive"]
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_restore_batch(jmap_mailbox_factory, fake_email_with_file):
+    """Tests :func:`core.utils.fetchers.BaseFetcher.restore_batch`
+    for :class:`core.utils.fetchers.JMAPFetcher`, importing all emails in a single call.
+    """
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        fake_email_with_file.mailbox = mailbox
+        fake_email_with_file.save(update_fields=["mailbox"])
+        with JMAPFetcher(mailbox.account) as fetcher:
+            result = list(
+                fetcher.restore_batch([fake_email_with_file, fake_email_with_file])
+            )
+
+    assert result == [(fake_email_with_file, None), (fake_email_with_file, None)]
+    assert server.method_calls == ["Mailbox/get", "Email/import"]
+    assert len(server.emails) == 2
+
+
+@pytest.mark.django_db
+def test_JMAPFetcher_restore_missing_mailbox(
+    jmap_mailbox_factory, fake_email_with_file
+):
+    """Tests :func:`core.utils.fetchers.JMAPFetcher.restore`
+    in case the mailbox does not exist on the server.
+    """
+    with FakeJMAPServer([]) as server:
+        mailbox = jmap_mailbox_factory(server)
+        fake_email_with_file.mailbox = baker.make(
+            Mailbox, account=mailbox.account, name="Missing"
+        )
+        fake_email_with_file.save(update_fields=["mailbox"])
+        with (
+            JMAPFetcher(mailbox.account) as fetcher,
+            pytest.raises(MailboxError),
+        ):
+            fetcher.restore(fake_email_with_file)
+
+    assert server.emails == {}
@@ -21,12 +21,13 @@
 import logging
 
 import pytest
+from constance.test import override_config
 from model_bakery import baker
 
-from core.constants import EmailProtocolChoices
-from core.models import Mailbox
-from core.utils.fetchers import POP3Fetcher
-from core.utils.fetchers.exceptions import MailAccountError
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Email, Mailbox
+from core.utils.fetchers import FetchingFilter, POP3Fetcher
+from core.utils.fetchers.exceptions import MailAccountError, MailHostThrottledError
 
 
 @pytest.fixture
@@ -50,6 +51,16 @@ def mock_POP3(mocker, faker):
     mock_POP3.return_value.list.return_value = b"+OK" + fake_response
     mock_POP3.return_value.list.return_value = (b"+OK", fake_response.split(), 123)
     mock_POP3.return_value.retr.return_value = (b"+OK", fake_response.split(), 123)
+    mock_POP3.return_value.top.return_value = (
+        b"+OK",
+        [b"Message-ID: <" + fake_response.replace(b" ", b".") + b">"],
+        123,
+    )
+    mock_POP3.return_value.uidl.return_value = (
+        b"+OK",
+        [b"%d uidl%d" % (number, number) for number in range(1, 4)],
+        123,
+    )
     mock_POP3.return_value.quit.return_value = b"+OK" + fake_response
     return mock_POP3
 
@@ -380,6 +391,22 @@ def test_POP3Fetcher_fetch_emails_success(mocker, pop3_mailbox, mock_logger, moc
     mock_logger.error.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_POP3Fetcher_stream_emails_lazy(pop3_mailbox, mock_logger, mock_POP3):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.stream_emails`
+    in case the emails are consumed one by one.
+    """
+    stream = POP3Fetcher(pop3_mailbox.account).stream_emails(pop3_mailbox)
+
+    mock_POP3.return_value.list.assert_not_called()
+
+    result = next(stream)
+
+    assert result == b"\n".join(mock_POP3.return_value.retr.return_value[1])
+    mock_POP3.return_value.list.assert_called_once_with()
+    mock_POP3.return_value.retr.assert_called_once_with(1)
+
+
 @pytest.mark.django_db
 def test_POP3Fetcher_fetch_emails_wrong_mailbox(pop3_mailbox, mock_logger):
     """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
@@ -492,6 +519,346 @@ def test_POP3Fetcher_fetch_emails_exception_ignored(
     mock_logger.exception.assert_called()
 
 
+@pytest.fixture
+def mock_POP3_maildrop(mock_POP3):
+    """Extends :func:`mock_POP3` to have three distinct messages on the server."""
+    mock_POP3.return_value.list.return_value = (
+        b"+OK",
+        [b"1 100", b"2 100", b"3 100"],
+        123,
+    )
+    mock_POP3.return_value.top.side_effect = lambda number, _lines: (
+        b"+OK",
+        [b"Message-ID: <message%d@test>" % number, b"X-Spam-Flag: NO"],
+        123,
+    )
+    mock_POP3.return_value.retr.side_effect = lambda number: (
+        b"+OK",
+        [b"Message-ID: <message%d@test>" % number, b"", b"mail %d" % number],
+        123,
+    )
+    return mock_POP3
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_skips_known(
+    mocker, pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case some messages are already archived.
+    """
+    baker.make(Email, mailbox=pop3_mailbox, message_id="<message2@test>")
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 1", b"mail 3"]
+    mock_POP3_maildrop.return_value.top.assert_has_calls(
+        [mocker.call(1, 0), mocker.call(2, 0), mocker.call(3, 0)]
+    )
+    mock_POP3_maildrop.return_value.retr.assert_has_calls(
+        [mocker.call(1), mocker.call(3)]
+    )
+    assert mock_POP3_maildrop.return_value.retr.call_count == 2
+    assert pop3_mailbox.fetched_uidls == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("throw_out_spam, expected_retr_count", [(True, 2), (False, 3)])
+def test_POP3Fetcher_fetch_emails_skips_spam(
+    pop3_mailbox,
+    mock_logger,
+    mock_POP3_maildrop,
+    throw_out_spam,
+    expected_retr_count,
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case a message is flagged as spam.
+    """
+    mock_POP3_maildrop.return_value.top.side_effect = lambda number, _lines: (
+        b"+OK",
+        [b"X-Spam-Flag: YES" if number == 1 else b"X-Spam-Flag: NO"],
+        123,
+    )
+
+    with override_config(THROW_OUT_SPAM=throw_out_spam):
+        result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert len(result) == expected_retr_count
+    assert mock_POP3_maildrop.return_value.retr.call_count == expected_retr_count
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_skips_oversized(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case a message is larger than the maximum datasize.
+    """
+    mock_POP3_maildrop.return_value.list.return_value = (
+        b"+OK",
+        [b"1 100", b"2 1000", b"3 100"],
+        123,
+    )
+
+    with override_config(FETCH_MAX_EMAIL_DATASIZE=500):
+        result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 1", b"mail 3"]
+    assert mock_POP3_maildrop.return_value.retr.call_count == 2
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+@override_config(FETCH_SPOOL_EMAIL_DATASIZE=500)
+def test_POP3Fetcher_stream_emails_spools_large(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.stream_emails`
+    in case a message is larger than the spooling datasize.
+    """
+    mock_POP3_maildrop.return_value.list.return_value = (
+        b"+OK",
+        [b"1 100", b"2 1000", b"3 100"],
+        123,
+    )
+    mock_POP3_maildrop.return_value._getresp.return_value = b"+OK"
+    mock_POP3_maildrop.return_value._getline.side_effect = [
+        (b"Message-ID: <message2@test>", 29),
+        (b"", 2),
+        (b"..mail 2", 10),
+        (b".", 3),
+    ]
+
+    result = [
+        mail if isinstance(mail, bytes) else mail.read()
+        for mail in POP3Fetcher(pop3_mailbox.account).stream_emails(pop3_mailbox)
+    ]
+
+    assert result[1] == b"Message-ID: <message2@test>\n\n.mail 2\n"
+    assert mock_POP3_maildrop.return_value.retr.call_count == 2
+    mock_POP3_maildrop.return_value._putcmd.assert_called_once_with("RETR 2")
+    mock_logger.warning.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_top_error(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case the headers of the messages can't be retrieved.
+    """
+    baker.make(Email, mailbox=pop3_mailbox, message_id="<message2@test>")
+    mock_POP3_maildrop.return_value.top.side_effect = AssertionError
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert len(result) == 3
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental(
+    mocker, pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of the incremental criterion with messages fetched before.
+    """
+    pop3_mailbox.fetched_uidls = ["uidl1", "uidl9"]
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 2", b"mail 3"]
+    mock_POP3_maildrop.return_value.uidl.assert_called_once_with()
+    mock_POP3_maildrop.return_value.top.assert_has_calls(
+        [mocker.call(2, 0), mocker.call(3, 0)]
+    )
+    assert mock_POP3_maildrop.return_value.top.call_count == 2
+    assert pop3_mailbox.fetched_uidls == ["uidl1", "uidl2", "uidl3"]
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental_skips_known(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of the incremental criterion with messages that are already archived.
+    """
+    baker.make(Email, mailbox=pop3_mailbox, message_id="<message2@test>")
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert len(result) == 2
+    assert pop3_mailbox.fetched_uidls == ["uidl1", "uidl2", "uidl3"]
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental_failed_message(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of the incremental criterion with a message that fails to be retrieved.
+    """
+    retr_side_effect = mock_POP3_maildrop.return_value.retr.side_effect
+    mock_POP3_maildrop.return_value.retr.side_effect = lambda number: (
+        b"-ERR" if number == 2 else retr_side_effect(number)
+    )
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert len(result) == 2
+    assert pop3_mailbox.fetched_uidls == ["uidl1", "uidl3"]
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_throttled(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case the mailserver reports throttling while a message is retrieved.
+    """
+    retr_side_effect = mock_POP3_maildrop.return_value.retr.side_effect
+    mock_POP3_maildrop.return_value.retr.side_effect = lambda number: (
+        b"-ERR Too many commands" if number == 2 else retr_side_effect(number)
+    )
+
+    with pytest.raises(MailHostThrottledError, match="Too many commands"):
+        POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert mock_POP3_maildrop.return_value.retr.call_count == 2
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental_filter(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of the incremental criterion with a fetching filter,
+    the messages that are filtered out must not be recorded as fetched.
+    """
+    baker.make(Email, mailbox=pop3_mailbox, message_id="<message3@test>")
+    mock_POP3_maildrop.return_value.top.side_effect = lambda number, _lines: (
+        b"+OK",
+        [
+            b"Message-ID: <message%d@test>" % number,
+            b"From: bob@test" if number == 2 else b"From: alice@test",
+        ],
+        123,
+    )
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox,
+        EmailFetchingCriterionChoices.INCREMENTAL,
+        FetchingFilter({"from": "alice"}),
+    )
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 1"]
+    assert pop3_mailbox.fetched_uidls == ["uidl1", "uidl3"]
+    assert pop3_mailbox.fetch_checkpoint == ""
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental_uidl_error(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case of the incremental criterion on a server without UIDL support.
+    """
+    pop3_mailbox.fetched_uidls = ["uidl1"]
+    mock_POP3_maildrop.return_value.uidl.return_value = b"-ERR"
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert len(result) == 3
+    assert pop3_mailbox.fetched_uidls == ["uidl1"]
+    mock_logger.warning.assert_called()
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_stream_emails_incremental_closed_early(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.stream_emails`
+    in case of the incremental criterion when the stream is closed early.
+    """
+    stream = POP3Fetcher(pop3_mailbox.account).stream_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    next(stream)
+    next(stream)
+    stream.close()
+
+    assert pop3_mailbox.fetched_uidls == ["uidl1"]
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_resume_checkpoint(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case an interrupted run is resumed.
+    """
+    pop3_mailbox.is_fetch_complete = False
+    pop3_mailbox.fetch_checkpoint = "uidl1"
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 2", b"mail 3"]
+    assert mock_POP3_maildrop.return_value.top.call_count == 2
+    assert pop3_mailbox.fetch_checkpoint == "uidl3"
+    assert pop3_mailbox.fetched_uidls == []
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_resume_checkpoint_uidl_error(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case an interrupted run is resumed on a server without UIDL support.
+    The message numbers may have shifted, so the run must restart from the beginning.
+    """
+    pop3_mailbox.is_fetch_complete = False
+    pop3_mailbox.fetch_checkpoint = "1"
+    mock_POP3_maildrop.return_value.uidl.return_value = b"-ERR"
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(pop3_mailbox)
+
+    assert [mail.splitlines()[-1] for mail in result] == [
+        b"mail 1",
+        b"mail 2",
+        b"mail 3",
+    ]
+    assert pop3_mailbox.fetch_checkpoint == "1"
+
+
+@pytest.mark.django_db
+def test_POP3Fetcher_fetch_emails_incremental_resume_checkpoint(
+    pop3_mailbox, mock_logger, mock_POP3_maildrop
+):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_emails`
+    in case an interrupted incremental run is resumed.
+    """
+    pop3_mailbox.is_fetch_complete = False
+    pop3_mailbox.fetch_checkpoint = "uidl2"
+
+    result = POP3Fetcher(pop3_mailbox.account).fetch_emails(
+        pop3_mailbox, EmailFetchingCriterionChoices.INCREMENTAL
+    )
+
+    assert [mail.splitlines()[-1] for mail in result] == [b"mail 3"]
+    assert pop3_mailbox.fetch_checkpoint == "uidl3"
+    assert pop3_mailbox.fetched_uidls == ["uidl1", "uidl2", "uidl3"]
+
+
 @pytest.mark.django_db
 def test_POP3Fetcher_fetch_mailboxes(pop3_mailbox):
     """Tests :func:`core.utils.fetchers.POP3Fetcher.fetch_mailboxes`."""
@@ -519,6 +886,13 @@ def test_POP3Fetcher_restore_wrong_mailbox(
         POP3Fetcher(pop3_mailbox.account).restore(fake_email)
 
 
+@pytest.mark.django_db
+def test_POP3Fetcher_restore_batch(fake_email_with_file, pop3_mailbox):
+    """Tests :func:`core.utils.fetchers.POP3Fetcher.restore_batch`."""
+    with pytest.raises(NotImplementedError):
+        list(POP3Fetcher(pop3_mailbox.account).restore_batch([fake_email_with_file]))
+
+
 @pytest.mark.django_db
 def test_POP3Fetcher_close_success(pop3_mailbox, mock_logger, mock_POP3):
     """Tests :func:`core.utils.fetchers.POP3Fetcher.close`
@@ -0,0 +1,233 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for the :class:`core.utils.AsyncFetchEngine` class.
+
+The engine is tested against the stand-in servers from :mod:`test.fake_servers`.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from constance.test import override_config
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Email
+from core.utils.AsyncFetchEngine import AsyncFetchEngine
+from core.utils.fetchers.exceptions import MailAccountError, MailboxError
+from test.fake_servers import FakeIMAP4Server, generate_corpus
+
+
+@pytest.fixture(autouse=True)
+def mock_logger(mocker):
+    """The mocked :attr:`core.utils.AsyncFetchEngine.logger`."""
+    return mocker.patch("core.utils.AsyncFetchEngine.logger", autospec=True)
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_success(server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case of success with several servers.
+    """
+    corpus = generate_corpus(8)
+
+    with (
+        FakeIMAP4Server(corpus[:5], latency=0.001) as first_server,
+        FakeIMAP4Server(corpus[5:], latency=0.001) as second_server,
+    ):
+        first_mailbox = server_mailbox_factory(first_server)
+        second_mailbox = server_mailbox_factory(second_server)
+        result = AsyncFetchEngine().run(
+            [
+                (first_mailbox, EmailFetchingCriterionChoices.ALL),
+                (second_mailbox, EmailFetchingCriterionChoices.INCREMENTAL),
+            ]
+        )
+
+    assert result == [None, None]
+    assert first_mailbox.emails.count() == 5
+    assert second_mailbox.emails.count() == 3
+    second_mailbox.refresh_from_db()
+    assert second_mailbox.highest_uid == 3
+    assert second_mailbox.uid_validity == 1
+    assert second_mailbox.is_healthy is True
+    assert second_mailbox.fetch_run_id is not None
+    assert second_mailbox.fetch_progress == 3
+    assert second_mailbox.fetch_checkpoint == "3"
+    assert second_mailbox.is_fetch_complete is True
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_failure(server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case one of the mailboxes fails to be fetched.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        other_mailbox = server_mailbox_factory(server)
+        other_mailbox.name = "Missing"
+        result = AsyncFetchEngine().run(
+            [
+                (mailbox, EmailFetchingCriterionChoices.ALL),
+                (other_mailbox, EmailFetchingCriterionChoices.ALL),
+            ]
+        )
+
+    assert result[0] is None
+    assert isinstance(result[1], MailboxError)
+    assert mailbox.emails.count() == 4
+    other_mailbox.refresh_from_db()
+    assert other_mailbox.is_healthy is False
+    assert other_mailbox.is_fetch_complete is False
+    assert other_mailbox.account.is_healthy is not False
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_duplicates(mocker, server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case the mailbox already contains the fetched emails.
+    """
+    corpus = generate_corpus(4)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        AsyncFetchEngine().run([(mailbox, EmailFetchingCriterionChoices.ALL)])
+        # as if the mailbox changed since
+        mailbox.sync_state = ""
+        spy_is_skipped_batch = mocker.spy(Email, "is_skipped_batch")
+        result = AsyncFetchEngine().run([(mailbox, EmailFetchingCriterionChoices.ALL)])
+
+    assert result == [None]
+    assert mailbox.emails.count() == 4
+    spy_is_skipped_batch.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_account_failure(server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case the connection to an account fails.
+    """
+    with FakeIMAP4Server([]) as server:
+        mailbox = server_mailbox_factory(server)
+    # the server is shut down now
+
+    result = AsyncFetchEngine().run([(mailbox, EmailFetchingCriterionChoices.ALL)])
+
+    assert isinstance(result[0], MailAccountError)
+    mailbox.account.refresh_from_db()
+    assert mailbox.account.is_healthy is False
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_host_concurrency(mocker, server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case of many mailboxes on the same server.
+    """
+    spy_Semaphore = mocker.spy(asyncio, "Semaphore")
+    corpus = generate_corpus(2)
+
+    with (
+        override_config(ASYNC_FETCH_HOST_CONCURRENCY=2),
+        FakeIMAP4Server(corpus) as server,
+    ):
+        mailboxes = [server_mailbox_factory(server) for _ in range(5)]
+        result = AsyncFetchEngine().run(
+            [(mailbox, EmailFetchingCriterionChoices.ALL) for mailbox in mailboxes]
+        )
+
+    assert result == [None] * 5
+    spy_Semaphore.assert_called_once_with(2)
+    for mailbox in mailboxes:
+        assert mailbox.emails.count() == 2
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_save_error(mocker, server_mailbox_factory):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case saving a fetched email fails.
+    """
+    mocker.patch(
+        "core.utils.AsyncFetchEngine.IngestionPipeline.save_batch",
+        side_effect=RuntimeError,
+    )
+    corpus = generate_corpus(300)
+
+    with FakeIMAP4Server(corpus) as server:
+        mailbox = server_mailbox_factory(server)
+        with pytest.raises(RuntimeError):
+            AsyncFetchEngine().run([(mailbox, EmailFetchingCriterionChoices.ALL)])
+
+    assert not any(
+        thread.name == "async-fetch-engine" for thread in threading.enumerate()
+    )
+    mailbox.refresh_from_db()
+    assert mailbox.highest_uid is None
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_unsupported_protocol(fake_mailbox):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case of a mailbox with a protocol that is not supported.
+    """
+    fake_mailbox.account.protocol = EmailProtocolChoices.POP3
+
+    with pytest.raises(ValueError, match="not supported"):
+        AsyncFetchEngine().run([(fake_mailbox, EmailFetchingCriterionChoices.ALL)])
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_run_bad_criterion(fake_mailbox):
+    """Tests :func:`core.utils.AsyncFetchEngine.run`
+    in case of a criterion that is not available.
+    """
+    fake_mailbox.account.protocol = EmailProtocolChoices.IMAP
+
+    with pytest.raises(ValueError, match="not available"):
+        AsyncFetchEngine().run([(fake_mailbox, "NOT A CRITERION")])
+
+
+@pytest.mark.parametrize(
+    "protocol, expected_result",
+    [
+        (EmailProtocolChoices.IMAP, True),
+        (EmailProtocolChoices.IMAP4_SSL, True),
+        (EmailProtocolChoices.POP3, False),
+        (EmailProtocolChoices.EXCHANGE, False),
+    ],
+)
+@pytest.mark.django_db
+def test_AsyncFetchEngine_supports(fake_mailbox, protocol, expected_result):
+    """Tests :func:`core.utils.AsyncFetchEngine.supports`."""
+    fake_mailbox.account.protocol = protocol
+
+    assert AsyncFetchEngine.supports(fake_mailbox) is expected_result
+
+
+@pytest.mark.django_db
+def test_AsyncFetchEngine_supports_compression(fake_mailbox):
+    """Tests :func:`core.utils.AsyncFetchEngine.supports`
+    in case the account uses compression.
+    """
+    fake_mailbox.account.protocol = EmailProtocolChoices.IMAP
+    fake_mailbox.account.use_compression = True
+
+    assert AsyncFetchEngine.supports(fake_mailbox) is False
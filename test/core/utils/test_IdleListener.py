@@ -0,0 +1,195 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Test module for the :class:`core.utils.IdleListener` class."""
+
+import time
+
+import pytest
+from django.db import OperationalError
+from model_bakery import baker
+
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
+from core.models import Daemon
+from core.utils.fetchers import IMAP4Fetcher
+from core.utils.fetchers.exceptions import MailAccountError
+from core.utils.IdleListener import IdleListener
+from test.fake_servers import FakeIMAP4Server, generate_corpus
+
+
+@pytest.fixture(autouse=True)
+def mock_logger(mocker):
+    """The mocked :attr:`core.utils.IdleListener.logger`."""
+    return mocker.patch("core.utils.IdleListener.logger", autospec=True)
+
+
+@pytest.fixture
+def mock_fetch_emails(mocker):
+    """Patches the :func:`core.tasks.fetch_emails` task run by the listener."""
+    return mocker.patch("core.utils.IdleListener.fetch_emails", autospec=True)
+
+
+def wait_until(condition, timeout=5):
+    """Waits until the condition is met or the timeout has passed."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.django_db
+def test_IdleListener_stand_in_server(
+    server_mailbox_factory, mock_fetch_emails, mocker
+):
+    """Tests :class:`core.utils.IdleListener`
+    against a stand-in server receiving a new message.
+    """
+    mocker.patch("core.models.MailHostThrottle.MailHostThrottle.acquire")
+    corpus = generate_corpus(3)
+    with FakeIMAP4Server(corpus[:2]) as server:
+        daemon = baker.make(
+            Daemon,
+            mailbox=server_mailbox_factory(server),
+            fetching_criterion=EmailFetchingCriterionChoices.INCREMENTAL,
+        )
+        listener = IdleListener(daemon, idle_timeout=1)
+        listener.start()
+
+        assert wait_until(lambda: mock_fetch_emails.delay.call_count == 1)
+        assert wait_until(lambda: "IDLE" in server.commands)
+        server.add_message(corpus[2])
+        assert wait_until(lambda: mock_fetch_emails.delay.call_count == 2)
+
+        listener.stop()
+        listener.join(timeout=10)
+
+    assert not listener.is_alive()
+    mock_fetch_emails.delay.assert_called_with(str(daemon.uuid))
+
+
+@pytest.mark.django_db
+def test_IdleListener_run_reconnect(mocker, fake_daemon, mock_logger):
+    """Tests :func:`core.utils.IdleListener.run`
+    in case the connection fails.
+    """
+    listener = IdleListener(fake_daemon)
+    mocker.patch.object(listener, "RETRY_DELAY", 0)
+
+    def fail_once_then_stop():
+        if mock_listen.call_count == 1:
+            raise MailAccountError(Exception())
+        listener.stop()
+
+    mock_listen = mocker.patch.object(
+        listener, "listen", side_effect=fail_once_then_stop
+    )
+
+    listener.run()
+
+    assert mock_listen.call_count == 2
+    mock_logger.exception.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IdleListener_run_database_error(mocker, fake_daemon, mock_logger):
+    """Tests :func:`core.utils.IdleListener.run`
+    in case the database fails.
+    """
+    listener = IdleListener(fake_daemon)
+    mocker.patch.object(listener, "RETRY_DELAY", 0)
+
+    def fail_once_then_stop():
+        if mock_listen.call_count == 1:
+            raise OperationalError
+        listener.stop()
+
+    mock_listen = mocker.patch.object(
+        listener, "listen", side_effect=fail_once_then_stop
+    )
+
+    listener.run()
+
+    assert mock_listen.call_count == 2
+    mock_logger.exception.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IdleListener_listen_no_imap(
+    fake_daemon, mock_fetch_emails, mock_logger, mocker
+):
+    """Tests :func:`core.utils.IdleListener.listen`
+    in case the account of the daemon does not use IMAP.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.POP3
+    mock_get_fetcher = mocker.patch(
+        "core.models.Account.Account.get_fetcher", autospec=True
+    )
+    mock_get_fetcher.return_value.__enter__.return_value = mocker.sentinel.fetcher
+    listener = IdleListener(fake_daemon)
+
+    listener.listen()
+
+    assert listener.stop_event.is_set()
+    mock_fetch_emails.delay.assert_not_called()
+    mock_logger.error.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IdleListener_listen_unpooled(fake_daemon, mock_fetch_emails, mocker):
+    """Tests :func:`core.utils.IdleListener.listen`
+    in case of success, the listening connection must not be pooled.
+    """
+    fake_daemon.mailbox.account.protocol = EmailProtocolChoices.IMAP
+    listener = IdleListener(fake_daemon)
+    mock_fetcher = mocker.Mock(spec=IMAP4Fetcher)
+    mock_fetcher.wait_for_new_emails.side_effect = lambda *_args: listener.stop()
+    mock_get_fetcher = mocker.patch(
+        "core.models.Account.Account.get_fetcher", autospec=True
+    )
+    mock_get_fetcher.return_value.__enter__.return_value = mock_fetcher
+
+    listener.listen()
+
+    mock_get_fetcher.assert_called_once_with(fake_daemon.mailbox.account, pooled=False)
+    mock_fetch_emails.delay.assert_called_once_with(str(fake_daemon.uuid))
+
+
+@pytest.mark.django_db
+def test_IdleListener_fetch(fake_daemon, mock_fetch_emails, mock_logger):
+    """Tests :func:`core.utils.IdleListener.fetch`
+    in case of success, the fetching task must be queued instead of run in the listener.
+    """
+    IdleListener(fake_daemon).fetch()
+
+    mock_fetch_emails.assert_not_called()
+    mock_fetch_emails.delay.assert_called_once_with(str(fake_daemon.uuid))
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IdleListener_fetch_error(fake_daemon, mock_fetch_emails, mock_logger):
+    """Tests :func:`core.utils.IdleListener.fetch`
+    in case queuing the fetching task fails.
+    """
+    mock_fetch_emails.delay.side_effect = OSError
+
+    IdleListener(fake_daemon).fetch()
+
+    mock_fetch_emails.delay.assert_called_once_with(str(fake_daemon.uuid))
+    mock_logger.exception.assert_called_once()
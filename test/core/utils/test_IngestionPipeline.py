@@ -0,0 +1,389 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Test module for the :class:`core.utils.IngestionPipeline` class."""
+
+import os
+import signal
+from tempfile import TemporaryFile
+
+import pytest
+from constance.test import override_config
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from core.models import Correspondent, Email, Mailbox
+from core.utils.IngestionPipeline import IngestionPipeline
+from core.utils.mail_parsing import parse_email
+from test.fake_servers import generate_corpus
+
+
+@pytest.fixture(autouse=True)
+def inline_ingestion_parsing():
+    """Lets the tests in this module start process pools."""
+
+
+@pytest.fixture(autouse=True)
+def mock_logger(mocker):
+    """The mocked :attr:`core.utils.IngestionPipeline.logger`."""
+    return mocker.patch("core.utils.IngestionPipeline.logger", autospec=True)
+
+
+@pytest.fixture
+def spy_Email_save_parsed_email(mocker):
+    """Spies on :func:`core.models.Email.Email.save_parsed_email`."""
+    return mocker.spy(Email, "save_parsed_email")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("workers", [1, 2])
+def test_IngestionPipeline_ingest_success(
+    fake_mailbox, spy_Email_save_parsed_email, workers
+):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of success with and without a process pool.
+    """
+    corpus = generate_corpus(7, attachment_count=1)
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=workers, INGESTION_BATCH_SIZE=3),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        result = list(pipeline.ingest(corpus))
+
+    assert len(result) == len(corpus)
+    assert all(isinstance(email, Email) for email in result)
+    assert [email.datasize for email in result] == [len(data) for data in corpus]
+    assert fake_mailbox.emails.count() == len(corpus)
+    for email in result:
+        assert email.attachments.count() == 1
+    assert [call.args[0] for call in spy_Email_save_parsed_email.call_args_list] == [
+        parse_email(data, [""], [""]) for data in corpus
+    ]
+    assert pipeline._executor is None
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_batches(mocker, fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of more emails than the batch size.
+    """
+    corpus = generate_corpus(5)
+    requested_emails = []
+
+    def stream_emails():
+        for email_data in corpus:
+            requested_emails.append(email_data)
+            yield email_data
+
+    spy_save_batch = mocker.spy(IngestionPipeline, "save_batch")
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=2),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        ingestion = pipeline.ingest(stream_emails())
+        next(ingestion)
+        assert requested_emails == corpus[:2]
+        result = [None, *ingestion]
+
+    assert len(result) == len(corpus)
+    assert [len(call.args[1]) for call in spy_save_batch.call_args_list] == [2, 2, 1]
+    assert fake_mailbox.emails.count() == len(corpus)
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_spooled_file(
+    mocker, fake_mailbox, spy_Email_save_parsed_email
+):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of an email spooled to a file.
+    """
+    corpus = generate_corpus(3)
+    spy_create_from_email_bytes = mocker.spy(Email, "create_from_email_bytes")
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=10),
+        TemporaryFile() as spool_file,
+    ):
+        spool_file.write(corpus[1])
+        spool_file.seek(0)
+        with IngestionPipeline(fake_mailbox) as pipeline:
+            ingestion = pipeline.ingest([corpus[0], spool_file, corpus[2]])
+            first_email = next(ingestion)
+            # the file is saved right away, after the pending batch
+            assert spy_create_from_email_bytes.call_count == 1
+            second_email = next(ingestion)
+            third_email = next(ingestion)
+
+    assert [first_email.datasize, second_email.datasize, third_email.datasize] == [
+        len(data) for data in corpus
+    ]
+    assert spy_Email_save_parsed_email.call_count == len(corpus)
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_stream_error(fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case requesting the next email fails.
+    """
+    corpus = generate_corpus(3)
+
+    def stream_emails():
+        yield from corpus
+        raise RuntimeError
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=10),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        results = pipeline.ingest(stream_emails())
+        result = [next(results) for _ in corpus]
+        with pytest.raises(RuntimeError):
+            next(results)
+
+    assert all(result)
+    assert fake_mailbox.emails.count() == len(corpus)
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_parse_error(mocker, fake_mailbox, mock_logger):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case parsing an email fails.
+    """
+    corpus = generate_corpus(3)
+    mocker.patch(
+        "core.utils.IngestionPipeline.parse_email",
+        autospec=True,
+        side_effect=[parse_email(corpus[0]), ValueError, parse_email(corpus[2])],
+    )
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        result = list(pipeline.ingest(corpus))
+
+    assert result[1] is None
+    assert fake_mailbox.emails.count() == 2
+    mock_logger.exception.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_duplicate(fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of an email that is already in the db.
+    """
+    corpus = generate_corpus(2)
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        list(pipeline.ingest(corpus[:1]))
+        result = list(pipeline.ingest(corpus))
+
+    assert result[0] is None
+    assert isinstance(result[1], Email)
+    assert fake_mailbox.emails.count() == 2
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_add_flush(fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.add`
+    and :func:`core.utils.IngestionPipeline.IngestionPipeline.flush`.
+    """
+    corpus = generate_corpus(3)
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=2),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        first_result = pipeline.add(corpus[0])
+        second_result = pipeline.add(corpus[1])
+        third_result = pipeline.add(corpus[2])
+        flush_result = pipeline.flush()
+        empty_flush_result = pipeline.flush()
+
+    assert first_result == []
+    assert len(second_result) == 2
+    assert third_result == []
+    assert len(flush_result) == 1
+    assert empty_flush_result == []
+    assert fake_mailbox.emails.count() == len(corpus)
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_shared_pipeline(fake_mailbox):
+    """Tests :class:`core.utils.IngestionPipeline.IngestionPipeline`
+    in case of a pipeline sharing the process pool of another one.
+    """
+    other_mailbox = baker.make(Mailbox, account=fake_mailbox.account)
+    corpus = generate_corpus(2)
+
+    with override_config(INGESTION_PARSE_WORKERS=2):
+        pipeline = IngestionPipeline(fake_mailbox)
+        shared_pipeline = IngestionPipeline(other_mailbox, pipeline)
+        list(pipeline.ingest(corpus[:1]))
+        list(shared_pipeline.ingest(corpus[1:]))
+        executor = pipeline._executor
+        shared_pipeline.close()
+        assert pipeline._executor is executor
+        pipeline.close()
+
+    assert executor is not None
+    assert shared_pipeline._executor is None
+    assert shared_pipeline.correspondent_cache is pipeline.correspondent_cache
+    assert fake_mailbox.emails.count() == 1
+    assert other_mailbox.emails.count() == 1
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_broken_pool(fake_mailbox, mock_logger):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case a worker of the process pool is killed.
+    """
+    corpus = generate_corpus(4)
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=2, INGESTION_BATCH_SIZE=10),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        list(pipeline.ingest(corpus[:1]))
+        broken_executor = pipeline._executor
+        for process in broken_executor._processes.values():
+            os.kill(process.pid, signal.SIGKILL)
+
+        broken_result = list(pipeline.ingest(corpus[1:3]))
+        result = list(pipeline.ingest(corpus[3:]))
+        executor = pipeline._executor
+
+    assert all(isinstance(email, Email) for email in broken_result)
+    assert isinstance(result[0], Email)
+    assert executor is not None
+    assert executor is not broken_executor
+    assert fake_mailbox.emails.count() == len(corpus)
+    mock_logger.warning.assert_called_once()
+    mock_logger.exception.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_close(fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.close`."""
+    with override_config(INGESTION_PARSE_WORKERS=2):
+        pipeline = IngestionPipeline(fake_mailbox)
+        future = pipeline.submit(generate_corpus(1)[0])
+        executor = pipeline._executor
+
+        pipeline.close()
+
+    assert future.done()
+    assert executor is not None
+    assert pipeline._executor is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "workers, is_daemon, expected_is_parallel",
+    [
+        (4, False, True),
+        (2, False, True),
+        (1, False, False),
+        (0, False, False),
+        (4, True, False),
+    ],
+)
+def test_IngestionPipeline_is_parallel(
+    mocker, fake_mailbox, workers, is_daemon, expected_is_parallel
+):
+    """Tests :attr:`core.utils.IngestionPipeline.IngestionPipeline.is_parallel`."""
+    mocker.patch(
+        "core.utils.IngestionPipeline.multiprocessing.current_process"
+    ).return_value.daemon = is_daemon
+
+    with override_config(INGESTION_PARSE_WORKERS=workers):
+        pipeline = IngestionPipeline(fake_mailbox)
+
+    assert pipeline.is_parallel is expected_is_parallel
+    if not expected_is_parallel:
+        assert pipeline.submit(b"") is None
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_duplicate_in_batch(
+    mocker, fake_mailbox, spy_Email_save_parsed_email
+):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of an email that occurs twice in the same batch.
+    """
+    corpus = generate_corpus(2)
+    spy_parse_email = mocker.spy(IngestionPipeline, "submit")
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=10),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        result = list(pipeline.ingest([corpus[0], corpus[1], corpus[0]]))
+
+    assert isinstance(result[0], Email)
+    assert isinstance(result[1], Email)
+    assert result[2] is None
+    assert spy_parse_email.call_count == 2
+    assert spy_Email_save_parsed_email.call_count == 2
+    assert fake_mailbox.emails.count() == 2
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_save_batch_single_duplicate_query(fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.save_batch`
+    in case all emails of the batch are already in the db.
+    """
+    corpus = generate_corpus(5)
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        pipeline.save_batch(corpus)
+        with CaptureQueriesContext(connection) as queries:
+            result = pipeline.save_batch(corpus)
+
+    assert result == [None] * len(corpus)
+    assert fake_mailbox.emails.count() == len(corpus)
+    assert len([query for query in queries if 'FROM "emails"' in query["sql"]]) == 1
+
+
+@pytest.mark.django_db
+def test_IngestionPipeline_ingest_correspondent_cache(mocker, fake_mailbox):
+    """Tests :func:`core.utils.IngestionPipeline.IngestionPipeline.ingest`
+    in case of correspondents that are mentioned in several emails.
+    """
+    corpus = generate_corpus(20)
+    spy_bulk_create = mocker.spy(Correspondent.objects, "bulk_create")
+
+    with (
+        override_config(INGESTION_PARSE_WORKERS=1, INGESTION_BATCH_SIZE=5),
+        IngestionPipeline(fake_mailbox) as pipeline,
+    ):
+        list(pipeline.ingest(corpus))
+
+    # 10 senders and 1 recipient
+    assert Correspondent.objects.count() == 11
+    assert len(pipeline.correspondent_cache) == 11
+    assert spy_bulk_create.call_count == 10
@@ -19,6 +19,7 @@
 """Test module for :mod:`core.utils.mail_parsing`."""
 
 import email
+import pickle
 from datetime import UTC, datetime
 from email import policy
 from email.message import EmailMessage
@@ -170,6 +171,41 @@ def test_get_header_failure(fake_single_header):
         mail_parsing.get_header(None, fake_single_header[0])
 
 
+def test_get_headers(
+    email_message, fake_single_header, fake_unstripped_header, fake_multi_header
+):
+    """Tests :func:`core.utils.mail_parsing.get_headers`."""
+    result = mail_parsing.get_headers(email_message)
+
+    assert result == {
+        header_name.lower(): mail_parsing.get_header(email_message, header_name)
+        for header_name in email_message
+    }
+    assert list(result) == list(
+        dict.fromkeys(header_name.lower() for header_name in email_message)
+    )
+
+
+def test_get_headers_joinparam(email_message, fake_multi_header):
+    """Tests :func:`core.utils.mail_parsing.get_headers`
+    in case a joining_string is given.
+    """
+    result = mail_parsing.get_headers(email_message, joining_string="test")
+
+    assert result[fake_multi_header[0].lower()] == "test".join(
+        [header.strip() for header in fake_multi_header[1]]
+    )
+
+
+def test_get_headers_empty():
+    """Tests :func:`core.utils.mail_parsing.get_headers`
+    in case the message has no headers.
+    """
+    result = mail_parsing.get_headers(EmailMessage())
+
+    assert result == {}
+
+
 def test_parse_datetime_header_success(faker, mock_logger):
     """Tests :func:`core.utils.mail_parsing.parse_datetime_header`
     in case of success.
@@ -282,6 +318,164 @@ def test_get_bodytexts(
     assert result.get("html", "") == expected_email_features["html_bodytext"]
 
 
+@pytest.mark.parametrize(
+    "test_email_path, expected_email_features, expected_correspondents_features,expected_attachments_features",
+    TEST_EMAIL_PARAMETERS,
+)
+def test_parse_email(
+    test_email_path,
+    expected_email_features,
+    expected_correspondents_features,
+    expected_attachments_features,
+):
+    """Tests :func:`core.utils.mail_parsing.parse_email` on test-email data."""
+    with open(test_email_path, "br") as test_email_file:
+        test_email_bytes = test_email_file.read()
+
+    result = mail_parsing.parse_email(test_email_bytes)
+
+    assert result.message_id == expected_email_features["message_id"]
+    assert len(result.headers) == expected_email_features["header_count"]
+    assert (
+        result.bodytexts.get("plain", "") == expected_email_features["plain_bodytext"]
+    )
+    assert result.bodytexts.get("html", "") == expected_email_features["html_bodytext"]
+    assert result.datasize == len(test_email_bytes)
+    assert result.references == expected_email_features["references"]
+    assert {
+        attachment.file_name: {
+            "content_maintype": attachment.content_maintype,
+            "content_subtype": attachment.content_subtype,
+            "content_disposition": attachment.content_disposition,
+            "content_id": attachment.content_id,
+        }
+        for attachment in result.attachments
+    } == expected_attachments_features
+    assert {
+        mention: {address for _, address in correspondent_tuples}
+        for mention, correspondent_tuples in result.correspondents.items()
+    } == {
+        mention: set(correspondents)
+        for mention, correspondents in expected_correspondents_features.items()
+    }
+    unpickled_result = pickle.loads(  # noqa: S301 ; the data is pickled right here
+        pickle.dumps(result)
+    )
+
+    assert unpickled_result == result
+
+
+def test_parse_email_spooled_file():
+    """Tests :func:`core.utils.mail_parsing.parse_email`
+    in case of an email spooled to a file.
+    """
+    with open(TEST_EMAIL_PARAMETERS[0][0], "br") as test_email_file:
+        test_email_bytes = test_email_file.read()
+        test_email_file.read(10)
+
+        result = mail_parsing.parse_email(test_email_file)
+
+    expected_result = mail_parsing.parse_email(test_email_bytes)
+    assert result.message_id == expected_result.message_id
+    assert result.headers == expected_result.headers
+    assert result.datasize == expected_result.datasize
+    assert result.correspondents == expected_result.correspondents
+    assert len(result.attachments) == len(expected_result.attachments)
+
+
+@pytest.mark.parametrize(
+    "test_email_path, expected_email_features, expected_correspondents_features,expected_attachments_features",
+    TEST_EMAIL_PARAMETERS,
+)
+def test_get_bodytexts_and_attachment_parts(
+    test_email_path,
+    expected_email_features,
+    expected_correspondents_features,
+    expected_attachments_features,
+):
+    """Tests :func:`core.utils.mail_parsing.get_bodytexts_and_attachment_parts`
+    on test-email data.
+    """
+    with open(test_email_path, "br") as test_email_file:
+        test_email_message = email.message_from_bytes(
+            test_email_file.read(), policy=policy.default
+        )
+
+    bodytexts, attachments = mail_parsing.get_bodytexts_and_attachment_parts(
+        test_email_message
+    )
+
+    assert bodytexts == mail_parsing.get_bodytexts(test_email_message)
+    assert bodytexts.get("plain", "") == expected_email_features["plain_bodytext"]
+    assert bodytexts.get("html", "") == expected_email_features["html_bodytext"]
+    assert {attachment.file_name for attachment in attachments} == set(
+        expected_attachments_features
+    )
+
+
+def test_message_from_data_headersonly():
+    """Tests :func:`core.utils.mail_parsing.message_from_data`
+    in case only the headers are parsed.
+    """
+    with open(TEST_EMAIL_PARAMETERS[1][0], "br") as test_email_file:
+        test_email_bytes = test_email_file.read()
+
+    result = mail_parsing.message_from_data(test_email_bytes, headersonly=True)
+
+    assert dict(result.items()) == dict(
+        mail_parsing.message_from_data(test_email_bytes).items()
+    )
+    assert not result.is_multipart()
+
+
+def test_get_attachment_parts_ignored_types():
+    """Tests :func:`core.utils.mail_parsing.get_attachment_parts`
+    in case of ignored content types.
+    """
+    with open(TEST_EMAIL_PARAMETERS[1][0], "br") as test_email_file:
+        test_email_message = email.message_from_bytes(
+            test_email_file.read(), policy=policy.default
+        )
+
+    assert len(mail_parsing.get_attachment_parts(test_email_message)) == 1
+    assert mail_parsing.get_attachment_parts(test_email_message, ["image"]) == []
+    assert mail_parsing.get_attachment_parts(test_email_message, [], ["png"]) == []
+
+
+@pytest.mark.parametrize(
+    "references_header, expected_message_ids",
+    [
+        (None, []),
+        ("", []),
+        ("<a@b.c>", ["<a@b.c>"]),
+        ("<a@b.c> <d@e.f>", ["<a@b.c>", "<d@e.f>"]),
+        (" <a@b.c>,<d@e.f>  ,", ["<a@b.c>", "<d@e.f>"]),
+    ],
+)
+def test_get_referenced_message_ids(references_header, expected_message_ids):
+    """Tests :func:`core.utils.mail_parsing.get_referenced_message_ids`."""
+    result = mail_parsing.get_referenced_message_ids(references_header)
+
+    assert result == expected_message_ids
+
+
+def test_get_correspondent_tuples():
+    """Tests :func:`core.utils.mail_parsing.get_correspondent_tuples`."""
+    result = mail_parsing.get_correspondent_tuples(
+        {
+            "from": "Some One <one@some.org>",
+            "to": "two@some.org, Three <three@some.org>",
+            "cc": "",
+            "subject": "not a correspondent",
+        }
+    )
+
+    assert result == {
+        "from": [("Some One", "one@some.org")],
+        "to": [("", "two@some.org"), ("Three", "three@some.org")],
+    }
+
+
 @pytest.mark.parametrize(
     "header, expected_href",
     [
@@ -0,0 +1,375 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`FakeIMAP4Server` stand-in IMAP server."""
+
+from __future__ import annotations
+
+import re
+import select
+import socketserver
+import time
+import zlib
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from typing import TYPE_CHECKING
+
+from .FakeMailServer import FakeMailServer
+
+
+if TYPE_CHECKING:
+    import socket
+
+
+class DeflateReader:
+    """Reads lines from a DEFLATE compressed connection, see RFC 4978."""
+
+    def __init__(self, connection: socket.socket) -> None:
+        """Sets up the decompression of the connection."""
+        self.connection = connection
+        self.decompressor = zlib.decompressobj(-15)
+        self.buffer = b""
+
+    def readline(self) -> bytes:
+        """Reads a line, an empty line if the connection is closed."""
+        while b"\n" not in self.buffer:
+            data = self.connection.recv(65536)
+            if not data:
+                break
+            self.buffer += self.decompressor.decompress(data)
+        line, separator, self.buffer = self.buffer.partition(b"\n")
+        return line + separator
+
+    def read(self, size: int) -> bytes:
+        """Reads the given number of bytes, fewer if the connection is closed."""
+        while len(self.buffer) < size:
+            data = self.connection.recv(65536)
+            if not data:
+                break
+            self.buffer += self.decompressor.decompress(data)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class DeflateWriter:
+    """Writes to a DEFLATE compressed connection, see RFC 4978."""
+
+    def __init__(self, connection: socket.socket) -> None:
+        """Sets up the compression of the connection."""
+        self.connection = connection
+        self.compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+        )
+
+    def write(self, data: bytes) -> int:
+        """Compresses and sends the data, returns the number of bytes on the wire."""
+        compressed_data = self.compressor.compress(data) + self.compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        self.connection.sendall(compressed_data)
+        return len(compressed_data)
+
+
+class FakeIMAP4Handler(socketserver.StreamRequestHandler):
+    """Handles the IMAP session of a single client connection.
+
+    Every received command is answered after the latency of the server.
+    Commands are dispatched to the `do_<COMMAND>` methods,
+    unknown commands are answered with BAD.
+    """
+
+    server: FakeIMAP4Server
+
+    disable_nagle_algorithm = True
+    """Small responses must not be delayed, that would distort the benchmarks."""
+
+    FETCH_ITEM_PATTERN = re.compile(r"BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|[\w.]+")
+    """Pattern to split the items of a FETCH command."""
+
+    LITERAL_PATTERN = re.compile(r"\{(\d+)\}$")
+    """Pattern of the announcement of a literal at the end of a command line."""
+
+    def send(self, line: bytes) -> None:
+        """Sends a line to the client."""
+        self.server.bytes_sent += self.wfile.write(line + b"\r\n")
+
+    def handle(self) -> None:
+        """Runs the IMAP session."""
+        self.selected: dict[int, bytes] | None = None
+        self.is_compression_accepted = False
+        self.send(b"* OK FakeIMAP4Server ready")
+        while line := self.rfile.readline():
+            tag, _, rest = line.rstrip(b"\r\n").decode().partition(" ")
+            command, _, arguments = rest.partition(" ")
+            self.server.commands.append(rest)
+            time.sleep(self.server.latency)
+            handler = getattr(self, f"do_{command.upper()}", None)
+            if handler is None:
+                self.send(f"{tag} BAD unknown command".encode())
+                continue
+            status = handler(arguments)
+            self.send(f"{tag} {status}".encode())
+            if self.is_compression_accepted:
+                self.is_compression_accepted = False
+                self.rfile = DeflateReader(self.connection)  # type: ignore[assignment]
+                self.wfile = DeflateWriter(self.connection)  # type: ignore[assignment]
+            if command.upper() == "LOGOUT":
+                break
+
+    def do_CAPABILITY(self, arguments: str) -> str:
+        """Lists the capabilities of the server."""
+        self.send(
+            " ".join(["* CAPABILITY IMAP4rev1", *self.server.capabilities]).encode()
+        )
+        return "OK CAPABILITY completed"
+
+    def do_LOGIN(self, arguments: str) -> str:
+        """Accepts every login."""
+        return "OK LOGIN completed"
+
+    def do_COMPRESS(self, arguments: str) -> str:
+        """Compresses the rest of the session with DEFLATE."""
+        if arguments.upper() != "DEFLATE":
+            return "BAD unknown compression mechanism"
+        if isinstance(self.wfile, DeflateWriter):
+            return "NO [COMPRESSIONACTIVE] already compressing"
+        self.is_compression_accepted = True
+        return "OK DEFLATE active"
+
+    def do_NOOP(self, arguments: str) -> str:
+        """Does nothing."""
+        return "OK NOOP completed"
+
+    def do_LOGOUT(self, arguments: str) -> str:
+        """Ends the session."""
+        self.send(b"* BYE logging out")
+        return "OK LOGOUT completed"
+
+    def do_LIST(self, arguments: str) -> str:
+        """Lists all mailboxes."""
+        for name in self.server.mailboxes:
+            self.send(f'* LIST () "/" {name}'.encode())
+        return "OK LIST completed"
+
+    def do_SELECT(self, arguments: str) -> str:
+        """Selects a mailbox."""
+        name = arguments.strip('"')
+        if name not in self.server.mailboxes:
+            return "NO no such mailbox"
+        self.selected = self.server.mailboxes[name]
+        self.send(f"* {len(self.selected)} EXISTS".encode())
+        self.send(b"* 0 RECENT")
+        self.send(f"* OK [UIDVALIDITY {self.server.uid_validity}]".encode())
+        self.send(f"* OK [UIDNEXT {max(self.selected, default=0) + 1}]".encode())
+        return "OK [READ-WRITE] SELECT completed"
+
+    def do_STATUS(self, arguments: str) -> str:
+        """Reports the status of a mailbox.
+
+        Supports the status data items MESSAGES, UIDNEXT, UIDVALIDITY and HIGHESTMODSEQ.
+        """
+        name, _, items = arguments.rpartition(" (")
+        name = name.strip('"')
+        if name not in self.server.mailboxes:
+            return "NO no such mailbox"
+        messages = self.server.mailboxes[name]
+        values = {
+            "MESSAGES": len(messages),
+            "UIDNEXT": max(messages, default=0) + 1,
+            "UIDVALIDITY": self.server.uid_validity,
+            "HIGHESTMODSEQ": self.server.highest_modseq,
+        }
+        status_items = " ".join(
+            f"{item} {values[item]}" for item in items.rstrip(")").upper().split()
+        )
+        self.send(f'* STATUS "{name}" ({status_items})'.encode())
+        return "OK STATUS completed"
+
+    def do_EXAMINE(self, arguments: str) -> str:
+        """Selects a mailbox read-only."""
+        status = self.do_SELECT(arguments)
+        return status.replace("READ-WRITE", "READ-ONLY")
+
+    def do_UNSELECT(self, arguments: str) -> str:
+        """Leaves the selected mailbox."""
+        self.selected = None
+        return "OK UNSELECT completed"
+
+    def do_CLOSE(self, arguments: str) -> str:
+        """Leaves the selected mailbox."""
+        return self.do_UNSELECT(arguments)
+
+    def do_CHECK(self, arguments: str) -> str:
+        """Does nothing."""
+        return "OK CHECK completed"
+
+    def do_IDLE(self, arguments: str) -> str:
+        """Idles until the client sends DONE, announcing messages added in the meantime."""
+        self.send(b"+ idling")
+        known_count = len(self.selected or {})
+        while not select.select([self.connection], [], [], 0.01)[0]:
+            if self.selected is not None and len(self.selected) > known_count:
+                known_count = len(self.selected)
+                self.send(f"* {known_count} EXISTS".encode())
+        if self.rfile.readline().strip().upper() != b"DONE":
+            return "BAD expected DONE"
+        return "OK IDLE terminated"
+
+    def do_APPEND(self, arguments: str) -> str:
+        """Appends a message or, with MULTIAPPEND, several messages to a mailbox, see RFC 3502.
+
+        The messages are only added once all of them have been received.
+        """
+        name, _, rest = arguments.partition(" ")
+        name = name.strip('"')
+        if name not in self.server.mailboxes:
+            return "NO [TRYCREATE] no such mailbox"
+        messages = []
+        while match := self.LITERAL_PATTERN.search(rest):
+            if messages and "MULTIAPPEND" not in self.server.capabilities:
+                return "BAD MULTIAPPEND is not supported"
+            self.send(b"+ Ready for literal data")
+            messages.append(self.rfile.read(int(match.group(1))))
+            rest = self.rfile.readline().rstrip(b"\r\n").decode()
+        if not messages:
+            return "BAD missing message literal"
+        for message in messages:
+            self.server.add_message(message, name)
+        return "OK APPEND completed"
+
+    def do_UID(self, arguments: str) -> str:
+        """Runs a SEARCH or FETCH command with UIDs."""
+        if self.selected is None:
+            return "BAD no mailbox selected"
+        command, _, arguments = arguments.partition(" ")
+        if command.upper() == "SEARCH":
+            return self.uid_search(arguments)
+        if command.upper() == "FETCH":
+            return self.uid_fetch(arguments)
+        return "BAD unknown UID command"
+
+    def parse_uid_set(self, uid_set: str) -> list[int]:
+        """Parses a set of UIDs like `1,3,5:*` into the matching UIDs in the selected mailbox."""
+        max_uid = max(self.selected, default=0)
+        matching_uids = set()
+        for part in uid_set.split(","):
+            start, _, end = part.partition(":")
+            start_uid = max_uid if start == "*" else int(start)
+            end_uid = start_uid if not end else max_uid if end == "*" else int(end)
+            low, high = sorted((start_uid, end_uid))
+            matching_uids.update(uid for uid in self.selected if low <= uid <= high)
+        return sorted(matching_uids)
+
+    def uid_search(self, criterion: str) -> str:
+        """Searches the selected mailbox. Supports ALL and UID sets."""
+        if criterion.upper().startswith("UID "):
+            uids = self.parse_uid_set(criterion[4:])
+        else:
+            uids = sorted(self.selected)
+        self.send(" ".join(["* SEARCH", *map(str, uids)]).encode())
+        return "OK SEARCH completed"
+
+    @staticmethod
+    def filter_headers(message: bytes, header_names: list[str]) -> bytes:
+        """Extracts the header block with only the given headers from a message."""
+        headers = BytesHeaderParser(policy=compat32).parsebytes(message)
+        return (
+            "".join(
+                f"{name}: {value}\r\n"
+                for name, value in headers.items()
+                if name.upper() in header_names
+            ).encode()
+            + b"\r\n"
+        )
+
+    def uid_fetch(self, arguments: str) -> str:
+        """Fetches data of messages in the selected mailbox.
+
+        Supports the message data items UID, RFC822, RFC822.SIZE, BODY[], BODY.PEEK[],
+        BODY.PEEK[]<offset.length> and BODY.PEEK[HEADER.FIELDS (...)].
+        """
+        uid_set, _, items = arguments.partition(" ")
+        uids = self.parse_uid_set(uid_set)
+        if self.server.failing_uids.intersection(uids):
+            return "NO message could not be fetched"
+        sequence_numbers = {uid: number for number, uid in enumerate(self.selected, 1)}
+        for uid in uids:
+            message = self.selected[uid]
+            response = b"* %d FETCH (UID %d" % (sequence_numbers[uid], uid)
+            for item in self.FETCH_ITEM_PATTERN.findall(items.upper()):
+                if item == "RFC822.SIZE":
+                    response += b" RFC822.SIZE %d" % len(message)
+                elif item in ["RFC822", "BODY[]", "BODY.PEEK[]"]:
+                    name = b"RFC822" if item == "RFC822" else b"BODY[]"
+                    response += b" %s {%d}\r\n%s" % (name, len(message), message)
+                elif item.startswith("BODY.PEEK[]<"):
+                    offset, _, length = item[12:-1].partition(".")
+                    piece = message[int(offset) : int(offset) + int(length)]
+                    response += b" BODY[]<%s> {%d}\r\n%s" % (
+                        offset.encode(),
+                        len(piece),
+                        piece,
+                    )
+                elif item.startswith("BODY.PEEK[HEADER.FIELDS"):
+                    name = item.removeprefix("BODY.PEEK").encode()
+                    headers = self.filter_headers(message, item[25:-2].split())
+                    response += b" %s {%d}\r\n%s" % (name, len(headers), headers)
+            self.send(response + b")")
+        return "OK FETCH completed"
+
+
+class FakeIMAP4Server(FakeMailServer):
+    """A minimal in-process IMAP4rev1 server serving a fixed set of messages in an INBOX.
+
+    Attributes:
+        mailboxes: The messages by their UID by the name of their mailbox.
+        uid_validity: The UIDVALIDITY reported for all mailboxes.
+        failing_uids: UIDs that fail every FETCH request they are part of.
+        highest_modseq: The HIGHESTMODSEQ reported for all mailboxes, counts up with every new message.
+        capabilities: Additional capabilities announced by the server.
+        bytes_sent: The number of bytes sent to all clients, compressed if the session is.
+    """
+
+    def __init__(
+        self,
+        messages: list[bytes],
+        latency: float = 0,
+        uid_validity: int = 1,
+        failing_uids: set[int] | None = None,
+    ) -> None:
+        """Binds the server to a free port on localhost.
+
+        Args:
+            messages: The messages in the INBOX, they get the UIDs 1 to n.
+            latency: Seconds to wait before answering a command. Defaults to 0.
+            uid_validity: The UIDVALIDITY of the INBOX. Defaults to 1.
+            failing_uids: UIDs that fail every FETCH request they are part of.
+        """
+        super().__init__(FakeIMAP4Handler, latency)
+        self.mailboxes = {"INBOX": dict(enumerate(messages, 1))}
+        self.uid_validity = uid_validity
+        self.failing_uids = failing_uids or set()
+        self.highest_modseq = 1
+        self.capabilities = ["UNSELECT", "IDLE", "COMPRESS=DEFLATE"]
+
+    def add_message(self, message: bytes, mailbox_name: str = "INBOX") -> None:
+        """Delivers a new message to a mailbox, it gets the next free UID."""
+        messages = self.mailboxes[mailbox_name]
+        messages[max(messages, default=0) + 1] = message
+        self.highest_modseq += 1
@@ -0,0 +1,455 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`FakeJMAPServer` stand-in JMAP server."""
+
+from __future__ import annotations
+
+import json
+import time
+from datetime import UTC, datetime, timedelta
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from http.server import BaseHTTPRequestHandler
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+from .FakeMailServer import FakeMailServer
+
+
+class FakeJMAPHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests of a single client connection to the JMAP server, see RFC 8620 and RFC 8621.
+
+    Every request is answered after the latency of the server.
+    Method calls are dispatched to the `call_<Type>_<method>` methods,
+    unknown methods are answered with an unknownMethod error.
+    """
+
+    server: FakeJMAPServer
+
+    protocol_version = "HTTP/1.1"
+    """Keeps the connections alive like a real JMAP server."""
+
+    disable_nagle_algorithm = True
+    """Small responses must not be delayed, that would distort the benchmarks."""
+
+    def log_message(
+        self, format: str, *args: Any  # noqa: A002 ; overridden signature
+    ) -> None:
+        """Keeps the requests out of the test output."""
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200) -> None:
+        """Sends a response with a body."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+    def send_json(self, data: Any, status: int = 200) -> None:
+        """Sends a JSON response."""
+        self.send_body(json.dumps(data).encode(), "application/json", status)
+
+    def start_request(self) -> bool:
+        """Records the request, waits for the latency and checks the authorization.
+
+        Returns:
+            Whether the request may be answered, otherwise a 401 response has been sent.
+        """
+        self.server.commands.append(f"{self.command} {self.path}")
+        time.sleep(self.server.latency)
+        if not self.headers.get("Authorization", "").startswith(
+            self.server.auth_scheme + " "
+        ):
+            self.send_json({"type": "unauthorized"}, 401)
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        """Serves the session resource and the downloads of blobs."""
+        if not self.start_request():
+            return
+        path = urlsplit(self.path).path
+        if path == "/.well-known/jmap":
+            self.send_json(self.server.session)
+        elif path.startswith("/download/"):
+            blob_id = unquote(path.split("/")[3])
+            if blob_id not in self.server.blobs:
+                self.send_json({"type": "blobNotFound"}, 404)
+            else:
+                self.send_body(self.server.blobs[blob_id], "message/rfc822")
+        else:
+            self.send_json({"type": "notFound"}, 404)
+
+    def do_POST(self) -> None:
+        """Serves the API and the uploads of blobs."""
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.start_request():
+            return
+        path = urlsplit(self.path).path
+        if path == "/api":
+            self.send_json(
+                {
+                    "methodResponses": self.run_method_calls(
+                        json.loads(body)["methodCalls"]
+                    ),
+                    "sessionState": "1",
+                }
+            )
+        elif path.startswith("/upload/"):
+            blob_id = self.server.add_blob(body)
+            self.send_json(
+                {
+                    "accountId": FakeJMAPServer.ACCOUNT_ID,
+                    "blobId": blob_id,
+                    "type": self.headers.get("Content-Type"),
+                    "size": len(body),
+                },
+                201,
+            )
+        else:
+            self.send_json({"type": "notFound"}, 404)
+
+    def run_method_calls(self, method_calls: list[list[Any]]) -> list[list[Any]]:
+        """Runs method calls, resolving their back-references to earlier results."""
+        method_responses: list[list[Any]] = []
+        for name, arguments, call_id in method_calls:
+            self.server.method_calls.append(name)
+            resolved_arguments = self.resolve_arguments(arguments, method_responses)
+            if len(resolved_arguments) < len(arguments):
+                method_responses.append(
+                    ["error", {"type": "invalidResultReference"}, call_id]
+                )
+                continue
+            handler = getattr(self, "call_" + name.replace("/", "_"), None)
+            if handler is None:
+                method_responses.append(["error", {"type": "unknownMethod"}, call_id])
+                continue
+            response = handler(resolved_arguments)
+            if "type" in response:
+                method_responses.append(["error", response, call_id])
+            else:
+                method_responses.append([name, response, call_id])
+        return method_responses
+
+    @staticmethod
+    def resolve_arguments(
+        arguments: dict[str, Any], method_responses: list[list[Any]]
+    ) -> dict[str, Any]:
+        """Resolves the back-references in the arguments of a method call.
+
+        Back-references to unknown results are left out.
+        """
+        resolved_arguments = {}
+        for key, value in arguments.items():
+            if not key.startswith("#"):
+                resolved_arguments[key] = value
+                continue
+            for response_name, response_arguments, response_call_id in method_responses:
+                if (
+                    response_call_id == value["resultOf"]
+                    and response_name == value["name"]
+                ):
+                    resolved_arguments[key[1:]] = response_arguments[
+                        value["path"].strip("/")
+                    ]
+        return resolved_arguments
+
+    def call_Core_echo(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Echoes the arguments."""
+        return arguments
+
+    def call_Mailbox_get(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Lists all mailboxes."""
+        return {
+            "accountId": FakeJMAPServer.ACCOUNT_ID,
+            "state": "1",
+            "list": list(self.server.mailboxes.values()),
+            "notFound": [],
+        }
+
+    def matches(self, email_data: dict[str, Any], condition: dict[str, Any]) -> bool:
+        """Checks whether an email matches a filter condition or operator."""
+        if "operator" in condition:
+            results = [
+                self.matches(email_data, child) for child in condition["conditions"]
+            ]
+            if condition["operator"] == "AND":
+                return all(results)
+            if condition["operator"] == "OR":
+                return any(results)
+            return not any(results)
+        checks = {
+            "inMailbox": lambda value: value in email_data["mailboxIds"],
+            "hasKeyword": lambda value: value in email_data["keywords"],
+            "notKeyword": lambda value: value not in email_data["keywords"],
+            "after": lambda value: email_data["receivedAt"] >= value,
+            "before": lambda value: email_data["receivedAt"] < value,
+            "minSize": lambda value: email_data["size"] >= value,
+            "maxSize": lambda value: email_data["size"] < value,
+        }
+        return all(checks[key](value) for key, value in condition.items())
+
+    def call_Email_query(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Searches the emails, sorted by the date they were received."""
+        matching_ids = [
+            email_data["id"]
+            for email_data in sorted(
+                self.server.emails.values(),
+                key=lambda email_data: email_data["receivedAt"],
+            )
+            if self.matches(email_data, arguments.get("filter") or {})
+        ]
+        position = arguments.get("position", 0)
+        limit = arguments.get("limit", len(matching_ids))
+        return {
+            "accountId": FakeJMAPServer.ACCOUNT_ID,
+            "queryState": str(self.server.state),
+            "canCalculateChanges": False,
+            "position": position,
+            "ids": matching_ids[position : position + limit],
+        }
+
+    def call_Email_get(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Gets the properties of emails, including raw header properties."""
+        ids = arguments.get("ids")
+        if ids is None:
+            ids = list(self.server.emails)
+        properties = arguments.get("properties") or ["id", "blobId", "size"]
+        if len(ids) > self.server.max_objects_in_get:
+            return {"type": "requestTooLarge"}
+        email_list = []
+        for email_id in ids:
+            if email_id not in self.server.emails:
+                continue
+            email_data = self.server.emails[email_id]
+            headers = BytesHeaderParser(policy=compat32).parsebytes(
+                self.server.blobs.get(email_data["blobId"], b"")
+            )
+            email_properties = {}
+            for email_property in properties:
+                if email_property.startswith("header:"):
+                    value = headers.get(email_property.removeprefix("header:"))
+                    email_properties[email_property] = (
+                        None if value is None else " " + value
+                    )
+                else:
+                    email_properties[email_property] = email_data[email_property]
+            email_list.append(email_properties)
+        return {
+            "accountId": FakeJMAPServer.ACCOUNT_ID,
+            "state": str(self.server.state),
+            "list": email_list,
+            "notFound": [
+                email_id for email_id in ids if email_id not in self.server.emails
+            ],
+        }
+
+    def call_Email_changes(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Lists the emails created since a state."""
+        since_state = arguments["sinceState"]
+        if not since_state.isdigit() or not (
+            self.server.min_changes_state <= int(since_state) <= self.server.state
+        ):
+            return {"type": "cannotCalculateChanges"}
+        created = [
+            email_data
+            for email_data in self.server.emails.values()
+            if email_data["createdState"] > int(since_state)
+        ]
+        max_changes = arguments.get("maxChanges") or len(created)
+        has_more_changes = len(created) > max_changes
+        created = created[:max_changes]
+        return {
+            "accountId": FakeJMAPServer.ACCOUNT_ID,
+            "oldState": since_state,
+            "newState": str(
+                created[-1]["createdState"] if has_more_changes else self.server.state
+            ),
+            "hasMoreChanges": has_more_changes,
+            "created": [email_data["id"] for email_data in created],
+            "updated": [],
+            "destroyed": [],
+        }
+
+    def call_Email_import(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Adds emails from uploaded blobs to mailboxes."""
+        created = {}
+        not_created = {}
+        for creation_id, email_import in arguments["emails"].items():
+            if email_import["blobId"] not in self.server.blobs:
+                not_created[creation_id] = {"type": "blobNotFound"}
+            elif not set(email_import["mailboxIds"]).issubset(self.server.mailboxes):
+                not_created[creation_id] = {
+                    "type": "invalidProperties",
+                    "properties": ["mailboxIds"],
+                }
+            else:
+                email_id = self.server.add_email(
+                    email_import["blobId"],
+                    list(email_import["mailboxIds"]),
+                    email_import.get("keywords") or {},
+                )
+                created[creation_id] = {"id": email_id}
+        return {
+            "accountId": FakeJMAPServer.ACCOUNT_ID,
+            "created": created or None,
+            "notCreated": not_created or None,
+        }
+
+
+class FakeJMAPServer(FakeMailServer):
+    """A minimal in-process JMAP server serving a fixed set of messages in an INBOX via plain HTTP.
+
+    Attributes:
+        auth_scheme: The authentication scheme the server accepts, `Basic` or `Bearer`.
+        max_objects_in_get: The maximum number of objects per get call announced by the server.
+        mailboxes: The properties of the mailboxes by their id.
+        emails: The properties of the emails by their id.
+        blobs: The uploaded and delivered blobs by their id.
+        state: The state of the emails, counts up with every new email.
+        min_changes_state: The oldest state that the server can calculate changes from.
+        start_time: The time the emails are received from.
+        method_calls: The names of all method calls received by the server, for inspection.
+    """
+
+    ACCOUNT_ID = "account1"
+    """The id of the only account of the server."""
+
+    def __init__(
+        self,
+        messages: list[bytes],
+        latency: float = 0,
+        auth_scheme: str = "Basic",
+        max_objects_in_get: int = 500,
+    ) -> None:
+        """Binds the server to a free port on localhost.
+
+        Args:
+            messages: The messages in the INBOX.
+            latency: Seconds to wait before answering a request. Defaults to 0.
+            auth_scheme: The authentication scheme the server accepts. Defaults to `Basic`.
+            max_objects_in_get: The maximum number of objects per get call. Defaults to 500.
+        """
+        super().__init__(FakeJMAPHandler, latency)
+        self.auth_scheme = auth_scheme
+        self.max_objects_in_get = max_objects_in_get
+        self.mailboxes: dict[str, dict[str, Any]] = {}
+        self.emails: dict[str, dict[str, Any]] = {}
+        self.blobs: dict[str, bytes] = {}
+        self.state = 0
+        self.min_changes_state = 0
+        self.method_calls: list[str] = []
+        self.start_time = datetime.now(UTC) - timedelta(hours=1)
+        self.add_mailbox("INBOX")
+        for message in messages:
+            self.add_message(message)
+
+    @property
+    def session_url(self) -> str:
+        """The URL of the session resource."""
+        return f"http://127.0.0.1:{self.port}/.well-known/jmap"
+
+    @property
+    def session(self) -> dict[str, Any]:
+        """The session resource."""
+        base_url = f"http://127.0.0.1:{self.port}"
+        return {
+            "capabilities": {
+                "urn:ietf:params:jmap:core": {
+                    "maxSizeUpload": 50000000,
+                    "maxConcurrentUpload": 4,
+                    "maxSizeRequest": 10000000,
+                    "maxConcurrentRequests": 4,
+                    "maxCallsInRequest": 16,
+                    "maxObjectsInGet": self.max_objects_in_get,
+                    "maxObjectsInSet": 500,
+                    "collationAlgorithms": [],
+                },
+                "urn:ietf:params:jmap:mail": {},
+            },
+            "accounts": {
+                self.ACCOUNT_ID: {
+                    "name": "archive@eonvelope.test",
+                    "isPersonal": True,
+                    "isReadOnly": False,
+                    "accountCapabilities": {"urn:ietf:params:jmap:mail": {}},
+                }
+            },
+            "primaryAccounts": {"urn:ietf:params:jmap:mail": self.ACCOUNT_ID},
+            "username": "archive@eonvelope.test",
+            "apiUrl": f"{base_url}/api",
+            "downloadUrl": f"{base_url}/download/{{accountId}}/{{blobId}}/{{name}}?accept={{type}}",
+            "uploadUrl": f"{base_url}/upload/{{accountId}}/",
+            "eventSourceUrl": f"{base_url}/eventsource/",
+            "state": "1",
+        }
+
+    def add_mailbox(self, name: str, parent_id: str | None = None) -> str:
+        """Creates a mailbox and returns its id."""
+        mailbox_id = f"mailbox{len(self.mailboxes) + 1}"
+        self.mailboxes[mailbox_id] = {
+            "id": mailbox_id,
+            "name": name,
+            "parentId": parent_id,
+        }
+        return mailbox_id
+
+    def add_blob(self, data: bytes) -> str:
+        """Stores a blob and returns its id."""
+        blob_id = f"blob{len(self.blobs) + 1}"
+        self.blobs[blob_id] = data
+        return blob_id
+
+    def add_email(
+        self, blob_id: str, mailbox_ids: list[str], keywords: dict[str, bool]
+    ) -> str:
+        """Creates an email from a blob and returns its id.
+
+        The emails are received one second apart, starting an hour before the server was created.
+        """
+        self.state += 1
+        email_id = f"email{self.state}"
+        self.emails[email_id] = {
+            "id": email_id,
+            "blobId": blob_id,
+            "mailboxIds": dict.fromkeys(mailbox_ids, True),
+            "keywords": keywords,
+            "receivedAt": (self.start_time + timedelta(seconds=self.state)).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "size": len(self.blobs[blob_id]),
+            "createdState": self.state,
+        }
+        return email_id
+
+    def add_message(
+        self,
+        message: bytes,
+        mailbox_name: str = "INBOX",
+        keywords: dict[str, bool] | None = None,
+    ) -> str:
+        """Delivers a new message to a mailbox and returns the id of the email."""
+        [mailbox_id] = [
+            mailbox_id
+            for mailbox_id, mailbox_data in self.mailboxes.items()
+            if mailbox_data["name"] == mailbox_name
+        ]
+        return self.add_email(self.add_blob(message), [mailbox_id], keywords or {})
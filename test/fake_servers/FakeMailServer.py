@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`FakeMailServer` base class of the stand-in mailservers."""
+
+from __future__ import annotations
+
+import socketserver
+import threading
+from typing import TYPE_CHECKING, Self
+
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+class FakeMailServer(socketserver.ThreadingTCPServer):
+    """Base for the minimal in-process mailservers.
+
+    Binds to a free port on localhost and serves in a background thread
+    while used as a context manager.
+
+    Attributes:
+        latency: Seconds to wait before answering a command, simulating a slow link.
+        commands: All commands received by the server, for inspection.
+        bytes_sent: The number of bytes sent to all clients.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        handler_class: type[socketserver.BaseRequestHandler],
+        latency: float = 0,
+    ) -> None:
+        """Binds the server to a free port on localhost.
+
+        Args:
+            handler_class: The class handling the sessions of the clients.
+            latency: Seconds to wait before answering a command. Defaults to 0.
+        """
+        super().__init__(("127.0.0.1", 0), handler_class)
+        self.latency = latency
+        self.commands: list[str] = []
+        self.bytes_sent = 0
+
+    @property
+    def port(self) -> int:
+        """The port the server is listening on."""
+        return int(self.server_address[1])
+
+    def __enter__(self) -> Self:
+        """Starts serving in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stops serving and closes the socket."""
+        self.shutdown()
+        self.server_close()
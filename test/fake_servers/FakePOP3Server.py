@@ -0,0 +1,227 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with the :class:`FakePOP3Server` stand-in POP3 server."""
+
+from __future__ import annotations
+
+import re
+import socketserver
+import time
+
+from .FakeMailServer import FakeMailServer
+
+
+class FakePOP3Handler(socketserver.StreamRequestHandler):
+    """Handles the POP3 session of a single client connection, see RFC 1939.
+
+    Every received command is answered after the latency of the server.
+    Commands are dispatched to the `do_<COMMAND>` methods,
+    unknown commands are answered with -ERR.
+    """
+
+    server: FakePOP3Server
+
+    disable_nagle_algorithm = True
+    """Small responses must not be delayed, that would distort the benchmarks."""
+
+    def send(self, line: bytes) -> None:
+        """Sends a line to the client."""
+        self.server.bytes_sent += self.wfile.write(line + b"\r\n")
+
+    def send_multiline(self, data: bytes) -> None:
+        """Sends the data of a multi-line response, byte-stuffed and terminated."""
+        self.server.bytes_sent += self.wfile.write(self.server.encode_multiline(data))
+
+    def handle(self) -> None:
+        """Runs the POP3 session."""
+        self.deleted_numbers: set[int] = set()
+        self.send(b"+OK FakePOP3Server ready")
+        while line := self.rfile.readline():
+            command, _, arguments = line.rstrip(b"\r\n").decode().partition(" ")
+            self.server.commands.append(line.rstrip(b"\r\n").decode())
+            time.sleep(self.server.latency)
+            handler = getattr(self, f"do_{command.upper()}", None)
+            if handler is None:
+                self.send(b"-ERR unknown command")
+                continue
+            handler(arguments)
+            if command.upper() == "QUIT":
+                break
+
+    def get_number(self, arguments: str) -> int | None:
+        """Looks up the number of the message given in the arguments.
+
+        Sends an error response if there is no such message.
+        """
+        number = arguments.split(" ", 1)[0]
+        if not number.isdigit() or not (
+            0 < int(number) <= len(self.server.messages)
+            and int(number) not in self.deleted_numbers
+        ):
+            self.send(b"-ERR no such message")
+            return None
+        return int(number)
+
+    def active_messages(self) -> list[tuple[int, bytes]]:
+        """All messages that are not marked as deleted with their number."""
+        return [
+            (number, message)
+            for number, message in enumerate(self.server.messages, 1)
+            if number not in self.deleted_numbers
+        ]
+
+    def do_CAPA(self, arguments: str) -> None:
+        """Lists the capabilities of the server."""
+        self.send(b"+OK capability list follows")
+        self.send_multiline(b"USER\r\nTOP\r\nUIDL")
+
+    def do_USER(self, arguments: str) -> None:
+        """Accepts every user."""
+        self.send(b"+OK send your password")
+
+    def do_PASS(self, arguments: str) -> None:
+        """Accepts every password."""
+        self.send(b"+OK maildrop locked and ready")
+
+    def do_NOOP(self, arguments: str) -> None:
+        """Does nothing."""
+        self.send(b"+OK")
+
+    def do_STAT(self, arguments: str) -> None:
+        """Reports the number and total size of the messages."""
+        messages = self.active_messages()
+        self.send(
+            b"+OK %d %d" % (len(messages), sum(len(message) for _, message in messages))
+        )
+
+    def do_LIST(self, arguments: str) -> None:
+        """Lists the sizes of all messages or a single one."""
+        if arguments:
+            if number := self.get_number(arguments):
+                self.send(
+                    b"+OK %d %d" % (number, len(self.server.messages[number - 1]))
+                )
+            return
+        self.send(b"+OK scan listing follows")
+        self.send_multiline(
+            b"\r\n".join(
+                b"%d %d" % (number, len(message))
+                for number, message in self.active_messages()
+            )
+        )
+
+    def do_UIDL(self, arguments: str) -> None:
+        """Lists the unique ids of all messages or a single one."""
+        if arguments:
+            if number := self.get_number(arguments):
+                self.send(b"+OK %d uid%d" % (number, number))
+            return
+        self.send(b"+OK unique-id listing follows")
+        self.send_multiline(
+            b"\r\n".join(
+                b"%d uid%d" % (number, number) for number, _ in self.active_messages()
+            )
+        )
+
+    def do_RETR(self, arguments: str) -> None:
+        """Sends a complete message."""
+        if number := self.get_number(arguments):
+            self.send(b"+OK %d octets" % len(self.server.messages[number - 1]))
+            self.server.bytes_sent += self.wfile.write(
+                self.server.encoded_messages[number - 1]
+            )
+
+    def do_TOP(self, arguments: str) -> None:
+        """Sends the headers and the given number of body lines of a message."""
+        _, _, line_count = arguments.partition(" ")
+        if not line_count.isdigit():
+            self.send(b"-ERR invalid line count")
+            return
+        if number := self.get_number(arguments):
+            message = self.server.messages[number - 1]
+            headers_end = message.find(b"\r\n\r\n")
+            end = len(message) if headers_end == -1 else headers_end + 4
+            for _ in range(int(line_count)):
+                line_end = message.find(b"\r\n", end)
+                if line_end == -1:
+                    end = len(message)
+                    break
+                end = line_end + 2
+            self.send(b"+OK top of message follows")
+            self.send_multiline(message[:end])
+
+    def do_DELE(self, arguments: str) -> None:
+        """Marks a message as deleted."""
+        if number := self.get_number(arguments):
+            self.deleted_numbers.add(number)
+            self.send(b"+OK message deleted")
+
+    def do_RSET(self, arguments: str) -> None:
+        """Unmarks all messages marked as deleted."""
+        self.deleted_numbers.clear()
+        self.send(b"+OK")
+
+    def do_QUIT(self, arguments: str) -> None:
+        """Ends the session, removing the messages marked as deleted."""
+        if self.deleted_numbers:
+            self.server.set_messages(
+                [
+                    message
+                    for number, message in enumerate(self.server.messages, 1)
+                    if number not in self.deleted_numbers
+                ]
+            )
+        self.send(b"+OK bye")
+
+
+class FakePOP3Server(FakeMailServer):
+    """A minimal in-process POP3 server serving a fixed set of messages in its maildrop.
+
+    The unique id of every message is `uid<number>`.
+
+    Attributes:
+        messages: The messages in the maildrop.
+        encoded_messages: The messages in their wire form, encoded ahead
+            so the memory used by the server does not distort the benchmarks.
+    """
+
+    def __init__(self, messages: list[bytes], latency: float = 0) -> None:
+        """Binds the server to a free port on localhost.
+
+        Args:
+            messages: The messages in the maildrop, they get the numbers 1 to n.
+            latency: Seconds to wait before answering a command. Defaults to 0.
+        """
+        super().__init__(FakePOP3Handler, latency)
+        self.set_messages(messages)
+
+    @staticmethod
+    def encode_multiline(data: bytes) -> bytes:
+        """Byte-stuffs and terminates the data of a multi-line response."""
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        return re.sub(rb"(?m)^\.", b"..", data) + b".\r\n"
+
+    def set_messages(self, messages: list[bytes]) -> None:
+        """Replaces the messages in the maildrop."""
+        self.messages = list(messages)
+        self.encoded_messages = [
+            self.encode_multiline(message) for message in self.messages
+        ]
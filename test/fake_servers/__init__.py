@@ -0,0 +1,39 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Package with in-process stand-in mailservers for integration tests and benchmarks.
+
+The servers only implement the subset of their protocol that the fetchers use.
+They bind to a free port on localhost, so no network access is required.
+"""
+
+from .corpus import generate_corpus
+from .FakeIMAP4Server import FakeIMAP4Server
+from .FakeJMAPServer import FakeJMAPServer
+from .FakeMailServer import FakeMailServer
+from .FakePOP3Server import FakePOP3Server
+
+
+__all__ = [
+    "FakeIMAP4Server",
+    "FakeJMAPServer",
+    "FakeMailServer",
+    "FakePOP3Server",
+    "generate_corpus",
+]
@@ -0,0 +1,69 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# Eonvelope - a open-source self-hostable email archiving server
+# Copyright (C) 2024 David Aderbauer & The Eonvelope Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Module with utility to generate a corpus of emails for the stand-in servers."""
+
+from __future__ import annotations
+
+import random
+from datetime import UTC, datetime, timedelta
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import format_datetime, make_msgid
+
+
+def generate_corpus(
+    count: int,
+    body_size: int = 1024,
+    attachment_count: int = 0,
+    attachment_size: int = 4096,
+) -> list[bytes]:
+    """Generates a list of distinct plain text emails with CRLF line endings.
+
+    The attachments are filled with reproducible random data, so they don't compress.
+
+    Args:
+        count: The number of emails to generate.
+        body_size: The size of the bodytext of every email in bytes.
+        attachment_count: The number of attachments of every email. Defaults to 0.
+        attachment_size: The size of every attachment in bytes before encoding. Defaults to 4096.
+
+    Returns:
+        The generated emails as :class:`bytes`.
+    """
+    start_time = datetime(2024, 1, 1, tzinfo=UTC)
+    random_generator = random.Random(count)  # noqa: S311 ; only filler data
+    corpus = []
+    for number in range(count):
+        message = EmailMessage()
+        message["Message-ID"] = make_msgid(f"corpus{number}", "eonvelope.test")
+        message["From"] = f"sender{number % 10}@eonvelope.test"
+        message["To"] = "archive@eonvelope.test"
+        message["Subject"] = f"Corpus message {number}"
+        message["Date"] = format_datetime(start_time + timedelta(minutes=number))
+        message.set_content("x" * body_size)
+        for attachment_number in range(attachment_count):
+            message.add_attachment(
+                random_generator.randbytes(attachment_size),
+                maintype="application",
+                subtype="octet-stream",
+                filename=f"attachment{attachment_number}.bin",
+            )
+        corpus.append(message.as_bytes(policy=SMTP))
+    return corpus
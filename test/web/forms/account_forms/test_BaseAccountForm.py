@@ -51,11 +51,13 @@ def test_post_create_test_success(account_payload, other_user, mock_Account_test
     assert form_data["mail_host_port"] == account_payload["mail_host_port"]
     assert "timeout" in form_data
     assert form_data["timeout"] == account_payload["timeout"]
+    assert "use_compression" in form_data
+    assert form_data["use_compression"] == account_payload["use_compression"]
     assert "is_favorite" not in form_data
     assert "is_healthy" not in form_data
     assert "created" not in form_data
     assert "updated" not in form_data
-    assert len(form_data) == 6
+    assert len(form_data) == 7
     mock_Account_test.assert_called_once()
 
 
@@ -78,11 +80,13 @@ def test_post_update_test_success(fake_account, account_payload, mock_Account_te
     assert form_data["mail_host_port"] == account_payload["mail_host_port"]
     assert "timeout" in form_data
     assert form_data["timeout"] == account_payload["timeout"]
+    assert "use_compression" in form_data
+    assert form_data["use_compression"] == account_payload["use_compression"]
     assert "is_favorite" not in form_data
     assert "is_healthy" not in form_data
     assert "created" not in form_data
     assert "updated" not in form_data
-    assert len(form_data) == 6
+    assert len(form_data) == 7
     mock_Account_test.assert_called_once()
 
 
@@ -221,10 +225,13 @@ def test_get(fake_account, mock_Account_test):
     assert "timeout" in form_fields
     assert "timeout" in form_initial_data
     assert form_initial_data["timeout"] == fake_account.timeout
+    assert "use_compression" in form_fields
+    assert "use_compression" in form_initial_data
+    assert form_initial_data["use_compression"] == fake_account.use_compression
     assert "is_favorite" not in form_fields
     assert "user" not in form_fields
     assert "is_healthy" not in form_fields
     assert "created" not in form_fields
     assert "updated" not in form_fields
-    assert len(form_fields) == 6
+    assert len(form_fields) == 7
     mock_Account_test.assert_not_called()
@@ -50,7 +50,9 @@ def test_post_update(fake_daemon, daemon_with_interval_payload):
     assert "is_healthy" not in form_data
     assert "created" not in form_data
     assert "updated" not in form_data
-    assert len(form_data) == 3
+    assert "fetching_filter" in form_data
+    assert form_data["fetching_filter"] is None
+    assert len(form_data) == 4
 
 
 @pytest.mark.django_db
@@ -67,6 +69,23 @@ def test_post_bad_fetching_criterion(
     assert form["fetching_criterion"].errors
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "bad_fetching_filter",
+    ['{"unknown": "x"}', '{"or": {"from": "x"}}', '{"smaller": -1}'],
+)
+def test_post_bad_fetching_filter(
+    fake_daemon, daemon_with_interval_payload, bad_fetching_filter
+):
+    """Tests post direction of :class:`web.forms.BaseDaemonForm`."""
+    daemon_with_interval_payload["fetching_filter"] = bad_fetching_filter
+
+    form = BaseDaemonForm(instance=fake_daemon, data=daemon_with_interval_payload)
+
+    assert not form.is_valid()
+    assert form["fetching_filter"].errors
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     "unavailable_fetching_criterion",
@@ -140,7 +159,8 @@ def test_get(fake_daemon):
     assert "is_healthy" not in form_fields
     assert "created" not in form_fields
     assert "updated" not in form_fields
-    assert len(form_fields) == 3
+    assert "fetching_filter" in form_fields
+    assert len(form_fields) == 4
 
 
 @pytest.mark.django_db
@@ -52,7 +52,9 @@ def test_post_update(fake_daemon, daemon_with_interval_payload):
     assert "is_healthy" not in form_data
     assert "created" not in form_data
     assert "updated" not in form_data
-    assert len(form_data) == 4
+    assert "fetching_filter" in form_data
+    assert form_data["fetching_filter"] is None
+    assert len(form_data) == 5
 
 
 @pytest.mark.django_db
@@ -129,4 +131,5 @@ def test_get(fake_daemon):
     assert "is_healthy" not in form_fields
     assert "created" not in form_fields
     assert "updated" not in form_fields
-    assert len(form_fields) == 4
+    assert "fetching_filter" in form_fields
+    assert len(form_fields) == 5
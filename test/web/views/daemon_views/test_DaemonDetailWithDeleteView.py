@@ -68,6 +68,27 @@ def test_get_auth_owner(fake_daemon, owner_client, detail_url):
     assert fake_daemon.mailbox.name in response.content.decode("utf-8")
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("is_own_run", [True, False])
+def test_get_fetch_progress(faker, fake_daemon, owner_client, detail_url, is_own_run):
+    """Tests that the progress of the latest fetching run of the mailbox
+    is only shown if the run belongs to the daemon.
+    """
+    fake_daemon.mailbox.fetch_run_id = faker.uuid4()
+    fake_daemon.mailbox.fetch_run_key = (
+        fake_daemon.fetch_run_key if is_own_run else faker.word()
+    )
+    fake_daemon.mailbox.save()
+
+    response = owner_client.get(detail_url(DaemonDetailWithDeleteView, fake_daemon))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert (
+        "web/mailbox/partials/_fetch_progress_item.html"
+        in [template.name for template in response.templates]
+    ) is is_own_run
+
+
 @pytest.mark.django_db
 def test_get_auth_admin(fake_daemon, admin_client, detail_url):
     """Tests :class:`web.views.DaemonDetailWithDeleteView` with the authenticated admin user client."""
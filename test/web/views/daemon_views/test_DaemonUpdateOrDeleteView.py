@@ -84,7 +84,7 @@ def test_get_auth_owner_criterion_choices(fake_daemon, owner_client, detail_url)
     assert "object" in response.context
     assert isinstance(response.context["object"], Daemon)
     assert "form" in response.context
-    assert len(response.context["form"].fields["fetching_criterion"].choices) == 1
+    assert len(response.context["form"].fields["fetching_criterion"].choices) == 2
     assert str(fake_daemon.uuid) in response.content.decode("utf-8")
 
 
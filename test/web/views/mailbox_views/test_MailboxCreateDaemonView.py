@@ -83,7 +83,7 @@ def test_get_auth_owner_criterion_choices(owner_client, fake_mailbox, detail_url
     ]
     assert "form" in response.context
     assert isinstance(response.context["form"], CreateDaemonForm)
-    assert len(response.context["form"].fields["fetching_criterion"].choices) == 1
+    assert len(response.context["form"].fields["fetching_criterion"].choices) == 2
     assert response.context["form"].initial["mailbox"] == fake_mailbox.id
     assert "object" in response.context
     assert response.context["object"] == fake_mailbox
@@ -25,7 +25,7 @@ from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse
 from rest_framework import status
 
-from core.constants import EmailFetchingCriterionChoices
+from core.constants import EmailFetchingCriterionChoices, EmailProtocolChoices
 from core.models import Mailbox
 from core.utils.fetchers.exceptions import FetcherError
 from web.views import MailboxFilterView
@@ -444,3 +444,61 @@ def test_post_fetch_auth_admin(
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert "404.html" in [template.name for template in response.templates]
     mock_Mailbox_fetch.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_post_restore_success_auth_owner(
+    fake_email_with_file, owner_client, detail_url, mock_restore_emails_delay
+):
+    """Tests :class:`web.views.MailboxDetailWithDeleteView` with the authenticated owner user client
+    in case of a successful restore action.
+    """
+    fake_email_with_file.mailbox.account.protocol = EmailProtocolChoices.IMAP4_SSL
+    fake_email_with_file.mailbox.account.is_healthy = True
+    fake_email_with_file.mailbox.account.save(update_fields=["protocol", "is_healthy"])
+    fake_email_with_file.mailbox.is_healthy = True
+    fake_email_with_file.mailbox.save(update_fields=["is_healthy"])
+
+    response = owner_client.post(
+        detail_url(MailboxDetailWithDeleteView, fake_email_with_file.mailbox),
+        {"restore": "Restore emails"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "web/mailbox/mailbox_detail.html" in [
+        template.name for template in response.templates
+    ]
+    assert len(response.context["messages"]) == 1
+    for mess in response.context["messages"]:
+        assert mess.level == messages.SUCCESS
+    mock_restore_emails_delay.assert_called_once_with([fake_email_with_file.id])
+
+
+@pytest.mark.django_db
+def test_post_restore_unsupported_auth_owner(
+    fake_email, owner_client, detail_url, mock_restore_emails_delay
+):
+    """Tests :class:`web.views.MailboxDetailWithDeleteView` with the authenticated owner user client
+    in case the mailbox does not support restoring.
+    """
+    fake_email.mailbox.account.protocol = EmailProtocolChoices.POP3_SSL
+    fake_email.mailbox.account.save(update_fields=["protocol"])
+
+    response = owner_client.post(
+        detail_url(MailboxDetailWithDeleteView, fake_email.mailbox),
+        {"restore": "Restore emails"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.context["messages"]) == 1
+    for mess in response.context["messages"]:
+        assert mess.level == messages.WARNING
+    mock_restore_emails_delay.assert_not_called()
+
+
+@pytest.fixture
+def mock_restore_emails_delay(mocker):
+    """Patches `core.tasks.restore_emails.delay`."""
+    return mocker.patch(
+        "web.views.mailbox_views.MailboxDetailWithDeleteView.restore_emails.delay"
+    )